@@ -1,16 +1,91 @@
+import logging
 import os
+import shutil
 import textwrap
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from itertools import islice
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
-from tqdm import tqdm
-
-from mast_contributor_tools.filename_check.fc_db import Hlsp_SQLiteDb
+from mast_contributor_tools.filename_check.fc_config import (
+    DEFAULT_CONFIG_FILE,
+    DEFAULT_OIF_FILE,
+    RuleSet,
+    get_rules,
+    load_rules,
+)
 from mast_contributor_tools.filename_check.hlsp_filename import HLSPNAME_REGEX, FieldRule, HlspFileName
 from mast_contributor_tools.utils.logger_config import setup_logger
 
 logger = setup_logger(__name__)
 
+if TYPE_CHECKING:
+    from mast_contributor_tools.filename_check.fc_cache import VerdictCache
+    from mast_contributor_tools.filename_check.fc_metrics import RunMetrics
+    from mast_contributor_tools.filename_check.fc_sample import SampleEstimate
+    from mast_contributor_tools.filename_check.fc_sinks import ResultSink
+
+
+def iter_file_paths(
+    hlsp_path: str,
+    from_file: str = "",
+    search_pattern: str = "*.*",
+    exclude_pattern: Union[str, None] = None,
+    discovery: str = "glob",
+) -> Iterator[Path]:
+    """
+    Yield filename Paths relative to the given directory, one at a time, without building a list.
+
+    Parameters are as for get_file_paths(), which collects the paths from this generator.
+    """
+    # Set current directory if no directory specified
+    if not hlsp_path:
+        base_path = Path.cwd()
+    else:
+        base_path = Path(hlsp_path)
+
+    # If a from_file was given, create the file list from that
+    if from_file:
+        # Raise error if file does not exist
+        if not os.path.exists(from_file):
+            msg = f"File '{from_file}' does not exist."
+            logger.error(msg)
+            raise FileNotFoundError(msg)
+        with open(from_file, "r") as f:
+            paths = (Path(filename.strip("\n")) for filename in f)
+            yield from match_paths(paths, search_pattern, exclude_pattern)
+    # Otherwise, scan the contents of the directory
+    elif discovery == "walk":
+        yield from match_paths(_walk_files(base_path), search_pattern, exclude_pattern)
+    else:
+        paths = (p.relative_to(base_path) for p in base_path.rglob(search_pattern) if p.is_file())
+        yield from match_paths(paths, search_pattern, exclude_pattern)
+
+
+def _walk_files(base_path: Path) -> Iterator[Path]:
+    """Yield the files below a directory, relative to it, listing each directory once with os.scandir().
+
+    The file types come from the directory entries, so that on most file systems no file is stat'ed.
+    As with Path.rglob(), symbolic links to directories are not followed.
+    """
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        with os.scandir(base_path / relative) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(os.path.join(relative, entry.name))
+                elif entry.is_file():
+                    yield Path(relative, entry.name)
+
+
+def match_paths(paths: Iterable[Path], search_pattern: str, exclude_pattern: Union[str, None]) -> Iterator[Path]:
+    """Keep the paths matching the search pattern, and not the exclude pattern"""
+    for f in paths:
+        if f.match(search_pattern) and not (exclude_pattern and f.match(exclude_pattern)):
+            yield f
+
 
 def get_file_paths(
     hlsp_path: str,
@@ -18,6 +93,7 @@ def get_file_paths(
     search_pattern: str = "*.*",
     exclude_pattern: Union[str, None] = None,
     max_n: Union[int, None] = None,
+    discovery: str = "glob",
 ) -> list[Path]:
     """
     Build a list of filename Paths relative to the given directory.
@@ -43,48 +119,30 @@ def get_file_paths(
         Maximum number of files to check, for testing purposes. For example,
         max_n=10 will only check the first 10 files found.
 
+    discovery : str, optional
+        How to list the files of the directory: 'glob' (default) with Path.rglob(), or 'walk' with
+        os.scandir(), which is faster on file systems where looking up each file is slow. The
+        faster one for a machine is measured by `mct bench` (see fc_bench).
+
     Returns
     -------
     list[Path]
         A list of filename Paths contained within the given directory
     """
-    # Set current directory if no directory specified
-    if not hlsp_path:
-        base_path = Path.cwd()
-    else:
-        base_path = Path(hlsp_path)
-
-    # If a from_file was given, create the file list from that
-    if from_file:
-        # Raise error if file does not exist
-        if not os.path.exists(from_file):
-            msg = f"File '{from_file}' does not exist."
-            logger.error(msg)
-            raise FileNotFoundError(msg)
-        else:
-            with open(from_file, "r") as f:
-                file_list = [Path(filename.strip("\n")) for filename in f.readlines()]
-    # Otherwise, scan the contents of the directory
-    else:
-        file_list = [p.relative_to(base_path) for p in base_path.rglob(search_pattern) if p.is_file()]
-
-    # Match against the search pattern
-    file_list = [f for f in file_list if f.match(search_pattern)]
-
-    # Exclude files from exclude_pattern
-    if exclude_pattern:
-        file_list = [f for f in file_list if not f.match(exclude_pattern)]
+    file_paths = iter_file_paths(hlsp_path, from_file, search_pattern, exclude_pattern, discovery)
 
     # Limit number of files returned to first n rows for testing purposes
     if max_n:
-        if int(max_n) < len(file_list):
-            file_list = file_list[: int(max_n)]
+        file_list = list(islice(file_paths, int(max_n)))
+    else:
+        file_list = list(file_paths)
 
     # Raise error if no files are found
     if len(file_list) == 0:
         if from_file:
             msg = f"No files found to check against filename rules in file ({from_file})."
         else:
+            base_path = Path(hlsp_path) if hlsp_path else Path.cwd()
             msg = f"No files found to check against filename rules in directory ({base_path})."
         logger.error(msg)
         raise FileNotFoundError(msg)
@@ -92,19 +150,14 @@ def get_file_paths(
     return file_list
 
 
-def check_filenames(hlsp_name: str, file_list: list[Path], dbFile: str) -> None:
-    """Recursively check filenames in a directory tree of HLSP products
+def validate_hlsp_name(hlsp_name: str) -> None:
+    """Make sure the name of an HLSP collection is valid
 
-    Parameters
-    ----------
-    hlsp_name : str
-        Official identifier (abbreviation/acronym/initialism) for the HLSP collection
-    file_list: list[str]
-        List of files to check, typically output from get_file_paths()
-    dbFile : str, optional
-        Name of SQLite database file to contain results
+    Raises
+    ------
+    ValueError
+        Raised if the name does not follow the rules for HLSP names.
     """
-    # Make sure hlsp name is valid
     if not FieldRule.match_pattern(hlsp_name, HLSPNAME_REGEX):
         msg = (
             f"Invalid hlsp_name for HLSP collection: '{hlsp_name}'.\n"
@@ -117,44 +170,351 @@ def check_filenames(hlsp_name: str, file_list: list[Path], dbFile: str) -> None:
         logger.error(msg)
         raise ValueError(msg)
 
-    # Beging file name checking
-    logger.critical(f"Evaluating {len(file_list)} files for HLSP collection '{hlsp_name}'")
+
+def evaluate_file(
+    file_path: Path,
+    hlsp_name: str,
+    cache: Union["VerdictCache", None] = None,
+    rules: Union[RuleSet, str, None] = None,
+) -> Union[tuple[dict, list[dict]], None]:
+    """Evaluate the name of one file and each of its fields
+
+    Parameters
+    ----------
+    file_path : Path
+        Path of the file to check
+    hlsp_name : str
+        Official identifier (abbreviation/acronym/initialism) for the HLSP collection
+    cache : VerdictCache, optional
+        Cache of field scores from previous evaluations, made with the same rules
+    rules : RuleSet or str, optional
+        Rules to check the fields with, or the name of a rule set; the default rule set if not given
+
+    Returns
+    -------
+    tuple[dict, list[dict]] or None
+        The file record and the records of its fields, or None if the name is invalid
+    """
+    try:
+        hfn = HlspFileName(file_path, hlsp_name, rules)
+        hfn.partition()
+    except ValueError:
+        logger.error("Invalid name: %s, skipping...", file_path.name)
+        return None
+    hfn.create_fields()
+    elements = hfn.evaluate_fields(cache)
+    # Link elements to parent filename in db
+    for e in elements:
+        e["file_ref"] = file_path.name
+    # Order is important here: evaluating filename requries fields to be evaluated
+    return hfn.evaluate_filename(), elements
+
+
+def evaluate_name(
+    file_name: str,
+    hlsp_name: str = "",
+    cache: Union["VerdictCache", None] = None,
+    rules: Union[RuleSet, str, None] = None,
+) -> dict:
+    """Evaluate a single file name, returning its verdict and the scores of its fields as one record
+
+    Unlike check_single_filename(), nothing is logged, so this is suited to checking many names,
+    for example from a pipe or a validation service.
+
+    Parameters
+    ----------
+    file_name : str
+        File name of an HLSP product, optionally with its path: for example 'hlsp_my-hlsp_readme.txt'
+    hlsp_name : str, optional
+        Name of the HLSP collection. If not supplied, it is inferred from the second field of the name.
+    cache : VerdictCache, optional
+        Cache of field scores from previous evaluations, made with the same rules
+    rules : RuleSet or str, optional
+        Rules to check the fields with, or the name of a rule set; the default rule set if not given
+
+    Returns
+    -------
+    dict
+        The file record with its field records under 'fields', as written by the NDJSON result sink,
+        or the file name and an 'error' message if the name cannot be checked
+    """
+    file_path = Path(file_name)
+    parts = file_path.name.split("_")
+    if not hlsp_name:
+        if len(parts) < 3:
+            return {"filename": file_path.name, "error": "Could not infer HLSP name: not enough parts in filename"}
+        hlsp_name = parts[1].lower()
+    try:
+        hfn = HlspFileName(file_path, hlsp_name, rules)
+        hfn.partition()
+    except ValueError as e:
+        return {"filename": file_path.name, "error": str(e)}
+    hfn.create_fields()
+    fields = hfn.evaluate_fields(cache)
+    return {**hfn.evaluate_filename(), "fields": fields}
+
+
+def open_sink(output_format: str, dbFile: str, **options) -> "ResultSink":
+    """Create the results file, replacing any existing file, and return the sink writing to it.
+
+    Any options are passed on to the sink, see fc_sinks.get_sink().
+    """
+    from mast_contributor_tools.filename_check.fc_sinks import get_sink
+
     if Path(dbFile).is_file():
-        logger.warning(f"Database file {dbFile} already exists. Overwriting File.")
+        logger.warning("Database file %s already exists. Overwriting File.", dbFile)
         os.remove(dbFile)
-    db = Hlsp_SQLiteDb(dbFile)
-    logger.debug(f"Creating results database {dbFile}")
-    db.create_db()
+    sink = get_sink(output_format, dbFile, **options)
+    logger.debug("Creating results file %s", dbFile)
+    sink.open()
+    return sink
+
+
+def load_collection_rules(hlsp_name: str, vocabulary_file: str = "") -> RuleSet:
+    """Returns the default rule set, extended with the vocabulary file of a collection if one is given.
+
+    Raises
+    ------
+    FileNotFoundError
+        Raised if the vocabulary file does not exist.
+    ValueError
+        Raised if the vocabulary file is invalid.
+    """
+    if not vocabulary_file:
+        return get_rules()
+    rules = load_rules(hlsp_name, DEFAULT_CONFIG_FILE, DEFAULT_OIF_FILE, vocabulary_file)
+    added = ", ".join(f"{len(values)} {section}" for section, values in rules.vocabulary.items())
+    logger.info("Vocabulary of %s from %s: %s", hlsp_name, vocabulary_file, added or "no new values")
+    return rules
+
+
+def vocabulary_record(rules: RuleSet) -> Union[dict, None]:
+    """Returns the vocabulary file of a rule set and the values it adds, as recorded in the run metrics"""
+    if len(rules.files) < 3:
+        return None
+    return {"file": os.path.abspath(rules.files[2]), "values": {k: list(v) for k, v in rules.vocabulary.items()}}
+
+
+def load_cache(cache_file: str, cfg_hash: str = "") -> Union["VerdictCache", None]:
+    """Load the field score cache, or return None if no cache file is given"""
+    from mast_contributor_tools.filename_check.fc_cache import VerdictCache
+
+    if not cache_file:
+        return None
+    cache = VerdictCache(cache_file, cfg_hash)
+    cache.load()
+    logger.debug("Loaded %d cached field scores from %s", len(cache.entries), cache_file)
+    return cache
+
+
+def save_cache(cache: Union["VerdictCache", None], metrics: "RunMetrics") -> Union[float, None]:
+    """Save the field score cache, if there is one, and return its hit rate"""
+    if cache is None:
+        return None
+    with metrics.stage("save_cache"):
+        cache.save()
+    logger.info("Field score cache hit rate: %.1f%%", 100 * cache.hit_rate)
+    return cache.hit_rate
+
+
+def log_rejected(rejected: list[tuple[str, str]], counts: Counter) -> None:
+    """Log the files that could not be added to the results file, and count them"""
+    counts["rejected"] += len(rejected)
+    for filename, error in rejected:
+        logger.error("Error adding %s: %s", filename, error)
+
+
+def check_filenames(
+    hlsp_name: str,
+    file_list: list[Path],
+    dbFile: str,
+    cache_file: str = "",
+    output_format: str = "sqlite",
+    batch_size: int = 1000,
+    metrics_file: Union[str, None] = None,
+    root: str = "",
+    check_content: bool = False,
+    vocabulary_file: str = "",
+    sqlite_writer: str = "background",
+) -> None:
+    """Recursively check filenames in a directory tree of HLSP products
+
+    Parameters
+    ----------
+    hlsp_name : str
+        Official identifier (abbreviation/acronym/initialism) for the HLSP collection
+    file_list: list[str]
+        List of files to check, typically output from get_file_paths()
+    dbFile : str, optional
+        Name of the results file (an SQLite database, by default)
+    cache_file : str, optional
+        Name of an SQLite file caching field scores between runs. Not used if empty (default).
+    output_format : str, optional
+        Format of the results file: one of 'sqlite' (default), 'duckdb' or 'ndjson'. See fc_sinks.
+    batch_size : int, optional
+        Number of files whose results are written to the results file at a time
+    metrics_file : str, optional
+        Name of the JSON file recording the timings and other metrics of the run (see fc_metrics).
+        Defaults to the name of the results file followed by '.metrics.json'; not written if empty.
+    root : str, optional
+        Directory the paths of file_list are relative to, if not the current directory. Only
+        used to check the content of the files.
+    check_content : bool, optional
+        Also check that the first bytes of each file match the format of its extension,
+        recording the result as a 'content' field (see fc_content)
+    vocabulary_file : str, optional
+        YAML file of the missions, instruments, filters, product types and extensions used by the
+        collection besides those of the package configuration (see fc_config.load_vocabulary).
+        The file and the values it adds are recorded in the metrics of the run.
+    sqlite_writer : str, optional
+        How batches are written to an SQLite results file: 'background' (default) in a thread of
+        their own while the next batch is checked, or 'inline' before the next batch is checked.
+        Not used by the other formats.
+    """
+    # Imported here rather than at the top of the module, since checking single names does not need them
+    from tqdm import tqdm
+
+    from mast_contributor_tools.filename_check.fc_content import add_content_fields
+    from mast_contributor_tools.filename_check.fc_metrics import RunMetrics
+
+    # Make sure hlsp name is valid
+    validate_hlsp_name(hlsp_name)
+    rules = load_collection_rules(hlsp_name, vocabulary_file)
+    metrics = RunMetrics(
+        hlsp_name,
+        output_format,
+        settings={
+            "batch_size": batch_size,
+            "cache": bool(cache_file),
+            "check_content": check_content,
+            "sqlite_writer": sqlite_writer if output_format == "sqlite" else None,
+        },
+        workers=1,
+    )
+    if metrics_file is None:
+        metrics_file = f"{dbFile}.metrics.json" if dbFile != "-" else ""
+
+    # Beging file name checking
+    logger.critical("Evaluating %d files for HLSP collection '%s'", len(file_list), hlsp_name)
+    with metrics.stage("open"):
+        options = {"background": sqlite_writer == "background"} if output_format == "sqlite" else {}
+        sink = open_sink(output_format, dbFile, **options)
+        # Load the scores of previously seen field values
+        cache = load_cache(cache_file, rules.config_hash)
+
+    # Number of files with each final verdict, and of files that could not be checked or written
+    counts: Counter = Counter(invalid=0, rejected=0)
+
+    def write_batch() -> None:
+        """Hand the current batch of files to the sink, and start a new batch"""
+        nonlocal file_recs, field_recs
+        if check_content:
+            with metrics.stage("content"):
+                add_content_fields(file_recs, field_recs, root)
+        with metrics.stage("write"):
+            log_rejected(sink.write_batch(file_recs, field_recs), counts)
+        counts.update(r["final_verdict"] for r in file_recs)
+        # New lists, since a background writer may still hold the previous ones
+        file_recs, field_recs = [], []
+        # Show the writer's queue depth and lag, if any, next to the progress bar
+        progress.set_postfix(sink.status(), refresh=False)
 
     # Evaluate each filename
+    file_recs: list[dict] = []
+    field_recs: list[list[dict]] = []
     # tqdm creates the progress bar: https://tqdm.github.io/docs/tqdm/
-    for f in tqdm(file_list):
-        logger.debug(f"Examining {f.name}")
-        try:
-            hfn = HlspFileName(f, hlsp_name)
-            hfn.partition()
-        except ValueError:
-            logger.error(f"Invalid name: {f.name}, skipping...")
-        else:
-            hfn.create_fields()
-            elements = hfn.evaluate_fields()
-            # Link elements to parent filename in db
-            for e in elements:
-                e["file_ref"] = f.name
-            # Order is important here: evaluating filename requries fields to be evaluated
-            file_rec = hfn.evaluate_filename()
-            # Record the results in the db
-            try:
-                db.add_filename(file_rec)
-            except Exception as e:
-                logger.error(f"Error adding {f.name}: {e}")
-            else:
-                db.add_fields(elements)
-            logger.debug(f"Verdict for {f.name}: '{file_rec['final_verdict']}'")
-
-    logger.critical(db.print_summary())  # print summary information on how many files passed
-    db.close_db()
-    logger.critical(f"\nFilename checking complete. Results written to {dbFile}")
+    progress = tqdm(file_list)
+    # Checked once rather than for every file, since the level does not change during the run
+    debug = logger.isEnabledFor(logging.DEBUG)
+    with metrics.stage("evaluate"):
+        for f in progress:
+            if debug:
+                logger.debug("Examining %s", f.name)
+            result = evaluate_file(f, hlsp_name, cache, rules)
+            if result is None:
+                counts["invalid"] += 1
+                continue
+            file_rec, elements = result
+            # Record the results in batches
+            file_recs.append(file_rec)
+            field_recs.append(elements)
+            if len(file_recs) >= batch_size:
+                write_batch()
+            if debug:
+                logger.debug("Verdict for %s: '%s'", f.name, file_rec["final_verdict"])
+        # The time spent handing batches to the sink, or checking their content, is not counted as evaluating;
+        # taken before the last batch, which is written after the evaluate stage
+        batch_time = metrics.stages.get("write", 0.0) + metrics.stages.get("content", 0.0)
+    metrics.add_time("evaluate", -batch_time)
+    write_batch()
+    with metrics.stage("finish"):
+        log_rejected(sink.finish(), counts)
+    cache_hit_rate = save_cache(cache, metrics)
+
+    with metrics.stage("summarize"):
+        logger.critical(sink.summarize())  # print summary information on how many files passed
+    with metrics.stage("close"):
+        sink.close()
+
+    # Record the metrics of the run with the results, and in the metrics file
+    metrics.finish(
+        len(file_list),
+        counts,
+        cache_hit_rate=cache_hit_rate,
+        config_hash=rules.config_hash,
+        vocabulary=vocabulary_record(rules),
+    )
+    sink.record_run(metrics.run_row())
+    if metrics_file:
+        metrics.write_json(metrics_file)
+        logger.debug("Run metrics written to %s", metrics_file)
+    logger.critical("\nFilename checking complete. Results written to %s", dbFile)
+
+
+def sample_filenames(
+    hlsp_name: str,
+    file_paths: Iterable[Path],
+    sample_size: int,
+    seed: Union[int, None] = None,
+    vocabulary_file: str = "",
+) -> "SampleEstimate":
+    """Estimate the verdicts of a collection by checking a stratified sample of its file names
+
+    Parameters
+    ----------
+    hlsp_name : str
+        Official identifier (abbreviation/acronym/initialism) for the HLSP collection
+    file_paths : Iterable[Path]
+        Files of the collection, typically from iter_file_paths(). They are read in a single pass.
+    sample_size : int
+        Number of files to sample uniformly; files from strata (directory and extension) missing
+        from this sample are added, up to as many again. See fc_sample.
+    seed : int, optional
+        Seed of the random number generator, for reproducible samples
+    vocabulary_file : str, optional
+        Vocabulary file of the collection, as for check_filenames()
+
+    Returns
+    -------
+    SampleEstimate
+        The estimated proportion of files with each verdict, with confidence intervals
+    """
+    from mast_contributor_tools.filename_check.fc_sample import StratifiedSample, estimate_verdicts
+
+    # Make sure hlsp name is valid
+    validate_hlsp_name(hlsp_name)
+    rules = load_collection_rules(hlsp_name, vocabulary_file)
+
+    sample = StratifiedSample(sample_size, seed=seed).extend(file_paths)
+    if sample.n_files == 0:
+        msg = "No files found to check against filename rules."
+        logger.error(msg)
+        raise FileNotFoundError(msg)
+    logger.info("Sampled %d files in %d directory/extension strata", sample.n_files, len(sample.strata))
+
+    estimate = estimate_verdicts(sample, hlsp_name, rules=rules)
+    logger.critical(estimate.format())
+    return estimate
 
 
 def check_single_filename(file_name: str, hlsp_name: str = "") -> None:
@@ -186,7 +546,6 @@ def check_single_filename(file_name: str, hlsp_name: str = "") -> None:
     elements = hfn.evaluate_fields()
     file_rec = hfn.evaluate_filename()
 
-    # TODO: Add more helpful outputs here for each failure cases?
     # Define list of suggested solution for each rule
     suggested_solutions = {
         "capitalization_score": "File names should be all lowercase.",
@@ -195,23 +554,38 @@ def check_single_filename(file_name: str, hlsp_name: str = "") -> None:
         "value_score": "Unrecognized value or combination. These are often necessary and good, but require review by MAST staff.",
     }
 
-    # Display resuls
-    for e in elements:
-        logger_msg = "Individual Field evaluations: \n"
-        for p, v in e.items():
-            logger_msg += f"  {p}: '{v}' \n"
-            if (v.lower() in ["needs review", "fail"]) and (p in suggested_solutions.keys()):
-                # Wrap text to the same indent level
-                logger_msg += textwrap.fill(
-                    f"\tHINT: {suggested_solutions[p]}",
-                    subsequent_indent="\t",
-                    width=os.get_terminal_size().columns - 5,  # Extra 5 to account for the tab
-                )
-                logger_msg += "\n"
-        logger.debug(logger_msg)
+    # Display resuls; the field evaluations are only built in verbose mode
+    if logger.isEnabledFor(logging.DEBUG):
+        for e in elements:
+            logger_msg = "Individual Field evaluations: \n"
+            for p, v in e.items():
+                if p == "suggestions":
+                    continue
+                logger_msg += f"  {p}: '{v}' \n"
+                if (v.lower() in ["needs review", "fail"]) and (p in suggested_solutions.keys()):
+                    # Wrap text to the same indent level
+                    logger_msg += textwrap.fill(
+                        f"\tHINT: {suggested_solutions[p]}",
+                        subsequent_indent="\t",
+                        # Extra 5 to account for the tab; 80 columns when not a TTY
+                        width=shutil.get_terminal_size().columns - 5,
+                    )
+                    logger_msg += "\n"
+            logger.debug(logger_msg)
 
     logger_msg = f"Evaluating filename: {file_name} \n"
     for p, v in file_rec.items():
         logger_msg += f"  {p}: {v} \n"
     logger_msg += f"Final Verdict: '{file_rec['final_verdict'].upper()}'"
+    logger_msg += format_suggestions(elements)
     logger.critical(logger_msg)
+
+
+def format_suggestions(elements: list[dict]) -> str:
+    """Returns a line with the suggested values of each field that has any, for example "did you mean 'nircam'?" """
+    lines = ""
+    for e in elements:
+        if e.get("suggestions"):
+            suggestions = " or ".join(repr(v) for v in e["suggestions"])
+            lines += f"\n  {e['name']} '{e['value']}': did you mean {suggestions}?"
+    return lines
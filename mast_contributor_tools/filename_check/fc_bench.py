@@ -0,0 +1,209 @@
+"""Measure check_filenames on this machine, and recommend the settings it runs fastest with.
+
+The fastest settings depend on the node and its file system: how quickly a directory tree can be
+listed, and how much writing the results in a background thread saves over writing them between
+batches. `mct bench` runs short trials of check_filenames on a directory or list of files of the
+user, or on a synthetic collection of empty files, and writes the settings of the fastest trial to
+the settings file loaded by `mct check_filenames` (see fc_settings).
+
+Two strategies of discovery are timed by listing the same files with each of them, in turn. Each
+combination of batch size and SQLite writer then checks the same files in a process of its own,
+so that its peak memory is measured apart from the others. Among the trials within SPEED_TOLERANCE
+of the fastest, the one using the least memory is recommended.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice, product
+from typing import Union
+
+from mast_contributor_tools import __version__
+from mast_contributor_tools.filename_check.fc_app import get_file_paths, iter_file_paths
+from mast_contributor_tools.filename_check.fc_choices import DISCOVERY_STRATEGIES, SQLITE_WRITERS
+from mast_contributor_tools.filename_check.fc_server import benchmark_names
+from mast_contributor_tools.filename_check.fc_settings import DEFAULT_SETTINGS
+
+# Batch sizes tried, around the default of check_filenames
+BATCH_SIZES = [250, 1000, 5000]
+# Number of files checked by each trial
+DEFAULT_N_FILES = 10_000
+# Number of files in each directory of the synthetic collection
+FILES_PER_DIRECTORY = 500
+# Trials this much slower than the fastest are not recommended, however little memory they use
+SPEED_TOLERANCE = 0.05
+
+
+@dataclass
+class Trial:
+    """Settings of a trial of check_filenames, and its speed and peak memory"""
+
+    settings: dict
+    files_per_sec: float
+    peak_rss_mb: Union[float, None]
+
+
+@dataclass
+class BenchResult:
+    """Results of run_bench(): the trials, the time to list the files with each discovery strategy, and the
+    recommended settings"""
+
+    source: str
+    n_files: int
+    output_format: str
+    discovery_sec: dict[str, float] = field(default_factory=dict)
+    trials: list[Trial] = field(default_factory=list)
+    recommended: dict = field(default_factory=dict)
+
+    def record(self) -> dict:
+        """Returns the results as recorded in the settings file, next to the recommended settings"""
+        return {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "mct_version": __version__,
+            "source": self.source,
+            "n_files": self.n_files,
+            "output_format": self.output_format,
+            "discovery_sec": {k: round(v, 4) for k, v in self.discovery_sec.items()},
+            "trials": [
+                {
+                    **t.settings,
+                    "files_per_sec": round(t.files_per_sec, 1),
+                    "peak_rss_mb": t.peak_rss_mb and round(t.peak_rss_mb, 1),
+                }
+                for t in self.trials
+            ],
+        }
+
+
+def configurations(output_format: str = "sqlite") -> list[dict]:
+    """Returns the settings of check_filenames to try: every batch size, with each SQLite writer for SQLite results"""
+    writers = SQLITE_WRITERS if output_format == "sqlite" else [DEFAULT_SETTINGS["sqlite_writer"]]
+    return [{"batch_size": b, "sqlite_writer": w} for b, w in product(BATCH_SIZES, writers)]
+
+
+def make_corpus(directory: str, n_files: int, hlsp_name: str = "bench") -> None:
+    """Create a synthetic collection of n_files empty files with realistic names, FILES_PER_DIRECTORY to a directory"""
+    for start in range(0, n_files, FILES_PER_DIRECTORY):
+        subdir = os.path.join(directory, f"dir{start // FILES_PER_DIRECTORY:04d}")
+        os.makedirs(subdir, exist_ok=True)
+        for name in benchmark_names(min(FILES_PER_DIRECTORY, n_files - start), start, hlsp_name):
+            open(os.path.join(subdir, name), "w").close()
+
+
+def time_discovery(directory: str, n_files: int, repeat: int = 1) -> dict[str, float]:
+    """Returns the best time, in seconds, to list up to n_files files of a directory with each discovery strategy.
+
+    The strategies take turns, so that neither benefits alone from the directories cached by the other.
+    """
+    best = {}
+    for _ in range(repeat):
+        for discovery in DISCOVERY_STRATEGIES:
+            start = time.perf_counter()
+            for _ in islice(iter_file_paths(directory, discovery=discovery), n_files):
+                pass
+            best[discovery] = min(best.get(discovery, float("inf")), time.perf_counter() - start)
+    return best
+
+
+def _run_trial(hlsp_name: str, file_list: list, output_format: str, settings: dict, db_file: str) -> dict:
+    """Check the files with the given settings, quietly, and return the metrics of the run.
+
+    Run in a process of its own, so that the peak memory of the run is its own.
+    """
+    # Imported here so that the progress bar reads the variable when tqdm is first imported
+    os.environ["TQDM_DISABLE"] = "1"
+    from mast_contributor_tools.filename_check.fc_app import check_filenames
+
+    logging.disable(logging.CRITICAL)
+    metrics_file = db_file + ".metrics.json"
+    check_filenames(hlsp_name, file_list, db_file, output_format=output_format, metrics_file=metrics_file, **settings)
+    with open(metrics_file, "r") as f:
+        return json.load(f)
+
+
+def run_trial(hlsp_name: str, file_list: list, output_format: str, settings: dict, work_dir: str) -> Trial:
+    """Returns the speed and peak memory of check_filenames with the given settings, run in a new process."""
+    db_file = os.path.join(work_dir, "bench" + ("" if output_format == "ndjson" else ".db"))
+    # A fresh interpreter, rather than a fork of this one, so that its memory starts from nothing
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        metrics = executor.submit(_run_trial, hlsp_name, file_list, output_format, settings, db_file).result()
+    return Trial(settings, metrics["files_per_sec"], metrics["peak_rss_mb"])
+
+
+def recommend(trials: list[Trial]) -> Trial:
+    """Returns the trial using the least memory among those within SPEED_TOLERANCE of the fastest"""
+    fastest = max(t.files_per_sec for t in trials)
+    candidates = [t for t in trials if t.files_per_sec >= (1 - SPEED_TOLERANCE) * fastest]
+    return min(candidates, key=lambda t: (t.peak_rss_mb or 0.0, -t.files_per_sec))
+
+
+def run_bench(
+    hlsp_name: str = "bench",
+    directory: str = "",
+    from_file: str = "",
+    n_files: int = DEFAULT_N_FILES,
+    output_format: str = "sqlite",
+    repeat: int = 1,
+) -> BenchResult:
+    """Run trials of check_filenames with each configuration, and recommend the fastest settings.
+
+    Parameters
+    ----------
+    hlsp_name : str, optional
+        Name of the HLSP collection the files are checked for
+    directory : str, optional
+        Directory of files to check, as for `mct check_filenames`. If neither a directory nor a
+        list of files is given, a synthetic collection of n_files empty files is created.
+    from_file : str, optional
+        Text file listing the files to check. Discovery is not timed, as the files are not listed.
+    n_files : int, optional
+        Number of files to list and check in each trial
+    output_format : str, optional
+        Format of the results file written by each trial, see fc_sinks
+    repeat : int, optional
+        Number of times each configuration is tried; the fastest trial of each is kept
+
+    Returns
+    -------
+    BenchResult
+        The trials and the recommended settings
+    """
+    with tempfile.TemporaryDirectory(prefix="mct_bench_") as work_dir:
+        source = from_file or directory
+        if not source:
+            directory = os.path.join(work_dir, "corpus")
+            make_corpus(directory, n_files, hlsp_name)
+        result = BenchResult(source or f"synthetic ({n_files} files)", n_files, output_format)
+        discovery = DEFAULT_SETTINGS["discovery"]
+        if not from_file:
+            result.discovery_sec = time_discovery(directory, n_files, repeat)
+            discovery = min(result.discovery_sec, key=result.discovery_sec.get)
+        file_list = get_file_paths(directory, from_file=from_file, max_n=n_files, discovery=discovery)
+        result.n_files = len(file_list)
+
+        for settings in configurations(output_format):
+            trials = [run_trial(hlsp_name, file_list, output_format, settings, work_dir) for _ in range(repeat)]
+            result.trials.append(max(trials, key=lambda t: t.files_per_sec))
+    result.recommended = {**recommend(result.trials).settings, "discovery": discovery}
+    return result
+
+
+def format_bench(result: BenchResult) -> str:
+    """Returns a table of the trials of run_bench(), and the recommended settings."""
+    lines = [f"Benchmark of check_filenames on {result.n_files} files of {result.source}:"]
+    for discovery, seconds in result.discovery_sec.items():
+        lines.append(f"    Discovery '{discovery}': {result.n_files / max(seconds, 1e-9):.0f} files per second")
+    lines.append(f"    {'batch_size':>10}  {'sqlite_writer':<13}  {'files/s':>9}  {'peak MB':>8}")
+    for trial in result.trials:
+        rss = f"{trial.peak_rss_mb:.1f}" if trial.peak_rss_mb is not None else "-"
+        settings = trial.settings
+        lines.append(
+            f"    {settings['batch_size']:>10}  {settings['sqlite_writer']:<13}  {trial.files_per_sec:>9.0f}  {rss:>8}"
+        )
+    lines.append("Recommended settings: " + ", ".join(f"{k}={v}" for k, v in result.recommended.items()))
+    return "\n".join(lines)
@@ -0,0 +1,128 @@
+"""A persistent cache of field scores, shared between filename check runs.
+
+Most field values (missions, instruments, product types, extensions...) repeat across
+files and across runs, so their scores only need to be computed once. Each entry is
+keyed by the role of the field, its value, and a hash of the configuration used to
+score it; changing the configuration therefore invalidates the cache automatically.
+
+A cache file may be shared by several configurations, for example collections checked in turn
+with their own vocabulary files. The entries of the MAX_CONFIGS configurations saved most
+recently are kept, and those of older configurations are removed.
+"""
+
+import sqlite3
+import time
+from typing import Union
+
+from mast_contributor_tools.filename_check.fc_config import DEFAULT_CONFIG_FILE, DEFAULT_OIF_FILE, hash_files
+
+# Files that determine how fields are scored by the default rule set
+CONFIG_FILES = [DEFAULT_CONFIG_FILE, DEFAULT_OIF_FILE]
+SCORE_NAMES = ["capitalization_score", "length_score", "format_score", "value_score", "field_verdict"]
+# Number of configurations whose entries are kept in a cache file
+MAX_CONFIGS = 8
+
+CACHE_TABLE = """
+        CREATE TABLE IF NOT EXISTS verdict_cache (
+        config_hash  TEXT NOT NULL,
+        role  TEXT NOT NULL,
+        value  TEXT NOT NULL,
+        capitalization_score  TEXT NOT NULL,
+        length_score  TEXT NOT NULL,
+        format_score  TEXT NOT NULL,
+        value_score  TEXT NOT NULL,
+        field_verdict  TEXT NOT NULL,
+        PRIMARY KEY (config_hash, role, value)
+        ) WITHOUT ROWID;
+        """
+CONFIGS_TABLE = """
+        CREATE TABLE IF NOT EXISTS cache_configs (
+        config_hash  TEXT NOT NULL PRIMARY KEY,
+        saved_at  REAL NOT NULL
+        ) WITHOUT ROWID;
+        """
+# Forget the configurations other than the MAX_CONFIGS saved most recently, then remove their entries
+DELETE_OLD_CONFIGS = [
+    "DELETE FROM cache_configs WHERE config_hash NOT IN "
+    "(SELECT config_hash FROM cache_configs ORDER BY saved_at DESC LIMIT ?)",
+    "DELETE FROM verdict_cache WHERE config_hash NOT IN (SELECT config_hash FROM cache_configs)",
+]
+
+
+def config_hash(config_files: Union[list[str], None] = None) -> str:
+    """Returns a hash of the configuration files and package version, identifying how fields are scored.
+
+    This is the RuleSet.config_hash of a rule set loaded from the same files.
+    """
+    return hash_files(config_files or CONFIG_FILES)
+
+
+class VerdictCache:
+    """Cache of field scores, stored in an SQLite file and loaded into memory for a run.
+
+    Parameters
+    ----------
+    cache_file : str
+        Name of the SQLite file holding the cache; created if it does not exist
+    cfg_hash : str, optional
+        Hash of the configuration used to score fields; defaults to config_hash()
+    max_entries : int, optional
+        Maximum number of entries held in memory, and written back to the file
+    """
+
+    def __init__(self, cache_file: str, cfg_hash: str = "", max_entries: int = 1_000_000) -> None:
+        self.cache_file = cache_file
+        self.config_hash = cfg_hash or config_hash()
+        self.max_entries = max_entries
+        self.entries: dict[tuple[str, str], dict[str, str]] = {}
+        self.new_entries: set[tuple[str, str]] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self) -> None:
+        """Load the entries for the current configuration into memory."""
+        with sqlite3.connect(self.cache_file) as conn:
+            conn.execute(CACHE_TABLE)
+            rows = conn.execute(
+                f"SELECT role, value, {', '.join(SCORE_NAMES)} FROM verdict_cache WHERE config_hash = ? LIMIT ?",
+                [self.config_hash, self.max_entries],
+            )
+            self.entries = {(r[0], r[1]): dict(zip(SCORE_NAMES, r[2:])) for r in rows}
+        conn.close()
+
+    def save(self) -> None:
+        """Write new entries back to the file, and remove entries for all but the MAX_CONFIGS latest configurations."""
+        with sqlite3.connect(self.cache_file) as conn:
+            conn.execute(CACHE_TABLE)
+            conn.execute(CONFIGS_TABLE)
+            conn.execute("INSERT OR REPLACE INTO cache_configs VALUES (?, ?)", [self.config_hash, time.time()])
+            conn.execute(DELETE_OLD_CONFIGS[0], [MAX_CONFIGS])
+            conn.execute(DELETE_OLD_CONFIGS[1])
+            conn.executemany(
+                f"INSERT OR REPLACE INTO verdict_cache VALUES (?, ?, ?, {', '.join('?' * len(SCORE_NAMES))})",
+                ([self.config_hash, *key, *(self.entries[key][s] for s in SCORE_NAMES)] for key in self.new_entries),
+            )
+        conn.close()
+        self.new_entries.clear()
+
+    def get(self, role: str, value: str) -> Union[dict[str, str], None]:
+        """Returns the cached scores of a field, or None if it has not been scored."""
+        scores = self.entries.get((role, value))
+        if scores is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return scores
+
+    def put(self, role: str, value: str, scores: dict[str, str]) -> None:
+        """Add the scores of a field to the cache, unless the cache is full."""
+        if len(self.entries) < self.max_entries:
+            key = (role, value)
+            self.entries[key] = {s: scores[s] for s in SCORE_NAMES}
+            self.new_entries.add(key)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
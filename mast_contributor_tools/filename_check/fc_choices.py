@@ -0,0 +1,22 @@
+"""Choices of the command line options, shared with the modules implementing them.
+
+This module has no dependencies, so that mast_cli can define the options of every command
+without importing the modules (and sqlite3, csv or json) that only the commands need.
+"""
+
+# Formats of the results file of check_filenames, and the extension of its default name; see fc_sinks.SINKS
+OUTPUT_FORMATS = {"sqlite": ".db", "duckdb": ".duckdb", "ndjson": ".ndjson"}
+# Relations that can be exported, and the column holding the verdict for each
+EXPORT_RELATIONS = {
+    "filename": "final_verdict",
+    "fields": "field_verdict",
+    "potential_problems": "field_verdict",
+}
+EXPORT_FORMATS = ["csv", "parquet", "arrow"]
+VERDICTS = ["PASS", "FAIL", "NEEDS REVIEW"]
+DIFF_FORMATS = ["text", "jsonl", "db"]
+PLAN_FORMATS = ["csv", "sh"]
+# Ways of writing batches to an SQLite results database, see fc_sinks.SQLiteSink
+SQLITE_WRITERS = ["background", "inline"]
+# Ways of listing the files of a directory, see fc_app.iter_file_paths
+DISCOVERY_STRATEGIES = ["glob", "walk"]
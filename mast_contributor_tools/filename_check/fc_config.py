@@ -0,0 +1,325 @@
+"""Named, immutable rule sets used to check file names, and a registry that loads and reloads them.
+
+A rule set holds everything that determines how the fields of a file name are scored: the
+recognized extensions and product types from fc_config.yaml, the maximum length of each field,
+and the missions, instruments and filters from oif.yaml. It is loaded once, and never changed
+afterwards, so it can be shared between threads and passed to HlspFileName and the fields.
+
+Several rule sets can be registered in one process, for example the package defaults next to
+the overrides of one collection or a candidate vocabulary::
+
+    registry.register("candidate", oif_file="new_oif.yaml")
+    rules = registry.get("candidate")
+    HlspFileName(Path("hlsp_my-hlsp_readme.txt"), "my-hlsp", rules=rules)
+
+The registry checks whether the files of a rule set have changed, at most once every
+'reload_interval' seconds, and swaps in the new rule set when they have, so that a long-lived
+validation service picks up a changed configuration without a restart.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Union
+
+import yaml
+
+from mast_contributor_tools import __version__
+from mast_contributor_tools.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The LibYAML loader, when available, parses the configuration files about ten times faster
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+# Configuration files of the package, used by the default rule set
+DEFAULT_CONFIG_FILE = os.path.join(BASE_DIR, "fc_config.yaml")
+DEFAULT_OIF_FILE = os.path.join(BASE_DIR, "oif.yaml")
+DEFAULT_RULES = "default"
+# Name of the vocabulary file of a collection, in a directory of rule set files
+VOCABULARY_FILE = "vocabulary.yaml"
+# Sections of a collection vocabulary file, and the vocabulary of the rule set each one extends
+VOCABULARY_SECTIONS = {
+    "missions": "missions",
+    "instruments": "instruments",
+    "filters": "filters",
+    "product_types": "semantic_types",
+    "extensions": "extension_types",
+}
+# Default number of seconds between checks for changed configuration files
+RELOAD_INTERVAL = 2.0
+
+
+def hash_files(config_files: list[str]) -> str:
+    """Returns a hash of the configuration files and package version, identifying how fields are scored."""
+    h = hashlib.sha256(__version__.encode())
+    for config_file in config_files:
+        with open(config_file, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """An immutable set of rules for checking the fields of file names.
+
+    Create rule sets with load_rules() or a ConfigRegistry rather than directly.
+
+    Attributes
+    ----------
+    name : str
+        Name of the rule set in its registry
+    extension_types : frozenset[str]
+        Recognized file extensions
+    semantic_types : frozenset[str]
+        Recognized product types
+    field_lengths : Mapping[str, int]
+        Maximum length of each field, by field name
+    missions : frozenset[str]
+        Recognized missions
+    instruments : frozenset[str]
+        Recognized instruments, of any mission
+    filters : frozenset[str]
+        Recognized filters, of any instrument
+    oif : Mapping
+        Contents of oif.yaml, with the aliases of missions and instruments
+    vocabulary : Mapping[str, tuple[str]]
+        Values added to each section by the vocabulary file of a collection, if any, and not
+        already in the package configuration
+    config_hash : str
+        Hash of the configuration files, as used to key the VerdictCache
+    files : tuple[str]
+        Paths of the fc_config.yaml and oif.yaml files the rule set was loaded from, followed by
+        the vocabulary file if there is one
+    """
+
+    name: str
+    extension_types: frozenset
+    semantic_types: frozenset
+    field_lengths: MappingProxyType
+    missions: frozenset
+    instruments: frozenset
+    filters: frozenset
+    oif: MappingProxyType = field(repr=False)
+    vocabulary: MappingProxyType
+    config_hash: str
+    files: tuple
+
+
+def load_rules(
+    name: str,
+    config_file: str = DEFAULT_CONFIG_FILE,
+    oif_file: str = DEFAULT_OIF_FILE,
+    vocabulary_file: str = "",
+) -> RuleSet:
+    """Load and compile a rule set from an fc_config.yaml and an oif.yaml file.
+
+    Parameters
+    ----------
+    name : str
+        Name of the rule set
+    config_file : str, optional
+        File with the FieldLength, ExtensionTypes and SemanticTypes; the package file by default
+    oif_file : str, optional
+        File with the missions, instruments and filters; the package file by default
+    vocabulary_file : str, optional
+        File with the missions, instruments, filters, product types and extensions used by a
+        collection, added to those of the other files (see load_vocabulary)
+
+    Raises
+    ------
+    ValueError
+        Raised if a file is not valid YAML, or lacks one of the expected sections.
+    """
+    try:
+        with open(config_file, "r") as f:
+            cfg = yaml.load(f, Loader=YamlLoader)
+        with open(oif_file, "r") as f:
+            oif = yaml.load(f, Loader=YamlLoader)
+        instruments = {m: cfg_m["instruments"] or {} for m, cfg_m in oif.items()}
+        filters = [f for m in instruments.values() for i in m.values() for f in (i or {}).get("filters") or []]
+        vocabularies = {
+            "extension_types": frozenset(cfg["ExtensionTypes"]),
+            "semantic_types": frozenset(cfg["SemanticTypes"]),
+            "missions": frozenset(oif),
+            "instruments": frozenset(i for m in instruments.values() for i in m),
+            "filters": frozenset(filters),
+        }
+        field_lengths = MappingProxyType(dict(cfg["FieldLength"]))
+    except (yaml.YAMLError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid configuration for rule set '{name}': {e!r}") from e
+
+    files = (config_file, oif_file)
+    added: dict[str, tuple] = {}
+    if vocabulary_file:
+        files += (vocabulary_file,)
+        # Merged once here, so checking a field remains a single lookup in a frozenset
+        for section, values in load_vocabulary(vocabulary_file).items():
+            attribute = VOCABULARY_SECTIONS[section]
+            added[section] = tuple(sorted(values - vocabularies[attribute]))
+            vocabularies[attribute] |= values
+    return RuleSet(
+        name=name,
+        field_lengths=field_lengths,
+        oif=MappingProxyType(oif),
+        vocabulary=MappingProxyType(added),
+        config_hash=hash_files(files),
+        files=files,
+        **vocabularies,
+    )
+
+
+def load_vocabulary(vocabulary_file: str) -> dict[str, frozenset]:
+    """Returns the values of each section of the vocabulary file of a collection.
+
+    A vocabulary file lists the values a collection uses that are not in the package configuration,
+    in any of the sections of VOCABULARY_SECTIONS. Values are compared in lower case, like field values::
+
+        filters: [f062, f087]
+        product_types: [sed]
+
+    Raises
+    ------
+    ValueError
+        Raised if the file is not valid YAML, or has a section other than those of VOCABULARY_SECTIONS,
+        or a section that is not a list of values.
+    """
+    with open(vocabulary_file, "r") as f:
+        try:
+            vocabulary = yaml.load(f, Loader=YamlLoader) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid vocabulary file '{vocabulary_file}': {e}") from e
+    if not isinstance(vocabulary, dict) or not set(vocabulary) <= set(VOCABULARY_SECTIONS):
+        raise ValueError(
+            f"Invalid vocabulary file '{vocabulary_file}': its sections must be among {', '.join(VOCABULARY_SECTIONS)}"
+        )
+    values = {}
+    for section, section_values in vocabulary.items():
+        if not isinstance(section_values, list):
+            raise ValueError(f"Invalid vocabulary file '{vocabulary_file}': '{section}' must be a list of values")
+        values[section] = frozenset(str(v).lower() for v in section_values)
+    return values
+
+
+class ConfigRegistry:
+    """Load, cache and reload named rule sets.
+
+    Rule sets are replaced rather than changed when their files change, so a caller that holds
+    a rule set keeps checking with it, while later calls to get() return the new one.
+
+    Parameters
+    ----------
+    reload_interval : float, optional
+        Seconds between checks for changed files of a rule set; 0 checks on every call to get(),
+        and a negative value never reloads
+    """
+
+    def __init__(self, reload_interval: float = RELOAD_INTERVAL) -> None:
+        self.reload_interval = reload_interval
+        # Rule set, modification times of its files, and time of the next check, by name
+        self._entries: dict[str, tuple[RuleSet, tuple, float]] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        config_file: str = DEFAULT_CONFIG_FILE,
+        oif_file: str = DEFAULT_OIF_FILE,
+        vocabulary_file: str = "",
+    ) -> RuleSet:
+        """Load a rule set and register it under a name, replacing any rule set of that name.
+
+        The parameters are those of load_rules().
+
+        Raises
+        ------
+        FileNotFoundError
+            Raised if a file does not exist.
+        ValueError
+            Raised if a file is not a valid configuration.
+        """
+        with self._lock:
+            rules = load_rules(name, config_file, oif_file, vocabulary_file)
+            self._entries[name] = (rules, _mtimes(rules.files), time.monotonic() + self.reload_interval)
+        return rules
+
+    def register_directory(self, name: str, directory: str) -> RuleSet:
+        """Register a rule set from the fc_config.yaml, oif.yaml and vocabulary.yaml files of a directory.
+
+        Any of the files may be left out of the directory, in which case the package file is used,
+        without a collection vocabulary.
+
+        Raises
+        ------
+        FileNotFoundError
+            Raised if the directory has none of the files.
+        """
+        defaults = (DEFAULT_CONFIG_FILE, DEFAULT_OIF_FILE, "")
+        names = (*(os.path.basename(f) for f in defaults[:2]), VOCABULARY_FILE)
+        files = [os.path.join(directory, f) for f in names]
+        if not any(os.path.isfile(f) for f in files):
+            raise FileNotFoundError(f"No {', '.join(names)} in '{directory}'")
+        return self.register(name, *[f if os.path.isfile(f) else default for f, default in zip(files, defaults)])
+
+    def get(self, name: str = DEFAULT_RULES) -> RuleSet:
+        """Returns the rule set of a name, reloading it first if its files have changed.
+
+        The default rule set is registered on first use. If the changed files cannot be loaded,
+        the error is logged and the previous rule set is kept.
+
+        Raises
+        ------
+        KeyError
+            Raised if no rule set is registered under the name.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            if name != DEFAULT_RULES:
+                raise KeyError(f"Unknown rule set '{name}'; registered rule sets are: {', '.join(self.names())}")
+            return self.register(name)
+        if self.reload_interval < 0 or time.monotonic() < entry[2]:
+            return entry[0]
+        return self._check(name)
+
+    def reload(self, name: str = DEFAULT_RULES) -> RuleSet:
+        """Load the files of a rule set again, whether or not they have changed."""
+        rules = self.get(name)
+        return self.register(name, *rules.files)
+
+    def names(self) -> list[str]:
+        """Returns the names of the registered rule sets."""
+        return sorted(self._entries)
+
+    def _check(self, name: str) -> RuleSet:
+        """Reload a rule set if the modification time of one of its files has changed."""
+        with self._lock:
+            rules, mtimes, _ = self._entries[name]
+            try:
+                new_mtimes = _mtimes(rules.files)
+                if new_mtimes != mtimes:
+                    rules = load_rules(name, *rules.files)
+                    logger.warning("Reloaded rule set '%s' (configuration %s)", name, rules.config_hash)
+                mtimes = new_mtimes
+            except (OSError, ValueError) as e:
+                logger.error("Could not reload rule set '%s', keeping the previous rules: %s", name, e)
+            self._entries[name] = (rules, mtimes, time.monotonic() + self.reload_interval)
+        return rules
+
+
+def _mtimes(files: tuple) -> tuple:
+    """Returns the modification time of each file, in nanoseconds"""
+    return tuple(os.stat(f).st_mtime_ns for f in files)
+
+
+# Registry shared by the whole process
+registry = ConfigRegistry()
+
+
+def get_rules(rules: Union[RuleSet, str, None] = None) -> RuleSet:
+    """Returns a rule set given itself, its name in the shared registry, or None for the default rule set."""
+    if isinstance(rules, RuleSet):
+        return rules
+    return registry.get(rules or DEFAULT_RULES)
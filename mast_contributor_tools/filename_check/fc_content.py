@@ -0,0 +1,203 @@
+"""Check that the content of each file matches the format of its extension.
+
+A file named '.fits' that is really an HTML error page, or a '.png' that is really a JPEG, has a
+valid name but not a valid product. The format of a file is recognized from the signature
+("magic number") in its first bytes, so checking it takes a single small read per file. The
+reads are I/O bound, so each batch of files is read on a pool of threads.
+
+The result is recorded as a 'content' field of the file, whose value is the recognized format.
+"""
+
+import bz2
+import os
+import zlib
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+
+from mast_contributor_tools.filename_check.hlsp_filename import SCORE, FieldRule
+
+# Bytes read from the start of each file
+SNIFF_SIZE = 512
+
+# Signatures of binary formats: name of the format, offset of the signature and its bytes
+SIGNATURES = [
+    ("fits", 0, b"SIMPLE  ="),
+    ("png", 0, b"\x89PNG\r\n\x1a\n"),
+    ("jpeg", 0, b"\xff\xd8\xff"),
+    ("gif", 0, b"GIF87a"),
+    ("gif", 0, b"GIF89a"),
+    ("pdf", 0, b"%PDF-"),
+    ("postscript", 0, b"%!PS"),
+    ("tiff", 0, b"II*\x00"),
+    ("tiff", 0, b"MM\x00*"),
+    ("gzip", 0, b"\x1f\x8b"),
+    ("bz2", 0, b"BZh"),
+    ("zip", 0, b"PK\x03\x04"),
+    # An empty zip archive has only its end of central directory record
+    ("zip", 0, b"PK\x05\x06"),
+    ("hdf5", 0, b"\x89HDF\r\n\x1a\n"),
+    ("asdf", 0, b"#ASDF "),
+    ("sqlite", 0, b"SQLite format 3\x00"),
+]
+
+# Formats of text files, which have no signature; HTML is recognized to report error pages saved as products
+TEXT_FORMATS = {"text", "html"}
+HTML_PREFIXES = (b"<!doctype html", b"<html")
+
+# Expected format of each extension; 'text' is any content without a binary signature or NUL bytes.
+# Extensions that are not listed, for example 'dat', may hold anything and are not checked.
+EXTENSION_FORMATS = {
+    "asdf": "asdf",
+    "csv": "text",
+    "db": "sqlite",
+    "ecsv": "text",
+    "fits": "fits",
+    "fits.bz2": "bz2",
+    "fits.gz": "gzip",
+    "gif": "gif",
+    "h5": "hdf5",
+    "html": "text",
+    "jpeg": "jpeg",
+    "jpg": "jpeg",
+    "md": "text",
+    "pdf": "pdf",
+    "png": "png",
+    "ps": "postscript",
+    "readme": "text",
+    "rst": "text",
+    "tar.gz": "gzip",
+    "tif": "tiff",
+    "txt": "text",
+    "xml": "text",
+    "yaml": "text",
+    "zip": "zip",
+}
+# Decompressors of compressed formats, to check files small enough to be read whole
+DECOMPRESSORS = {"gzip": lambda: zlib.decompressobj(wbits=31), "bz2": bz2.BZ2Decompressor}
+
+
+def sniff_format(head: bytes) -> str:
+    """Returns the format of a file given its first bytes
+
+    Returns
+    -------
+    str
+        The name of the format from SIGNATURES, 'html' or 'text' for content without a
+        signature or NUL bytes, 'empty' for an empty file, or 'binary' for other content
+    """
+    for name, offset, signature in SIGNATURES:
+        if head.startswith(signature, offset):
+            return name
+    if not head:
+        return "empty"
+    if b"\0" in head:
+        return "binary"
+    return "html" if head.lstrip().lower().startswith(HTML_PREFIXES) else "text"
+
+
+def gzip_content(head: bytes) -> Union[bytes, None]:
+    """Returns the first bytes of the content of a gzip file, or None if they cannot be decompressed"""
+    try:
+        return zlib.decompressobj(wbits=31).decompress(head, SNIFF_SIZE)
+    except zlib.error:
+        return None
+
+
+def content_mismatch(extension: str, head: bytes, complete: bool) -> Union[str, None]:
+    """Returns the reason the content of a file does not match its extension, or None if it does
+
+    Parameters
+    ----------
+    extension : str
+        Extension of the file, for example 'fits.gz'
+    head : bytes
+        First bytes of the file
+    complete : bool
+        Whether head is the whole file, in which case a truncated file is detected too
+    """
+    expected = EXTENSION_FORMATS.get(extension.lower())
+    found = sniff_format(head)
+    if expected is None:
+        return None
+    if found != expected and not (expected == "text" and found in TEXT_FORMATS):
+        return f"expected {expected}"
+    if extension.lower() == "fits.gz":
+        # The start of the compressed file is enough to check that it holds a FITS file
+        content = gzip_content(head)
+        if content is not None and len(content) >= len(b"SIMPLE  =") and sniff_format(content) != "fits":
+            return f"holds {sniff_format(content)}, expected fits"
+    if complete and expected == "fits" and len(head) < 2880:
+        return f"truncated, {len(head)} bytes"
+    if complete and expected in DECOMPRESSORS:
+        # A whole compressed file is small enough to check that its stream is complete
+        stream = DECOMPRESSORS[expected]()
+        try:
+            stream.decompress(head)
+        except (OSError, zlib.error) as e:
+            return f"invalid: {e}"
+        if not stream.eof:
+            return f"truncated, {len(head)} bytes"
+    return None
+
+
+def read_head(path: str) -> tuple[bytes, bool]:
+    """Read the first bytes of a file in a single read, returning them and whether they are the whole file"""
+    with open(path, "rb", buffering=0) as f:
+        head = f.read(SNIFF_SIZE + 1)
+    return head[:SNIFF_SIZE], len(head) <= SNIFF_SIZE
+
+
+def content_record(path: str, extension: str) -> dict:
+    """Returns the 'content' field record of a file, which fails if its content does not match its extension"""
+    try:
+        head, complete = read_head(path)
+    except OSError as e:
+        found, mismatch = "unreadable", e.strerror or str(e)
+    else:
+        found, mismatch = sniff_format(head), content_mismatch(extension, head, complete)
+    value_score = SCORE[mismatch is None]
+    return {
+        "name": "content",
+        "value": found if mismatch is None else f"{found} ({mismatch})",
+        "capitalization_score": "pass",
+        "length_score": "pass",
+        "format_score": "pass",
+        "value_score": value_score,
+        "field_verdict": FieldRule.field_verdict([value_score]),
+    }
+
+
+def add_content_fields(
+    file_records: list[dict], field_records: list[list[dict]], root: str = "", workers: int = 8
+) -> None:
+    """Check the content of a batch of files against their extensions, adding a 'content' field to each
+
+    The final verdict of files whose content does not match fails. The first bytes of each file
+    are read on a pool of threads, since the time taken is mostly waiting for the storage.
+
+    Parameters
+    ----------
+    file_records : list[dict]
+        Attributes of each file, as returned by HlspFileName.evaluate_filename(); updated in place
+    field_records : list[list[dict]]
+        Attributes of the fields of each file, in the same order; the content field is appended
+    root : str, optional
+        Directory the paths of the files are relative to, if not the current directory
+    workers : int, optional
+        Number of threads reading files
+    """
+    extensions = [_extension(elements) for elements in field_records]
+    paths = [os.path.join(root, r["path"], r["filename"]) for r in file_records]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mct-content") as pool:
+        records = pool.map(content_record, paths, extensions)
+        for file_record, elements, record in zip(file_records, field_records, records):
+            record["file_ref"] = file_record["filename"]
+            elements.append(record)
+            if record["field_verdict"] == "FAIL":
+                file_record["final_verdict"] = "FAIL"
+
+
+def _extension(elements: Iterable[dict]) -> str:
+    """Returns the value of the extension field among the field records of a file"""
+    return next((e["value"] for e in elements if e["name"] == "extension"), "")
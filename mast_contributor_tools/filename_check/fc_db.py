@@ -1,6 +1,16 @@
 """Create and manage an SQLite database for storing results of file checking."""
 
+import csv
+import os
+import queue
 import sqlite3
+import threading
+import time
+from itertools import chain
+from pathlib import Path
+from typing import Union
+
+from mast_contributor_tools.filename_check.fc_choices import EXPORT_FORMATS, EXPORT_RELATIONS, VERDICTS
 
 # The following SQL will create am SQLite database
 FILENAME_TABLE = """
@@ -33,9 +43,76 @@ PROBLEMS_VIEW = """
         AND fl.field_verdict != 'PASS';
         """
 
+# Indexes used to query results, built once the results have been written
+RESULTS_INDEXES = {
+    "ix_filename_path": "filename(path, filename)",
+    "ix_filename_verdict": "filename(final_verdict, path, filename)",
+    "ix_fields_file_ref": "fields(file_ref, name)",
+    "ix_fields_name_value": "fields(name, value, file_ref)",
+    "ix_fields_value": "fields(value, file_ref, name)",
+    "ix_fields_verdict": "fields(field_verdict, name, file_ref)",
+}
+# Counts of every distinct (field, value, verdict), so the most common problems can be listed quickly
+VALUE_COUNTS_TABLE = """
+        CREATE TABLE value_counts AS
+        SELECT name, value, field_verdict, COUNT(*) AS n
+        FROM fields GROUP BY name, value, field_verdict;
+        """
+
+# Columns of the filename and fields tables, in order
+FILE_COLUMNS = ["path", "filename", "final_verdict", "n_elements"]
+FIELD_COLUMNS = [
+    "file_ref",
+    "name",
+    "value",
+    "capitalization_score",
+    "length_score",
+    "format_score",
+    "value_score",
+    "field_verdict",
+]
+
 INSERT_FILE_RECORD = """INSERT INTO filename VALUES(:path,:filename,:final_verdict,:n_elements)"""
 INSERT_FIELD_RECORD = """INSERT INTO fields VALUES(:file_ref,:name,:value,:capitalization_score,:length_score,:format_score,:value_score,:field_verdict)"""
 
+# One row per filename check run written to this database, see fc_metrics.
+# The complete record of the run, including the duration of each stage, is in 'metrics' as JSON.
+RUNS_TABLE = """
+        CREATE TABLE IF NOT EXISTS runs (
+        run_id  TEXT NOT NULL PRIMARY KEY,
+        started_at  TEXT NOT NULL,
+        finished_at  TEXT NOT NULL,
+        hlsp_name  TEXT NOT NULL,
+        tool_version  TEXT NOT NULL,
+        config_hash  TEXT NOT NULL,
+        output_format  TEXT NOT NULL,
+        n_files  INTEGER NOT NULL,
+        duration_s  REAL NOT NULL,
+        files_per_sec  REAL,
+        peak_rss_mb  REAL,
+        cache_hit_rate  REAL,
+        workers  INTEGER NOT NULL,
+        metrics  TEXT NOT NULL
+        );
+        """
+RUN_COLUMNS = [
+    "run_id",
+    "started_at",
+    "finished_at",
+    "hlsp_name",
+    "tool_version",
+    "config_hash",
+    "output_format",
+    "n_files",
+    "duration_s",
+    "files_per_sec",
+    "peak_rss_mb",
+    "cache_hit_rate",
+    "workers",
+    "metrics",
+]
+INSERT_RUN_RECORD = f"INSERT INTO runs VALUES({','.join('?' * len(RUN_COLUMNS))})"
+
 
 class Hlsp_SQLiteDb:
     """Create an SQLite DB to store results.
@@ -46,11 +123,22 @@ class Hlsp_SQLiteDb:
         name of the SQLite DB file to be created
     """
 
+    # Statements creating the tables and views, and inserting the file and field records.
+    # Other results databases, such as that of the metadata check, override these.
+    schema = [FILENAME_TABLE, FIELDS_TABLE, PROBLEMS_VIEW]
+    insert_file = INSERT_FILE_RECORD
+    insert_field = INSERT_FIELD_RECORD
+    # Table of file records, with their final verdicts
+    file_table = "filename"
+    indexes = RESULTS_INDEXES
+    value_counts = VALUE_COUNTS_TABLE
+
     def __init__(
         self,
         filename: str,
     ) -> None:
         self.db_file = filename
+        self.writer: Union[threading.Thread, None] = None
 
     def create_db(self) -> None:
         """Create the database and construct the tables.
@@ -61,20 +149,65 @@ class Hlsp_SQLiteDb:
             Raised if the DB cannot be created or the tables fail to be created.
         """
         try:
-            self.conn = sqlite3.connect(self.db_file)
-            for statement in [FILENAME_TABLE, FIELDS_TABLE, PROBLEMS_VIEW]:
+            self.conn = self.connect()
+            for statement in self.schema:
                 self.conn.execute(statement)
-
-            # Turn on Write-Ahead Log
-            # See https://www.powersync.com/blog/sqlite-optimizations-for-ultra-high-performance
-            self.conn.execute("PRAGMA journal_mode = WAL")
-            self.conn.execute("PRAGMA synchronous = normal")
-            self.conn.execute("PRAGMA journal_size_limit = 6144000")
             self.conn.commit()
 
         except sqlite3.Error as e:
             print(e)
 
+    def connect(self) -> sqlite3.Connection:
+        """Returns a new connection writing to the database.
+
+        Every connection writing results is made here: the journal mode is stored in the
+        database, but the synchronous setting and journal size limit only apply to the
+        connection that sets them.
+        """
+        conn = sqlite3.connect(self.db_file)
+        # Turn on Write-Ahead Log
+        # See https://www.powersync.com/blog/sqlite-optimizations-for-ultra-high-performance
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = normal")
+        conn.execute("PRAGMA journal_size_limit = 6144000")
+        return conn
+
+    def open_db(self, readonly: bool = True) -> None:
+        """Open an existing results database, for example to export or query results.
+
+        Parameters
+        ----------
+        readonly : bool, optional
+            Open the database read-only (default)
+
+        Raises
+        ------
+        FileNotFoundError
+            Raised if the DB file does not exist.
+        """
+        if not os.path.isfile(self.db_file):
+            raise FileNotFoundError(f"Results database '{self.db_file}' does not exist.")
+        self.conn = sqlite3.connect(database_uri(self.db_file, "ro" if readonly else "rw"), uri=True)
+
+    def has_indexes(self) -> bool:
+        """Returns True if the query indexes and value counts have been built for this database."""
+        names = {r[0] for r in self.conn.execute("SELECT name FROM sqlite_master WHERE type IN ('index', 'table')")}
+        return names.issuperset([*self.indexes, "value_counts"])
+
+    def build_indexes(self) -> None:
+        """Build the indexes and value counts used to query the results.
+
+        This is done once after all results are written, which is much faster than
+        maintaining the indexes during insertion.
+        """
+        for index_name, columns in self.indexes.items():
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {columns}")
+        self.conn.execute("DROP TABLE IF EXISTS value_counts")
+        self.conn.execute(self.value_counts)
+        # Gather statistics so the query planner can choose between the indexes
+        self.conn.execute("ANALYZE")
+        self.conn.commit()
+
     def close_db(self) -> None:
         self.conn.close()
 
@@ -88,7 +221,7 @@ class Hlsp_SQLiteDb:
         file_record : dict
             File attributes
         """
-        self.conn.execute(INSERT_FILE_RECORD, file_record)
+        self.conn.execute(self.insert_file, file_record)
         self.conn.commit()
 
     def add_fields(self, elements: list[dict]) -> None:
@@ -102,34 +235,331 @@ class Hlsp_SQLiteDb:
         elements : list[dict]
             List of element attribute dictionaries.
         """
-        self.conn.executemany(INSERT_FIELD_RECORD, elements)
+        self.conn.executemany(self.insert_field, elements)
+        self.conn.commit()
+
+    def add_batch(self, file_records: list[dict], field_records: list[list[dict]]) -> list[tuple[str, str]]:
+        """Add the records of several files and their fields in a single transaction
+
+        If any record is rejected (for example, a duplicate filename), the files are added
+        one at a time instead, so that only the rejected files and their fields are skipped.
+
+        Parameters
+        ----------
+        file_records : list[dict]
+            File attributes for each file
+        field_records : list[list[dict]]
+            Attributes of the fields of each file, in the same order as file_records
+
+        Returns
+        -------
+        list[tuple[str, str]]
+            The filename and error message of each rejected file
+        """
+        try:
+            with self.conn:
+                self.insert_records(file_records, field_records)
+            return []
+        except sqlite3.Error:
+            pass
+
+        rejected = []
+        for file_record, elements in zip(file_records, field_records):
+            try:
+                with self.conn:
+                    self.insert_records([file_record], [elements])
+            except sqlite3.Error as e:
+                rejected.append((file_record["filename"], str(e)))
+        return rejected
+
+    def insert_records(self, file_records: list[dict], field_records: list[list[dict]]) -> None:
+        """Insert the records of files and their fields, in the caller's transaction
+
+        Results databases with other tables, such as that of the metadata check, extend this.
+        """
+        self.conn.executemany(self.insert_file, file_records)
+        self.conn.executemany(self.insert_field, chain.from_iterable(field_records))
+
+    def start_writer(self, max_batches: int = 8) -> None:
+        """Start a background thread that writes batches submitted with submit_batch().
+
+        The writer thread owns the database connection until stop_writer() is called, so the
+        caller can keep evaluating files while earlier results are written to disk. At most
+        ``max_batches`` batches wait in the queue; beyond that, submit_batch() blocks until the
+        writer catches up, which bounds memory use.
+
+        Parameters
+        ----------
+        max_batches : int, optional
+            Maximum number of batches waiting to be written
+        """
+        # The connection is closed here and reopened by the writer thread, since an SQLite
+        # connection may only be used by the thread that created it
+        self.conn.close()
+        self.queue: queue.Queue = queue.Queue(maxsize=max_batches)
+        self.rejected: list[tuple[str, str]] = []
+        self.writer_error: Union[Exception, None] = None
+        self.files_submitted = 0
+        self.files_written = 0
+        self.last_wait = 0.0
+        self.writer = threading.Thread(target=self._write_queue, name="Hlsp_SQLiteDb-writer", daemon=True)
+        self.writer.start()
+
+    def _write_queue(self) -> None:
+        """Body of the writer thread: write batches from the queue until the end sentinel."""
+        conn = None
+        try:
+            conn = self.conn = self.connect()
+        except sqlite3.Error as e:
+            # Batches are still taken from the queue, so that producers are never blocked
+            self.writer_error = e
+        try:
+            while (item := self.queue.get()) is not None:
+                submitted, file_records, field_records = item
+                # After an error, keep draining the queue so that producers are never blocked
+                if self.writer_error is None:
+                    try:
+                        self.rejected += self.add_batch(file_records, field_records)
+                    except Exception as e:
+                        self.writer_error = e
+                self.files_written += len(file_records)
+                self.last_wait = time.perf_counter() - submitted
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def submit_batch(self, file_records: list[dict], field_records: list[list[dict]]) -> list[tuple[str, str]]:
+        """Queue a batch of records for the writer thread, waiting only if the queue is full.
+
+        Parameters
+        ----------
+        file_records : list[dict]
+            File attributes for each file
+        field_records : list[list[dict]]
+            Attributes of the fields of each file, in the same order as file_records
+
+        Returns
+        -------
+        list[tuple[str, str]]
+            The filename and error message of each file rejected since the previous call
+
+        Raises
+        ------
+        sqlite3.Error
+            Raised if the writer thread failed to write an earlier batch.
+        """
+        self._raise_writer_error()
+        self.queue.put((time.perf_counter(), file_records, field_records))
+        self.files_submitted += len(file_records)
+        return self._pop_rejected()
+
+    def writer_status(self) -> dict[str, Union[int, str]]:
+        """Returns the number of batches queued, the number of files not yet written, and how
+        long the last batch waited before being written."""
+        return {
+            "queue": self.queue.qsize(),
+            "lag": self.files_submitted - self.files_written,
+            "wait": f"{self.last_wait:.2f}s",
+        }
+
+    def stop_writer(self) -> list[tuple[str, str]]:
+        """Write any queued batches, stop the writer thread, and reopen the connection.
+
+        Returns
+        -------
+        list[tuple[str, str]]
+            The filename and error message of each file rejected since the last submit_batch()
+
+        Raises
+        ------
+        sqlite3.Error
+            Raised if the writer thread failed to write a batch.
+        """
+        if self.writer is None:
+            return []
+        self.queue.put(None)
+        self.writer.join()
+        self.writer = None
+        self.conn = self.connect()
+        self._raise_writer_error()
+        return self._pop_rejected()
+
+    def _raise_writer_error(self) -> None:
+        """Raise the error of the writer thread in the calling thread, if there was one."""
+        if self.writer_error is not None:
+            raise self.writer_error
+
+    def _pop_rejected(self) -> list[tuple[str, str]]:
+        """Returns and forgets the files rejected so far by the writer thread."""
+        # Only the first n entries are removed, in case the writer appends more in the meantime
+        n = len(self.rejected)
+        rejected, self.rejected[:n] = self.rejected[:n], []
+        return rejected
+
+    def add_run(self, run_row: tuple) -> None:
+        """Add the record of a filename check run to the runs table, creating the table if needed
+
+        Parameters
+        ----------
+        run_row : tuple
+            Values of each of RUN_COLUMNS, as returned by RunMetrics.run_row()
+        """
+        self.conn.execute(RUNS_TABLE)
+        self.conn.execute(INSERT_RUN_RECORD, run_row)
         self.conn.commit()
 
+    def verdict_counts(self) -> dict[str, int]:
+        """Returns the number of files with each final verdict."""
+        return dict(self.conn.execute(f"SELECT final_verdict, COUNT(*) FROM {self.file_table} GROUP BY final_verdict"))
+
     def print_summary(self) -> str:
         """
         Returns a string detailing some summary information on how many files have passed validation
         """
-        # Get data from db
-        dat = self.conn.execute("SELECT filename, final_verdict from filename").fetchall()
-        # Parse numbers
-        num_files = len(dat)
-        num_pass = sum([1 for d in dat if d[1] == "pass"])
-        num_review = sum([1 for d in dat if d[1] == "needs review"])
-        num_fail = sum([1 for d in dat if d[1] == "fail"])
-        # Write summary message
-        summary_message = "Output summary:\n    "
-        summary_message += f"Files Checked: {num_files}\n    "
-        summary_message += f"Files Passed: {num_pass}\n    "
-        summary_message += f"Files Need Review: {num_review}\n    "
-        summary_message += f"Files Failed: {num_fail}\n    "
-        # All files passed
-        if num_pass == num_files:
-            summary_message += "All files passed!"
-        elif num_review > 0:
-            summary_message += "If any fields were marked with a score of 'needs review', please consult with your MAST staff contact. Unrecognized values are very often necessary and good, but require review."
-        # Some files failed
-        elif num_fail > 0:
-            summary_message += f"See results file ({self.db_file}) for more information. Some files did not meet our criteria. Note: only fields with a final_verdict of 'fail' contributed to this result."
-            # Add more detail here later? - could break down by fields, etc.
-
-        return summary_message
+        return format_summary(self.verdict_counts(), self.db_file)
+
+    def export_results(
+        self,
+        out_file: str,
+        relation: str = "potential_problems",
+        fmt: str = "csv",
+        columns: Union[list[str], None] = None,
+        verdicts: Union[list[str], None] = None,
+        batch_size: int = 50000,
+    ) -> int:
+        """Stream the rows of a table or view to a CSV, Parquet or Arrow IPC file.
+
+        Rows are fetched from SQLite and written in fixed-size batches, so memory use is
+        bounded by ``batch_size`` rather than by the size of the database. Parquet and Arrow
+        output require the optional ``pyarrow`` package.
+
+        Parameters
+        ----------
+        out_file : str
+            Name of the file to write
+        relation : str, optional
+            One of 'filename', 'fields' or 'potential_problems' (default)
+        fmt : str, optional
+            Output format: one of 'csv' (default), 'parquet' or 'arrow'
+        columns : list[str], optional
+            Columns to export; defaults to all columns of the relation
+        verdicts : list[str], optional
+            Only export rows with one of these verdicts, for example ['FAIL']
+        batch_size : int, optional
+            Number of rows fetched and written at a time
+
+        Returns
+        -------
+        int
+            Number of rows written
+
+        Raises
+        ------
+        ValueError
+            Raised if the relation, format, a column, or a verdict is not recognized.
+        """
+        if relation not in EXPORT_RELATIONS:
+            raise ValueError(f"Cannot export '{relation}': must be one of {[*EXPORT_RELATIONS]}")
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}': must be one of {EXPORT_FORMATS}")
+
+        # Column names and declared types come from the schema, which also guards the SQL below
+        schema = {r[1]: r[2].upper() for r in self.conn.execute(f"PRAGMA table_info({relation})")}
+        columns = columns or [*schema]
+        unknown = [c for c in columns if c not in schema]
+        if unknown:
+            raise ValueError(f"Unknown column(s) for '{relation}': {unknown}")
+
+        query = f"SELECT {', '.join(columns)} FROM {relation}"
+        params: list[str] = []
+        if verdicts:
+            verdicts = [v.upper() for v in verdicts]
+            bad = [v for v in verdicts if v not in VERDICTS]
+            if bad:
+                raise ValueError(f"Unknown verdict(s) {bad}: must be one of {VERDICTS}")
+            query += f" WHERE {EXPORT_RELATIONS[relation]} IN ({', '.join('?' * len(verdicts))})"
+            params = verdicts
+
+        cursor = self.conn.execute(query, params)
+        cursor.arraysize = batch_size
+        if fmt == "csv":
+            return _write_csv(cursor, out_file, columns)
+        return _write_arrow(cursor, out_file, columns, [schema[c] for c in columns], fmt)
+
+
+def database_uri(db_file: str, mode: str = "ro") -> str:
+    """Returns the URI of an SQLite database file, to be opened with the given mode ('ro' for read-only).
+
+    The path is made absolute and its characters escaped, as a '?' or '#' in it would otherwise
+    end the path of the URI.
+    """
+    return f"{Path(os.path.abspath(db_file)).as_uri()}?mode={mode}"
+
+
+def format_summary(counts: dict[str, int], results_file: str) -> str:
+    """Returns a string detailing how many files have passed validation, given the number of files with each verdict.
+
+    Parameters
+    ----------
+    counts : dict[str, int]
+        Number of files with each final verdict: 'PASS', 'NEEDS REVIEW' or 'FAIL'
+    results_file : str
+        Name of the file containing the results
+    """
+    num_files = sum(counts.values())
+    num_pass = counts.get("PASS", 0)
+    num_review = counts.get("NEEDS REVIEW", 0)
+    num_fail = counts.get("FAIL", 0)
+    # Write summary message
+    summary_message = "Output summary:\n    "
+    summary_message += f"Files Checked: {num_files}\n    "
+    summary_message += f"Files Passed: {num_pass}\n    "
+    summary_message += f"Files Need Review: {num_review}\n    "
+    summary_message += f"Files Failed: {num_fail}\n    "
+    # All files passed
+    if num_pass == num_files:
+        summary_message += "All files passed!"
+    elif num_review > 0:
+        summary_message += "If any fields were marked with a score of 'needs review', please consult with your MAST staff contact. Unrecognized values are very often necessary and good, but require review."
+    # Some files failed
+    elif num_fail > 0:
+        summary_message += f"See results file ({results_file}) for more information. Some files did not meet our criteria. Note: only fields with a final_verdict of 'fail' contributed to this result."
+        # Add more detail here later? - could break down by fields, etc.
+
+    return summary_message
+
+
+def _write_csv(cursor: sqlite3.Cursor, out_file: str, columns: list[str]) -> int:
+    """Write the rows of a cursor to a CSV file, one batch at a time."""
+    n_rows = 0
+    with open(out_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        while rows := cursor.fetchmany():
+            writer.writerows(rows)
+            n_rows += len(rows)
+    return n_rows
+
+
+def _write_arrow(cursor: sqlite3.Cursor, out_file: str, columns: list[str], types: list[str], fmt: str) -> int:
+    """Write the rows of a cursor to a Parquet or Arrow IPC file as a series of record batches."""
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(f"Exporting to {fmt} requires the optional 'pyarrow' package") from e
+
+    schema = pa.schema([(c, pa.int64() if t == "INTEGER" else pa.string()) for c, t in zip(columns, types)])
+    if fmt == "parquet":
+        writer = pa.parquet.ParquetWriter(out_file, schema)
+    else:
+        writer = pa.ipc.new_file(out_file, schema)
+
+    n_rows = 0
+    with writer:
+        while rows := cursor.fetchmany():
+            arrays = [pa.array(col, type=schema.field(i).type) for i, col in enumerate(zip(*rows))]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            n_rows += len(rows)
+    return n_rows
@@ -0,0 +1,172 @@
+"""Compare the results databases of two filename check runs.
+
+Both databases are attached to a single SQLite connection and compared with indexed
+joins, so neither side is loaded into Python: changes are streamed from the cursor as
+text or JSON lines, or written directly into a new SQLite database.
+"""
+
+import json
+import os
+import sqlite3
+from collections import Counter
+from typing import TextIO
+
+from mast_contributor_tools.filename_check.fc_db import database_uri
+
+# Rank verdicts so that a change to a lower rank is an improvement
+VERDICT_RANK = "CASE {0} WHEN 'PASS' THEN 0 WHEN 'NEEDS REVIEW' THEN 1 ELSE 2 END"
+CHANGE_TYPES = ["new", "removed", "improved", "regressed"]
+
+FILE_CHANGE_COLUMNS = ["change", "path", "filename", "old_verdict", "new_verdict"]
+FILE_CHANGES = f"""
+        SELECT 'new', n.path, n.filename, NULL, n.final_verdict
+        FROM new_run.filename AS n
+        WHERE NOT EXISTS (SELECT 1 FROM old_run.filename AS o WHERE o.filename = n.filename)
+        UNION ALL
+        SELECT 'removed', o.path, o.filename, o.final_verdict, NULL
+        FROM old_run.filename AS o
+        WHERE NOT EXISTS (SELECT 1 FROM new_run.filename AS n WHERE n.filename = o.filename)
+        UNION ALL
+        SELECT CASE WHEN {VERDICT_RANK.format("n.final_verdict")} < {VERDICT_RANK.format("o.final_verdict")}
+               THEN 'improved' ELSE 'regressed' END,
+               n.path, n.filename, o.final_verdict, n.final_verdict
+        FROM new_run.filename AS n JOIN old_run.filename AS o ON o.filename = n.filename
+        WHERE n.final_verdict != o.final_verdict
+        """
+
+# Field changes are only reported for files present in both runs
+FIELD_CHANGE_COLUMNS = ["change", "file_ref", "name", "old_value", "new_value", "old_verdict", "new_verdict"]
+FIELD_CHANGES = f"""
+        SELECT 'new', n.file_ref, n.name, NULL, n.value, NULL, n.field_verdict
+        FROM new_run.fields AS n JOIN old_run.filename AS ofn ON ofn.filename = n.file_ref
+        WHERE NOT EXISTS (SELECT 1 FROM old_run.fields AS o WHERE o.file_ref = n.file_ref AND o.name = n.name)
+        UNION ALL
+        SELECT 'removed', o.file_ref, o.name, o.value, NULL, o.field_verdict, NULL
+        FROM old_run.fields AS o JOIN new_run.filename AS nfn ON nfn.filename = o.file_ref
+        WHERE NOT EXISTS (SELECT 1 FROM new_run.fields AS n WHERE n.file_ref = o.file_ref AND n.name = o.name)
+        UNION ALL
+        SELECT CASE WHEN {VERDICT_RANK.format("n.field_verdict")} < {VERDICT_RANK.format("o.field_verdict")}
+               THEN 'improved' ELSE 'regressed' END,
+               n.file_ref, n.name, o.value, n.value, o.field_verdict, n.field_verdict
+        FROM new_run.fields AS n JOIN old_run.fields AS o ON o.file_ref = n.file_ref AND o.name = n.name
+        WHERE n.field_verdict != o.field_verdict
+        """
+
+
+class ResultsDiff:
+    """Compare two results databases written by check_filenames.
+
+    Parameters
+    ----------
+    old_db : str
+        Results database of the earlier run
+    new_db : str
+        Results database of the later run
+    """
+
+    def __init__(self, old_db: str, new_db: str) -> None:
+        self.old_db = old_db
+        self.new_db = new_db
+
+    def open(self, diff_db: str = ":memory:") -> None:
+        """Attach both results databases (read-only) to a connection.
+
+        Parameters
+        ----------
+        diff_db : str, optional
+            Database to hold the differences written by write_db(); in memory by default
+
+        Raises
+        ------
+        FileNotFoundError
+            Raised if either results database does not exist.
+        """
+        for db_file in [self.old_db, self.new_db]:
+            if not os.path.isfile(db_file):
+                raise FileNotFoundError(f"Results database '{db_file}' does not exist.")
+        # URI filenames are needed to attach the results databases read-only
+        self.conn = sqlite3.connect(diff_db, uri=True)
+        try:
+            for alias, db_file in [("old_run", self.old_db), ("new_run", self.new_db)]:
+                self.conn.execute(f"ATTACH DATABASE ? AS {alias}", [database_uri(db_file)])
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def file_changes(self) -> sqlite3.Cursor:
+        """Returns a cursor over files that are new, removed, or changed verdict, with FILE_CHANGE_COLUMNS."""
+        return self.conn.execute(FILE_CHANGES)
+
+    def field_changes(self) -> sqlite3.Cursor:
+        """Returns a cursor over fields that are new, removed, or changed verdict, with FIELD_CHANGE_COLUMNS."""
+        return self.conn.execute(FIELD_CHANGES)
+
+    def write_db(self, fields: bool = True) -> Counter:
+        """Write the differences into the 'file_changes' and 'field_changes' tables of the diff database.
+
+        Parameters
+        ----------
+        fields : bool, optional
+            Also write field-level changes (default True). If False, there is no 'field_changes' table.
+
+        Returns
+        -------
+        Counter
+            Number of file changes of each type
+        """
+        for table, query, columns in [
+            ("file_changes", FILE_CHANGES, FILE_CHANGE_COLUMNS),
+            ("field_changes", FIELD_CHANGES, FIELD_CHANGE_COLUMNS),
+        ]:
+            self.conn.execute(f"DROP TABLE IF EXISTS main.{table}")
+            if table == "field_changes" and not fields:
+                continue
+            self.conn.execute(f"CREATE TABLE main.{table} ({', '.join(columns)})")
+            self.conn.execute(f"INSERT INTO main.{table} {query}")
+        self.conn.commit()
+        return Counter(dict(self.conn.execute("SELECT change, COUNT(*) FROM main.file_changes GROUP BY change")))
+
+    def write_stream(self, out: TextIO, fmt: str = "text", fields: bool = True) -> Counter:
+        """Stream the differences to a text stream, one line per change.
+
+        Parameters
+        ----------
+        out : TextIO
+            Stream to write to, for example sys.stdout
+        fmt : str, optional
+            Either 'text' (default) or 'jsonl'
+        fields : bool, optional
+            Also write field-level changes (default True)
+
+        Returns
+        -------
+        Counter
+            Number of file changes of each type
+        """
+        counts: Counter = Counter()
+        for row in self.file_changes():
+            counts[row[0]] += 1
+            if fmt == "jsonl":
+                out.write(json.dumps({"type": "file", **dict(zip(FILE_CHANGE_COLUMNS, row))}) + "\n")
+            else:
+                change, path, filename, old, new = row
+                out.write(f"{change:<10} {os.path.join(path, filename)}  {old or '-'} -> {new or '-'}\n")
+        if fields:
+            for row in self.field_changes():
+                if fmt == "jsonl":
+                    out.write(json.dumps({"type": "field", **dict(zip(FIELD_CHANGE_COLUMNS, row))}) + "\n")
+                else:
+                    change, file_ref, name, _, value, old, new = row
+                    value = value if value is not None else row[3]
+                    out.write(f"{change:<10} {file_ref}:{name}='{value}'  {old or '-'} -> {new or '-'}\n")
+        return counts
+
+
+def summarize_changes(counts: Counter) -> str:
+    """Returns a summary of the number of file changes of each type."""
+    summary_message = "Diff summary:\n    "
+    summary_message += "\n    ".join(f"Files {change.capitalize()}: {counts[change]}" for change in CHANGE_TYPES)
+    return summary_message
@@ -0,0 +1,131 @@
+"""Record the performance of each filename check run.
+
+Every run of check_filenames() records when it started and finished, how many files it checked
+and how quickly, the time spent in each stage, its peak memory use and cache hit rate, and the
+configuration and version of this package. The record is written to a JSON metrics file, and
+to the `runs` table of the results database (for the SQLite and DuckDB output formats), so the
+performance of nightly runs and of different settings can be compared.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Union
+
+from mast_contributor_tools import __version__
+from mast_contributor_tools.filename_check.fc_cache import config_hash
+from mast_contributor_tools.filename_check.fc_db import RUN_COLUMNS
+
+
+def peak_rss_mb() -> Union[float, None]:
+    """Returns the peak resident memory of this process in MB, or None where it is not available (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+class RunMetrics:
+    """Collect the metrics of one run.
+
+    Parameters
+    ----------
+    hlsp_name : str
+        Official identifier of the HLSP collection
+    output_format : str
+        Format of the results file, see fc_sinks
+    settings : dict, optional
+        Settings of the run worth comparing between runs, for example the batch size
+    workers : int, optional
+        Number of workers evaluating files
+    """
+
+    def __init__(
+        self, hlsp_name: str, output_format: str, settings: Union[dict, None] = None, workers: int = 1
+    ) -> None:
+        self.run_id = uuid.uuid4().hex
+        self.hlsp_name = hlsp_name
+        self.output_format = output_format
+        self.settings = settings or {}
+        self.workers = workers
+        self.started_at = _now()
+        self.start = time.perf_counter()
+        # Seconds spent in each stage, in the order the stages were first entered
+        self.stages: dict[str, float] = {}
+        self.record: dict = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Add the time spent in the with block to a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Add time to a stage"""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self, n_files: int, counts: dict, cache_hit_rate: Union[float, None] = None, **extra) -> dict:
+        """Complete the record of the run, and return it.
+
+        Parameters
+        ----------
+        n_files : int
+            Number of files checked
+        counts : dict
+            Number of files with each outcome, for example each final verdict
+        cache_hit_rate : float, optional
+            Hit rate of the field score cache, if one was used
+        extra : optional
+            Any other values to record
+        """
+        duration = time.perf_counter() - self.start
+        self.record = {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "finished_at": _now(),
+            "hlsp_name": self.hlsp_name,
+            "tool_version": __version__,
+            "config_hash": config_hash(),
+            "output_format": self.output_format,
+            "n_files": n_files,
+            "duration_s": round(duration, 6),
+            "files_per_sec": round(n_files / duration, 3) if duration > 0 else None,
+            "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            "peak_rss_mb": peak_rss_mb(),
+            "cache_hit_rate": cache_hit_rate,
+            "workers": self.workers,
+            "counts": dict(counts),
+            "settings": self.settings,
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            **extra,
+        }
+        return self.record
+
+    def run_row(self) -> tuple:
+        """Returns the row of the runs table for this run"""
+        row = {**self.record, "metrics": json.dumps(self.record)}
+        return tuple(row.get(column) for column in RUN_COLUMNS)
+
+    def write_json(self, metrics_file: str) -> None:
+        """Write the record of the run to a JSON file"""
+        with open(metrics_file, "w") as f:
+            json.dump(self.record, f, indent=2)
+            f.write("\n")
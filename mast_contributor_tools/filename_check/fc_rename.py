@@ -0,0 +1,257 @@
+"""Plan the renaming of files that fail the filename check, from the results database of a run.
+
+A compliant name is proposed for each failing file by lowercasing every field, removing the
+characters its field forbids, and rewriting version fields such as 'V1-0' or '1.0' as 'v1.0'.
+Problems that need a decision, like unrecognized values or fields that are too long, are left
+alone; the proposed name is checked again and its verdict written next to it. Proposed names
+share most of their field values, so each distinct value is only evaluated once.
+
+Every existing and proposed name of the collection is then indexed by its case-folded form in
+one dictionary, so that a proposal taking the name of another file, or differing from it only in
+case, is found in a single lookup, and is reported as a collision rather than renamed.
+
+The plan is written as CSV, or as a shell script of 'mv' commands with the collisions commented out.
+"""
+
+import csv
+import os
+import re
+import shlex
+import sqlite3
+from collections import Counter
+from typing import TextIO, Union
+
+from mast_contributor_tools.filename_check.fc_config import RuleSet, get_rules
+from mast_contributor_tools.filename_check.fc_db import database_uri
+from mast_contributor_tools.filename_check.hlsp_filename import (
+    FILENAME_REGEX,
+    VERSION_REGEX,
+    FieldRule,
+    HlspFileName,
+    create_field,
+)
+
+PLAN_COLUMNS = ["path", "filename", "new_filename", "new_verdict", "status", "collides_with"]
+# Verdicts of file names, from best to worst
+VERDICTS = ["PASS", "NEEDS REVIEW", "FAIL"]
+# A renamed file, a proposal that takes the name of another file, or a name with nothing to fix
+PLAN_STATUSES = ["rename", "collision", "unchanged"]
+
+# Characters removed from the value of each field, after lowercasing
+FORBIDDEN_CHARS = {
+    "target_name": re.compile(r"[^a-z0-9+\-.]"),
+    "extension": re.compile(r"[^a-z0-9.]"),
+}
+OTHER_FORBIDDEN_CHARS = re.compile(r"[^a-z0-9-]")
+# Target names and HLSP names must begin and end with a letter or a number
+EDGE_CHARS = {"target_name": "+-.", "hlsp_name": "-"}
+# Version fields with at most this many numbers are rewritten as 'v' followed by the numbers
+MAX_VERSION_NUMBERS = 3
+
+
+def fix_version(value: str) -> str:
+    """Returns a version field matching VERSION_REGEX, such as 'v1.0' for 'V1-0', or the value if it cannot be fixed"""
+    if VERSION_REGEX.match(value):
+        return value
+    numbers = re.findall(r"[0-9]+", value)
+    version = "v" + ".".join(numbers)
+    if len(numbers) > MAX_VERSION_NUMBERS or not VERSION_REGEX.match(version):
+        return value
+    return version
+
+
+def fix_field(name: str, value: str) -> str:
+    """Returns the value of a field in lower case, without the characters forbidden in that field.
+
+    Parameters
+    ----------
+    name : str
+        Name of the field, as given by HlspFileName.field_layout(): for example 'target_name'
+    value : str
+        Value of the field
+
+    Returns
+    -------
+    str
+        The fixed value; compliant values are returned unchanged
+    """
+    value = value.lower()
+    if name == "hlsp_str":
+        return "hlsp"
+    if name == "version_id":
+        return fix_version(value)
+    value = FORBIDDEN_CHARS.get(name, OTHER_FORBIDDEN_CHARS).sub("", value)
+    return value.strip(EDGE_CHARS.get(name, ""))
+
+
+def split_fields(filename: str) -> list[str]:
+    """Returns the values of the fields of a file name, as partitioned by HlspFileName.partition()"""
+    parts = filename.split("_")
+    return parts[:-1] + parts[-1].split(".", 1)
+
+
+class RenamePlan:
+    """Plan the renaming of the failing files of a results database written by check_filenames.
+
+    Parameters
+    ----------
+    db_file : str
+        SQLite results database of the run
+    hlsp_name : str, optional
+        Name of the HLSP collection; that of the most recent run in the database if not given
+    rules : RuleSet or str, optional
+        Rules to check the proposed names with, or the name of a rule set; the default rule set if not given
+    """
+
+    def __init__(self, db_file: str, hlsp_name: str = "", rules: Union[RuleSet, str, None] = None) -> None:
+        self.db_file = db_file
+        self.hlsp_name = hlsp_name
+        self.rules = get_rules(rules)
+        # One row of PLAN_COLUMNS for each failing file
+        self.rows: list[list] = []
+        # Fixed value of each field value and the rank of its verdict in VERDICTS, by field name and value
+        self.fixes: dict[tuple[str, str], tuple[str, int]] = {}
+        # Field layout of the names, by number of fields and product type
+        self.layouts: dict[tuple[int, str], list[tuple[str, int]]] = {}
+
+    def build(self) -> Counter:
+        """Propose a name for each failing file, and find the proposals that collide with other names.
+
+        Returns
+        -------
+        Counter
+            Number of failing files of each status
+
+        Raises
+        ------
+        FileNotFoundError
+            Raised if the results database does not exist.
+        """
+        files = self.read_files()
+        # Case-folded names, existing and proposed, and the index of the first file to hold them
+        owners: dict[str, int] = {}
+        collisions: dict[str, list[str]] = {}
+        proposals = {}
+        for i, (_, filename, verdict) in enumerate(files):
+            keys = (filename.casefold(),)
+            if verdict == "FAIL":
+                proposals[i] = self.propose(filename)
+                keys += (proposals[i][0].casefold(),)
+            for key in keys:
+                owner = owners.setdefault(key, i)
+                if owner != i:
+                    collisions.setdefault(key, [files[owner][1]]).append(filename)
+
+        counts: Counter = Counter()
+        self.rows = []
+        for i, (new_name, new_verdict) in proposals.items():
+            path, filename, _ = files[i]
+            others = [n for n in collisions.get(new_name.casefold(), []) if n != filename]
+            if new_name == filename:
+                status = "unchanged"
+            else:
+                status = "collision" if others else "rename"
+            counts[status] += 1
+            self.rows.append([path, filename, new_name, new_verdict, status, ";".join(others)])
+        return counts
+
+    def propose(self, filename: str) -> tuple[str, str]:
+        """Returns a compliant name for a file, and its verdict as HlspFileName.evaluate_filename() would give it.
+
+        Fields that cannot be fixed keep their value, and names that cannot be partitioned into
+        fields are returned unchanged.
+        """
+        values = split_fields(filename)
+        layout = self.layouts.get((len(values), values[-2]))
+        if layout is None:
+            if not 4 <= len(values) <= 9:
+                return filename, "FAIL"
+            layout = self.layouts[(len(values), values[-2])] = HlspFileName.field_layout(len(values), values[-2])
+        # Most values repeat across the collection, so a name is usually fixed with dictionary lookups alone
+        fixes = self.fixes
+        rank = 0
+        for name, i in layout:
+            fix = fixes.get((name, values[i]))
+            if fix is None:
+                fix = fixes[(name, values[i])] = self.fix(name, values[i])
+            values[i] = fix[0]
+            rank = max(rank, fix[1])
+        new_name = "_".join(values[:-2]) + "_" + ".".join(values[-2:])
+        if not FILENAME_REGEX.match(new_name):
+            return new_name, "FAIL"
+        return new_name, VERDICTS[rank]
+
+    def fix(self, name: str, value: str) -> tuple[str, int]:
+        """Returns the fixed value of a field, or the value itself if nothing is left of it, and the rank of its verdict."""
+        if name == "hlsp_name" and self.hlsp_name:
+            value = self.hlsp_name
+        else:
+            value = fix_field(name, value) or value
+        field = create_field(name, value, self.hlsp_name or value.lower(), self.rules)
+        field.evaluate()
+        verdict = FieldRule.field_verdict([field.cap_eval, field.len_eval, field.format_eval, field.value_eval])
+        return value, VERDICTS.index(verdict)
+
+    def read_files(self) -> list[tuple[str, str, str]]:
+        """Returns the path, name and verdict of every file of the results database, failing or not."""
+        if not os.path.isfile(self.db_file):
+            raise FileNotFoundError(f"Results database '{self.db_file}' does not exist.")
+        # Read-only, so the plan can be made while the database is being queried
+        conn = sqlite3.connect(database_uri(self.db_file), uri=True)
+        try:
+            if not self.hlsp_name:
+                self.hlsp_name = latest_hlsp_name(conn)
+            # In the order the files were checked, as sorting a million names would take longer than planning them
+            return conn.execute("SELECT path, filename, final_verdict FROM filename").fetchall()
+        finally:
+            conn.close()
+
+    def write_csv(self, out: TextIO) -> None:
+        """Write the plan as CSV, with a header of PLAN_COLUMNS."""
+        writer = csv.writer(out)
+        writer.writerow(PLAN_COLUMNS)
+        writer.writerows(self.rows)
+
+    def write_script(self, out: TextIO) -> None:
+        """Write the plan as a shell script renaming the files, run from the root directory of the collection.
+
+        Collisions are written as comments, and 'mv -n' never replaces an existing file. Names that
+        only change case are renamed through a temporary name, as on case-insensitive file systems
+        the new name already exists.
+        """
+        out.write("#!/bin/sh\n# Renames planned by mct plan_renames from " + self.db_file + "\n")
+        for path, filename, new_name, new_verdict, status, others in self.rows:
+            old_path, new_path = shlex.quote(os.path.join(path, filename)), shlex.quote(os.path.join(path, new_name))
+            if new_name.casefold() == filename.casefold():
+                tmp_path = shlex.quote(os.path.join(path, filename + ".mct-rename"))
+                command = f"mv -n -- {old_path} {tmp_path} && mv -n -- {tmp_path} {new_path}"
+            else:
+                command = f"mv -n -- {old_path} {new_path}"
+            if status == "rename":
+                out.write(f"{command}  # {new_verdict}\n")
+            elif status == "collision":
+                out.write(f"# COLLISION with {others}: {command}\n")
+
+    def write(self, out: TextIO, fmt: str = "csv") -> None:
+        """Write the plan in one of fc_choices.PLAN_FORMATS."""
+        if fmt == "sh":
+            self.write_script(out)
+        else:
+            self.write_csv(out)
+
+
+def latest_hlsp_name(conn: sqlite3.Connection) -> str:
+    """Returns the HLSP name of the most recent run recorded in a results database, or '' if there is none."""
+    try:
+        row = conn.execute("SELECT hlsp_name FROM runs ORDER BY finished_at DESC LIMIT 1").fetchone()
+    except sqlite3.OperationalError:
+        # Databases written before runs were recorded
+        return ""
+    return row[0] if row else ""
+
+
+def summarize_plan(counts: Counter, hlsp_name: str = "") -> str:
+    """Returns a one-line summary of the number of failing files of each status."""
+    total = sum(counts.values())
+    summary = ", ".join(f"{counts[s]} {s}" for s in PLAN_STATUSES)
+    return f"Rename plan for {total} failing files{' of ' + hlsp_name if hlsp_name else ''}: {summary}"
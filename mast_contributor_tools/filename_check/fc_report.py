@@ -0,0 +1,228 @@
+"""Query a filename check results database without loading it into memory.
+
+Listings are paginated with keyset pagination: each page returns a key for its last
+row, and the next page starts after that key. Unlike OFFSET, this lets SQLite seek
+directly to the start of each page using the indexes built by
+:meth:`Hlsp_SQLiteDb.build_indexes`, so every page is equally fast.
+"""
+
+import sqlite3
+from typing import Union
+
+from mast_contributor_tools.filename_check.fc_db import FIELD_COLUMNS, FILE_COLUMNS, VERDICTS
+
+# Verdicts considered a problem when listing the most common failures
+PROBLEM_VERDICTS = ["FAIL", "NEEDS REVIEW"]
+
+
+def _verdict_filter(column: str, verdicts: Union[list[str], None]) -> tuple[list[str], list[str]]:
+    """Returns the WHERE clauses and parameters to filter a column by verdict."""
+    if not verdicts:
+        return [], []
+    verdicts = [v.upper() for v in verdicts]
+    bad = [v for v in verdicts if v not in VERDICTS]
+    if bad:
+        raise ValueError(f"Unknown verdict(s) {bad}: must be one of {VERDICTS}")
+    return [f"{column} IN ({', '.join('?' * len(verdicts))})"], verdicts
+
+
+def _prefix_filter(column: str, prefix: str) -> tuple[list[str], list[str]]:
+    """Returns the WHERE clauses and parameters to match a column by prefix as an index range."""
+    if not prefix:
+        return [], []
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return [f"{column} >= ?", f"{column} < ?"], [prefix, upper]
+
+
+def _file_filter(path_prefix: str, glob: str) -> tuple[list[str], list[str]]:
+    """Returns the WHERE clauses and parameters to select the fields of files by path prefix and name pattern."""
+    where, params = [], []
+    if glob:
+        where.append("file_ref GLOB ?")
+        params.append(glob)
+    if path_prefix:
+        clauses, values = _prefix_filter("fn.path", path_prefix)
+        where.append(f"EXISTS (SELECT 1 FROM filename AS fn WHERE fn.filename = file_ref AND {' AND '.join(clauses)})")
+        params += values
+    return where, params
+
+
+def split_key(key: str) -> tuple[str, str]:
+    """Split a page key of the form '<path or file>/<filename or field>' into its two parts."""
+    first, _, second = key.rpartition("/")
+    return first, second
+
+
+def query_files(
+    conn: sqlite3.Connection,
+    verdicts: Union[list[str], None] = None,
+    path_prefix: str = "",
+    glob: str = "",
+    after: str = "",
+    limit: int = 50,
+) -> tuple[list[tuple], str]:
+    """Returns one page of file records, ordered by path and filename.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Connection to a results database
+    verdicts : list[str], optional
+        Only return files with one of these final verdicts
+    path_prefix : str, optional
+        Only return files whose path starts with this prefix
+    glob : str, optional
+        Only return files whose name matches this glob pattern, for example '*_spec.fits'
+    after : str, optional
+        Key returned by the previous page; the page starts after this file
+    limit : int, optional
+        Maximum number of rows to return
+
+    Returns
+    -------
+    tuple[list[tuple], str]
+        The rows of the page, and the key of the last row ('' if this is the last page)
+    """
+    where, params = _verdict_filter("final_verdict", verdicts)
+    clauses, values = _prefix_filter("path", path_prefix)
+    where += clauses
+    params += values
+    if glob:
+        where.append("filename GLOB ?")
+        params.append(glob)
+    if after:
+        where.append("(path, filename) > (?, ?)")
+        params += split_key(after)
+
+    query = f"SELECT {', '.join(FILE_COLUMNS)} FROM filename"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY path, filename LIMIT ?"
+    rows = conn.execute(query, [*params, limit]).fetchall()
+    next_key = f"{rows[-1][0]}/{rows[-1][1]}" if len(rows) == limit else ""
+    return rows, next_key
+
+
+def query_fields(
+    conn: sqlite3.Connection,
+    verdicts: Union[list[str], None] = None,
+    field: str = "",
+    value: str = "",
+    path_prefix: str = "",
+    glob: str = "",
+    after: str = "",
+    limit: int = 50,
+) -> tuple[list[tuple], str]:
+    """Returns one page of field records, ordered by filename and field name.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Connection to a results database
+    verdicts : list[str], optional
+        Only return fields with one of these verdicts
+    field : str, optional
+        Only return fields with this name, for example 'instrument'
+    value : str, optional
+        Only return fields with this value, for example 'nircm'
+    path_prefix : str, optional
+        Only return fields of files whose path starts with this prefix
+    glob : str, optional
+        Only return fields of files whose name matches this glob pattern
+    after : str, optional
+        Key returned by the previous page; the page starts after this field
+    limit : int, optional
+        Maximum number of rows to return
+
+    Returns
+    -------
+    tuple[list[tuple], str]
+        The rows of the page, and the key of the last row ('' if this is the last page)
+    """
+    where, params = _verdict_filter("field_verdict", verdicts)
+    if field:
+        where.append("name = ?")
+        params.append(field)
+    if value:
+        where.append("value = ?")
+        params.append(value)
+    clauses, values = _file_filter(path_prefix, glob)
+    where += clauses
+    params += values
+    if after:
+        where.append("(file_ref, name) > (?, ?)")
+        params += split_key(after)
+
+    query = f"SELECT {', '.join(FIELD_COLUMNS)} FROM fields"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY file_ref, name LIMIT ?"
+    rows = conn.execute(query, [*params, limit]).fetchall()
+    next_key = f"{rows[-1][0]}/{rows[-1][1]}" if len(rows) == limit else ""
+    return rows, next_key
+
+
+def top_failures(
+    conn: sqlite3.Connection,
+    by: str = "value",
+    verdicts: Union[list[str], None] = None,
+    field: str = "",
+    n: int = 10,
+    path_prefix: str = "",
+    glob: str = "",
+) -> list[tuple]:
+    """Returns the most common failing values or fields, with their counts.
+
+    Counts are read from the ``value_counts`` table when it exists and the files are not
+    filtered, and are otherwise computed from the ``fields`` table.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Connection to a results database
+    by : str, optional
+        Either 'value' (default) to count each (field, value) pair, or 'field' to count each field
+    verdicts : list[str], optional
+        Verdicts to count; defaults to 'FAIL' and 'NEEDS REVIEW'
+    field : str, optional
+        Only count values of this field
+    n : int, optional
+        Number of rows to return
+    path_prefix : str, optional
+        Only count fields of files whose path starts with this prefix
+    glob : str, optional
+        Only count fields of files whose name matches this glob pattern
+
+    Returns
+    -------
+    list[tuple]
+        Rows of (name, value, count) or (name, count), most common first
+    """
+    if by not in ["value", "field"]:
+        raise ValueError(f"Cannot count failures by '{by}': must be 'value' or 'field'")
+    where, params = _verdict_filter("field_verdict", verdicts or PROBLEM_VERDICTS)
+    if field:
+        where.append("name = ?")
+        params.append(field)
+
+    # The value counts are not kept by file, so they cannot be filtered by path or name
+    clauses, values = _file_filter(path_prefix, glob)
+    where += clauses
+    params += values
+    has_counts = not clauses and conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'value_counts'").fetchone()
+    source, count = ("value_counts", "SUM(n)") if has_counts else ("fields", "COUNT(*)")
+    group = "name, value" if by == "value" else "name"
+    query = (
+        f"SELECT {group}, {count} AS total FROM {source} WHERE {' AND '.join(where)} "
+        f"GROUP BY {group} ORDER BY total DESC, {group} LIMIT ?"
+    )
+    return conn.execute(query, [*params, n]).fetchall()
+
+
+def format_table(columns: list[str], rows: list[tuple]) -> str:
+    """Format rows as a plain text table with aligned columns."""
+    widths = [max([len(c), *(len(str(r[i])) for r in rows)]) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    lines += ["  ".join(str(v).ljust(w) for v, w in zip(r, widths)) for r in rows]
+    return "\n".join(lines)
@@ -0,0 +1,215 @@
+"""Estimate the verdicts of a large collection from a sample of its file names.
+
+The first N files found are usually all in one directory, so they are rarely representative of
+the collection. Instead, the files are sampled in a single pass, stratified by directory and
+extension:
+
+* Each file gets a random key. The files with the smallest keys form a uniform random sample of
+  the requested size (bottom-k sampling), kept in a heap while the files are read.
+* Each stratum also keeps its file with the smallest key. Strata that are not in the uniform
+  sample are represented by that file, largest strata first, so small directories and rare
+  extensions are checked too.
+
+Within each stratum, the sampled files are then a simple random sample, so the verdict
+proportions are estimated by weighting each checked file by the number of files it stands for
+(N_h / n_h). The confidence intervals are Wilson score intervals using the Kish effective sample
+size of the weighted sample, with a finite population correction.
+"""
+
+import heapq
+import math
+import os
+import random
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from statistics import NormalDist
+from typing import Union
+
+from mast_contributor_tools.filename_check.fc_app import evaluate_name
+from mast_contributor_tools.filename_check.fc_cache import VerdictCache
+from mast_contributor_tools.filename_check.fc_config import RuleSet, get_rules
+
+# Verdicts estimated, in the order they are reported. Names that cannot be checked are 'INVALID'.
+SAMPLE_VERDICTS = ["PASS", "NEEDS REVIEW", "FAIL", "INVALID"]
+
+
+def stratum(path: str) -> tuple[str, str]:
+    """Returns the stratum of a file path: its directory and its (lowercase) extension"""
+    # String operations rather than Path attributes, since this is called for every file
+    directory, _, name = path.rpartition(os.sep)
+    _, dot, extension = name.partition(".")
+    return directory or ".", extension.lower() if dot else ""
+
+
+class StratifiedSample:
+    """Sample file paths in a single pass, stratified by directory and extension.
+
+    Parameters
+    ----------
+    size : int
+        Number of files in the uniform part of the sample
+    max_extra : int, optional
+        Maximum number of files added to represent strata missing from the uniform sample.
+        Defaults to size, so at most twice as many files as requested are checked.
+    seed : int, optional
+        Seed of the random number generator, for reproducible samples
+    """
+
+    def __init__(self, size: int, max_extra: Union[int, None] = None, seed: Union[int, None] = None) -> None:
+        if size < 1:
+            raise ValueError(f"Sample size must be at least 1, not {size}")
+        self.size = size
+        self.max_extra = size if max_extra is None else max_extra
+        self.random = random.Random(seed)
+        self.n_files = 0
+        # Max-heap (by negated key) of the files with the smallest keys: (-key, path, stratum)
+        self.heap: list[tuple[float, str, tuple[str, str]]] = []
+        # Number of files, and the file with the smallest key, in each stratum
+        self.strata: dict[tuple[str, str], list] = {}
+
+    def add(self, file_path: Path) -> None:
+        """Add one file to the population being sampled"""
+        key = self.random.random()
+        path = str(file_path)
+        s = stratum(path)
+        self.n_files += 1
+
+        stats = self.strata.get(s)
+        if stats is None:
+            self.strata[s] = [1, key, path]
+        else:
+            stats[0] += 1
+            if key < stats[1]:
+                stats[1], stats[2] = key, path
+
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, (-key, path, s))
+        elif key < -self.heap[0][0]:
+            heapq.heapreplace(self.heap, (-key, path, s))
+
+    def extend(self, file_paths: Iterable[Path]) -> "StratifiedSample":
+        """Add each of the files to the population, returning the sample"""
+        for f in file_paths:
+            self.add(f)
+        return self
+
+    def sample(self) -> dict[tuple[str, str], list[str]]:
+        """Returns the sampled paths of each stratum, leaving out strata with no sampled files"""
+        sampled: dict[tuple[str, str], list[str]] = {}
+        for _, path, s in self.heap:
+            sampled.setdefault(s, []).append(path)
+        # Represent the largest of the other strata by their file with the smallest key
+        missing = sorted((s for s in self.strata if s not in sampled), key=lambda s: -self.strata[s][0])
+        for s in missing[: self.max_extra]:
+            sampled[s] = [self.strata[s][2]]
+        return sampled
+
+
+@dataclass
+class SampleEstimate:
+    """Estimated proportion of files with each verdict, with confidence intervals"""
+
+    n_files: int
+    n_checked: int
+    n_strata: int
+    n_strata_checked: int
+    # Fraction of the files that are in the strata that were checked
+    coverage: float
+    confidence: float
+    proportions: dict[str, float] = field(default_factory=dict)
+    intervals: dict[str, tuple[float, float]] = field(default_factory=dict)
+    # Effective sample size of the weighted sample
+    n_effective: float = 0.0
+
+    def format(self) -> str:
+        """Returns a table of the estimated verdict proportions, as logged by `mct check_filenames --sample`"""
+        lines = [
+            f"Estimated from a sample of {self.n_checked} of {self.n_files} files "
+            f"({self.n_strata_checked} of {self.n_strata} directory/extension strata, "
+            f"covering {self.coverage:.1%} of the files)",
+            f"  {'Verdict':<14}{'Estimate':>10}   {self.confidence:.0%} confidence interval",
+        ]
+        for verdict in SAMPLE_VERDICTS:
+            low, high = self.intervals[verdict]
+            estimate = self.proportions[verdict]
+            lines.append(
+                f"  {verdict:<14}{estimate:>10.1%}   {low:.1%} - {high:.1%}  (~{round(estimate * self.n_files)} files)"
+            )
+        return "\n".join(lines)
+
+
+def wilson_interval(p: float, n: float, confidence: float = 0.95) -> tuple[float, float]:
+    """Wilson score interval of a proportion p estimated from n (effective) observations"""
+    if n <= 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    # The interval always contains p, which rounding errors could otherwise put just outside it
+    return max(0.0, min(p, center - half_width)), min(1.0, max(p, center + half_width))
+
+
+def estimate_verdicts(
+    sample: StratifiedSample, hlsp_name: str, confidence: float = 0.95, rules: Union[RuleSet, None] = None
+) -> SampleEstimate:
+    """Check the sampled file names, and estimate the proportion of files with each verdict
+
+    Parameters
+    ----------
+    sample : StratifiedSample
+        Sample of the files of the collection
+    hlsp_name : str
+        Official identifier (abbreviation/acronym/initialism) for the HLSP collection
+    confidence : float, optional
+        Confidence level of the intervals, 0.95 by default
+    rules : RuleSet, optional
+        Rules to check the names with; the default rule set if not given
+
+    Returns
+    -------
+    SampleEstimate
+        The estimated proportions and confidence intervals of each verdict in SAMPLE_VERDICTS
+    """
+    sampled = sample.sample()
+    # Field values are shared by many names, so cache their scores in memory
+    rules = get_rules(rules)
+    cache = VerdictCache("", rules.config_hash)
+
+    # Weight each checked file by the number of files of its stratum it stands for
+    totals = dict.fromkeys(SAMPLE_VERDICTS, 0.0)
+    sum_weights = sum_squared_weights = 0.0
+    n_checked = 0
+    for s, paths in sampled.items():
+        weight = sample.strata[s][0] / len(paths)
+        for path in paths:
+            record = evaluate_name(path, hlsp_name, cache, rules)
+            totals[record.get("final_verdict", "INVALID")] += weight
+            sum_weights += weight
+            sum_squared_weights += weight * weight
+        n_checked += len(paths)
+
+    n_files = sample.n_files
+    n_covered = sum(sample.strata[s][0] for s in sampled)
+    proportions = {v: totals[v] / sum_weights for v in SAMPLE_VERDICTS}
+    if n_checked >= n_covered:
+        # Every file was checked, so the proportions are exact
+        n_effective = math.inf
+        intervals = {v: (p, p) for v, p in proportions.items()}
+    else:
+        # Kish effective sample size, with the finite population correction
+        n_effective = sum_weights**2 / sum_squared_weights / (1 - n_checked / n_covered)
+        intervals = {v: wilson_interval(p, n_effective, confidence) for v, p in proportions.items()}
+
+    return SampleEstimate(
+        n_files=n_files,
+        n_checked=n_checked,
+        n_strata=len(sample.strata),
+        n_strata_checked=len(sampled),
+        coverage=n_covered / n_files,
+        confidence=confidence,
+        proportions=proportions,
+        intervals=intervals,
+        n_effective=n_effective,
+    )
@@ -0,0 +1,402 @@
+"""A long-running local service that checks file names, keeping its configuration in memory.
+
+Starting `mct` to check each file name costs far more than the check itself. The service loads
+the configuration once, and keeps the scores of every field value it has seen in an in-memory
+VerdictCache, so checking a name takes tens of microseconds.
+
+The service listens on a Unix socket, or over HTTP on localhost, and answers requests in JSON.
+Each request checks a batch of names::
+
+    {"filenames": ["hlsp_my-hlsp_readme.txt", ...], "hlsp_name": "my-hlsp"}
+
+'hlsp_name' is optional; by default it is inferred from each name. 'rules' is also optional, and
+names the rule set to check with among those registered in fc_config.registry; the default rule set
+is used otherwise. The response holds one record per name, in the same order, as returned by
+fc_app.evaluate_name()::
+
+    {"results": [{"path": ".", "filename": "hlsp_my-hlsp_readme.txt", "n_elements": 4, ...}, ...]}
+
+An invalid request is answered with ``{"error": "<message>"}``.
+
+On a Unix socket, each request and each response is one line of JSON, and a client may send any
+number of requests over one connection. Over HTTP, requests are POSTed to /validate, connections
+are kept alive between requests, and GET /health reports the version of the service. Each client
+connection is handled by its own thread.
+
+The rule sets are reloaded when their configuration files change (see fc_config.ConfigRegistry),
+and the scores kept for a rule set are dropped when it is reloaded, so the service need not be
+restarted after editing the vocabularies.
+"""
+
+import http.client
+import http.server
+import json
+import logging
+import os
+import socket
+import socketserver
+import statistics
+import threading
+import time
+from typing import Union
+
+from mast_contributor_tools import __version__
+from mast_contributor_tools.filename_check.fc_app import evaluate_name, logger
+from mast_contributor_tools.filename_check.fc_cache import VerdictCache
+from mast_contributor_tools.filename_check.fc_config import DEFAULT_RULES, ConfigRegistry, RuleSet, registry
+
+DEFAULT_PORT = 8765
+# Largest number of names accepted in a single request
+MAX_BATCH = 10000
+# Largest body, in bytes, accepted in a single HTTP request: ample for MAX_BATCH names
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class ValidationService:
+    """Check batches of file names, keeping the scores of field values in memory between requests.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Maximum number of field scores kept in memory, for each rule set
+    config_registry : ConfigRegistry, optional
+        Registry of the rule sets that requests may name; the shared fc_config.registry by default
+    """
+
+    def __init__(self, max_entries: int = 1_000_000, config_registry: Union[ConfigRegistry, None] = None) -> None:
+        self.max_entries = max_entries
+        self.registry = config_registry or registry
+        # One cache per rule set, replaced when the rule set is reloaded. The caches are not backed
+        # by a file: they live as long as the service.
+        self.caches: dict[str, VerdictCache] = {}
+
+    def rules_cache(self, rules_name: str) -> tuple[RuleSet, VerdictCache]:
+        """Returns the current rule set of a name, and the cache of scores made with it."""
+        rules = self.registry.get(rules_name)
+        cache = self.caches.get(rules_name)
+        if cache is None or cache.config_hash != rules.config_hash:
+            cache = self.caches[rules_name] = VerdictCache("", rules.config_hash, max_entries=self.max_entries)
+        return rules, cache
+
+    def handle(self, payload: dict) -> dict:
+        """Returns the response to a decoded request: the results for each name, or an error."""
+        if not isinstance(payload, dict) or not isinstance(payload.get("filenames"), list):
+            return {"error": "The request must be a JSON object with a list of 'filenames'"}
+        filenames = payload["filenames"]
+        hlsp_name = payload.get("hlsp_name") or ""
+        rules_name = payload.get("rules") or DEFAULT_RULES
+        if len(filenames) > MAX_BATCH:
+            return {"error": f"Too many filenames in one request: the limit is {MAX_BATCH}"}
+        if not all(isinstance(f, str) for f in [*filenames, hlsp_name, rules_name]):
+            return {"error": "'filenames', 'hlsp_name' and 'rules' must be strings"}
+        try:
+            rules, cache = self.rules_cache(rules_name)
+        except KeyError as e:
+            return {"error": e.args[0]}
+        return {"results": [evaluate_name(f, hlsp_name.lower(), cache, rules) for f in filenames]}
+
+    def handle_line(self, line: bytes) -> bytes:
+        """Returns the response to one line of JSON, as one line of JSON."""
+        try:
+            response = self.handle(json.loads(line))
+        except ValueError as e:
+            response = {"error": f"Invalid JSON: {e}"}
+        return json.dumps(response, separators=(",", ":")).encode() + b"\n"
+
+
+class _UnixRequestHandler(socketserver.StreamRequestHandler):
+    """Answer each line of JSON received on a Unix socket connection with a line of JSON."""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write(self.server.service.handle_line(line))
+
+
+class _HTTPRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answer POST /validate and GET /health requests."""
+
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._reply(200, {"status": "ok", "version": __version__})
+        else:
+            self._reply(404, {"error": f"Unknown path '{self.path}': use GET /health or POST /validate"})
+
+    def do_POST(self) -> None:
+        if self.path != "/validate":
+            self._reply(404, {"error": f"Unknown path '{self.path}': use GET /health or POST /validate"})
+            return
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            length = -1
+        if length < 0 or length > MAX_BODY_BYTES:
+            # The body is not read, so the connection cannot be used for another request
+            self.close_connection = True
+            if length < 0:
+                self._reply(400, {"error": "The request must have a valid Content-Length header"})
+            else:
+                self._reply(413, {"error": f"The request is too large: the limit is {MAX_BODY_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+        try:
+            response = self.server.service.handle(json.loads(body))
+        except ValueError as e:
+            response = {"error": f"Invalid JSON: {e}"}
+        self._reply(400 if "error" in response else 200, response)
+
+    def _reply(self, status: int, response: dict) -> None:
+        """Send a JSON response."""
+        data = json.dumps(response, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        # Log each request at debug level, rather than printing it to stderr
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Many clients may connect at once; a Unix socket refuses connections beyond this backlog
+    request_queue_size = 128
+
+
+class _ThreadingHTTPServer(http.server.ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+def make_server(service: ValidationService, socket_path: str = "", port: int = DEFAULT_PORT) -> socketserver.BaseServer:
+    """Create a server for the validation service, listening on a Unix socket or on a localhost port.
+
+    Parameters
+    ----------
+    service : ValidationService
+        The service answering requests
+    socket_path : str, optional
+        Path of the Unix socket to listen on. If not given, the server listens over HTTP instead.
+    port : int, optional
+        Port to listen on over HTTP, on localhost only; 0 picks any free port
+
+    Raises
+    ------
+    OSError
+        Raised if the socket or port is already in use.
+    """
+    if socket_path:
+        _remove_stale_socket(socket_path)
+        server: socketserver.BaseServer = _ThreadingUnixServer(socket_path, _UnixRequestHandler)
+    else:
+        server = _ThreadingHTTPServer(("127.0.0.1", port), _HTTPRequestHandler)
+    server.service = service
+    return server
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """Remove a Unix socket left behind by a previous service, unless a service is still listening on it."""
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(socket_path)
+        except OSError:
+            os.remove(socket_path)
+            return
+    raise OSError(f"A service is already listening on {socket_path}")
+
+
+def start_server(socket_path: str = "", port: int = 0) -> socketserver.BaseServer:
+    """Start a validation service in a background thread of this process, for example for testing.
+
+    Stop it with ``server.shutdown()`` and ``server.server_close()``.
+    """
+    server = make_server(ValidationService(), socket_path, port)
+    threading.Thread(target=server.serve_forever, name="mct-serve", daemon=True).start()
+    return server
+
+
+def serve(socket_path: str = "", port: int = DEFAULT_PORT) -> None:
+    """Run the validation service until interrupted, for example with Ctrl-C.
+
+    Parameters
+    ----------
+    socket_path : str, optional
+        Path of the Unix socket to listen on. If not given, the service listens over HTTP instead.
+    port : int, optional
+        Port to listen on over HTTP, on localhost only
+    """
+    server = make_server(ValidationService(), socket_path, port)
+    address = socket_path or f"http://127.0.0.1:{server.server_address[1]}"
+    logger.critical(f"Checking file names at {address}; press Ctrl-C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.critical("Stopping")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+class ValidationClient:
+    """Send file names to a running validation service. Each client holds one connection.
+
+    Parameters
+    ----------
+    socket_path : str, optional
+        Path of the Unix socket of the service. If not given, the service is reached over HTTP.
+    port : int, optional
+        Port of the service on localhost, over HTTP
+    timeout : float, optional
+        Time to wait for a response, in seconds
+    """
+
+    def __init__(self, socket_path: str = "", port: int = DEFAULT_PORT, timeout: float = 30.0) -> None:
+        self.socket_path = socket_path
+        self.port = port
+        self.timeout = timeout
+        self.conn: Union[socket.socket, http.client.HTTPConnection, None] = None
+
+    def validate(self, filenames: list[str], hlsp_name: str = "") -> list[dict]:
+        """Returns the record of each file name, as checked by the service.
+
+        Raises
+        ------
+        ValueError
+            Raised if the service rejects the request.
+        """
+        body = json.dumps({"filenames": filenames, "hlsp_name": hlsp_name}).encode()
+        if self.socket_path:
+            response = self._send_line(body)
+        else:
+            response = self._post(body)
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["results"]
+
+    def _send_line(self, body: bytes) -> dict:
+        """Send a request as a line of JSON over the Unix socket, and read the response line."""
+        if self.conn is None:
+            self.conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.conn.settimeout(self.timeout)
+            self.conn.connect(self.socket_path)
+            self.reader = self.conn.makefile("rb")
+        self.conn.sendall(body + b"\n")
+        return json.loads(self.reader.readline())
+
+    def _post(self, body: bytes) -> dict:
+        """POST a request to /validate over HTTP, and read the response."""
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=self.timeout)
+        self.conn.request("POST", "/validate", body, {"Content-Type": "application/json"})
+        return json.loads(self.conn.getresponse().read())
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def benchmark_names(n: int, start: int = 0, hlsp_name: str = "bench") -> list[str]:
+    """Returns n distinct, realistic file names to check, for benchmarking."""
+    products = ["spec", "img", "drz", "cat"]
+    return [
+        f"hlsp_{hlsp_name}_hst_wfc3_target-{i}_f160w_v1_{products[i % len(products)]}.fits"
+        for i in range(start, start + n)
+    ]
+
+
+def run_benchmark(
+    socket_path: str = "", port: int = DEFAULT_PORT, n_clients: int = 4, n_requests: int = 100, batch_size: int = 100
+) -> dict:
+    """Measure the latency and throughput of a running validation service.
+
+    Each client sends its requests one after the other, over its own connection, while the
+    clients run concurrently.
+
+    Parameters
+    ----------
+    socket_path : str, optional
+        Path of the Unix socket of the service. If not given, the service is reached over HTTP.
+    port : int, optional
+        Port of the service on localhost, over HTTP
+    n_clients : int, optional
+        Number of concurrent clients
+    n_requests : int, optional
+        Number of requests sent by each client
+    batch_size : int, optional
+        Number of names in each request
+
+    Returns
+    -------
+    dict
+        Number of requests and names checked, elapsed time, throughput, and latency percentiles
+
+    Raises
+    ------
+    ValueError
+        Raised if the number of clients, of requests or of names in each request is not positive.
+    """
+    for name, value in [("n_clients", n_clients), ("n_requests", n_requests), ("batch_size", batch_size)]:
+        if value < 1:
+            raise ValueError(f"'{name}' must be a positive integer, not {value!r}")
+    latencies: list[float] = []
+    errors: list[Exception] = []
+
+    def send_requests(client_id: int) -> None:
+        client = ValidationClient(socket_path, port)
+        try:
+            for i in range(n_requests):
+                names = benchmark_names(batch_size, start=(client_id * n_requests + i) * batch_size)
+                start = time.perf_counter()
+                client.validate(names)
+                latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=send_requests, args=(c,)) for c in range(n_clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+
+    if len(latencies) > 1:
+        q = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p95, p99 = q[49], q[94], q[98]
+    else:
+        p50 = p95 = p99 = latencies[0]
+    return {
+        "clients": n_clients,
+        "requests": len(latencies),
+        "names": len(latencies) * batch_size,
+        "seconds": elapsed,
+        "requests_per_s": len(latencies) / elapsed,
+        "names_per_s": len(latencies) * batch_size / elapsed,
+        "latency_ms": {"p50": p50 * 1000, "p95": p95 * 1000, "p99": p99 * 1000, "max": max(latencies) * 1000},
+    }
+
+
+def format_benchmark(results: dict) -> str:
+    """Returns a summary of the results of run_benchmark()."""
+    latency = results["latency_ms"]
+    return (
+        "Benchmark summary:\n    "
+        f"Clients: {results['clients']}\n    "
+        f"Requests: {results['requests']} ({results['requests_per_s']:.0f} per second)\n    "
+        f"Names checked: {results['names']} ({results['names_per_s']:.0f} per second)\n    "
+        f"Latency (ms): p50 {latency['p50']:.2f}, p95 {latency['p95']:.2f}, "
+        f"p99 {latency['p99']:.2f}, max {latency['max']:.2f}"
+    )
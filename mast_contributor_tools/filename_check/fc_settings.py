@@ -0,0 +1,123 @@
+"""Settings of `mct check_filenames` that depend on the machine, as recommended by `mct bench`.
+
+The fastest batch size, SQLite writer and discovery strategy depend on the node and its file
+system, so `mct bench` measures them and writes its recommendation to a settings file, which
+`mct check_filenames` then loads on every run. Options given on the command line take precedence.
+
+The settings file is settings.yaml in the user's configuration directory (for example
+~/.config/mast_contributor_tools), or the file named by the MCT_SETTINGS_FILE environment
+variable; an empty value turns off the settings file::
+
+    check_filenames:
+      batch_size: 5000
+      sqlite_writer: background
+      discovery: walk
+"""
+
+import os
+from typing import Union
+
+import yaml
+
+from mast_contributor_tools.filename_check.fc_choices import DISCOVERY_STRATEGIES, SQLITE_WRITERS
+from mast_contributor_tools.filename_check.fc_config import YamlLoader
+from mast_contributor_tools.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Environment variable with the path of the settings file; an empty value turns off the settings file
+SETTINGS_FILE_ENV = "MCT_SETTINGS_FILE"
+# Section of the settings file read by check_filenames
+SETTINGS_SECTION = "check_filenames"
+# Settings used when neither the command line nor the settings file gives them
+DEFAULT_SETTINGS = {"batch_size": 1000, "sqlite_writer": "background", "discovery": "glob"}
+
+
+def default_settings_file() -> str:
+    """Returns the path of the settings file: from the MCT_SETTINGS_FILE environment variable if it is set,
+    otherwise settings.yaml in the user's configuration directory (for example ~/.config/mast_contributor_tools)
+    """
+    if SETTINGS_FILE_ENV in os.environ:
+        return os.environ[SETTINGS_FILE_ENV]
+    config_dir = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(config_dir, "mast_contributor_tools", "settings.yaml")
+
+
+def validate_settings(settings: dict) -> dict:
+    """Returns the settings of check_filenames, after checking their values.
+
+    Raises
+    ------
+    ValueError
+        Raised if a setting is unknown, or its value is not valid.
+    """
+    unknown = set(settings) - set(DEFAULT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown settings {sorted(unknown)}: must be among {[*DEFAULT_SETTINGS]}")
+    batch_size = settings.get("batch_size", DEFAULT_SETTINGS["batch_size"])
+    if not isinstance(batch_size, int) or batch_size < 1:
+        raise ValueError(f"'batch_size' must be a positive integer, not {batch_size!r}")
+    for key, choices in [("sqlite_writer", SQLITE_WRITERS), ("discovery", DISCOVERY_STRATEGIES)]:
+        if settings.get(key, DEFAULT_SETTINGS[key]) not in choices:
+            raise ValueError(f"'{key}' must be one of {choices}, not {settings[key]!r}")
+    return dict(settings)
+
+
+def load_settings(settings_file: Union[str, None] = None) -> dict:
+    """Returns the settings of check_filenames from the settings file, over the default settings.
+
+    A missing settings file is not an error. An invalid settings file is reported and ignored,
+    so that a broken file never stops a check.
+
+    Parameters
+    ----------
+    settings_file : str, optional
+        Path of the settings file; default_settings_file() if not given, and none if empty
+    """
+    settings_file = default_settings_file() if settings_file is None else settings_file
+    if not settings_file or not os.path.isfile(settings_file):
+        return dict(DEFAULT_SETTINGS)
+    try:
+        with open(settings_file, "r") as f:
+            contents = yaml.load(f, Loader=YamlLoader) or {}
+        settings = validate_settings((contents if isinstance(contents, dict) else {}).get(SETTINGS_SECTION) or {})
+    except (OSError, yaml.YAMLError, ValueError, AttributeError) as e:
+        logger.warning("Ignoring invalid settings file %s: %s", settings_file, e)
+        return dict(DEFAULT_SETTINGS)
+    logger.info("Settings from %s: %s", settings_file, settings)
+    return {**DEFAULT_SETTINGS, **settings}
+
+
+def write_settings(settings: dict, benchmark: Union[dict, None] = None, settings_file: Union[str, None] = None) -> str:
+    """Write the settings of check_filenames to the settings file, with the benchmark they come from.
+
+    Parameters
+    ----------
+    settings : dict
+        Settings of check_filenames, among those of DEFAULT_SETTINGS
+    benchmark : dict, optional
+        Results of the benchmark, recorded under 'benchmark' for reference; not read by check_filenames
+    settings_file : str, optional
+        Path of the settings file; default_settings_file() if not given
+
+    Returns
+    -------
+    str
+        Path of the settings file
+
+    Raises
+    ------
+    ValueError
+        Raised if a setting is not valid, or the settings file is turned off by MCT_SETTINGS_FILE.
+    """
+    settings_file = settings_file or default_settings_file()
+    if not settings_file:
+        raise ValueError(f"No settings file to write: {SETTINGS_FILE_ENV} is empty")
+    os.makedirs(os.path.dirname(os.path.abspath(settings_file)), exist_ok=True)
+    contents = {SETTINGS_SECTION: validate_settings(settings)}
+    if benchmark:
+        contents["benchmark"] = benchmark
+    with open(settings_file, "w") as f:
+        f.write("# Settings of mct check_filenames for this machine, written by mct bench\n")
+        yaml.safe_dump(contents, f, sort_keys=False)
+    return settings_file
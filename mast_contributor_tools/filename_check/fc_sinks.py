@@ -0,0 +1,293 @@
+"""Destinations ("sinks") for the results of a filename check.
+
+Each sink receives the results in batches of file and field records. Three sinks are available:
+
+- 'sqlite': the results database used by the other `mct` commands (default)
+- 'duckdb': the same tables in a DuckDB database, for fast analytical queries on very large runs
+  (requires the optional 'duckdb' and 'pyarrow' packages)
+- 'ndjson': one JSON record per file, appended to a text file that may be compressed
+  (by using a '.gz', '.bz2' or '.xz' extension) or streamed to standard output (by using '-')
+"""
+
+import importlib
+import json
+import sys
+from abc import ABC, abstractmethod
+from collections import Counter
+from itertools import chain
+
+from mast_contributor_tools.filename_check.fc_choices import OUTPUT_FORMATS
+from mast_contributor_tools.filename_check.fc_db import (
+    FIELD_COLUMNS,
+    FILE_COLUMNS,
+    INSERT_RUN_RECORD,
+    PROBLEMS_VIEW,
+    RUNS_TABLE,
+    Hlsp_SQLiteDb,
+    format_summary,
+)
+
+# DuckDB does not support the foreign key to a missing table in the SQLite schema, so it has its own
+DUCKDB_TABLES = [
+    """
+        CREATE TABLE IF NOT EXISTS filename (
+        path  TEXT NOT NULL DEFAULT '.',
+        filename  TEXT NOT NULL UNIQUE,
+        final_verdict  TEXT CHECK (final_verdict IN ('PASS', 'FAIL', 'NEEDS REVIEW')),
+        n_elements  INTEGER
+        );
+        """,
+    """
+        CREATE TABLE IF NOT EXISTS fields (
+        file_ref  TEXT NOT NULL,
+        name  TEXT NOT NULL,
+        value  TEXT NOT NULL,
+        capitalization_score  TEXT NOT NULL CHECK (capitalization_score IN ('pass', 'fail')),
+        length_score  TEXT NOT NULL CHECK (length_score IN ('pass', 'fail')),
+        format_score  TEXT NOT NULL CHECK (format_score IN ('pass', 'fail')),
+        value_score  TEXT NOT NULL CHECK (value_score IN ('pass', 'fail', 'needs review')),
+        field_verdict  TEXT NOT NULL CHECK (field_verdict IN ('PASS', 'FAIL', 'NEEDS REVIEW'))
+        );
+        """,
+    PROBLEMS_VIEW,
+]
+
+
+class ResultSink(ABC):
+    """Template for result sinks.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file to write the results to
+    """
+
+    # Extension of the default results file name, for example 'results_my-hlsp.db'
+    extension = ""
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+
+    @abstractmethod
+    def open(self) -> None:
+        """Create the output and prepare it to receive results."""
+
+    @abstractmethod
+    def write_batch(self, file_records: list[dict], field_records: list[list[dict]]) -> list[tuple[str, str]]:
+        """Write the records of several files and their fields.
+
+        Parameters
+        ----------
+        file_records : list[dict]
+            File attributes for each file, as returned by HlspFileName.evaluate_filename()
+        field_records : list[list[dict]]
+            Attributes of the fields of each file, in the same order as file_records. Each field
+            has a 'file_ref' linking it to its file.
+
+        Returns
+        -------
+        list[tuple[str, str]]
+            The filename and error message of each file that could not be written
+        """
+
+    def finish(self) -> list[tuple[str, str]]:
+        """Finish writing any batches still pending, before the results are summarized.
+
+        Returns
+        -------
+        list[tuple[str, str]]
+            The filename and error message of each file that could not be written, and was not
+            already returned by write_batch()
+        """
+        return []
+
+    def status(self) -> dict:
+        """Returns the progress of the writer, for display in the progress bar."""
+        return {}
+
+    @abstractmethod
+    def summarize(self) -> str:
+        """Returns a summary of how many files have passed validation."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Finish writing the results and close the output."""
+
+    def record_run(self, run_row: tuple) -> None:
+        """Add the record of the run to the results, once they are closed. Only databases have a runs table.
+
+        Parameters
+        ----------
+        run_row : tuple
+            Values of each of fc_db.RUN_COLUMNS, as returned by RunMetrics.run_row()
+        """
+
+
+class SQLiteSink(ResultSink):
+    """Write the results to an SQLite database with Hlsp_SQLiteDb.
+
+    By default, batches are written by a background thread (see Hlsp_SQLiteDb.start_writer), so
+    files are evaluated while earlier results are written to disk. Files rejected by the database
+    are then reported by a later call to write_batch(), or by finish().
+
+    Parameters
+    ----------
+    filename : str
+        Name of the SQLite database to write the results to
+    background : bool, optional
+        Write batches in a background thread (default), rather than before write_batch() returns
+    """
+
+    extension = OUTPUT_FORMATS["sqlite"]
+
+    def __init__(self, filename: str, background: bool = True) -> None:
+        super().__init__(filename)
+        self.background = background
+
+    def open(self) -> None:
+        self.db = Hlsp_SQLiteDb(self.filename)
+        self.db.create_db()
+        if self.background:
+            self.db.start_writer()
+
+    def write_batch(self, file_records: list[dict], field_records: list[list[dict]]) -> list[tuple[str, str]]:
+        if self.background:
+            return self.db.submit_batch(file_records, field_records)
+        return self.db.add_batch(file_records, field_records)
+
+    def finish(self) -> list[tuple[str, str]]:
+        return self.db.stop_writer()
+
+    def status(self) -> dict:
+        return self.db.writer_status() if self.db.writer is not None else {}
+
+    def summarize(self) -> str:
+        return self.db.print_summary()
+
+    def close(self) -> None:
+        # Make sure every queued batch is written, if finish() was not called
+        self.db.stop_writer()
+        # Index the results once they are all written, so they can be queried with `mct report`
+        self.db.build_indexes()
+        self.db.close_db()
+
+    def record_run(self, run_row: tuple) -> None:
+        self.db.open_db(readonly=False)
+        self.db.add_run(run_row)
+        self.db.close_db()
+
+
+class DuckDBSink(ResultSink):
+    """Write the results to a DuckDB database, with the same tables as the SQLite database.
+
+    Batches are loaded into DuckDB as Arrow tables, which is much faster than inserting
+    rows one at a time.
+    """
+
+    extension = OUTPUT_FORMATS["duckdb"]
+
+    def open(self) -> None:
+        try:
+            import duckdb
+            import pyarrow
+        except ImportError as e:
+            raise ImportError("The 'duckdb' output format requires the optional 'duckdb' and 'pyarrow' packages") from e
+        self.pa = pyarrow
+        self.conn = duckdb.connect(self.filename)
+        for statement in DUCKDB_TABLES:
+            self.conn.execute(statement)
+
+    def _insert(self, table: str, columns: list[str], records: list[dict]) -> None:
+        """Insert records into a table as a single Arrow table."""
+        if not records:
+            return
+        self.conn.register("batch", self.pa.table({c: [r[c] for r in records] for c in columns}))
+        self.conn.execute(f"INSERT INTO {table} SELECT * FROM batch")
+        self.conn.unregister("batch")
+
+    def write_batch(self, file_records: list[dict], field_records: list[list[dict]]) -> list[tuple[str, str]]:
+        try:
+            self.conn.begin()
+            self._insert("filename", FILE_COLUMNS, file_records)
+            self._insert("fields", FIELD_COLUMNS, [*chain.from_iterable(field_records)])
+            self.conn.commit()
+            return []
+        except Exception:
+            self.conn.rollback()
+
+        # Some record was rejected: add the files one at a time to find which
+        rejected = []
+        for file_record, elements in zip(file_records, field_records):
+            try:
+                self.conn.begin()
+                self._insert("filename", FILE_COLUMNS, [file_record])
+                self._insert("fields", FIELD_COLUMNS, elements)
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                rejected.append((file_record["filename"], str(e)))
+        return rejected
+
+    def summarize(self) -> str:
+        counts = dict(
+            self.conn.execute("SELECT final_verdict, COUNT(*) FROM filename GROUP BY final_verdict").fetchall()
+        )
+        return format_summary(counts, self.filename)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def record_run(self, run_row: tuple) -> None:
+        import duckdb
+
+        with duckdb.connect(self.filename) as conn:
+            conn.execute(RUNS_TABLE)
+            conn.execute(INSERT_RUN_RECORD, run_row)
+
+
+class NDJSONSink(ResultSink):
+    """Append one JSON record per file, including its fields, to a text file or standard output."""
+
+    extension = OUTPUT_FORMATS["ndjson"]
+
+    def open(self) -> None:
+        self.counts: Counter = Counter()
+        if self.filename == "-":
+            self.out = sys.stdout
+            return
+        # The compression modules are only imported when needed, to keep `mct` quick to start
+        compression = {"gz": "gzip", "bz2": "bz2", "xz": "lzma"}.get(self.filename.rsplit(".", 1)[-1])
+        opener = importlib.import_module(compression).open if compression else open
+        self.out = opener(self.filename, "at")
+
+    def write_batch(self, file_records: list[dict], field_records: list[list[dict]]) -> list[tuple[str, str]]:
+        lines = []
+        for file_record, elements in zip(file_records, field_records):
+            fields = [{k: v for k, v in e.items() if k != "file_ref"} for e in elements]
+            lines.append(json.dumps({**file_record, "fields": fields}, separators=(",", ":")))
+            self.counts[file_record["final_verdict"]] += 1
+        if lines:
+            self.out.write("\n".join(lines) + "\n")
+        return []
+
+    def summarize(self) -> str:
+        return format_summary(self.counts, self.filename)
+
+    def close(self) -> None:
+        if self.out is sys.stdout:
+            self.out.flush()
+        else:
+            self.out.close()
+
+
+SINKS: dict[str, type[ResultSink]] = {"sqlite": SQLiteSink, "duckdb": DuckDBSink, "ndjson": NDJSONSink}
+
+
+def get_sink(output_format: str, filename: str, **options) -> ResultSink:
+    """Returns the result sink for an output format: one of 'sqlite', 'duckdb' or 'ndjson'.
+
+    Any options are passed on to the sink, for example ``background=False`` for the 'sqlite' sink.
+    """
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown output format '{output_format}': must be one of {[*SINKS]}")
+    return SINKS[output_format](filename, **options)
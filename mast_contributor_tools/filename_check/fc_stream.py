@@ -0,0 +1,158 @@
+"""Check a stream of file names quickly, writing one compact JSON record per name.
+
+This is used by `mct check_filename --stdin --format ndjson`, for example in shell pipelines such as
+``find . -type f | mct check_filename --stdin --format ndjson``.
+
+The names in a collection share most of their field values, so once a field value has been scored
+the JSON of its field record is kept, keyed by the role of the field and its value (as in the
+VerdictCache). Checking a name then only takes splitting it into fields and joining the JSON of
+each field. Names that cannot be split into fields are checked with fc_app.evaluate_name(), so
+the records are the same as those of the NDJSON result sink and of `mct serve` either way.
+"""
+
+import json
+import sys
+from collections.abc import Iterable, Iterator
+from pathlib import PurePath
+from typing import IO, Union
+
+from mast_contributor_tools.filename_check.fc_app import evaluate_name
+from mast_contributor_tools.filename_check.fc_config import RuleSet, get_rules
+from mast_contributor_tools.filename_check.hlsp_filename import FILENAME_REGEX, HlspFileName, create_field
+
+# Approximate number of bytes of names read from the input at a time
+CHUNK_BYTES = 1 << 16
+# Worst verdict first, as in HlspFileName.evaluate_filename()
+VERDICT_ORDER = ["FAIL", "NEEDS REVIEW", "PASS"]
+
+
+class NameStream:
+    """Check file names in batches, returning one line of JSON for each.
+
+    Parameters
+    ----------
+    hlsp_name : str, optional
+        Name of the HLSP collection. If not supplied, it is inferred from the second field of each name.
+    max_entries : int, optional
+        Maximum number of field records kept in memory
+    rules : RuleSet or str, optional
+        Rules to check the fields with, or the name of a rule set; the default rule set if not given.
+        The rule set is fixed for the life of the stream, since the field records are kept.
+    """
+
+    def __init__(
+        self, hlsp_name: str = "", max_entries: int = 1_000_000, rules: Union[RuleSet, str, None] = None
+    ) -> None:
+        self.hlsp_name = hlsp_name.lower()
+        self.rules = get_rules(rules)
+        self.max_entries = max_entries
+        self.n_entries = 0
+        # JSON of each field record and the rank of its verdict in VERDICT_ORDER, by role and then value
+        self.fields: dict[str, dict[str, tuple[str, int]]] = {}
+        # Field records, position and name of each field, by (number of fields, product type is readme, HLSP name)
+        self.layouts: dict[tuple[int, bool, str], list[tuple[dict, int, str]]] = {}
+        # JSON of the path of the names in each directory
+        self.paths: dict[str, str] = {}
+
+    def check(self, file_name: str) -> str:
+        """Returns the record of a file name as a line of compact JSON, without the newline."""
+        directory, slash, name = file_name.rpartition("/")
+        parts = name.split("_")
+        hlsp_name = self.hlsp_name or (parts[1].lower() if len(parts) > 2 else "")
+        values = parts[:-1] + parts[-1].split(".", 1)
+        n_fields = len(values)
+        if not 4 <= n_fields <= 9 or not hlsp_name or FILENAME_REGEX.match(name) is None:
+            # Names that cannot be split into fields are reported as usual
+            return json.dumps(evaluate_name(file_name, self.hlsp_name, rules=self.rules), separators=(",", ":"))
+
+        layout = self.layouts.get((n_fields, values[-2].lower() == "readme", hlsp_name))
+        if layout is None:
+            layout = self._layout(n_fields, values[-2].lower() == "readme", hlsp_name)
+        fields = [
+            records.get(values[i]) or self._score(records, field_name, values[i], hlsp_name)
+            for records, i, field_name in layout
+        ]
+
+        path = self.paths.get(directory + slash)
+        if path is None:
+            # The same path as Path(file_name).parent, as in fc_app.evaluate_name()
+            path = self.paths[directory + slash] = json.dumps(str(PurePath(file_name).parent))
+        return (
+            f'{{"path":{path},"filename":{json.dumps(name)},"n_elements":{n_fields},'
+            f'"final_verdict":"{VERDICT_ORDER[min([f[1] for f in fields])]}",'
+            f'"fields":[{",".join([f[0] for f in fields])}]}}'
+        )
+
+    def _layout(self, n_fields: int, is_readme: bool, hlsp_name: str) -> list[tuple[dict, int, str]]:
+        """Returns the field records, position and name of each field of a file name."""
+        layout = []
+        for name, i in HlspFileName.field_layout(n_fields, "readme" if is_readme else ""):
+            # The role of the HLSP name field includes the collection, as in HlspNameField.cache_role
+            role = f"{name}:{hlsp_name}" if name == "hlsp_name" else name
+            layout.append((self.fields.setdefault(role, {}), i, name))
+        self.layouts[(n_fields, is_readme, hlsp_name)] = layout
+        return layout
+
+    def _score(self, records: dict, field_name: str, value: str, hlsp_name: str) -> tuple[str, int]:
+        """Evaluate a field, and keep the JSON of its record unless the cache is full."""
+        field = create_field(field_name, value, hlsp_name, self.rules)
+        field.evaluate()
+        scores = field.get_scores()
+        result = (json.dumps(scores, separators=(",", ":")), VERDICT_ORDER.index(scores["field_verdict"]))
+        if self.n_entries < self.max_entries:
+            records[value] = result
+            self.n_entries += 1
+        return result
+
+    def check_batch(self, file_names: Iterable[str]) -> list[str]:
+        """Returns the record of each file name, skipping blank names."""
+        check = self.check
+        return [check(f) for f in file_names if f]
+
+
+def read_names(stream: IO[bytes], chunk_bytes: int = CHUNK_BYTES) -> Iterator[list[str]]:
+    """Read newline-separated file names from a binary stream, in batches of about chunk_bytes.
+
+    Names are decoded as UTF-8; undecodable bytes are kept as surrogate escapes rather than
+    stopping the stream. Surrounding whitespace is removed from each name.
+    """
+    while lines := stream.readlines(chunk_bytes):
+        yield [line.decode("utf-8", "surrogateescape").strip() for line in lines]
+
+
+def check_stream(input_stream: IO[bytes], output: IO[str], hlsp_name: str = "") -> int:
+    """Check each file name read from a binary stream, and write one JSON record per name.
+
+    Parameters
+    ----------
+    input_stream : IO[bytes]
+        Binary stream of newline-separated file names, for example sys.stdin.buffer
+    output : IO[str]
+        Text stream to write the records to, for example sys.stdout
+    hlsp_name : str, optional
+        Name of the HLSP collection. If not supplied, it is inferred from each name.
+
+    Returns
+    -------
+    int
+        Number of names checked
+    """
+    checker = NameStream(hlsp_name)
+    n_names = 0
+    for names in read_names(input_stream):
+        records = checker.check_batch(names)
+        if records:
+            # One write per batch, rather than one per name
+            output.write("\n".join(records) + "\n")
+        n_names += len(records)
+    output.flush()
+    return n_names
+
+
+def check_names(file_names: Iterable[str], output: IO[str] = sys.stdout, hlsp_name: str = "") -> int:
+    """Check a list of file names, and write one JSON record per name. Returns the number of names."""
+    records = NameStream(hlsp_name).check_batch(file_names)
+    if records:
+        output.write("\n".join(records) + "\n")
+    output.flush()
+    return len(records)
@@ -0,0 +1,163 @@
+"""Suggest the recognized values closest to an unrecognized field value, such as 'nircam' for 'nircm'.
+
+Each vocabulary of a rule set (missions, instruments, filters, product types and extensions) is
+indexed once by its deletion neighborhood: every string made by deleting up to two characters of
+each value points back to that value. Two strings within an edit distance of k always share a
+string made by deleting at most k characters of each, so the candidates for a query are found
+with one dictionary lookup per deletion of the query (about a hundred for the longest values),
+rather than by comparing the query with every value of the vocabulary. Only these candidates are
+then ranked by their edit distance to the query.
+
+Unrecognized values repeat across files, so the suggestions for each value are also remembered,
+and a field that has been seen before costs a single dictionary lookup.
+"""
+
+import itertools
+
+from mast_contributor_tools.filename_check.fc_config import RuleSet
+
+# Number of suggestions returned for a value
+MAX_SUGGESTIONS = 3
+# Largest edit distance between a value and its suggestions
+MAX_DISTANCE = 2
+# Maximum number of values whose suggestions are remembered, by each Suggester
+MAX_ENTRIES = 100_000
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Returns the Levenshtein distance between two strings: the number of characters to insert, delete or replace"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def max_distance(value: str) -> int:
+    """Returns the largest edit distance of a suggestion: 1 for values of up to 3 characters, 2 otherwise"""
+    return 1 if len(value) <= 3 else MAX_DISTANCE
+
+
+def deletions(value: str, depth: int) -> set[str]:
+    """Returns the strings made by deleting up to 'depth' characters of a string, including the string itself"""
+    result = {value}
+    frontier = {value}
+    for _ in range(depth):
+        frontier = {v[:i] + v[i + 1 :] for v in frontier for i in range(len(v))}
+        result |= frontier
+    return result
+
+
+class DeletionIndex:
+    """An index of strings by their deletion neighborhood, finding the strings within an edit distance of a query.
+
+    Parameters
+    ----------
+    values : iterable of str
+        Strings to index
+    """
+
+    def __init__(self, values) -> None:
+        # Values reached by deleting up to MAX_DISTANCE characters of them, by the string left
+        self.index: dict[str, list[str]] = {}
+        for value in values:
+            for deleted in deletions(value, MAX_DISTANCE):
+                self.index.setdefault(deleted, []).append(value)
+
+    def search(self, query: str, max_distance: int) -> list[tuple[int, str]]:
+        """Returns the (distance, value) of each value within max_distance of the query, closest first.
+
+        max_distance may not exceed MAX_DISTANCE.
+        """
+        index = self.index
+        candidates = {value for deleted in deletions(query, max_distance) for value in index.get(deleted, ())}
+        matches = [(edit_distance(query, value), value) for value in candidates]
+        return sorted(m for m in matches if m[0] <= max_distance)
+
+
+class Suggester:
+    """Suggest the recognized values of a rule set closest to unrecognized field values.
+
+    Parameters
+    ----------
+    rules : RuleSet
+        Rule set whose vocabularies are suggested
+    max_entries : int, optional
+        Maximum number of values whose suggestions are remembered
+    """
+
+    def __init__(self, rules: RuleSet, max_entries: int = MAX_ENTRIES) -> None:
+        self.rules = rules
+        self.max_entries = max_entries
+        # Built on first use, since most runs only need the suggestions of a few vocabularies
+        self.indexes: dict[str, DeletionIndex] = {}
+        self.memo: dict[tuple[str, str, bool], list[str]] = {}
+
+    def index(self, vocabulary: str) -> DeletionIndex:
+        """Returns the index of a vocabulary of the rule set, such as 'instruments'."""
+        index = self.indexes.get(vocabulary)
+        if index is None:
+            index = self.indexes[vocabulary] = DeletionIndex(getattr(self.rules, vocabulary))
+        return index
+
+    def suggest(self, vocabulary: str, value: str, multi_valued: bool = True) -> list[str]:
+        """Returns up to MAX_SUGGESTIONS recognized values closest to a value, closest first.
+
+        Parameters
+        ----------
+        vocabulary : str
+            Vocabulary of the rule set the value should be in: 'missions', 'instruments', 'filters',
+            'semantic_types' or 'extension_types'
+        value : str
+            Value of the field
+        multi_valued : bool, optional
+            Whether the value may be several hyphen-separated elements, as checked by
+            FieldRule.match_multi_choice(); only the unrecognized elements are replaced.
+
+        Returns
+        -------
+        list[str]
+            The suggested values, in lower case; empty if no recognized value is close enough
+        """
+        key = (vocabulary, value, multi_valued)
+        suggestions = self.memo.get(key)
+        if suggestions is None:
+            suggestions = self._suggest(vocabulary, value.lower(), multi_valued)
+            if len(self.memo) < self.max_entries:
+                self.memo[key] = suggestions
+        return suggestions
+
+    def _suggest(self, vocabulary: str, value: str, multi_valued: bool) -> list[str]:
+        """Returns the suggestions for a value in lower case"""
+        index = self.index(vocabulary)
+        known = getattr(self.rules, vocabulary)
+        elements = value.split("-") if multi_valued else [value]
+        # Candidates for each element with their distance: itself if recognized or beyond repair
+        candidates = []
+        for element in elements:
+            matches = [] if element in known else index.search(element, max_distance(element))
+            # A value as short as its distance would be a guess rather than a correction
+            matches = [m for m in matches if m[0] < len(element)][:MAX_SUGGESTIONS]
+            candidates.append(matches or [(0, element)])
+        # The combinations with the least total distance, keeping the elements in their order
+        combinations = sorted(
+            (sum(d for d, _ in combination), "-".join(v for _, v in combination))
+            for combination in itertools.product(*candidates)
+        )
+        return [v for _, v in combinations[:MAX_SUGGESTIONS] if v != value]
+
+
+# Suggester of each rule set, by configuration hash, so that their indexes are built once per process
+_suggesters: dict[str, Suggester] = {}
+
+
+def get_suggester(rules: RuleSet) -> Suggester:
+    """Returns the Suggester of a rule set, shared by every field checked with it."""
+    suggester = _suggesters.get(rules.config_hash)
+    if suggester is None:
+        suggester = _suggesters[rules.config_hash] = Suggester(rules)
+    return suggester
@@ -1,39 +1,31 @@
 """The main logic module to check filename compliance"""
 
-import os
 import re
 from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Union
 
-import yaml
+from mast_contributor_tools.filename_check.fc_config import BASE_DIR, RuleSet, YamlLoader, get_rules  # noqa: F401
+from mast_contributor_tools.filename_check.fc_suggest import get_suggester
 
 # ==========================================
 # Setup some configurations for this module
 # ==========================================
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-with open(os.path.join(BASE_DIR, "fc_config.yaml"), "r") as f:
-    cfg = yaml.safe_load(f)
-
-EXTENSION_TYPES = cfg["ExtensionTypes"]
-SEMANTIC_TYPES = cfg["SemanticTypes"]
-fieldLengthPolicy = cfg["FieldLength"]
+# The rules are loaded into immutable, named rule sets by fc_config.ConfigRegistry. These names
+# are those of the default rule set, as loaded on import, for code that does not pass a rule set.
+_default_rules = get_rules()
+EXTENSION_TYPES = sorted(_default_rules.extension_types)
+SEMANTIC_TYPES = sorted(_default_rules.semantic_types)
+fieldLengthPolicy = dict(_default_rules.field_lengths)
+# Sections of fc_config.yaml, as loaded into the default rule set
+cfg = {"FieldLength": fieldLengthPolicy, "ExtensionTypes": EXTENSION_TYPES, "SemanticTypes": SEMANTIC_TYPES}
 
 # Fetch configurations of three name fields: observation, instrument, and filter (oif)
-with open(os.path.join(BASE_DIR, "oif.yaml"), "r") as f:
-    oif = yaml.safe_load(f)
-
+oif = _default_rules.oif
 MISSIONS = [*oif]
-INSTRUMENTS = set(sum([[*oif[m]["instruments"]] for m in MISSIONS], []))
-# Tussing the list of all unique filters takes more work
-# The following does not support name "aliases" in the yaml file
-filt_list = []
-for m in MISSIONS:
-    for i in [*oif[m]["instruments"]]:
-        for f in [*oif[m]["instruments"][i]["filters"]]:
-            filt_list.append(f)
-
-FILTERS = set(filt_list)
+INSTRUMENTS = set(_default_rules.instruments)
+FILTERS = set(_default_rules.filters)
 
 SCORE = {False: "fail", True: "pass"}
 SCORE_LAX = {False: "needs review", True: "pass"}
@@ -166,12 +158,20 @@ class FilenameFieldAB(ABC):
         Internal name for the field being created
     field_value : str
         Value of the field (i.e. text of the field in the filename)
+    rules : RuleSet, optional
+        Rules to check the field with; the default rule set if not given
     """
 
-    def __init__(self, field_name: str, field_value: str) -> None:
+    # Vocabulary of the rule set that values of the field are checked against, if any, and whether
+    # a value may be several hyphen-separated elements: used to suggest recognized values
+    vocabulary = ""
+    multi_valued = True
+
+    def __init__(self, field_name: str, field_value: str, rules: Union[RuleSet, None] = None) -> None:
         self.name = field_name
         self.value = field_value
-        self.max_len = fieldLengthPolicy[field_name]
+        self.rules = rules or get_rules()
+        self.max_len = self.rules.field_lengths[field_name]
 
         # Set regex pattern based on field name
         if self.name == "hlsp_name":
@@ -196,6 +196,11 @@ class FilenameFieldAB(ABC):
         # Final Verdict
         self.field_verdict = "fail"
 
+    @property
+    def cache_role(self) -> str:
+        """Role of this field when caching its scores; fields with the same role and value score the same."""
+        return self.name
+
     @abstractmethod
     def evaluate(self):
         """Evaluate the field for each rule"""
@@ -203,12 +208,19 @@ class FilenameFieldAB(ABC):
         self.len_eval = FieldRule.length(self.value, self.max_len)
         self.format_eval = FieldRule.match_pattern(self.value, self.regex_pattern)
 
+    def set_scores(self, scores: dict) -> None:
+        """Set the scores from a previous evaluation of the same value, instead of calling evaluate()"""
+        self.cap_eval = scores["capitalization_score"]
+        self.len_eval = scores["length_score"]
+        self.format_eval = scores["format_score"]
+        self.value_eval = scores["value_score"]
+
     def get_scores(self):
         """Return final scores"""
         # Determine the final verdict as the worst of the four scores
         all_scores = [self.cap_eval, self.len_eval, self.format_eval, self.value_eval]
         self.field_verdict = FieldRule.field_verdict(all_scores)
-        return {
+        scores = {
             # Name of Field: for example 'mission' or 'product_type'
             "name": self.name,
             # value of the field: for example 'jwst' or 'spec'
@@ -221,33 +233,42 @@ class FilenameFieldAB(ABC):
             # Final Score
             "field_verdict": self.field_verdict,
         }
+        if self.value_eval == "needs review" and self.vocabulary:
+            # The closest recognized values, for example 'nircam' for 'nircm'
+            scores["suggestions"] = get_suggester(self.rules).suggest(self.vocabulary, self.value, self.multi_valued)
+        return scores
 
 
 class ExtensionField(FilenameFieldAB):
-    def __init__(self, value: str) -> None:
-        super().__init__("extension", value)
+    vocabulary = "extension_types"
+    multi_valued = False
+
+    def __init__(self, value: str, rules: Union[RuleSet, None] = None) -> None:
+        super().__init__("extension", value, rules)
 
     def evaluate(self):
         super().evaluate()
-        self.value_eval = FieldRule.match_choice(self.value, EXTENSION_TYPES)
+        self.value_eval = FieldRule.match_choice(self.value, self.rules.extension_types)
 
 
 class FilterField(FilenameFieldAB):
     """A container for attributes of the filename Filtername field."""
 
-    def __init__(self, value: str) -> None:
-        super().__init__("filter", value)
+    vocabulary = "filters"
+
+    def __init__(self, value: str, rules: Union[RuleSet, None] = None) -> None:
+        super().__init__("filter", value, rules)
 
     def evaluate(self):
         super().evaluate()
-        self.value_eval = FieldRule.match_multi_choice(self.value, FILTERS)
+        self.value_eval = FieldRule.match_multi_choice(self.value, self.rules.filters)
 
 
 class HlspField(FilenameFieldAB):
     """A container for attributes of the literal 'hlsp' prefix field."""
 
-    def __init__(self, value: str) -> None:
-        super().__init__("hlsp_str", value)
+    def __init__(self, value: str, rules: Union[RuleSet, None] = None) -> None:
+        super().__init__("hlsp_str", value, rules)
 
     def evaluate(self):
         super().evaluate()
@@ -257,10 +278,15 @@ class HlspField(FilenameFieldAB):
 class HlspNameField(FilenameFieldAB):
     """A container for attributes of the HLSP name field."""
 
-    def __init__(self, value: str, ref_name: str) -> None:
-        super().__init__("hlsp_name", value)
+    def __init__(self, value: str, ref_name: str, rules: Union[RuleSet, None] = None) -> None:
+        super().__init__("hlsp_name", value, rules)
         self.hlsp_ref_name = ref_name.lower()
 
+    @property
+    def cache_role(self) -> str:
+        # The value score depends on the name of the collection being checked
+        return f"{self.name}:{self.hlsp_ref_name}"
+
     def evaluate(self):
         super().evaluate()
         # Assume a valid HLSP name was passed to the constructor
@@ -270,41 +296,47 @@ class HlspNameField(FilenameFieldAB):
 class InstrumentField(FilenameFieldAB):
     """A container for attributes of the filename Instrument field."""
 
-    def __init__(self, value: str) -> None:
-        super().__init__("instrument", value)
+    vocabulary = "instruments"
+
+    def __init__(self, value: str, rules: Union[RuleSet, None] = None) -> None:
+        super().__init__("instrument", value, rules)
 
     def evaluate(self):
         super().evaluate()
-        self.value_eval = FieldRule.match_multi_choice(self.value, INSTRUMENTS)
+        self.value_eval = FieldRule.match_multi_choice(self.value, self.rules.instruments)
 
 
 class MissionField(FilenameFieldAB):
     """A container for attributes of the filename Mission (or observatory) field."""
 
-    def __init__(self, value: str) -> None:
-        super().__init__("mission", value)
+    vocabulary = "missions"
+
+    def __init__(self, value: str, rules: Union[RuleSet, None] = None) -> None:
+        super().__init__("mission", value, rules)
 
     def evaluate(self):
         super().evaluate()
-        self.value_eval = FieldRule.match_multi_choice(self.value, MISSIONS)
+        self.value_eval = FieldRule.match_multi_choice(self.value, self.rules.missions)
 
 
 class ProductField(FilenameFieldAB):
     """A container for attributes of the filename ProductType field."""
 
-    def __init__(self, value: str) -> None:
-        super().__init__("product_type", value)
+    vocabulary = "semantic_types"
+
+    def __init__(self, value: str, rules: Union[RuleSet, None] = None) -> None:
+        super().__init__("product_type", value, rules)
 
     def evaluate(self):
         super().evaluate()
-        self.value_eval = FieldRule.match_multi_choice(self.value, SEMANTIC_TYPES)
+        self.value_eval = FieldRule.match_multi_choice(self.value, self.rules.semantic_types)
 
 
 class TargetField(FilenameFieldAB):
     """A container for attributes of the filename TargetName field."""
 
-    def __init__(self, value: str) -> None:
-        super().__init__("target_name", value)
+    def __init__(self, value: str, rules: Union[RuleSet, None] = None) -> None:
+        super().__init__("target_name", value, rules)
 
     def evaluate(self):
         super().evaluate()
@@ -317,8 +349,8 @@ class TargetField(FilenameFieldAB):
 class VersionField(FilenameFieldAB):
     """A container for attributes of the filename Version field."""
 
-    def __init__(self, value: str) -> None:
-        super().__init__("version_id", value)
+    def __init__(self, value: str, rules: Union[RuleSet, None] = None) -> None:
+        super().__init__("version_id", value, rules)
 
     def evaluate(self):
         super().evaluate()
@@ -333,8 +365,8 @@ class GenericField(FilenameFieldAB):
     validated for length and capitalization, but not for value.
     """
 
-    def __init__(self, value: str, id: int) -> None:
-        super().__init__("generic" + str(id), value)
+    def __init__(self, value: str, id: int, rules: Union[RuleSet, None] = None) -> None:
+        super().__init__("generic" + str(id), value, rules)
 
     def evaluate(self):
         super().evaluate()
@@ -342,6 +374,41 @@ class GenericField(FilenameFieldAB):
         self.value_eval = "pass"
 
 
+def create_field(name: str, value: str, hlsp_name: str, rules: Union[RuleSet, None] = None) -> FilenameFieldAB:
+    """Create the Field object for a field of a filename, given its name from HlspFileName.field_layout().
+
+    Parameters
+    ----------
+    name : str
+        Name of the field: for example 'mission', or 'generic2' for the second generic field
+    value : str
+        Value of the field
+    hlsp_name : str
+        Name of the HLSP collection being checked
+    rules : RuleSet, optional
+        Rules to check the field with; the default rule set if not given
+    """
+    if name == "hlsp_str":
+        return HlspField(value, rules=rules)
+    elif name == "hlsp_name":
+        return HlspNameField(value, hlsp_name, rules=rules)
+    elif name == "mission":
+        return MissionField(value, rules=rules)
+    elif name == "instrument":
+        return InstrumentField(value, rules=rules)
+    elif name == "target_name":
+        return TargetField(value, rules=rules)
+    elif name == "filter":
+        return FilterField(value, rules=rules)
+    elif name == "version_id":
+        return VersionField(value, rules=rules)
+    elif name == "product_type":
+        return ProductField(value, rules=rules)
+    elif name == "extension":
+        return ExtensionField(value, rules=rules)
+    return GenericField(value, int(name[len("generic") :]), rules=rules)
+
+
 class HlspFileName:
     """HLSP filename validation
 
@@ -367,6 +434,9 @@ class HlspFileName:
         Filename of a collection product
     hlsp_name : str
         Official abbreviation/acronym/initialism of this HLSP collection
+    rules : RuleSet or str, optional
+        Rules to check the fields with, or the name of a rule set in fc_config.registry;
+        the default rule set if not given
 
     Raises
     ------
@@ -374,8 +444,10 @@ class HlspFileName:
         If the number of fields falls outside the limits.
     """
 
-    def __init__(self, filepath: Path, hlsp_name: str) -> None:
+    def __init__(self, filepath: Path, hlsp_name: str, rules: Union[RuleSet, str, None] = None) -> None:
         self.filepath = filepath
+        # Resolved once, so that every field of the name is checked with the same rules
+        self.rules = get_rules(rules)
         # Check that filename is of the right form
         if not re.match(FILENAME_REGEX, self.filepath.name):
             raise ValueError(f"Invalid file name for testing: {self.filepath.name}")
@@ -401,45 +473,74 @@ class HlspFileName:
         elif self.nFields > 9:
             raise ValueError(f"Filename {self.name} has more than 9 fields")
 
-    def create_fields(self) -> None:
-        """Create Field objects for each field in the filename."""
-        nf = self.nFields
+    @staticmethod
+    def field_layout(n_fields: int, product_type: str) -> list[tuple[str, int]]:
+        """Returns the name of each field of a filename, and its position among the field values.
+
+        Parameters
+        ----------
+        n_fields : int
+            Number of field values in the filename, between 4 and 9
+        product_type : str
+            Value of the product type field (the second to last), which determines if there is a version field
+
+        Returns
+        -------
+        list[tuple[str, int]]
+            Name and position of each field, in the order they are evaluated
+        """
         # The first two fields are: 'hlsp' and the acronnym of the collection
-        self.fields.append(HlspField(self.fieldvals[0]))
-        self.fields.append(HlspNameField(self.fieldvals[1], self.hlspName))
+        layout = [("hlsp_str", 0), ("hlsp_name", 1)]
 
         # If there are 9 fields, assume the rest of the fields are present in order
-        if nf == 9:
-            self.fields.append(MissionField(self.fieldvals[2]))
-            self.fields.append(InstrumentField(self.fieldvals[3]))
-            self.fields.append(TargetField(self.fieldvals[4]))
-            self.fields.append(FilterField(self.fieldvals[5]))
+        if n_fields == 9:
+            layout += [("mission", 2), ("instrument", 3), ("target_name", 4), ("filter", 5)]
 
         # If there are 5 < nFields < 9, the other fields are treated as generic
-        elif 5 < nf < 9:
-            for i in range(2, nf - 3):
-                self.fields.append(GenericField(self.fieldvals[i], i - 1))
+        elif 5 < n_fields < 9:
+            layout += [(f"generic{i - 1}", i) for i in range(2, n_fields - 3)]
 
         # Files should have a version field unless the product_type is readme
-        if self.fieldvals[nf - 2].lower() not in ["readme"]:
-            self.fields.append(VersionField(self.fieldvals[nf - 3]))
+        if product_type.lower() not in ["readme"]:
+            layout.append(("version_id", n_fields - 3))
 
         # The last two fields are: the file semantic type and the extension
-        self.fields.append(ProductField(self.fieldvals[nf - 2]))
-        self.fields.append(ExtensionField(self.fieldvals[nf - 1]))
+        layout += [("product_type", n_fields - 2), ("extension", n_fields - 1)]
+        return layout
+
+    def create_fields(self) -> None:
+        """Create Field objects for each field in the filename."""
+        for name, i in self.field_layout(self.nFields, self.fieldvals[self.nFields - 2]):
+            self.fields.append(create_field(name, self.fieldvals[i], self.hlspName, self.rules))
 
-    def evaluate_fields(self):
+    def evaluate_fields(self, cache=None):
         """Evaluate attributes of each field
 
+        Parameters:
+        -----------
+        cache : VerdictCache, optional
+            Cache of scores from previous evaluations; fields found in the cache are not re-evaluated,
+            and new evaluations are added to it.
+
         Returns:
         --------
         List of result dictionaries for each field
         """
+        results = []
         for f in self.fields:
-            f.evaluate()
+            cached = None if cache is None else cache.get(f.cache_role, f.value)
+            if cached is None:
+                f.evaluate()
+                scores = f.get_scores()
+                if cache is not None:
+                    cache.put(f.cache_role, f.value, scores)
+            else:
+                f.set_scores(cached)
+                scores = f.get_scores()
+            results.append(scores)
         # If the field evaluations succeeded, set a positive status
         self.field_status = "pass"
-        return [f.get_scores() for f in self.fields]
+        return results
 
     def evaluate_filename(self):
         """Evaluate attributes of the filename.
@@ -3,26 +3,50 @@
 #
 """
 Main entry point into mast_contributor tools
+
+Only the lightweight modules defining the options of each command are imported here.
+Each command imports the modules it needs when it runs, so that `mct --help` and
+`mct check_filename` start quickly.
 """
 
+import os
 from typing import Union
 
 import click
 
-from mast_contributor_tools.filename_check.fc_app import check_filenames, check_single_filename, get_file_paths, logger
+from mast_contributor_tools.filename_check.fc_choices import (
+    DIFF_FORMATS,
+    DISCOVERY_STRATEGIES,
+    EXPORT_FORMATS,
+    EXPORT_RELATIONS,
+    OUTPUT_FORMATS,
+    PLAN_FORMATS,
+    SQLITE_WRITERS,
+    VERDICTS,
+)
+
 
 # ==========================================
 # Command Line Interface (CLI) commands for mast contributor tools
 # Implemented using the click pacakge: https://pypi.org/project/click/
 # ==========================================
 @click.group("mct")
-def cli() -> None:
+@click.option(
+    "--log-file",
+    default=None,
+    help="Path of the rotating log file (defaults to $MCT_LOG_FILE, or mct.log in ~/.local/state/mast_contributor_tools); '' for none",
+)
+def cli(log_file: Union[str, None] = None) -> None:
     """
     Command-line interface for mast_contributor_tools package.
 
     To see more options for each command, you can use `--help` after each command.
     For instance, `mct check_filenames --help`
     """
+    if log_file is not None:
+        from mast_contributor_tools.utils.logger_config import set_log_file
+
+        set_log_file(log_file)
 
 
 # ==========================================
@@ -34,14 +58,68 @@ def cli() -> None:
     "-dir", "--directory", type=str, default=".", help="Path of HLSP directory tree; tests all files in that directory"
 )
 @click.option(
-    "-file", "--from_file", type=str, default="", help="Path to a text file containing a list of filenames to check, instead of scanning a directory"
+    "-file",
+    "--from_file",
+    type=str,
+    default="",
+    help="Path to a text file containing a list of filenames to check, instead of scanning a directory",
 )
 @click.option(
     "-p", "--pattern", default="*.*", help="File pattern to limit testing, for example 'hlsp\\_\\*\\_spec.fits'"
 )
 @click.option("-e", "--exclude", default="", help="File pattern to exclude from testing, for example '\\*.png'")
 @click.option("-n", "--max_n", default=None, help="Maximum number of files to check, for testing purposes.")
+@click.option(
+    "--sample",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Estimate the verdicts from a sample of this many files, stratified by directory and extension, without writing results",
+)
+@click.option("--seed", type=int, default=None, help="Random seed for --sample, for a reproducible sample")
 @click.option("-db", "--dbFile", default="", help="Results database filename (defaults to: results_<hlsp_name>.db)")
+@click.option(
+    "--output-format",
+    type=click.Choice([*OUTPUT_FORMATS]),
+    default="sqlite",
+    help="Format of the results file: an SQLite database, a DuckDB database, or JSON lines ('-' for the terminal)",
+)
+@click.option(
+    "--cache",
+    default=False,
+    flag_value=True,
+    help="Cache field scores in mct_cache.db next to the results database, to speed up later runs",
+)
+@click.option(
+    "--check-content",
+    default=False,
+    flag_value=True,
+    help="Also check that the first bytes of each file match the format of its extension",
+)
+@click.option(
+    "--vocabulary",
+    "vocabulary_file",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="YAML file of the missions, instruments, filters, product types and extensions the collection uses",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of files written to the results file at a time (defaults to the settings file, or 1000)",
+)
+@click.option(
+    "--sqlite-writer",
+    type=click.Choice(SQLITE_WRITERS),
+    default=None,
+    help="Write SQLite results in a background thread, or between batches (defaults to the settings file, or background)",
+)
+@click.option(
+    "--discovery",
+    type=click.Choice(DISCOVERY_STRATEGIES),
+    default=None,
+    help="List the files of the directory with Path.rglob or os.scandir (defaults to the settings file, or glob)",
+)
 @click.option("-v", "--verbose", default=False, flag_value=True, help="Enable verbose output")
 def filenames_cli(
     hlsp_name: str,
@@ -50,7 +128,16 @@ def filenames_cli(
     pattern: str = "*.*",
     exclude: str = "",
     max_n: Union[int, None] = None,
+    sample: Union[int, None] = None,
+    seed: Union[int, None] = None,
     dbfile: str = "",
+    output_format: str = "sqlite",
+    cache: bool = False,
+    check_content: bool = False,
+    vocabulary_file: Union[str, None] = None,
+    batch_size: Union[int, None] = None,
+    sqlite_writer: Union[str, None] = None,
+    discovery: Union[str, None] = None,
     verbose: bool = False,
 ) -> None:
     """
@@ -77,7 +164,22 @@ def filenames_cli(
 
         This example will only check files ending with ".fits" in the directory "subdir"
 
+        To quickly estimate how many files of a large collection pass, from a sample of 2000 files:
+
+            mct check_filenames my-hlsp --sample=2000
+
+        To accept the filters and product types of a collection that are not in the MAST vocabulary,
+        listed in a YAML file with 'filters:' and 'product_types:' sections:
+
+            mct check_filenames my-hlsp --vocabulary=my-hlsp_vocabulary.yaml
+
+        The batch size, SQLite writer and discovery strategy default to the settings recommended
+        for this machine by `mct bench`, if it has been run.
+
     """
+    from mast_contributor_tools.filename_check.fc_app import check_filenames, get_file_paths, logger
+    from mast_contributor_tools.filename_check.fc_settings import load_settings
+
     # Update logger level for verbose
     if verbose:
         logger.setLevel("DEBUG")
@@ -86,32 +188,94 @@ def filenames_cli(
 
     # Set default db file name
     if not dbfile:
-        dbfile = f"results_{hlsp_name}.db"
+        dbfile = f"results_{hlsp_name}{OUTPUT_FORMATS[output_format]}"
 
     # make hlsp_name argument lower case
     hlsp_name = hlsp_name.lower()
+    vocabulary_file = vocabulary_file or ""
+
+    # Options given on the command line take precedence over the settings file
+    settings = load_settings()
+    batch_size = batch_size or settings["batch_size"]
+    sqlite_writer = sqlite_writer or settings["sqlite_writer"]
+    discovery = discovery or settings["discovery"]
+
+    if sample:
+        from mast_contributor_tools.filename_check.fc_app import iter_file_paths, sample_filenames
+
+        # The files are streamed rather than listed, since there may be millions of them
+        file_paths = iter_file_paths(
+            directory, from_file=from_file, search_pattern=pattern, exclude_pattern=exclude, discovery=discovery
+        )
+        sample_filenames(hlsp_name, file_paths, sample, seed=seed, vocabulary_file=vocabulary_file)
+        return
 
     # Create list of files to check
-    file_list = get_file_paths(directory,
-                               from_file=from_file, 
-                               search_pattern=pattern, 
-                               exclude_pattern=exclude,
-                               max_n=max_n)
-    
+    file_list = get_file_paths(
+        directory,
+        from_file=from_file,
+        search_pattern=pattern,
+        exclude_pattern=exclude,
+        max_n=max_n,
+        discovery=discovery,
+    )
+
+    # The score cache is shared by every run writing results to the same directory
+    cache_file = os.path.join(os.path.dirname(dbfile), "mct_cache.db") if cache else ""
+
+    # Files listed in a file are read from their paths as they are, when checking their content
+    root = "" if from_file else directory
+
     # Perform the file name check
-    check_filenames(hlsp_name, file_list, dbFile=dbfile)
+    check_filenames(
+        hlsp_name,
+        file_list,
+        dbFile=dbfile,
+        cache_file=cache_file,
+        output_format=output_format,
+        root=root,
+        check_content=check_content,
+        vocabulary_file=vocabulary_file,
+        batch_size=batch_size,
+        sqlite_writer=sqlite_writer,
+    )
 
 
 @cli.command("check_filename", short_help="Check a single file name against MAST HLSP naming standards")
 @click.argument("filenames", nargs=-1)  # nargs=-1 allows variable number of arguments
+@click.option(
+    "--stdin",
+    "from_stdin",
+    default=False,
+    flag_value=True,
+    help="Also read file names from standard input, one per line",
+)
+@click.option(
+    "-f",
+    "--format",
+    "output_format",
+    type=click.Choice(["text", "ndjson"]),
+    default="text",
+    show_default=True,
+    help="Output format: log messages, or one line of JSON per file name",
+)
+@click.option(
+    "--hlsp", "hlsp_name", default="", help="Name of the HLSP collection, if not inferred from each file name"
+)
 @click.option("-v", "--verbose", default=False, flag_value=True, help="Enable verbose output")
-def single_filename_cli(filenames: str = "", verbose: bool = False) -> None:
+def single_filename_cli(
+    filenames: str = "",
+    from_stdin: bool = False,
+    output_format: str = "text",
+    hlsp_name: str = "",
+    verbose: bool = False,
+) -> None:
     """
     Command for checking a single file name against MAST standards.
 
     Required Arguments:
         FILENAMES is the name of at least one file to test. It does not need to be a real file.
-        Additional files can be provided as additional arguments.
+        Additional files can be provided as additional arguments, or read from standard input with --stdin.
 
     Example Usage:
 
@@ -123,22 +287,748 @@ def single_filename_cli(filenames: str = "", verbose: bool = False) -> None:
 
             mct check_filename hlsp_my-hlsp_hst_wfc3_multi_galaxy1_v1_spec.fits hlsp_my-hlsp_hst_wfc3_multi_galaxy2_v1_spec.fits
 
+        To check many names from another program, read them from standard input and write one JSON record per name:
+
+            find . -type f | mct check_filename --stdin --format ndjson > results.ndjson
+
     """
+    if output_format == "ndjson":
+        # Records are written to standard output without going through the logger
+        import sys
+
+        from mast_contributor_tools.filename_check.fc_stream import check_names, check_stream
+
+        check_names(filenames, sys.stdout, hlsp_name=hlsp_name)
+        if from_stdin:
+            check_stream(sys.stdin.buffer, sys.stdout, hlsp_name=hlsp_name)
+        return
+
+    from mast_contributor_tools.filename_check.fc_app import check_single_filename, logger
+
     # Update logger level for verbose
     if verbose:
         logger.setLevel("DEBUG")
         for handler in logger.handlers:
             handler.setLevel(logger.level)
 
+    if from_stdin:
+        import sys
+
+        from mast_contributor_tools.filename_check.fc_stream import read_names
+
+        filenames = [*filenames] + [f for names in read_names(sys.stdin.buffer) for f in names if f]
+
     # Check the file name
     for filename in filenames:
-        check_single_filename(filename)
+        check_single_filename(filename, hlsp_name)
+
+
+@cli.command("export", short_help="Export filename check results to CSV, Parquet or Arrow")
+@click.argument("dbfile")
+@click.argument("out_file")
+@click.option(
+    "-f",
+    "--format",
+    "fmt",
+    type=click.Choice(EXPORT_FORMATS),
+    default=None,
+    help="Output format (defaults to the extension of OUT_FILE, or 'csv')",
+)
+@click.option(
+    "-t",
+    "--table",
+    type=click.Choice([*EXPORT_RELATIONS]),
+    default="potential_problems",
+    help="Table or view to export",
+)
+@click.option(
+    "-c", "--columns", default="", help="Comma-separated list of columns to export, for example 'filename,value'"
+)
+@click.option(
+    "--verdict",
+    multiple=True,
+    type=click.Choice(VERDICTS, case_sensitive=False),
+    help="Only export rows with this verdict; may be repeated",
+)
+@click.option("--batch-size", default=50000, type=int, help="Number of rows read and written at a time")
+def export_cli(
+    dbfile: str,
+    out_file: str,
+    fmt: Union[str, None] = None,
+    table: str = "potential_problems",
+    columns: str = "",
+    verdict: tuple[str] = (),
+    batch_size: int = 50000,
+) -> None:
+    """
+    Command for exporting a results database to a file for use in dataframe tools.
+
+    Required Arguments:
+        DBFILE is the results database written by check_filenames.
+        OUT_FILE is the name of the file to write.
+
+    Example Usage:
+
+        To export all failing fields to a Parquet file (requires pyarrow):
+
+            mct export results_my-hlsp.db problems.parquet --verdict=FAIL
+
+        To export only the name and verdict of every file to CSV:
+
+            mct export results_my-hlsp.db files.csv -t filename -c filename,final_verdict
+
+    """
+    from mast_contributor_tools.filename_check.fc_app import logger
+    from mast_contributor_tools.filename_check.fc_db import Hlsp_SQLiteDb
+
+    # Infer the format from the file extension if not given
+    if not fmt:
+        suffix = out_file.rsplit(".", 1)[-1].lower()
+        fmt = {"parquet": "parquet", "pq": "parquet", "arrow": "arrow", "feather": "arrow"}.get(suffix, "csv")
+
+    db = Hlsp_SQLiteDb(dbfile)
+    try:
+        db.open_db()
+    except FileNotFoundError as e:
+        raise click.ClickException(str(e)) from e
+    try:
+        n_rows = db.export_results(
+            out_file,
+            relation=table,
+            fmt=fmt,
+            columns=[c.strip() for c in columns.split(",") if c.strip()],
+            verdicts=list(verdict),
+            batch_size=batch_size,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    finally:
+        db.close_db()
+    logger.critical(f"Exported {n_rows} rows from '{table}' to {out_file}")
+
+
+@cli.command("report", short_help="Query the results of a filename check")
+@click.argument("dbfile")
+@click.option(
+    "--verdict",
+    multiple=True,
+    type=click.Choice(VERDICTS, case_sensitive=False),
+    help="Only show results with this verdict; may be repeated",
+)
+@click.option("--field", default="", help="Only show fields with this name, for example 'instrument'")
+@click.option("--value", default="", help="Only show fields with this value, for example 'nircm'")
+@click.option("--path", "path_prefix", default="", help="Only show files whose path starts with this prefix")
+@click.option("--glob", default="", help="Only show files whose name matches this pattern, for example '\\*_spec.fits'")
+@click.option("-n", "--limit", default=50, type=int, help="Number of rows per page")
+@click.option("--after", default="", help="Show the page after this key, as printed at the end of the previous page")
+@click.option(
+    "--top", default=0, type=int, help="Instead of listing results, show the N most common failing values and fields"
+)
+@click.option(
+    "--build-indexes",
+    default=False,
+    flag_value=True,
+    help="Build the indexes of a database written without them, which speeds up every later query",
+)
+def report_cli(
+    dbfile: str,
+    verdict: tuple[str] = (),
+    field: str = "",
+    value: str = "",
+    path_prefix: str = "",
+    glob: str = "",
+    limit: int = 50,
+    after: str = "",
+    top: int = 0,
+    build_indexes: bool = False,
+) -> None:
+    """
+    Command for querying a results database, one page at a time.
+
+    Files are listed by default. If --field or --value are given, the matching fields are listed instead.
+    The database is only read, unless --build-indexes is given.
+
+    Required Arguments:
+        DBFILE is the results database written by check_filenames.
+
+    Example Usage:
+
+        To list the failing files in the subdirectory 'spectra':
+
+            mct report results_my-hlsp.db --verdict=FAIL --path=spectra
+
+        To list every file with an unrecognized instrument value 'nircm':
+
+            mct report results_my-hlsp.db --field=instrument --value=nircm
+
+        To show the ten most common problems:
+
+            mct report results_my-hlsp.db --top=10
+
+        To index a database written without indexes, then show the failing files:
+
+            mct report results_my-hlsp.db --build-indexes --verdict=FAIL
+
+    """
+    from mast_contributor_tools.filename_check.fc_app import logger
+    from mast_contributor_tools.filename_check.fc_db import Hlsp_SQLiteDb
+    from mast_contributor_tools.filename_check.fc_report import (
+        FIELD_COLUMNS,
+        FILE_COLUMNS,
+        format_table,
+        query_fields,
+        query_files,
+        top_failures,
+    )
+
+    db = Hlsp_SQLiteDb(dbfile)
+    try:
+        db.open_db(readonly=not build_indexes)
+    except FileNotFoundError as e:
+        raise click.ClickException(str(e)) from e
+    try:
+        # Databases written before indexing was added are only indexed when asked, as that writes to them
+        if not db.has_indexes():
+            if build_indexes:
+                logger.warning(f"Building indexes for {dbfile}; this is only needed once.")
+                db.build_indexes()
+            else:
+                logger.warning(f"{dbfile} has no indexes, so queries may be slow; index it once with --build-indexes.")
+        if top:
+            verdicts = list(verdict) or None
+            filters = {"path_prefix": path_prefix, "glob": glob}
+            click.echo(f"Most common problem values ({', '.join(verdict) or 'FAIL, NEEDS REVIEW'}):")
+            rows = top_failures(db.conn, "value", verdicts, field, top, **filters)
+            click.echo(format_table(["field", "value", "count"], rows))
+            click.echo("\nMost common problem fields:")
+            rows = top_failures(db.conn, "field", verdicts, field, top, **filters)
+            click.echo(format_table(["field", "count"], rows))
+            return
+
+        filters = {"verdicts": list(verdict), "path_prefix": path_prefix, "glob": glob, "after": after, "limit": limit}
+        if field or value:
+            rows, next_key = query_fields(db.conn, field=field, value=value, **filters)
+            columns = FIELD_COLUMNS
+        else:
+            rows, next_key = query_files(db.conn, **filters)
+            columns = FILE_COLUMNS
+        click.echo(format_table(columns, rows))
+        if next_key:
+            click.echo(f"\nMore results available; for the next page use: --after='{next_key}'")
+    finally:
+        db.close_db()
+
+
+@cli.command("diff", short_help="Compare the results of two filename check runs")
+@click.argument("old_db")
+@click.argument("new_db")
+@click.option("-f", "--format", "fmt", type=click.Choice(DIFF_FORMATS), default="text", help="Output format")
+@click.option(
+    "-o", "--output", default="", help="Output file (defaults to the terminal, or results_diff.db for --format=db)"
+)
+@click.option("--files-only", default=False, flag_value=True, help="Only report file changes, not field changes")
+def diff_cli(old_db: str, new_db: str, fmt: str = "text", output: str = "", files_only: bool = False) -> None:
+    """
+    Command for comparing the results databases of two runs, for example before and after a resubmission.
+
+    Files are reported as new, removed, improved, or regressed (changed to a worse verdict).
+    Fields of files present in both runs are reported the same way.
+
+    Required Arguments:
+        OLD_DB is the results database of the earlier run.
+        NEW_DB is the results database of the later run.
+
+    Example Usage:
+
+        To list the differences in the terminal:
+
+            mct diff results_my-hlsp_v1.db results_my-hlsp.db
+
+        To write the differences as JSON lines:
+
+            mct diff results_my-hlsp_v1.db results_my-hlsp.db -f jsonl -o changes.jsonl
+
+    """
+    from mast_contributor_tools.filename_check.fc_app import logger
+    from mast_contributor_tools.filename_check.fc_diff import ResultsDiff, summarize_changes
+
+    diff = ResultsDiff(old_db, new_db)
+    if fmt == "db":
+        output = output or "results_diff.db"
+    try:
+        diff.open(output if fmt == "db" else ":memory:")
+    except FileNotFoundError as e:
+        raise click.ClickException(str(e)) from e
+    try:
+        if fmt == "db":
+            counts = diff.write_db(fields=not files_only)
+        else:
+            with click.open_file(output or "-", "w") as out:
+                counts = diff.write_stream(out, fmt=fmt, fields=not files_only)
+    finally:
+        diff.close()
+    logger.critical(summarize_changes(counts))
+    if output:
+        logger.critical(f"Differences written to {output}")
+
+
+@cli.command("plan_renames", short_help="Propose compliant names for the files that fail the filename check")
+@click.argument("dbfile")
+@click.option(
+    "-f",
+    "--format",
+    "fmt",
+    type=click.Choice(PLAN_FORMATS),
+    default=None,
+    help="Output format: CSV, or a shell script of 'mv' commands (defaults to 'sh' for a .sh OUTPUT, else 'csv')",
+)
+@click.option("-o", "--output", default="", help="Output file (defaults to the terminal)")
+@click.option(
+    "--hlsp", "hlsp_name", default="", help="Name of the HLSP collection (defaults to that of the run in DBFILE)"
+)
+def plan_renames_cli(dbfile: str, fmt: Union[str, None] = None, output: str = "", hlsp_name: str = "") -> None:
+    """
+    Command for planning the renaming of the files that fail the filename check.
+
+    Each failing file is given a name with every field in lower case, without forbidden characters,
+    and with a version such as 'v1.0'. Proposals that take the name of another file of the collection,
+    including names that only differ in case, are reported as collisions instead. The plan lists the
+    verdict of each proposed name; values that need review, or fields that are too long, are left
+    for you to fix.
+
+    Required Arguments:
+        DBFILE is the results database written by check_filenames.
+
+    Example Usage:
+
+        To review the plan as CSV:
+
+            mct plan_renames results_my-hlsp.db -o renames.csv
+
+        To write the renames as a script, run from the root directory of the collection:
+
+            mct plan_renames results_my-hlsp.db -o renames.sh
+
+    """
+    from mast_contributor_tools.filename_check.fc_app import logger
+    from mast_contributor_tools.filename_check.fc_rename import RenamePlan, summarize_plan
+
+    plan = RenamePlan(dbfile, hlsp_name)
+    counts = plan.build()
+    with click.open_file(output or "-", "w") as out:
+        plan.write(out, fmt=fmt or ("sh" if output.endswith(".sh") else "csv"))
+    logger.critical(summarize_plan(counts, plan.hlsp_name))
+    if output:
+        logger.critical(f"Rename plan written to {output}")
+
+
+@cli.command("serve", short_help="Run a local service checking file names sent as JSON")
+@click.option("--socket", "socket_path", default="", help="Listen on this Unix socket instead of over HTTP")
+@click.option("--port", default=8765, type=int, help="Port to listen on over HTTP, on localhost only")
+@click.option(
+    "--rules",
+    "rule_sets",
+    multiple=True,
+    metavar="NAME=DIRECTORY",
+    help="Register a rule set from the fc_config.yaml and/or oif.yaml in a directory; may be repeated",
+)
+@click.option("-v", "--verbose", default=False, flag_value=True, help="Enable verbose output, logging every request")
+def serve_cli(socket_path: str = "", port: int = 8765, rule_sets: tuple = (), verbose: bool = False) -> None:
+    """
+    Command for running a long-lived service that checks file names, for example for an ingest system.
+
+    The configuration is loaded once, and the scores of field values are kept in memory, so each name
+    is checked in microseconds rather than paying to start a new `mct` process. Requests are JSON objects
+    with a list of 'filenames' (and optionally the 'hlsp_name'); the response holds one record per name.
+
+    Example Usage:
+
+        To listen over HTTP on localhost:
+
+            mct serve --port=8765
+
+            curl -d '{"filenames": ["hlsp_my-hlsp_readme.txt"]}' http://127.0.0.1:8765/validate
+
+        To listen on a Unix socket, with one line of JSON per request and per response:
+
+            mct serve --socket=/tmp/mct.sock
+
+        To also check names with a candidate vocabulary, in requests naming "rules": "candidate":
+
+            mct serve --rules=candidate=path/to/candidate_config
+
+    Configuration files are reloaded when they change, without restarting the service.
+    """
+    from mast_contributor_tools.filename_check.fc_app import logger
+    from mast_contributor_tools.filename_check.fc_config import registry
+    from mast_contributor_tools.filename_check.fc_server import serve
+
+    for rule_set in rule_sets:
+        name, equals, directory = rule_set.partition("=")
+        if not equals or not name or not directory:
+            raise click.BadParameter(f"'{rule_set}' is not of the form NAME=DIRECTORY", param_hint="--rules")
+        try:
+            registry.register_directory(name, directory)
+        except (OSError, ValueError) as e:
+            raise click.BadParameter(str(e), param_hint="--rules")
+
+    # Update logger level for verbose
+    if verbose:
+        logger.setLevel("DEBUG")
+        for handler in logger.handlers:
+            handler.setLevel(logger.level)
+
+    serve(socket_path=socket_path, port=port)
+
+
+@cli.command("serve_bench", short_help="Measure the latency and throughput of the file name service")
+@click.option("--socket", "socket_path", default="", help="Unix socket of the service, instead of HTTP")
+@click.option("--port", default=8765, type=int, help="Port of the service on localhost, over HTTP")
+@click.option(
+    "--spawn",
+    default=False,
+    flag_value=True,
+    help="Start a service in this process, rather than connecting to a running one",
+)
+@click.option("-c", "--clients", default=4, type=click.IntRange(min=1), help="Number of concurrent clients")
+@click.option(
+    "-r",
+    "--requests",
+    "n_requests",
+    default=100,
+    type=click.IntRange(min=1),
+    help="Number of requests sent by each client",
+)
+@click.option("-b", "--batch-size", default=100, type=click.IntRange(min=1), help="Number of names in each request")
+def serve_bench_cli(
+    socket_path: str = "",
+    port: int = 8765,
+    spawn: bool = False,
+    clients: int = 4,
+    n_requests: int = 100,
+    batch_size: int = 100,
+) -> None:
+    """
+    Command for benchmarking the service started with `mct serve`.
+
+    Example Usage:
+
+        To benchmark a service running on a Unix socket:
+
+            mct serve_bench --socket=/tmp/mct.sock --clients=8 --batch-size=1000
+
+        To benchmark without a running service, for example on a machine with no network:
+
+            mct serve_bench --spawn
+
+    """
+    from mast_contributor_tools.filename_check.fc_app import logger
+    from mast_contributor_tools.filename_check.fc_server import format_benchmark, run_benchmark, start_server
+
+    server = None
+    if spawn:
+        server = start_server(socket_path=socket_path, port=0)
+        port = server.server_address[1] if not socket_path else port
+    try:
+        results = run_benchmark(socket_path, port, n_clients=clients, n_requests=n_requests, batch_size=batch_size)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+    logger.critical(format_benchmark(results))
+
+
+@cli.command("bench", short_help="Find the fastest settings of check_filenames on this machine")
+@click.option(
+    "-dir",
+    "--directory",
+    default="",
+    help="Directory of files to check; a synthetic collection is created if not given",
+)
+@click.option("-file", "--from_file", default="", help="Path to a text file listing the files to check instead")
+@click.option("--hlsp", "hlsp_name", default="bench", help="Name of the HLSP collection the files are checked for")
+@click.option(
+    "-n",
+    "--n-files",
+    "n_files",
+    default=10_000,
+    type=click.IntRange(min=1),
+    help="Number of files checked by each trial",
+)
+@click.option(
+    "--output-format",
+    type=click.Choice([*OUTPUT_FORMATS]),
+    default="sqlite",
+    help="Format of the results file written by each trial",
+)
+@click.option(
+    "-r",
+    "--repeat",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of trials of each configuration; the fastest is kept",
+)
+@click.option(
+    "--settings-file",
+    default=None,
+    help="File the recommended settings are written to (defaults to $MCT_SETTINGS_FILE, or settings.yaml in ~/.config/mast_contributor_tools)",
+)
+@click.option("--dry-run", default=False, flag_value=True, help="Show the recommended settings without writing them")
+def bench_cli(
+    directory: str = "",
+    from_file: str = "",
+    hlsp_name: str = "bench",
+    n_files: int = 10_000,
+    output_format: str = "sqlite",
+    repeat: int = 1,
+    settings_file: Union[str, None] = None,
+    dry_run: bool = False,
+) -> None:
+    """
+    Command for finding the batch size, SQLite writer and discovery strategy with which
+    `mct check_filenames` runs fastest on this machine, and saving them to the settings file
+    that `mct check_filenames` loads.
+
+    Each configuration checks the same files in a process of its own, measuring the files
+    checked per second and the peak memory. The fastest configuration is recommended; among
+    those within 5% of it, the one using the least memory.
+
+    Example Usage:
+
+        To benchmark on a directory of the file system the collection is stored on:
+
+            mct bench -dir=/path/to/my-hlsp --hlsp=my-hlsp
+
+        To benchmark on a synthetic collection of 50000 files, trying each configuration 3 times:
+
+            mct bench -n 50000 --repeat=3
+
+    """
+    from mast_contributor_tools.filename_check.fc_app import logger
+    from mast_contributor_tools.filename_check.fc_bench import format_bench, run_bench
+    from mast_contributor_tools.filename_check.fc_settings import write_settings
+
+    result = run_bench(
+        hlsp_name.lower(),
+        directory=directory,
+        from_file=from_file,
+        n_files=n_files,
+        output_format=output_format,
+        repeat=repeat,
+    )
+    logger.critical(format_bench(result))
+    if dry_run:
+        return
+    try:
+        settings_file = write_settings(result.recommended, result.record(), settings_file)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    logger.critical("Settings written to %s", settings_file)
 
 
 # ==========================================
-# Add more commands here in the future! For example:
+# CLI commands for metadata checker
 # ==========================================
-# @cli.command("check_metadata", short_help="Check file metadata information against MAST HLSP standards")
+@cli.command("check_metadata", short_help="Check file metadata information against MAST HLSP standards")
+@click.argument("hlsp_name")
+@click.option(
+    "-dir",
+    "--directory",
+    type=str,
+    default=".",
+    help="Path of HLSP directory tree; tests all FITS files in that directory",
+)
+@click.option(
+    "-file",
+    "--from_file",
+    type=str,
+    default="",
+    help="Path to a text file containing a list of files to check, instead of scanning a directory",
+)
+@click.option(
+    "-p", "--pattern", default="*.fits", help="File pattern to limit testing, for example 'hlsp\\_\\*\\_spec.fits'"
+)
+@click.option(
+    "-e", "--exclude", default="", help="File pattern to exclude from testing, for example '\\*\\_preview.fits'"
+)
+@click.option("-n", "--max_n", default=None, help="Maximum number of files to check, for testing purposes.")
+@click.option("-db", "--dbFile", default="", help="Results database filename (defaults to: metadata_<hlsp_name>.db)")
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=8,
+    help="Number of threads reading headers; more help on network storage",
+)
+@click.option(
+    "--max-in-flight",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum number of files being read at a time (defaults to four times the number of workers)",
+)
+@click.option(
+    "--cache",
+    default=False,
+    flag_value=True,
+    help="Cache headers in mct_cache.db next to the results database, so later runs only read files that changed",
+)
+@click.option(
+    "--cache-only",
+    default=False,
+    flag_value=True,
+    help="Check the cached headers of the directory without looking at the files, for example after a rule change",
+)
+@click.option(
+    "--verify-checksums",
+    default=False,
+    flag_value=True,
+    help="Verify the CHECKSUM and DATASUM cards of each HDU, which reads the whole of each file (requires numpy)",
+)
+@click.option(
+    "--check-tables",
+    default=False,
+    flag_value=True,
+    help="Check the TTYPE, TFORM and TUNIT of each binary table column, and read their statistics (requires numpy)",
+)
+@click.option("-v", "--verbose", default=False, flag_value=True, help="Enable verbose output")
+def metadata_cli(
+    hlsp_name: str,
+    directory: str = ".",
+    from_file: str = "",
+    pattern: str = "*.fits",
+    exclude: str = "",
+    max_n: Union[int, None] = None,
+    dbfile: str = "",
+    workers: int = 8,
+    max_in_flight: Union[int, None] = None,
+    cache: bool = False,
+    cache_only: bool = False,
+    verify_checksums: bool = False,
+    check_tables: bool = False,
+    verbose: bool = False,
+) -> None:
+    """
+    Command for checking the header keywords of FITS files against MAST standards.
+
+    Only the headers are read, so large files are checked as quickly as small ones.
+
+    Required Arguments:
+        HLSP_NAME is the name of the HLSP collection
+
+    Example Usage:
+
+        To check all FITS files in the current working directory, run the command:
+
+            mct check_metadata <my-hlsp>
+
+        where '<my-hlsp>' is the name of your HLSP. The results are written to 'metadata_my-hlsp.db'.
+
+        To check the spectra in a specified directory:
+
+            mct check_metadata my-hlsp -dir='subdir' -p='*_spec.fits'
+
+        To read more files at a time from network storage:
+
+            mct check_metadata my-hlsp --workers=32
+
+        To only read the files that changed since the last run with --cache:
+
+            mct check_metadata my-hlsp --cache
+
+        To also verify the checksums of the data:
+
+            mct check_metadata my-hlsp --verify-checksums
+
+        To check the columns of catalogs:
+
+            mct check_metadata my-hlsp -p='*_cat.fits' --check-tables
+
+    """
+    from mast_contributor_tools.filename_check.fc_app import get_file_paths
+    from mast_contributor_tools.metadata_check.mc_app import check_metadata, logger
+
+    # Update logger level for verbose
+    if verbose:
+        logger.setLevel("DEBUG")
+        for handler in logger.handlers:
+            handler.setLevel(logger.level)
+
+    # Set default db file name
+    if not dbfile:
+        dbfile = f"metadata_{hlsp_name}.db"
+
+    if verify_checksums and cache_only:
+        raise click.UsageError("--verify-checksums reads the files, so cannot be used with --cache-only")
+
+    # make hlsp_name argument lower case
+    hlsp_name = hlsp_name.lower()
+
+    # The header cache is shared by every run writing results to the same directory
+    cache_file = os.path.join(os.path.dirname(dbfile), "mct_cache.db") if cache or cache_only else ""
+
+    # Create list of files to check, relative to the directory unless they are listed in a file
+    if cache_only:
+        from mast_contributor_tools.metadata_check.mc_cache import cached_file_paths
+
+        file_list = cached_file_paths(cache_file, directory, search_pattern=pattern, exclude_pattern=exclude)
+    else:
+        file_list = get_file_paths(
+            directory, from_file=from_file, search_pattern=pattern, exclude_pattern=exclude, max_n=max_n
+        )
+    root = "" if from_file and not cache_only else directory
+
+    check_metadata(
+        hlsp_name,
+        file_list,
+        dbFile=dbfile,
+        root=root,
+        workers=workers,
+        max_in_flight=max_in_flight,
+        cache_file=cache_file,
+        cache_only=cache_only,
+        verify_checksums=verify_checksums,
+        check_tables=check_tables,
+    )
+
+
+@cli.command("check_consistency", short_help="Check that file names match the keywords in the file headers")
+@click.argument("names_db")
+@click.argument("metadata_db")
+@click.option(
+    "-o", "--output", default="", help="Write the comparisons to the 'consistency' table of this SQLite database"
+)
+@click.option("-n", "--max_n", default=20, type=int, help="Number of the most common mismatches to list")
+def consistency_cli(names_db: str, metadata_db: str, output: str = "", max_n: int = 20) -> None:
+    """
+    Command for checking that the mission, instrument, target and filter fields of file names match
+    the TELESCOP, INSTRUME, TARGNAME and FILTER keywords of the files.
+
+    Header values are compared after normalizing their case and spacing and replacing the aliases
+    listed in oif.yaml; fields that do not match need review.
+
+    Required Arguments:
+        NAMES_DB is the results database of check_filenames.
+        METADATA_DB is the results database of check_metadata, for the same files.
+
+    Example Usage:
+
+        mct check_consistency results_my-hlsp.db metadata_my-hlsp.db -o consistency_my-hlsp.db
+
+    """
+    from mast_contributor_tools.metadata_check.mc_app import logger
+    from mast_contributor_tools.metadata_check.mc_consistency import ConsistencyCheck, summarize_consistency
+
+    check = ConsistencyCheck(names_db, metadata_db)
+    check.open(output or ":memory:")
+    try:
+        counts = check.write_db()
+        logger.critical(summarize_consistency(counts, check.mismatches(max_n)))
+    finally:
+        check.close()
+    if output:
+        logger.critical(f"Comparisons written to {output}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,220 @@
+"""Verify the CHECKSUM and DATASUM cards of FITS files.
+
+DATASUM is the 32-bit ones' complement sum of the data unit of an HDU, taken as big-endian
+unsigned integers, written as a decimal string. CHECKSUM is an ASCII encoding of the
+complement of the sum of the whole HDU, chosen so that the sum of the header, including the
+CHECKSUM card itself, and of the data is -0, that is all bits set (see the FITS Checksum
+Proposal, Seaman et al.).
+
+The data are summed with NumPy, one chunk of the file at a time through a memory map, so that
+files of several GB are verified at the speed of the storage with bounded memory use. NumPy
+releases the GIL while summing, so several files are verified in parallel on threads.
+NumPy is an optional dependency, only needed to verify checksums.
+"""
+
+import os
+from typing import BinaryIO, Union
+
+from mast_contributor_tools.metadata_check.fits_header import (
+    BLOCK_SIZE,
+    FitsHeader,
+    HDUInfo,
+    open_fits,
+    parse_header,
+    read_header_blocks,
+)
+from mast_contributor_tools.metadata_check.hlsp_metadata import SCORE, keyword_verdict
+
+# Bytes of data summed at a time; a multiple of the block size, so of the word size too
+CHUNK_SIZE = 2048 * BLOCK_SIZE
+NEGATIVE_ZERO = 0xFFFFFFFF
+# Characters excluded from encoded checksums: punctuation between the digits and letters
+EXCLUDED_CHARACTERS = set(range(0x3A, 0x41)) | set(range(0x5B, 0x61))
+
+
+def _numpy():
+    """Returns the numpy module, which is only needed to verify checksums"""
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("Verifying checksums requires the optional 'numpy' package") from e
+    return numpy
+
+
+def fold(total: int) -> int:
+    """Returns the 32-bit ones' complement of a sum of 32-bit words, by adding back the carries"""
+    while total > NEGATIVE_ZERO:
+        total = (total & NEGATIVE_ZERO) + (total >> 32)
+    return total
+
+
+def buffer_sum(buffer: bytes) -> int:
+    """Returns the ones' complement sum of a buffer of whole 32-bit words"""
+    np = _numpy()
+    return fold(int(np.frombuffer(buffer, dtype=">u4").sum(dtype=np.uint64)))
+
+
+def data_sum(path: Union[str, os.PathLike], offset: int, size: int, chunk_size: int = CHUNK_SIZE) -> int:
+    """Returns the ones' complement sum of a part of a file, summed one chunk at a time
+
+    Each chunk is mapped into memory, summed as 64-bit integers and unmapped, so memory use is
+    bounded by the size of a chunk however large the file. A last partial word, in a file
+    whose padding is missing, is summed as if padded with zeros.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Path of the file
+    offset : int
+        Offset of the first byte to sum
+    size : int
+        Number of bytes to sum
+    chunk_size : int, optional
+        Number of bytes summed at a time, a multiple of 4
+    """
+    np = _numpy()
+    total = 0
+    words = size // 4
+    for start in range(0, 4 * words, chunk_size):
+        length = min(chunk_size, 4 * words - start)
+        chunk = np.memmap(path, dtype=">u4", mode="r", offset=offset + start, shape=(length // 4,))
+        total = fold(total + int(chunk.sum(dtype=np.uint64)))
+        del chunk
+    if size % 4:
+        with open(path, "rb") as f:
+            f.seek(offset + 4 * words)
+            total = fold(total + buffer_sum(f.read(size % 4).ljust(4, b"\0")))
+    return total
+
+
+def encode_checksum(value: int, complement: bool = True) -> str:
+    """Encode a 32-bit sum as the 16 characters of a CHECKSUM value
+
+    The complement of the sum of an HDU whose CHECKSUM is '0000000000000000' is encoded so
+    that the sum of the HDU becomes -0 once the encoded value is written in its place.
+    """
+    if complement:
+        value = ~value & NEGATIVE_ZERO
+    encoded = [0] * 16
+    for i in range(4):
+        byte = (value >> (24 - 8 * i)) & 0xFF
+        chars = [byte // 4 + 0x30] * 4
+        chars[0] += byte % 4
+        # Move excluded characters by pairs, which leaves their sum unchanged
+        while any(c in EXCLUDED_CHARACTERS for c in chars):
+            for j in (0, 2):
+                if chars[j] in EXCLUDED_CHARACTERS or chars[j + 1] in EXCLUDED_CHARACTERS:
+                    chars[j] += 1
+                    chars[j + 1] -= 1
+        for j in range(4):
+            encoded[4 * j + i] = chars[j]
+    # Rotated right by one byte, to line up with the 32-bit words of the header
+    return bytes(encoded[-1:] + encoded[:-1]).decode("ascii")
+
+
+def _record(hdu: int, keyword: str, value: Union[str, None], type_ok: bool, value_ok: bool) -> dict:
+    """Returns the keyword record of a verified CHECKSUM or DATASUM card"""
+    scores = ["pass", SCORE[type_ok], SCORE[value_ok] if type_ok else None]
+    return {
+        "hdu": hdu,
+        "keyword": keyword,
+        "value": value,
+        "presence_score": scores[0],
+        "type_score": scores[1],
+        "value_score": scores[2],
+        "keyword_verdict": keyword_verdict(scores),
+    }
+
+
+def stream_sum(f: BinaryIO, size: int, chunk_size: int = CHUNK_SIZE) -> tuple[int, int]:
+    """Returns the ones' complement sum of the next bytes of a stream, and the number of bytes read
+
+    Used for compressed files, whose content can only be read in order. A last partial word,
+    in a truncated stream, is summed as if padded with zeros.
+    """
+    total = 0
+    n_bytes = 0
+    while n_bytes < size:
+        chunk = f.read(min(chunk_size, size - n_bytes))
+        if not chunk:
+            break
+        n_bytes += len(chunk)
+        total = fold(total + buffer_sum(chunk.ljust(-(-len(chunk) // 4) * 4, b"\0")))
+    return total, n_bytes
+
+
+def hdu_records(index: int, header: FitsHeader, header_blocks: bytes, data: int) -> list[dict]:
+    """Returns the records of the CHECKSUM and DATASUM cards of one HDU, given the sum of its data"""
+    records = []
+    checksum, datasum = header.get("CHECKSUM"), header.get("DATASUM")
+    if datasum is not None:
+        value_ok = str(datasum).strip().isdigit() and int(datasum) == data
+        records.append(_record(index, "DATASUM", str(datasum), isinstance(datasum, str), value_ok))
+    if checksum is not None:
+        value_ok = fold(buffer_sum(header_blocks) + data) == NEGATIVE_ZERO
+        records.append(_record(index, "CHECKSUM", str(checksum), isinstance(checksum, str), value_ok))
+    return records
+
+
+def stream_checksums(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> tuple[list[dict], int]:
+    """Verify the CHECKSUM and DATASUM cards of each HDU of a decompressed stream, in a single pass
+
+    Returns
+    -------
+    tuple[list[dict], int]
+        As verify_checksums()
+    """
+    records = []
+    n_bytes = 0
+    offset = 0
+    index = 0
+    # One block at a time, so that the stream is left at the start of the data
+    while (blocks := read_header_blocks(f, offset, "XTENSION" if index else "SIMPLE", read_blocks=1)) is not None:
+        header = parse_header(blocks)
+        offset += len(blocks) + header.padded_data_size()
+        if "CHECKSUM" in header or "DATASUM" in header:
+            data, size = stream_sum(f, header.padded_data_size(), chunk_size)
+            records += hdu_records(index, header, blocks, data)
+            n_bytes += len(blocks) + size
+        index += 1
+    return records, n_bytes
+
+
+def verify_checksums(
+    path: Union[str, os.PathLike], hdus: list[HDUInfo], chunk_size: int = CHUNK_SIZE
+) -> tuple[list[dict], int]:
+    """Verify the CHECKSUM and DATASUM cards of each HDU of a FITS file
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Path of the FITS file, which may be compressed
+    hdus : list[HDUInfo]
+        The headers of the file, as returned by fits_header.read_headers(). Not used for
+        compressed files, whose headers are read again as they are decompressed.
+    chunk_size : int, optional
+        Number of bytes summed at a time
+
+    Returns
+    -------
+    tuple[list[dict], int]
+        A keyword record for each CHECKSUM and DATASUM card, which fails if the sum does not
+        match, and the number of bytes summed. HDUs without either card are not summed.
+    """
+    records = []
+    n_bytes = 0
+    with open_fits(path) as (f, file_size):
+        if file_size is None:
+            # Compressed data cannot be memory-mapped, so are decompressed and summed in order
+            return stream_checksums(f, chunk_size)
+        for hdu in hdus:
+            if "CHECKSUM" not in hdu.header and "DATASUM" not in hdu.header:
+                continue
+            # The fill of the data unit is part of the sum
+            size = min(hdu.header.padded_data_size(), file_size - hdu.data_offset)
+            data = data_sum(path, hdu.data_offset, size, chunk_size)
+            f.seek(hdu.header_offset)
+            header_blocks = f.read(hdu.data_offset - hdu.header_offset)
+            records += hdu_records(hdu.index, hdu.header, header_blocks, data)
+            n_bytes += len(header_blocks) + size
+    return records, n_bytes
@@ -0,0 +1,384 @@
+"""Read the headers of FITS files without reading their data.
+
+A FITS file is a sequence of header and data units (HDUs). Each header is a sequence of
+80-character cards in 2880-byte blocks, ending with an END card, and is followed by its data,
+padded to a whole number of blocks. The size of the data is known from the header (BITPIX,
+NAXISn, PCOUNT and GCOUNT), so the data of each HDU is skipped with a seek rather than read.
+Reading the headers of a file therefore takes a few small reads, whatever the size of the file.
+
+Files compressed with gzip or bzip2 (.fits.gz, .fits.bz2) are read through a decompressing
+stream, which stops as soon as the END card of the primary header has been read. Skipping the
+data of compressed HDUs means decompressing them, so extension headers are only read when
+the keywords looked for are not all in the headers read before.
+
+See the FITS standard: https://fits.gsfc.nasa.gov/fits_standard.html
+"""
+
+import bz2
+import gzip
+import math
+import os
+import zlib
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from typing import BinaryIO, NamedTuple, Union
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+# Number of blocks read at a time: most headers fit in a single read
+READ_BLOCKS = 4
+# Keywords without a value
+COMMENTARY_KEYWORDS = {"", "COMMENT", "HISTORY"}
+# Signatures of compressed files, and the streams decompressing them
+COMPRESSED_SIGNATURES = {b"\x1f\x8b": lambda f: gzip.GzipFile(fileobj=f), b"BZh": bz2.BZ2File}
+
+CardValue = Union[str, bool, int, float, None]
+
+
+class FitsError(ValueError):
+    """Raised when a file is not a valid FITS file, or is truncated."""
+
+
+class FitsHeader:
+    """The cards of one FITS header.
+
+    Parameters
+    ----------
+    cards : list[tuple[str, CardValue, str]]
+        Keyword, value and comment of each card, in order. Long string values continued over
+        several cards (with CONTINUE) are joined into one card.
+    """
+
+    def __init__(self, cards: list[tuple[str, CardValue, str]]) -> None:
+        self.cards = cards
+        # Value of the first card with each keyword
+        self.values: dict[str, CardValue] = {}
+        for keyword, value, _ in cards:
+            if keyword not in COMMENTARY_KEYWORDS:
+                self.values.setdefault(keyword, value)
+
+    def __contains__(self, keyword: str) -> bool:
+        return keyword in self.values
+
+    def __getitem__(self, keyword: str) -> CardValue:
+        return self.values[keyword]
+
+    def get(self, keyword: str, default: CardValue = None) -> CardValue:
+        return self.values.get(keyword, default)
+
+    def get_int(self, keyword: str, default: int) -> int:
+        """Returns the integer value of a card, or the default if the card is missing
+
+        Raises
+        ------
+        FitsError
+            Raised if the value of the card is not an integer.
+        """
+        value = self.values.get(keyword, default)
+        # bool is a subclass of int, but T and F are not sizes
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise FitsError(f"Invalid {keyword} = {value!r}: must be an integer")
+        return value
+
+    def data_size(self) -> int:
+        """Returns the size in bytes of the data following this header, without padding
+
+        Raises
+        ------
+        FitsError
+            Raised if NAXIS, NAXISn, BITPIX, PCOUNT or GCOUNT is not an integer.
+        """
+        naxis = self.get_int("NAXIS", 0)
+        if not naxis:
+            return 0
+        axes = [self.get_int(f"NAXIS{i}", 0) for i in range(1, naxis + 1)]
+        # Random groups have NAXIS1 = 0, which is not part of the size
+        if axes[0] == 0 and self.get("GROUPS") is True:
+            axes = axes[1:]
+        n_values = self.get_int("PCOUNT", 0) + math.prod(axes)
+        return abs(self.get_int("BITPIX", 8)) // 8 * self.get_int("GCOUNT", 1) * n_values
+
+    def padded_data_size(self) -> int:
+        """Returns the size in bytes of the data following this header, padded to whole blocks"""
+        return -(-self.data_size() // BLOCK_SIZE) * BLOCK_SIZE
+
+
+class HDUInfo(NamedTuple):
+    """The header of one HDU, and where it is in the file"""
+
+    index: int
+    header: FitsHeader
+    # Offsets in bytes from the start of the file
+    header_offset: int
+    data_offset: int
+    # Size of the data without padding
+    data_size: int
+
+
+def parse_value(field: str) -> tuple[CardValue, str]:
+    """Parse the value and comment of a card, from the characters after '= '"""
+    text = field.lstrip()
+    if text.startswith("'"):
+        # Strings are quoted, with quotes inside doubled; trailing spaces are not significant
+        i = 1
+        while True:
+            i = text.find("'", i)
+            if i < 0:
+                raise FitsError(f"Unterminated string in card value: {field!r}")
+            if text[i + 1 : i + 2] != "'":
+                break
+            i += 2
+        value = text[1:i].replace("''", "'").rstrip()
+        rest = text[i + 1 :]
+        comment = rest.split("/", 1)[1].strip() if "/" in rest else ""
+        return value, comment
+
+    token, _, comment = text.partition("/")
+    token, comment = token.strip(), comment.strip()
+    if not token:
+        return None, comment
+    if token in ("T", "F"):
+        return token == "T", comment
+    try:
+        return int(token), comment
+    except ValueError:
+        pass
+    try:
+        return float(token.replace("D", "E")), comment
+    except ValueError:
+        # For example complex values; kept as text
+        return token, comment
+
+
+def parse_card(card: str) -> tuple[str, CardValue, str]:
+    """Returns the keyword, value and comment of an 80-character card"""
+    keyword = card[:8].rstrip()
+    if keyword == "HIERARCH" and "=" in card:
+        name, _, field = card[9:].partition("=")
+        value, comment = parse_value(field)
+        return name.strip(), value, comment
+    if card[8:10] != "= " or keyword in COMMENTARY_KEYWORDS:
+        # Commentary cards, and CONTINUE cards, are kept as text
+        return keyword, card[8:].rstrip(), ""
+    value, comment = parse_value(card[10:])
+    return keyword, value, comment
+
+
+def parse_header(blocks: bytes) -> FitsHeader:
+    """Parse the cards of a header, up to its END card"""
+    text = blocks.decode("ascii", "replace")
+    cards: list[tuple[str, CardValue, str]] = []
+    for i in range(0, len(text), CARD_SIZE):
+        card = text[i : i + CARD_SIZE]
+        keyword = card[:8].rstrip()
+        if keyword == "END":
+            break
+        if keyword == "CONTINUE" and cards and isinstance(cards[-1][1], str) and cards[-1][1].endswith("&"):
+            # Long string continued from the previous card
+            value, comment = parse_value(card[8:])
+            previous = cards[-1]
+            comments = f"{previous[2]} {comment}".strip()
+            cards[-1] = (previous[0], previous[1][:-1] + (value if isinstance(value, str) else ""), comments)
+            continue
+        cards.append(parse_card(card))
+    return FitsHeader(cards)
+
+
+def _find_end(buffer: bytes, start: int) -> int:
+    """Returns the offset of the end of the block holding the END card, or -1 if there is no END card yet"""
+    for offset in range(start, len(buffer) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        for card in range(offset, offset + BLOCK_SIZE, CARD_SIZE):
+            if buffer[card : card + 8] == b"END     ":
+                return offset + BLOCK_SIZE
+    return -1
+
+
+def read_header(
+    f: BinaryIO, offset: int, keyword: str = "SIMPLE", read_blocks: int = READ_BLOCKS
+) -> Union[tuple[FitsHeader, int], None]:
+    """Read the header starting at an offset in a file.
+
+    Parameters are as for read_header_blocks().
+
+    Returns
+    -------
+    tuple[FitsHeader, int] or None
+        The header and the size of its blocks in bytes, or None at the end of the file
+    """
+    blocks = read_header_blocks(f, offset, keyword, read_blocks)
+    if blocks is None:
+        return None
+    return parse_header(blocks), len(blocks)
+
+
+def read_header_blocks(
+    f: BinaryIO, offset: int, keyword: str = "SIMPLE", read_blocks: int = READ_BLOCKS
+) -> Union[bytes, None]:
+    """Read the blocks of the header starting at an offset in a file, up to its END card.
+
+    Parameters
+    ----------
+    f : BinaryIO
+        File opened in binary mode. It only needs to support forward seeks, so it may be a
+        decompressing stream.
+    offset : int
+        Offset of the start of the header from the start of the file
+    keyword : str, optional
+        Keyword of the first card: 'SIMPLE' for the primary header, 'XTENSION' for extensions
+    read_blocks : int, optional
+        Number of blocks read at a time. With 1, the file is left at the end of the header.
+
+    Returns
+    -------
+    bytes or None
+        The blocks of the header, or None at the end of the file
+
+    Raises
+    ------
+    FitsError
+        If there is no header starting with the keyword, the header is truncated or has no END
+        card, or a decompressing stream ends before the offset
+    """
+    # Decompressing streams cannot seek past their end, so stop at the end of truncated data
+    if f.seek(offset) < offset:
+        raise FitsError(f"File is truncated: it ends before offset {offset}")
+    buffer = b""
+    while True:
+        chunk = f.read(read_blocks * BLOCK_SIZE)
+        if not chunk:
+            if not buffer:
+                return None
+            raise FitsError(f"Header at offset {offset} has no END card")
+        if not buffer and chunk[:10] != f"{keyword:<8}= ".encode():
+            # Checked before looking for the END card, so other files are rejected after one read
+            raise FitsError(f"Expected a header starting with {keyword} at offset {offset}")
+        start = len(buffer) - len(buffer) % BLOCK_SIZE
+        buffer += chunk
+        end = _find_end(buffer, start)
+        if end > 0:
+            return buffer[:end]
+        if len(buffer) % BLOCK_SIZE:
+            raise FitsError(f"Header at offset {offset} is truncated")
+
+
+def iter_hdus(f: BinaryIO, file_size: Union[int, None] = None, max_hdus: Union[int, None] = None) -> Iterator[HDUInfo]:
+    """Yield the header of each HDU of a FITS file, skipping over their data.
+
+    Parameters
+    ----------
+    f : BinaryIO
+        File opened in binary mode
+    file_size : int, optional
+        Size of the file, if known, to detect truncated data
+    max_hdus : int, optional
+        Maximum number of HDUs to read, for example 1 for the primary header only
+
+    Raises
+    ------
+    FitsError
+        If the file does not start with a primary header, there is something other than an
+        extension header after an HDU, or a header or data unit is truncated
+    """
+    offset = 0
+    index = 0
+    while max_hdus is None or index < max_hdus:
+        result = read_header(f, offset, "XTENSION" if index else "SIMPLE")
+        if result is None:
+            if index == 0:
+                raise FitsError("File is empty")
+            return
+        header, header_size = result
+        if index == 0 and header.get("SIMPLE") is not True:
+            raise FitsError("File does not conform to the FITS standard (SIMPLE = F)")
+
+        data_offset = offset + header_size
+        data_size = header.data_size()
+        next_offset = data_offset + header.padded_data_size()
+        if file_size is not None and data_offset + data_size > file_size:
+            raise FitsError(
+                f"Data of HDU {index} is truncated: {data_offset + data_size} bytes expected, {file_size} found"
+            )
+        yield HDUInfo(index, header, offset, data_offset, data_size)
+        offset = next_offset
+        index += 1
+
+
+@contextmanager
+def open_fits(path: Union[str, os.PathLike]) -> Iterator[tuple[BinaryIO, Union[int, None]]]:
+    """Open a FITS file for reading, decompressing it if it is compressed with gzip or bzip2.
+
+    Compressed files are recognized from their first bytes rather than their extension.
+
+    Yields
+    ------
+    tuple[BinaryIO, int or None]
+        The file, or a stream of its decompressed content, and the size of the file, or None
+        if it is compressed
+
+    Raises
+    ------
+    FitsError
+        If a compressed file is truncated or corrupt
+    """
+    # Unbuffered, since the reads are already whole blocks
+    with open(path, "rb", buffering=0) as f:
+        magic = f.read(3)
+        f.seek(0)
+        stream = next((s for sig, s in COMPRESSED_SIGNATURES.items() if magic.startswith(sig)), None)
+        if stream is None:
+            yield f, os.fstat(f.fileno()).st_size
+            return
+        try:
+            with stream(f) as decompressed:
+                yield decompressed, None
+        except (EOFError, zlib.error, OSError) as e:
+            raise FitsError(f"Could not decompress the file: {e}") from e
+
+
+def read_headers(
+    path: Union[str, os.PathLike], max_hdus: Union[int, None] = None, keywords: Union[Iterable[str], None] = None
+) -> list[HDUInfo]:
+    """Read the headers of each HDU of a FITS file, without reading any data.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Path of the FITS file, which may be compressed with gzip or bzip2
+    max_hdus : int, optional
+        Maximum number of HDUs to read
+    keywords : Iterable[str], optional
+        Keywords looked for in the headers. Compressed files are only read until each of them
+        has been found, to avoid decompressing the data of later HDUs; the headers of
+        uncompressed files are all read, since their data are skipped without reading them.
+
+    Returns
+    -------
+    list[HDUInfo]
+        The header of each HDU, with the offsets of the header and data in the file, or in the
+        decompressed content of compressed files
+    """
+    return read_headers_until(path, keywords, max_hdus)[0]
+
+
+def read_headers_until(
+    path: Union[str, os.PathLike], keywords: Union[Iterable[str], None] = None, max_hdus: Union[int, None] = None
+) -> tuple[list[HDUInfo], bool]:
+    """Read the headers of a FITS file as read_headers() does, and tell whether every HDU was read.
+
+    Returns
+    -------
+    tuple[list[HDUInfo], bool]
+        The header of each HDU read, and False if the file is compressed and reading stopped
+        once each keyword was found, so that later HDUs may be missing
+    """
+    with open_fits(path) as (f, file_size):
+        if file_size is not None or keywords is None:
+            return [*iter_hdus(f, file_size, max_hdus)], True
+        hdus = []
+        missing = set(keywords)
+        for hdu in iter_hdus(f, None, max_hdus):
+            hdus.append(hdu)
+            missing.difference_update(hdu.header.values)
+            if not missing:
+                return hdus, False
+        return hdus, True
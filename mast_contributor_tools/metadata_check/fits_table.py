@@ -0,0 +1,330 @@
+"""Check the columns of the binary tables of FITS catalogs.
+
+Each column of a binary table (XTENSION = 'BINTABLE') is described in its header by TTYPEn,
+its name, TFORMn, its data type and number of values per row, and TUNITn, its unit. The
+descriptors are checked from the header alone: every column needs a valid TFORMn, and should
+have a unique TTYPEn, and a TUNITn if it holds numbers. The widths of the columns must add
+up to the width of a row, NAXIS1.
+
+Statistics of the numeric columns (the number of NaN and null values, and the range of the
+other values) are computed from the data, which are read through a memory map with a
+structured dtype of the numeric columns, a few MB of rows at a time. Catalogs of several GB
+are read at the speed of the storage, with bounded memory use. Reading the data requires
+NumPy, as for verifying checksums.
+"""
+
+import os
+import re
+from typing import NamedTuple, Union
+
+from mast_contributor_tools.metadata_check.fits_checksum import CHUNK_SIZE, _numpy
+from mast_contributor_tools.metadata_check.fits_header import FitsHeader, HDUInfo, open_fits
+from mast_contributor_tools.metadata_check.hlsp_metadata import SCORE, SCORE_LAX, keyword_verdict
+
+# Repeat count, data type code and optional array descriptor, for example '12A' or '1PE(100)'
+TFORM_REGEX = re.compile(r"^\s*(\d*)([LXBIJKAEDCMPQ])(.*?)\s*$")
+# NumPy type and size in bytes of one value of each data type. Bits (X) are counted in bytes
+# separately; variable-length arrays (P, Q) are stored in the row as a count and an offset.
+TFORM_TYPES = {
+    "L": ("i1", 1),
+    "B": ("u1", 1),
+    "I": (">i2", 2),
+    "J": (">i4", 4),
+    "K": (">i8", 8),
+    "A": ("S1", 1),
+    "E": (">f4", 4),
+    "D": (">f8", 8),
+    "C": (">c8", 8),
+    "M": (">c16", 16),
+    "P": (">i4", 8),
+    "Q": (">i8", 16),
+}
+# Columns whose statistics are computed
+INTEGER_CODES = set("BIJK")
+FLOAT_CODES = set("ED")
+# Column names recommended by the FITS standard: letters, digits and underscores
+TTYPE_REGEX = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+class Column(NamedTuple):
+    """The descriptors of one column of a binary table"""
+
+    # Number of the column, from 1
+    number: int
+    name: Union[str, None]
+    tform: str
+    unit: Union[str, None]
+    # Number of values per row, and data type code
+    repeat: int
+    code: str
+    # Offset of the column in a row, and its width, in bytes
+    offset: int
+    width: int
+    null: Union[int, None]
+    scale: float
+    zero: float
+
+
+def parse_tform(tform: str) -> tuple[int, str]:
+    """Returns the repeat count and the data type code of a TFORMn value
+
+    Raises
+    ------
+    ValueError
+        If the value is not a valid binary table format
+    """
+    match = TFORM_REGEX.match(tform)
+    if match is None:
+        raise ValueError(f"Invalid TFORM '{tform}'")
+    repeat, code, _ = match.groups()
+    return int(repeat or 1), code
+
+
+def column_width(repeat: int, code: str) -> int:
+    """Returns the width in bytes of a column in a row"""
+    if code == "X":
+        return -(-repeat // 8)
+    return repeat * TFORM_TYPES[code][1]
+
+
+def _record(hdu: int, keyword: str, value, presence: str, type_ok: bool = True, value_score: str = "pass") -> dict:
+    """Returns the keyword record of a table descriptor"""
+    scores = [presence, SCORE[type_ok] if value is not None else None, value_score if value is not None else None]
+    return {
+        "hdu": hdu,
+        "keyword": keyword,
+        "value": None if value is None else str(value),
+        "presence_score": scores[0],
+        "type_score": scores[1],
+        "value_score": scores[2],
+        "keyword_verdict": keyword_verdict(scores),
+    }
+
+
+def parse_column(number: int, header: FitsHeader, offset: int) -> Union[Column, None]:
+    """Returns the descriptors of a column starting at an offset in the row, or None if its TFORMn is not valid"""
+    name, tform, unit = header.get(f"TTYPE{number}"), header.get(f"TFORM{number}"), header.get(f"TUNIT{number}")
+    if not isinstance(tform, str):
+        return None
+    try:
+        repeat, code = parse_tform(tform)
+    except ValueError:
+        return None
+    null = header.get(f"TNULL{number}")
+    return Column(
+        number=number,
+        name=name.strip() if isinstance(name, str) and name.strip() else None,
+        tform=tform.strip(),
+        unit=unit if isinstance(unit, str) else None,
+        repeat=repeat,
+        code=code,
+        offset=offset,
+        width=column_width(repeat, code),
+        null=null if _is_integer(null) else None,
+        scale=_number(header.get(f"TSCAL{number}"), 1.0),
+        zero=_number(header.get(f"TZERO{number}"), 0.0),
+    )
+
+
+def name_record(index: int, number: int, name, names: set[str]) -> dict:
+    """Returns the record of the TTYPEn of a column, adding its name to the names of the columns before it"""
+    if name is None or not isinstance(name, str):
+        return _record(index, f"TTYPE{number}", name, SCORE_LAX[name is not None], False)
+    if not name.strip():
+        value_score = SCORE_LAX[False]
+    elif name.strip().lower() in names:
+        value_score = SCORE[False]
+    else:
+        value_score = SCORE_LAX[bool(TTYPE_REGEX.match(name.strip()))]
+    names.add(name.strip().lower())
+    return _record(index, f"TTYPE{number}", name, "pass", True, value_score)
+
+
+def table_columns(index: int, header: FitsHeader) -> tuple[list[Column], list[dict]]:
+    """Parse and check the column descriptors of a binary table header
+
+    Parameters
+    ----------
+    index : int
+        Index of the HDU in the file
+    header : FitsHeader
+        Header of the binary table
+
+    Returns
+    -------
+    tuple[list[Column], list[dict]]
+        The columns, and the keyword record of each TTYPEn, TFORMn and TUNITn. A missing or
+        invalid TFORMn fails, as do duplicate names and a total width other than NAXIS1, and
+        no columns are returned then, since their offsets are not known. Missing names, names
+        with other characters than letters, digits and underscores, and numeric columns
+        without a unit need review.
+    """
+    n_fields = header.get("TFIELDS")
+    if not _is_integer(n_fields):
+        return [], [_record(index, "TFIELDS", n_fields, SCORE[n_fields is not None], False)]
+    columns, records = [], []
+    names: set[str] = set()
+    offset = 0
+    for n in range(1, n_fields + 1):
+        records.append(name_record(index, n, header.get(f"TTYPE{n}"), names))
+        column = parse_column(n, header, offset)
+        tform = header.get(f"TFORM{n}")
+        if column is None:
+            records.append(_record(index, f"TFORM{n}", tform, SCORE[tform is not None], False))
+            continue
+        records.append(_record(index, f"TFORM{n}", tform, "pass"))
+        if column.code in INTEGER_CODES | FLOAT_CODES:
+            unit = header.get(f"TUNIT{n}")
+            records.append(_record(index, f"TUNIT{n}", unit, SCORE_LAX[unit is not None], isinstance(unit, str)))
+        columns.append(column)
+        offset += column.width
+    if len(columns) < n_fields:
+        return [], records
+    if offset != header.get("NAXIS1"):
+        records.append(_record(index, "NAXIS1", header.get("NAXIS1"), "pass", True, SCORE[False]))
+        return [], records
+    return columns, records
+
+
+def _is_integer(value) -> bool:
+    """Returns whether a card value is an integer, as bool is a subclass of int"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _number(value, default: float) -> float:
+    """Returns a card value as a number, or the default if it is missing or not a number"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return default
+
+
+def numeric_dtype(columns: list[Column], row_size: int):
+    """Returns the structured NumPy dtype of the numeric columns of a row, skipping the other columns"""
+    np = _numpy()
+    numeric = [c for c in columns if c.code in INTEGER_CODES | FLOAT_CODES and c.repeat > 0]
+    return np.dtype(
+        {
+            "names": [f"c{c.number}" for c in numeric],
+            "formats": [
+                (TFORM_TYPES[c.code][0], (c.repeat,)) if c.repeat > 1 else TFORM_TYPES[c.code][0] for c in numeric
+            ],
+            "offsets": [c.offset for c in numeric],
+            "itemsize": row_size,
+        }
+    )
+
+
+def column_stats(
+    path: Union[str, os.PathLike], hdu: HDUInfo, columns: list[Column], chunk_size: int = CHUNK_SIZE
+) -> dict[int, dict]:
+    """Returns the statistics of the numeric columns of a binary table, read in chunks of rows
+
+    Each chunk of whole rows is mapped into memory and unmapped once its columns are summarized,
+    so memory use is bounded by the chunk size however large the table.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Path of the FITS file, which must not be compressed
+    hdu : HDUInfo
+        The binary table
+    columns : list[Column]
+        Its columns, as returned by table_columns()
+    chunk_size : int, optional
+        Number of bytes of rows read at a time
+
+    Returns
+    -------
+    dict[int, dict]
+        For the number of each numeric column: the number of NaN values ('n_nan'), of values
+        equal to TNULLn ('n_null'), and the minimum and maximum of the other values, scaled by
+        TSCALn and TZEROn ('min', 'max'; None if there are none)
+    """
+    np = _numpy()
+    row_size, n_rows = hdu.header.get("NAXIS1", 0), hdu.header.get("NAXIS2", 0)
+    dtype = numeric_dtype(columns, row_size)
+    stats = {int(name[1:]): {"n_nan": 0, "n_null": 0, "min": None, "max": None} for name in dtype.names}
+    if not stats or not n_rows or not row_size:
+        return stats
+    by_number = {c.number: c for c in columns}
+    chunk_rows = max(1, chunk_size // row_size)
+    for start in range(0, n_rows, chunk_rows):
+        shape = (min(chunk_rows, n_rows - start),)
+        rows = np.memmap(path, dtype=dtype, mode="r", offset=hdu.data_offset + start * row_size, shape=shape)
+        for number, summary in stats.items():
+            _update_stats(summary, rows[f"c{number}"], by_number[number])
+        del rows
+    for number, summary in stats.items():
+        _scale_range(summary, by_number[number])
+    return stats
+
+
+def _update_stats(stats: dict, values, column: Column) -> None:
+    """Add the values of a column in a chunk of rows to its statistics"""
+    np = _numpy()
+    if column.code in FLOAT_CODES:
+        invalid = np.isnan(values)
+        stats["n_nan"] += int(np.count_nonzero(invalid))
+    elif column.null is not None:
+        invalid = values == column.null
+        stats["n_null"] += int(np.count_nonzero(invalid))
+    else:
+        invalid = None
+    valid = values if invalid is None else values[~invalid]
+    if valid.size:
+        low, high = valid.min().item(), valid.max().item()
+        stats["min"] = low if stats["min"] is None else min(stats["min"], low)
+        stats["max"] = high if stats["max"] is None else max(stats["max"], high)
+
+
+def _scale_range(stats: dict, column: Column) -> None:
+    """Scale the range of the stored values of a column by TSCALn and TZEROn, to the physical values"""
+    if stats["min"] is None or (column.scale == 1.0 and column.zero == 0.0):
+        return
+    low, high = (column.zero + column.scale * stats[k] for k in ("min", "max"))
+    stats["min"], stats["max"] = min(low, high), max(low, high)
+
+
+def check_tables(
+    path: Union[str, os.PathLike], hdus: list[HDUInfo], stats: bool = True
+) -> tuple[list[dict], list[dict]]:
+    """Check the column descriptors of each binary table of a FITS file, and summarize their columns
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Path of the FITS file
+    hdus : list[HDUInfo]
+        The headers of the file, as returned by fits_header.read_headers()
+    stats : bool, optional
+        Read the data to compute the statistics of the numeric columns, which requires NumPy.
+        The data of compressed files are not read, since they cannot be memory-mapped.
+
+    Returns
+    -------
+    tuple[list[dict], list[dict]]
+        The keyword records of the descriptors, and a record of each column, with its
+        descriptors and, if the data were read, the statistics from column_stats()
+    """
+    tables = [hdu for hdu in hdus if hdu.header.get("XTENSION") == "BINTABLE"]
+    if stats and tables:
+        with open_fits(path) as (_, file_size):
+            stats = file_size is not None
+    records, column_records = [], []
+    for hdu in tables:
+        columns, descriptor_records = table_columns(hdu.index, hdu.header)
+        records += descriptor_records
+        summaries = column_stats(path, hdu, columns) if stats and columns else {}
+        for c in columns:
+            column_records.append(
+                {
+                    "hdu": hdu.index,
+                    "column_number": c.number,
+                    "name": c.name,
+                    "tform": c.tform,
+                    "tunit": c.unit,
+                    "n_rows": hdu.header.get("NAXIS2"),
+                    **summaries.get(c.number, {"n_nan": None, "n_null": None, "min": None, "max": None}),
+                }
+            )
+    return records, column_records
@@ -0,0 +1,147 @@
+"""The main logic module to check the metadata of HLSP files against the MAST keyword requirements"""
+
+import os
+from pathlib import Path
+from typing import Union
+
+import yaml
+
+from mast_contributor_tools.filename_check.fc_config import YamlLoader
+from mast_contributor_tools.metadata_check.fits_header import CardValue, HDUInfo
+
+# ==========================================
+# Setup some configurations for this module
+# ==========================================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BASE_DIR, "mc_config.yaml")
+with open(CONFIG_FILE, "r") as f:
+    cfg = yaml.load(f, Loader=YamlLoader)
+
+# Type of the value of each keyword
+REQUIRED_KEYWORDS: dict[str, str] = cfg["RequiredKeywords"]
+RECOMMENDED_KEYWORDS: dict[str, str] = cfg["RecommendedKeywords"]
+# Every keyword looked for, so that reading compressed files can stop once they are all found
+CHECKED_KEYWORDS = [*REQUIRED_KEYWORDS, *RECOMMENDED_KEYWORDS]
+
+# Python types of the values of each keyword type. Booleans are excluded from numbers, since
+# bool is a subclass of int.
+VALUE_TYPES = {"str": (str,), "float": (int, float), "int": (int,), "bool": (bool,)}
+
+SCORE = {False: "fail", True: "pass"}
+SCORE_LAX = {False: "needs review", True: "pass"}
+VERDICT_RANK = {"FAIL": 0, "NEEDS REVIEW": 1, "PASS": 2}
+
+
+def type_matches(value: CardValue, value_type: str) -> bool:
+    """Returns True if a keyword value has the expected type: 'str', 'float', 'int' or 'bool'"""
+    if isinstance(value, bool) and value_type != "bool":
+        return False
+    return isinstance(value, VALUE_TYPES[value_type])
+
+
+def keyword_verdict(scores: list[Union[str, None]]) -> str:
+    """Returns the verdict of a keyword given its scores: any 'fail' fails it, then any 'needs review'"""
+    if "fail" in scores:
+        return "FAIL"
+    if "needs review" in scores:
+        return "NEEDS REVIEW"
+    return "PASS"
+
+
+class HlspMetadata:
+    """Check the header keywords of one HLSP file.
+
+    Parameters
+    ----------
+    filepath : Path
+        Path of the file
+    hlsp_name : str
+        Official identifier (abbreviation/acronym/initialism) for the HLSP collection
+    hdus : list[HDUInfo]
+        The headers of the file, as returned by fits_header.read_headers()
+    """
+
+    def __init__(self, filepath: Path, hlsp_name: str, hdus: list[HDUInfo]) -> None:
+        self.path = filepath.parent
+        self.name = filepath.name
+        self.hlsp_name = hlsp_name
+        self.hdus = hdus
+        self.keywords: list[dict] = []
+
+    def find_keyword(self, keyword: str) -> Union[tuple[int, CardValue], None]:
+        """Returns the index of the first HDU with a keyword, primary header first, and its value"""
+        for hdu in self.hdus:
+            if keyword in hdu.header:
+                return hdu.index, hdu.header[keyword]
+        return None
+
+    def score_value(self, keyword: str, value: CardValue) -> str:
+        """Score the value of a keyword that has the expected type"""
+        if isinstance(value, str) and not value.strip():
+            return "needs review"
+        if keyword == "HLSPID":
+            # The HLSP identifier is expected to match the name of the collection
+            return SCORE_LAX[str(value).lower() == self.hlsp_name.lower()]
+        return "pass"
+
+    def evaluate_keyword(self, keyword: str, value_type: str, required: bool) -> dict:
+        """Check that a keyword is present, with a value of the expected type"""
+        found = self.find_keyword(keyword)
+        if found is None:
+            presence = SCORE[False] if required else SCORE_LAX[False]
+            record = {"hdu": None, "keyword": keyword, "value": None, "presence_score": presence}
+            record.update(type_score=None, value_score=None)
+        else:
+            hdu, value = found
+            type_ok = type_matches(value, value_type)
+            record = {"hdu": hdu, "keyword": keyword, "value": None if value is None else str(value)}
+            record.update(
+                presence_score="pass",
+                type_score=SCORE[type_ok],
+                value_score=self.score_value(keyword, value) if type_ok else None,
+            )
+        scores = [record["presence_score"], record["type_score"], record["value_score"]]
+        record["keyword_verdict"] = keyword_verdict(scores)
+        return record
+
+    def evaluate_keywords(self) -> list[dict]:
+        """Check each required and recommended keyword, returning the record of each"""
+        self.keywords = [self.evaluate_keyword(k, t, True) for k, t in REQUIRED_KEYWORDS.items()]
+        self.keywords += [self.evaluate_keyword(k, t, False) for k, t in RECOMMENDED_KEYWORDS.items()]
+        for k in self.keywords:
+            k["file_ref"] = self.name
+        return self.keywords
+
+    def add_keywords(self, records: list[dict]) -> None:
+        """Add the records of keywords checked elsewhere, for example by fits_checksum, to the file"""
+        self.keywords += [{**r, "file_ref": self.name} for r in records]
+
+    def evaluate_file(self) -> dict:
+        """Returns the record of the file, with the worst verdict of its keywords"""
+        verdicts = [k["keyword_verdict"] for k in self.keywords]
+        final_verdict = min(verdicts, key=VERDICT_RANK.get, default="PASS")
+        return {
+            "path": str(self.path),
+            "filename": self.name,
+            "final_verdict": final_verdict,
+            "n_hdus": len(self.hdus),
+            "error": None,
+            "read_ms": None,
+            "checksum_bytes": None,
+            "checksum_ms": None,
+        }
+
+
+def invalid_file_record(filepath: Path, error: str, read_ms: Union[float, None] = None) -> dict:
+    """Returns the record of a file whose headers could not be read, which fails"""
+    return {
+        "path": str(filepath.parent),
+        "filename": filepath.name,
+        "final_verdict": "FAIL",
+        "n_hdus": 0,
+        "error": error,
+        "read_ms": read_ms,
+        "checksum_bytes": None,
+        "checksum_ms": None,
+    }
@@ -0,0 +1,409 @@
+import logging
+import os
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Union
+
+from mast_contributor_tools.filename_check.fc_app import log_rejected, validate_hlsp_name
+from mast_contributor_tools.filename_check.fc_config import hash_files
+from mast_contributor_tools.metadata_check.fits_header import FitsError, HDUInfo, read_headers, read_headers_until
+from mast_contributor_tools.metadata_check.hlsp_metadata import (
+    CHECKED_KEYWORDS,
+    CONFIG_FILE,
+    HlspMetadata,
+    invalid_file_record,
+)
+from mast_contributor_tools.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+if TYPE_CHECKING:
+    from mast_contributor_tools.metadata_check.mc_cache import HeaderCache
+    from mast_contributor_tools.metadata_check.mc_db import Hlsp_MetadataDb
+
+
+def evaluate_file(
+    file_path: Path,
+    hlsp_name: str,
+    root: str = "",
+    cache: Union["HeaderCache", None] = None,
+    cache_only: bool = False,
+    verify: bool = False,
+    tables: bool = False,
+) -> tuple[dict, list[dict]]:
+    """Read the headers of one FITS file and check its keywords
+
+    Parameters
+    ----------
+    file_path : Path
+        Path of the file to check, relative to root
+    hlsp_name : str
+        Official identifier (abbreviation/acronym/initialism) for the HLSP collection
+    root : str, optional
+        Directory the path is relative to, if not the current directory
+    cache : HeaderCache, optional
+        Cache of the headers of files read before. The headers are only read if the file is not
+        in the cache, or has changed since.
+    cache_only : bool, optional
+        Take the headers from the cache without looking at the file at all
+    verify : bool, optional
+        Verify the CHECKSUM and DATASUM cards of each HDU, reading the whole file
+    tables : bool, optional
+        Check the column descriptors of each binary table, and unless cache_only, read the
+        statistics of their numeric columns
+
+    Returns
+    -------
+    tuple[dict, list[dict]]
+        The file record and the records of its keywords. The file record has the time taken to
+        read the headers in 'read_ms', or None if they were cached, and with verify, the number
+        of bytes summed and the time taken in 'checksum_bytes' and 'checksum_ms'. With tables,
+        it has the record of each table column in 'columns'. Files whose headers cannot be
+        read fail, with the reason in their 'error', and have no keyword records.
+    """
+    start = time.perf_counter()
+    full_path = os.path.join(root, file_path)
+    elapsed = None
+    complete = True
+    try:
+        if cache is None:
+            # Compressed files are only read up to the checked keywords, unless the tables of every HDU are checked
+            hdus, complete = read_headers_until(full_path, None if tables else CHECKED_KEYWORDS)
+            elapsed = read_ms(start)
+        else:
+            hdus, elapsed = cached_headers(os.path.abspath(full_path), cache, cache_only)
+    except (OSError, FitsError) as e:
+        return invalid_file_record(file_path, str(e), read_ms(start)), []
+    hm = HlspMetadata(file_path, hlsp_name, hdus)
+    hm.evaluate_keywords()
+    extra = {}
+    try:
+        if verify:
+            extra.update(verify_file(full_path, hdus, hm))
+        if tables:
+            extra.update(check_file_tables(full_path, hdus, hm, stats=not cache_only))
+    except (OSError, FitsError) as e:
+        return invalid_file_record(file_path, str(e), elapsed), []
+    file_rec = {**hm.evaluate_file(), "read_ms": elapsed, **extra}
+    if not complete:
+        # The number of HDUs of the file is not known
+        file_rec["n_hdus"] = None
+    return file_rec, hm.keywords
+
+
+def verify_file(path: str, hdus: list[HDUInfo], hm: HlspMetadata) -> dict:
+    """Verify the checksums of a file, adding their records to its keywords
+
+    Returns
+    -------
+    dict
+        The number of bytes summed and the time taken, as 'checksum_bytes' and 'checksum_ms'
+    """
+    from mast_contributor_tools.metadata_check.fits_checksum import verify_checksums
+
+    start = time.perf_counter()
+    records, n_bytes = verify_checksums(path, hdus)
+    hm.add_keywords(records)
+    return {"checksum_bytes": n_bytes, "checksum_ms": read_ms(start)}
+
+
+def check_file_tables(path: str, hdus: list[HDUInfo], hm: HlspMetadata, stats: bool = True) -> dict:
+    """Check the binary tables of a file, adding the records of their descriptors to its keywords
+
+    Returns
+    -------
+    dict
+        The record of each table column, as 'columns'
+    """
+    from mast_contributor_tools.metadata_check.fits_table import check_tables
+
+    records, columns = check_tables(path, hdus, stats)
+    hm.add_keywords(records)
+    return {"columns": [{**c, "file_ref": hm.name} for c in columns]}
+
+
+def cached_headers(
+    path: str, cache: "HeaderCache", cache_only: bool = False
+) -> tuple[list[HDUInfo], Union[float, None]]:
+    """Returns the headers of a file from the cache, reading and caching them if the file has changed
+
+    Every HDU is read, even of compressed files, so that rules applied later from the cache alone
+    see the keywords and tables of every extension.
+
+    Returns
+    -------
+    tuple[list[HDUInfo], float or None]
+        The headers, and the time taken to read them in milliseconds, or None if they were cached
+
+    Raises
+    ------
+    OSError, FitsError
+        If the headers could not be read, now or when they were cached
+    """
+    st = None if cache_only else os.stat(path)
+    cached = cache.get(path, st)
+    if cached is None:
+        if cache_only:
+            raise FileNotFoundError(f"{path} is not in the header cache")
+        start = time.perf_counter()
+        try:
+            hdus = read_headers(path)
+        except FitsError as e:
+            cache.put(path, st, None, str(e))
+            raise
+        cache.put(path, st, hdus)
+        return hdus, read_ms(start)
+    hdus, error = cached
+    if error is not None:
+        raise FitsError(error)
+    return hdus, None
+
+
+def read_ms(start: float) -> float:
+    """Returns the milliseconds elapsed since a time.perf_counter() value"""
+    return round(1000 * (time.perf_counter() - start), 3)
+
+
+def evaluate_file_or_fail(file_path: Path, hlsp_name: str, *args) -> tuple[dict, list[dict]]:
+    """Evaluate one file as evaluate_file() does, recording any unexpected error as the failure of that file,
+    so that one malformed file does not stop the run"""
+    try:
+        return evaluate_file(file_path, hlsp_name, *args)
+    except Exception as e:
+        logger.debug("Unexpected error checking %s", file_path, exc_info=True)
+        return invalid_file_record(file_path, f"{type(e).__name__}: {e}"), []
+
+
+def evaluate_files(
+    file_list: Iterable[Path],
+    hlsp_name: str,
+    root: str = "",
+    workers: int = 8,
+    max_in_flight: Union[int, None] = None,
+    cache: Union["HeaderCache", None] = None,
+    cache_only: bool = False,
+    verify: bool = False,
+    tables: bool = False,
+) -> Iterator[tuple[dict, list[dict]]]:
+    """Evaluate files on a pool of threads, yielding the results of each file as it completes
+
+    Reading headers is limited by the latency of opening and reading files rather than by the
+    CPU, so threads are used even though Python runs only one of them at a time: while one
+    thread waits for the storage, the others run.
+
+    Parameters
+    ----------
+    file_list : Iterable[Path]
+        Files to check, relative to root. They are read as files are submitted, so may be a generator.
+    hlsp_name : str
+        Official identifier (abbreviation/acronym/initialism) for the HLSP collection
+    root : str, optional
+        Directory the paths are relative to, if not the current directory
+    workers : int, optional
+        Number of threads reading headers
+    max_in_flight : int, optional
+        Maximum number of files submitted but not yet returned, which bounds memory use.
+        Defaults to four times the number of workers.
+    cache : HeaderCache, optional
+        Cache of the headers of files read before
+    cache_only : bool, optional
+        Take the headers from the cache without looking at the files
+    verify : bool, optional
+        Verify the CHECKSUM and DATASUM cards of each file. Checksums are summed by NumPy,
+        which releases the GIL, so files are verified in parallel on the threads.
+    tables : bool, optional
+        Check the binary tables of each file
+
+    Yields
+    ------
+    tuple[dict, list[dict]]
+        The file record and keyword records of each file, in the order they complete
+    """
+    max_in_flight = max_in_flight or 4 * workers
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mct-metadata") as pool:
+        pending: set[Future] = set()
+        for f in file_list:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+            pending.add(pool.submit(evaluate_file_or_fail, f, hlsp_name, root, cache, cache_only, verify, tables))
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def open_results(dbFile: str) -> "Hlsp_MetadataDb":
+    """Create the results database, replacing any existing file, and start its writer thread"""
+    from mast_contributor_tools.metadata_check.mc_db import Hlsp_MetadataDb
+
+    if Path(dbFile).is_file():
+        logger.warning("Database file %s already exists. Overwriting File.", dbFile)
+        os.remove(dbFile)
+    db = Hlsp_MetadataDb(dbFile)
+    logger.debug("Creating results database %s", dbFile)
+    db.create_db()
+    db.start_writer()
+    return db
+
+
+def open_cache(cache_file: str) -> Union["HeaderCache", None]:
+    """Open the header cache, or return None if no cache file is given"""
+    from mast_contributor_tools.metadata_check.mc_cache import HeaderCache
+
+    if not cache_file:
+        return None
+    cache = HeaderCache(cache_file)
+    cache.open()
+    return cache
+
+
+def close_cache(cache: Union["HeaderCache", None]) -> Union[float, None]:
+    """Save and close the header cache, if any, returning its hit rate"""
+    if cache is None:
+        return None
+    cache.close()
+    logger.info("Header cache hit rate: %.1f%%", 100 * cache.hit_rate)
+    return cache.hit_rate
+
+
+def check_metadata(
+    hlsp_name: str,
+    file_list: list[Path],
+    dbFile: str,
+    root: str = "",
+    batch_size: int = 1000,
+    workers: int = 8,
+    max_in_flight: Union[int, None] = None,
+    cache_file: str = "",
+    cache_only: bool = False,
+    verify_checksums: bool = False,
+    check_tables: bool = False,
+) -> None:
+    """Check the header keywords of FITS files of an HLSP collection
+
+    Only the headers of each file are read: the data are skipped, so checking a file takes
+    about as long as opening it, whatever its size. Headers are read on a pool of threads,
+    and the results written to the database by a background writer thread.
+
+    Parameters
+    ----------
+    hlsp_name : str
+        Official identifier (abbreviation/acronym/initialism) for the HLSP collection
+    file_list: list[Path]
+        List of files to check, typically output from fc_app.get_file_paths()
+    dbFile : str
+        Name of the SQLite results database
+    root : str, optional
+        Directory the paths of file_list are relative to, if not the current directory
+    batch_size : int, optional
+        Number of files whose results are written to the database at a time
+    workers : int, optional
+        Number of threads reading headers
+    max_in_flight : int, optional
+        Maximum number of files being read or waiting to be returned at a time; defaults to
+        four times the number of workers
+    cache_file : str, optional
+        Name of an SQLite file caching the headers of files between runs (see mc_cache). Not
+        used if empty (default).
+    cache_only : bool, optional
+        Take the headers from the cache without looking at the files, for example to apply new
+        keyword rules to files known not to have changed
+    verify_checksums : bool, optional
+        Verify the CHECKSUM and DATASUM cards of each HDU, which reads the whole of each file.
+        Requires NumPy.
+    check_tables : bool, optional
+        Check the column descriptors of the binary tables of each file, and summarize their
+        numeric columns in the 'table_columns' table. Reading the columns requires NumPy; from
+        the header cache alone, only the descriptors are checked.
+
+    Raises
+    ------
+    ValueError
+        If checksums are to be verified from the header cache alone
+    """
+    # Imported here rather than at the top of the module, as in fc_app
+    from tqdm import tqdm
+
+    from mast_contributor_tools.filename_check.fc_metrics import RunMetrics
+
+    # Make sure hlsp name is valid
+    validate_hlsp_name(hlsp_name)
+    if verify_checksums and cache_only:
+        raise ValueError("Checksums cannot be verified from the header cache alone, without reading the files")
+    settings = {
+        "batch_size": batch_size,
+        "max_in_flight": max_in_flight or 4 * workers,
+        "cache": bool(cache_file),
+        "cache_only": cache_only,
+        "verify_checksums": verify_checksums,
+        "check_tables": check_tables,
+    }
+    metrics = RunMetrics(hlsp_name, "sqlite", settings=settings, workers=workers)
+
+    logger.critical("Checking the metadata of %d files for HLSP collection '%s'", len(file_list), hlsp_name)
+    db = open_results(dbFile)
+    cache = open_cache(cache_file)
+
+    counts: Counter = Counter(rejected=0)
+    checksum_bytes = 0
+
+    def write_batch() -> None:
+        """Queue the current batch of files for the writer, and start a new batch"""
+        nonlocal file_recs, keyword_recs
+        log_rejected(db.submit_batch(file_recs, keyword_recs), counts)
+        counts.update(r["final_verdict"] for r in file_recs)
+        file_recs, keyword_recs = [], []
+        # Headers read since the last batch are cached now, rather than held until the end
+        if cache is not None:
+            cache.save()
+        progress.set_postfix(db.writer_status(), refresh=False)
+
+    file_recs: list[dict] = []
+    keyword_recs: list[list[dict]] = []
+    # Checked once rather than for every file, since the level does not change during the run
+    debug = logger.isEnabledFor(logging.DEBUG)
+    progress = tqdm(total=len(file_list))
+    with metrics.stage("evaluate"):
+        results = evaluate_files(
+            file_list, hlsp_name, root, workers, max_in_flight, cache, cache_only, verify_checksums, check_tables
+        )
+        for file_rec, keywords in results:
+            progress.update()
+            checksum_bytes += file_rec["checksum_bytes"] or 0
+            if file_rec["error"]:
+                logger.error("Could not read the headers of %s: %s", file_rec["filename"], file_rec["error"])
+            elif debug:
+                logger.debug("Verdict for %s: '%s'", file_rec["filename"], file_rec["final_verdict"])
+            file_recs.append(file_rec)
+            keyword_recs.append(keywords)
+            if len(file_recs) >= batch_size:
+                write_batch()
+        write_batch()
+    progress.close()
+    with metrics.stage("finish"):
+        log_rejected(db.stop_writer(), counts)
+        cache_hit_rate = close_cache(cache)
+
+    logger.critical(db.print_summary())
+    for path, n_files, mean_ms, max_ms in db.slowest_paths():
+        logger.info("Slowest reads: %s: %d files, %.1f ms on average, %.1f ms at most", path, n_files, mean_ms, max_ms)
+    # Index the results once they are all written, so they can be queried
+    with metrics.stage("close"):
+        db.build_indexes()
+    checksum_rate = None
+    if verify_checksums:
+        # Files are verified on several threads, so the throughput is over the time taken by all of them
+        checksum_rate = checksum_bytes / 1e9 / metrics.stages["evaluate"]
+        logger.info("Verified the checksums of %.2f GB at %.2f GB/s", checksum_bytes / 1e9, checksum_rate)
+    metrics.finish(
+        len(file_list),
+        counts,
+        cache_hit_rate=cache_hit_rate,
+        config_hash=hash_files([CONFIG_FILE]),
+        checksum_gb_per_s=checksum_rate,
+    )
+    db.add_run(metrics.run_row())
+    db.close_db()
+    logger.critical("\nMetadata checking complete. Results written to %s", dbFile)
@@ -0,0 +1,195 @@
+"""A persistent cache of FITS headers, shared between metadata check runs.
+
+Most files of a collection do not change between submissions, so their headers only need to be
+read once. The parsed cards of each file are stored with the size, modification time and inode
+of the file when it was read; a file is only read again if one of these has changed. Since the
+cache holds the headers rather than the verdicts, changes to the keyword rules are applied to
+cached files without reading them again, and with `cache_only` without even looking at them.
+
+The cache is a table of the same SQLite file as the field score cache of the filename check
+(see filename_check.fc_cache), next to the results database.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Union
+
+from mast_contributor_tools.filename_check.fc_app import match_paths
+from mast_contributor_tools.filename_check.fc_db import database_uri
+from mast_contributor_tools.metadata_check.fits_header import FitsHeader, HDUInfo
+
+HEADER_CACHE_TABLE = """
+        CREATE TABLE IF NOT EXISTS header_cache (
+        path  TEXT NOT NULL PRIMARY KEY,
+        size  INTEGER NOT NULL,
+        mtime_ns  INTEGER NOT NULL,
+        inode  INTEGER NOT NULL,
+        hdus  TEXT,
+        error  TEXT
+        ) WITHOUT ROWID;
+        """
+
+# Headers of a file, or the reason they could not be read
+CachedHeaders = tuple[Union[list[HDUInfo], None], Union[str, None]]
+
+
+def file_key(st: os.stat_result) -> tuple[int, int, int]:
+    """Returns the size, modification time and inode of a file, which change when it is rewritten"""
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def encode_hdus(hdus: list[HDUInfo]) -> str:
+    """Encode the headers of a file as JSON, keeping the type of each value"""
+    return json.dumps(
+        [[h.index, h.header_offset, h.data_offset, h.data_size, h.header.cards] for h in hdus], separators=(",", ":")
+    )
+
+
+def decode_hdus(text: str) -> list[HDUInfo]:
+    """Decode the headers of a file encoded by encode_hdus()"""
+    return [
+        HDUInfo(index, FitsHeader([tuple(card) for card in cards]), header_offset, data_offset, data_size)
+        for index, header_offset, data_offset, data_size, cards in json.loads(text)
+    ]
+
+
+class HeaderCache:
+    """Cache of the headers of FITS files, stored in an SQLite file.
+
+    Lookups may be made from several threads, each with its own read-only connection. New
+    entries are held in memory until they are written by save(), from the thread that opened
+    the cache.
+
+    Parameters
+    ----------
+    cache_file : str
+        Name of the SQLite file holding the cache; created if it does not exist
+    """
+
+    def __init__(self, cache_file: str) -> None:
+        self.cache_file = cache_file
+        self.new_entries: list[tuple] = []
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.connections: list[sqlite3.Connection] = []
+
+    def open(self) -> None:
+        """Create the cache table if needed."""
+        self.conn = sqlite3.connect(self.cache_file)
+        # Readers in other threads do not block the writer
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute(HEADER_CACHE_TABLE)
+        self.conn.commit()
+
+    def _reader(self) -> sqlite3.Connection:
+        """Returns the connection of the calling thread"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            # Only used by this thread, but closed by close() from the thread that opened the cache
+            conn = sqlite3.connect(database_uri(self.cache_file), uri=True, check_same_thread=False)
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def get(self, path: str, st: Union[os.stat_result, None] = None) -> Union[CachedHeaders, None]:
+        """Returns the cached headers of a file, or None if the file is not cached or has changed.
+
+        Parameters
+        ----------
+        path : str
+            Absolute path of the file
+        st : os.stat_result, optional
+            Current status of the file. If not given, the cached headers are returned without
+            checking whether the file has changed.
+        """
+        row = self._reader().execute("SELECT * FROM header_cache WHERE path = ?", (path,)).fetchone()
+        hit = row is not None and (st is None or tuple(row[1:4]) == file_key(st))
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not hit:
+            return None
+        hdus, error = row[4:]
+        return (decode_hdus(hdus) if hdus is not None else None), error
+
+    def put(
+        self, path: str, st: os.stat_result, hdus: Union[list[HDUInfo], None], error: Union[str, None] = None
+    ) -> None:
+        """Add the headers of a file, or the reason they could not be read, to the cache."""
+        entry = (path, *file_key(st), encode_hdus(hdus) if hdus is not None else None, error)
+        with self.lock:
+            self.new_entries.append(entry)
+
+    def save(self) -> None:
+        """Write the new entries to the file, replacing older entries for the same files."""
+        with self.lock:
+            entries, self.new_entries = self.new_entries, []
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO header_cache VALUES (?, ?, ?, ?, ?, ?)", entries)
+
+    def close(self) -> None:
+        """Save the new entries and close every connection."""
+        self.save()
+        for conn in self.connections:
+            conn.close()
+        self.connections.clear()
+        self.conn.close()
+
+    def cached_paths(self, directory: str) -> list[str]:
+        """Returns the absolute paths of the cached files in a directory tree, without looking at the files"""
+        prefix = os.path.join(os.path.abspath(directory), "")
+        # Paths between the prefix and the prefix with its last character incremented, using the primary key
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        rows = self.conn.execute("SELECT path FROM header_cache WHERE path >= ? AND path < ?", (prefix, upper))
+        return [r[0] for r in rows]
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def cached_file_paths(
+    cache_file: str, directory: str, search_pattern: str = "*.fits", exclude_pattern: Union[str, None] = None
+) -> list[Path]:
+    """List the cached files in a directory tree, as get_file_paths() would list the files themselves.
+
+    Parameters
+    ----------
+    cache_file : str
+        Name of the SQLite file holding the cache
+    directory : str
+        Head of the directory tree
+    search_pattern : str, optional
+        Only list files matching this pattern
+    exclude_pattern : str, optional
+        Do not list files matching this pattern
+
+    Returns
+    -------
+    list[Path]
+        Paths of the cached files, relative to the directory
+
+    Raises
+    ------
+    FileNotFoundError
+        If no file of the directory tree is cached
+    """
+    cache = HeaderCache(cache_file)
+    cache.open()
+    base = os.path.abspath(directory)
+    paths = (Path(os.path.relpath(p, base)) for p in cache.cached_paths(directory))
+    file_list = list(match_paths(paths, search_pattern, exclude_pattern))
+    cache.close()
+    if not file_list:
+        raise FileNotFoundError(f"No files of directory ({base}) found in the header cache ({cache_file}).")
+    return file_list
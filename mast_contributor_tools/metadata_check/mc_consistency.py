@@ -0,0 +1,203 @@
+"""Check that the fields of file names match the keywords in the headers of the files.
+
+The mission, instrument, target and filter fields of a 9-field file name should agree with
+the TELESCOP, INSTRUME, TARGNAME and FILTER keywords of the file. The fields are in the
+results database of a filename check, and the keywords in the results database of a metadata
+check; both are attached to a single SQLite connection and compared with one indexed join,
+so neither side is loaded into Python.
+
+Header values are written in many ways ('HST', 'Magellan Clay', 'NIRCAM'), so they are
+normalized, and the aliases listed in oif.yaml are replaced by the value used in file names,
+before they are compared.
+"""
+
+import os
+import sqlite3
+from collections import Counter
+
+from mast_contributor_tools.filename_check.fc_db import database_uri
+
+# Header keyword holding the value of each filename field
+FIELD_KEYWORDS = {"mission": "TELESCOP", "instrument": "INSTRUME", "target_name": "TARGNAME", "filter": "FILTER"}
+
+# Lower case, with spaces and underscores written as hyphens, as in file names. normalize() is the same in Python.
+NORMALIZED = "lower(replace(replace(trim({0}), ' ', '-'), '_', '-'))"
+ALIASES_TABLE = """
+        CREATE TEMP TABLE aliases (
+        name  TEXT NOT NULL,
+        alias  TEXT NOT NULL,
+        value  TEXT NOT NULL,
+        PRIMARY KEY (name, alias)
+        ) WITHOUT ROWID;
+        """
+# Aliases with wildcards, such as 'kb*', which are matched with GLOB rather than looked up
+ALIAS_PATTERNS_TABLE = (
+    "CREATE TEMP TABLE alias_patterns (name TEXT NOT NULL, pattern TEXT NOT NULL, value TEXT NOT NULL)"
+)
+FIELD_KEYWORDS_TABLE = "CREATE TEMP TABLE field_keywords (name TEXT PRIMARY KEY, keyword TEXT NOT NULL) WITHOUT ROWID"
+
+CONSISTENCY_COLUMNS = ["file_ref", "name", "field_value", "keyword", "header_value", "header_field", "verdict"]
+CONSISTENCY_TABLE = """
+        CREATE TABLE main.consistency (
+        file_ref  TEXT NOT NULL,
+        name  TEXT NOT NULL,
+        field_value  TEXT NOT NULL,
+        keyword  TEXT NOT NULL,
+        header_value  TEXT NOT NULL,
+        header_field  TEXT NOT NULL,
+        verdict  TEXT NOT NULL CHECK("verdict" IN ('PASS', 'NEEDS REVIEW'))
+        );
+        """
+# The fields of each name are found through ix_fields_name_value, and the keyword of each of
+# them through ix_keywords_file_ref: one lookup per field rather than a scan of either table.
+# CROSS JOIN fixes that order, since SQLite has no statistics on the small temporary table.
+# A field matches if its value, or one of its hyphen-separated elements for multi-valued
+# fields such as 'acs-wfc3', is the header value, ignoring hyphens (as in 'ngc1234' and 'NGC 1234').
+CONSISTENCY = f"""
+        WITH compared AS (
+            SELECT fl.file_ref, fl.name, fl.value AS field_value, kw.keyword, kw.value AS header_value,
+                   COALESCE(
+                       (SELECT a.value FROM temp.aliases AS a
+                        WHERE a.name = fl.name AND a.alias = {NORMALIZED.format("kw.value")}),
+                       (SELECT p.value FROM temp.alias_patterns AS p
+                        WHERE p.name = fl.name AND {NORMALIZED.format("kw.value")} GLOB p.pattern LIMIT 1),
+                       {NORMALIZED.format("kw.value")}
+                   ) AS header_field
+            FROM temp.field_keywords AS fk
+            CROSS JOIN names.fields AS fl ON fl.name = fk.name
+            JOIN metadata.keywords AS kw ON kw.file_ref = fl.file_ref AND kw.keyword = fk.keyword
+            WHERE kw.value IS NOT NULL AND trim(kw.value) != ''
+        )
+        SELECT file_ref, name, field_value, keyword, header_value, header_field,
+               CASE WHEN lower(field_value) = header_field
+                      OR instr('-' || lower(field_value) || '-', '-' || header_field || '-') > 0
+                      OR replace(lower(field_value), '-', '') = replace(header_field, '-', '')
+               THEN 'PASS' ELSE 'NEEDS REVIEW' END
+        FROM compared
+        """
+CONSISTENCY_INDEX = "CREATE INDEX main.ix_consistency_verdict ON consistency(verdict, name, file_ref)"
+
+
+def normalize(value: str) -> str:
+    """Returns a header value or alias normalized as by the NORMALIZED SQL expression"""
+    return value.strip().replace(" ", "-").replace("_", "-").lower()
+
+
+def oif_aliases(oif: dict) -> list[tuple[str, str, str]]:
+    """Returns the field name, normalized alias and value of each alias of a mission or instrument in oif.yaml
+
+    Each mission and instrument is an alias of itself, so that header values that differ
+    only by case or spacing are recognized too.
+    """
+    aliases = []
+    for mission, mission_cfg in oif.items():
+        for alias in [mission, *(mission_cfg.get("aliases") or [])]:
+            aliases.append(("mission", normalize(alias), mission))
+        for instrument, instrument_cfg in (mission_cfg.get("instruments") or {}).items():
+            for alias in [instrument, *((instrument_cfg or {}).get("aliases") or [])]:
+                aliases.append(("instrument", normalize(alias), instrument))
+    return aliases
+
+
+class ConsistencyCheck:
+    """Compare the file name fields in a filename check results database with the header
+    keywords in a metadata check results database.
+
+    Parameters
+    ----------
+    names_db : str
+        Results database of check_filenames
+    metadata_db : str
+        Results database of check_metadata, for the same files
+    """
+
+    def __init__(self, names_db: str, metadata_db: str) -> None:
+        self.names_db = names_db
+        self.metadata_db = metadata_db
+
+    def open(self, consistency_db: str = ":memory:") -> None:
+        """Attach both results databases (read-only) to a connection, and load the aliases.
+
+        Parameters
+        ----------
+        consistency_db : str, optional
+            Database to hold the 'consistency' table; in memory by default
+
+        Raises
+        ------
+        FileNotFoundError
+            Raised if either results database does not exist.
+        """
+        for db_file in [self.names_db, self.metadata_db]:
+            if not os.path.isfile(db_file):
+                raise FileNotFoundError(f"Results database '{db_file}' does not exist.")
+        self.conn = sqlite3.connect(consistency_db, uri=True)
+        try:
+            for alias, db_file in [("names", self.names_db), ("metadata", self.metadata_db)]:
+                self.conn.execute(f"ATTACH DATABASE ? AS {alias}", [database_uri(db_file)])
+            self._load_aliases()
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+
+    def _load_aliases(self) -> None:
+        """Load the aliases of field values, and the header keyword of each field, into temporary tables."""
+        from mast_contributor_tools.filename_check.hlsp_filename import oif
+
+        for statement in [ALIASES_TABLE, ALIAS_PATTERNS_TABLE, FIELD_KEYWORDS_TABLE]:
+            self.conn.execute(statement)
+        aliases = oif_aliases(oif)
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO temp.aliases VALUES (?, ?, ?)", [a for a in aliases if not _is_pattern(a[1])]
+        )
+        self.conn.executemany(
+            "INSERT INTO temp.alias_patterns VALUES (?, ?, ?)", [a for a in aliases if _is_pattern(a[1])]
+        )
+        self.conn.executemany("INSERT INTO temp.field_keywords VALUES (?, ?)", FIELD_KEYWORDS.items())
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def comparisons(self) -> sqlite3.Cursor:
+        """Returns a cursor over the comparison of each field with its header keyword, with CONSISTENCY_COLUMNS."""
+        return self.conn.execute(CONSISTENCY)
+
+    def write_db(self) -> Counter:
+        """Write the comparisons into the 'consistency' table of the consistency database.
+
+        Returns
+        -------
+        Counter
+            Number of comparisons with each verdict
+        """
+        self.conn.execute("DROP TABLE IF EXISTS main.consistency")
+        self.conn.execute(CONSISTENCY_TABLE)
+        self.conn.execute(f"INSERT INTO main.consistency {CONSISTENCY}")
+        self.conn.execute(CONSISTENCY_INDEX)
+        self.conn.commit()
+        return Counter(dict(self.conn.execute("SELECT verdict, COUNT(*) FROM main.consistency GROUP BY verdict")))
+
+    def mismatches(self, limit: int = 20) -> list[tuple]:
+        """Returns the most common mismatched (field, field value, header value), with their number of files"""
+        query = """SELECT name, field_value, header_value, COUNT(*) AS n FROM main.consistency
+                   WHERE verdict = 'NEEDS REVIEW' GROUP BY name, field_value, header_value ORDER BY n DESC LIMIT ?"""
+        return self.conn.execute(query, (limit,)).fetchall()
+
+
+def _is_pattern(alias: str) -> bool:
+    """Returns whether an alias has wildcards, like a shell pattern"""
+    return any(c in alias for c in "*?[")
+
+
+def summarize_consistency(counts: Counter, mismatches: list[tuple]) -> str:
+    """Returns a summary of the number of fields matching their header keyword, and the most common mismatches."""
+    summary_message = "Consistency summary:\n    "
+    summary_message += f"Fields matching the header: {counts['PASS']}\n    "
+    summary_message += f"Fields needing review: {counts['NEEDS REVIEW']}"
+    if mismatches:
+        summary_message += "\nMost common mismatches:\n    "
+        summary_message += "\n    ".join(
+            f"{name}='{field_value}', {FIELD_KEYWORDS[name]}='{header_value}': {n} files"
+            for name, field_value, header_value, n in mismatches
+        )
+    return summary_message
@@ -0,0 +1,150 @@
+"""Create and manage an SQLite database for storing results of metadata checking.
+
+The database works as the filename check results database (see filename_check.fc_db), with a
+table of files and a table of the keywords checked in each file.
+"""
+
+from itertools import chain
+
+from mast_contributor_tools.filename_check.fc_db import Hlsp_SQLiteDb
+
+FITS_FILE_TABLE = """
+        CREATE TABLE IF NOT EXISTS fits_file (
+        path  TEXT NOT NULL DEFAULT '.',
+        filename  TEXT NOT NULL UNIQUE,
+        final_verdict  TEXT CHECK("final_verdict" IN ('PASS', 'FAIL', 'NEEDS REVIEW')),
+        n_hdus  INTEGER,
+        error  TEXT,
+        read_ms  REAL,
+        checksum_bytes  INTEGER,
+        checksum_ms  REAL
+        );
+        """
+# Type and value scores are NULL for keywords that were not found, or whose type is wrong
+KEYWORDS_TABLE = """
+        CREATE TABLE IF NOT EXISTS keywords (
+        file_ref  TEXT NOT NULL,
+        hdu  INTEGER,
+        keyword  TEXT NOT NULL,
+        value  TEXT,
+        presence_score  TEXT NOT NULL CHECK("presence_score" IN ('pass', 'fail', 'needs review')),
+        type_score  TEXT CHECK("type_score" IN ('pass', 'fail')),
+        value_score  TEXT CHECK("value_score" IN ('pass', 'fail', 'needs review')),
+        keyword_verdict  TEXT NOT NULL CHECK("keyword_verdict" IN ('PASS', 'FAIL', 'NEEDS REVIEW')),
+        FOREIGN KEY(file_ref) REFERENCES fits_file(filename)
+        );
+        """
+# Columns of the binary tables of each file, with their statistics if the data were read (see fits_table)
+TABLE_COLUMNS_TABLE = """
+        CREATE TABLE IF NOT EXISTS table_columns (
+        file_ref  TEXT NOT NULL,
+        hdu  INTEGER NOT NULL,
+        column_number  INTEGER NOT NULL,
+        name  TEXT,
+        tform  TEXT NOT NULL,
+        tunit  TEXT,
+        n_rows  INTEGER,
+        n_nan  INTEGER,
+        n_null  INTEGER,
+        min  REAL,
+        max  REAL,
+        FOREIGN KEY(file_ref) REFERENCES fits_file(filename)
+        );
+        """
+KEYWORD_PROBLEMS_VIEW = """
+        CREATE VIEW IF NOT EXISTS potential_problems as
+        select ff.path, ff.filename, kw.hdu, kw.keyword, kw.value, kw.presence_score, kw.type_score,
+        kw.value_score, kw.keyword_verdict
+        from fits_file as ff, keywords as kw
+        where ff.filename = kw.file_ref
+        AND kw.keyword_verdict != 'PASS';
+        """
+
+METADATA_INDEXES = {
+    "ix_fits_file_path": "fits_file(path, filename)",
+    "ix_fits_file_verdict": "fits_file(final_verdict, path, filename)",
+    "ix_fits_file_read_ms": "fits_file(read_ms, path)",
+    "ix_keywords_file_ref": "keywords(file_ref, keyword)",
+    "ix_keywords_verdict": "keywords(keyword_verdict, keyword, file_ref)",
+    "ix_table_columns_file_ref": "table_columns(file_ref, hdu, column_number)",
+    "ix_table_columns_name": "table_columns(name, file_ref)",
+}
+KEYWORD_COUNTS_TABLE = """
+        CREATE TABLE value_counts AS
+        SELECT keyword, value, keyword_verdict, COUNT(*) AS n
+        FROM keywords GROUP BY keyword, value, keyword_verdict;
+        """
+
+# Columns of the fits_file and keywords tables, in order
+FITS_FILE_COLUMNS = ["path", "filename", "final_verdict", "n_hdus", "error", "read_ms", "checksum_bytes", "checksum_ms"]
+KEYWORD_COLUMNS = [
+    "file_ref",
+    "hdu",
+    "keyword",
+    "value",
+    "presence_score",
+    "type_score",
+    "value_score",
+    "keyword_verdict",
+]
+
+TABLE_COLUMN_COLUMNS = [
+    "file_ref",
+    "hdu",
+    "column_number",
+    "name",
+    "tform",
+    "tunit",
+    "n_rows",
+    "n_nan",
+    "n_null",
+    "min",
+    "max",
+]
+
+INSERT_FITS_FILE_RECORD = """INSERT INTO fits_file VALUES(:path,:filename,:final_verdict,:n_hdus,:error,:read_ms,:checksum_bytes,:checksum_ms)"""
+INSERT_KEYWORD_RECORD = """INSERT INTO keywords VALUES(:file_ref,:hdu,:keyword,:value,:presence_score,:type_score,:value_score,:keyword_verdict)"""
+INSERT_TABLE_COLUMN_RECORD = f"INSERT INTO table_columns VALUES({','.join(':' + c for c in TABLE_COLUMN_COLUMNS)})"
+
+
+class Hlsp_MetadataDb(Hlsp_SQLiteDb):
+    """Create an SQLite DB to store the results of a metadata check.
+
+    Parameters
+    ----------
+    filename : str
+        name of the SQLite DB file to be created
+    """
+
+    schema = [FITS_FILE_TABLE, KEYWORDS_TABLE, TABLE_COLUMNS_TABLE, KEYWORD_PROBLEMS_VIEW]
+    insert_file = INSERT_FITS_FILE_RECORD
+    insert_field = INSERT_KEYWORD_RECORD
+    file_table = "fits_file"
+    indexes = METADATA_INDEXES
+    value_counts = KEYWORD_COUNTS_TABLE
+
+    def insert_records(self, file_records: list[dict], keyword_records: list[list[dict]]) -> None:
+        """Insert the records of files and their keywords, and the records of the table columns of each file
+
+        The columns of a file, if its tables were checked, are in the 'columns' of its record.
+        """
+        super().insert_records(file_records, keyword_records)
+        columns = chain.from_iterable(r.get("columns", []) for r in file_records)
+        self.conn.executemany(INSERT_TABLE_COLUMN_RECORD, columns)
+
+    def slowest_paths(self, n: int = 5) -> list[tuple[str, int, float, float]]:
+        """Returns the directories whose headers took longest to read on average, to spot slow storage
+
+        Parameters
+        ----------
+        n : int, optional
+            Number of directories to return
+
+        Returns
+        -------
+        list[tuple[str, int, float, float]]
+            The path, number of files, and mean and maximum read time in milliseconds of each directory
+        """
+        query = """SELECT path, COUNT(*), AVG(read_ms), MAX(read_ms) FROM fits_file
+                   WHERE read_ms IS NOT NULL GROUP BY path ORDER BY AVG(read_ms) DESC LIMIT ?"""
+        return self.conn.execute(query, (n,)).fetchall()
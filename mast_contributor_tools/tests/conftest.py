@@ -0,0 +1,14 @@
+"""
+Fixtures shared by every test
+"""
+
+import pytest
+
+from mast_contributor_tools.utils.logger_config import LOG_FILE_ENV, set_log_file
+
+
+@pytest.fixture(autouse=True)
+def no_log_file(monkeypatch) -> None:
+    """Keep the tests, and the commands they run, from writing to the log file of the user"""
+    monkeypatch.setenv(LOG_FILE_ENV, "")
+    set_log_file("")
@@ -2,10 +2,22 @@
 Tests for mast_contributor_tools/filename_check/fc_app.py
 """
 
+import json
+import sqlite3
+import time
 from pathlib import Path
 from unittest import mock
 
-from mast_contributor_tools.filename_check.fc_app import check_filenames, get_file_paths
+import pytest
+
+from mast_contributor_tools.filename_check.fc_app import (
+    check_filenames,
+    evaluate_name,
+    get_file_paths,
+    iter_file_paths,
+    sample_filenames,
+)
+from mast_contributor_tools.filename_check.fc_cache import config_hash
 
 
 def fake_directory() -> list[Path]:
@@ -36,20 +48,112 @@ def test_get_file_paths(mock_isfile, mock_rglob) -> None:
     output = get_file_paths("fake-directory", max_n=2)
     assert len(output) == 2
     # Test that the search_pattern argument performs as expected
-    output = get_file_paths("fake-directory", search_pattern='*1.fits')
+    output = get_file_paths("fake-directory", search_pattern="*1.fits")
     assert len(output) == 1
     # Test that the exclude_pattern argument performs as expected
-    output = get_file_paths("fake-directory", exclude_pattern='*1.fits')
+    output = get_file_paths("fake-directory", exclude_pattern="*1.fits")
     assert len(output) == 2
 
+
+def test_get_file_paths_walk(tmp_path) -> None:
+    """Test that walking the directory with os.scandir() finds the same files as Path.rglob(), without symlinked directories"""
+    for name in ["a/file1.fits", "a/b/file2.fits", "file3.png", "a/b/c/file4.fits"]:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("")
+    (tmp_path / "link").symlink_to(tmp_path / "a", target_is_directory=True)
+    walked = get_file_paths(str(tmp_path), discovery="walk")
+    assert sorted(walked) == sorted(get_file_paths(str(tmp_path)))
+    assert len(walked) == 4
+    assert sorted(get_file_paths(str(tmp_path), search_pattern="*.fits", discovery="walk")) == [
+        Path("a/b/c/file4.fits"),
+        Path("a/b/file2.fits"),
+        Path("a/file1.fits"),
+    ]
+
+
 @mock.patch("mast_contributor_tools.filename_check.fc_app.HlspFileName")
-@mock.patch("mast_contributor_tools.filename_check.fc_app.Hlsp_SQLiteDb")
-def test_check_filenames(mock_Hlsp_SQLiteDb, mock_HlspFileName) -> None:
+@mock.patch("mast_contributor_tools.filename_check.fc_sinks.get_sink")
+def test_check_filenames(mock_get_sink, mock_HlspFileName, tmp_path) -> None:
     """Test that the check_filenames() function calls the right classes"""
+    mock_HlspFileName().evaluate_filename.return_value = {"filename": "file1.fits", "final_verdict": "PASS"}
+    mock_HlspFileName.reset_mock()
     # Run function
-    check_filenames("hlsp-name", file_list=fake_directory(), dbFile="test_file.db")
+    metrics_file = tmp_path / "metrics.json"
+    check_filenames(
+        "hlsp-name", file_list=fake_directory(), dbFile="test_file.db", batch_size=2, metrics_file=str(metrics_file)
+    )
     # Assert expected calls were made
-    # assert mock_Hlsp_SQLiteDb object was made
-    mock_Hlsp_SQLiteDb.assert_called_once()
+    # assert the result sink was made, and the results written in batches
+    mock_get_sink.assert_called_once_with("sqlite", "test_file.db", background=True)
+    assert mock_get_sink().write_batch.call_count == 2
+    mock_get_sink().close.assert_called_once()
     # Assert HlspFileName was called once for each file
     assert mock_HlspFileName.call_count == len(fake_directory())
+    # Assert the metrics of the run were recorded
+    mock_get_sink().record_run.assert_called_once()
+    metrics = json.loads(metrics_file.read_text())
+    assert metrics["n_files"] == 3
+    assert metrics["counts"] == {"PASS": 3, "invalid": 0, "rejected": 0}
+    assert {"open", "evaluate", "write", "finish", "summarize", "close"} <= set(metrics["stages"])
+
+
+@mock.patch("mast_contributor_tools.filename_check.fc_sinks.get_sink")
+def test_check_filenames_evaluate_time(mock_get_sink, tmp_path) -> None:
+    """Test that writing the last batch, after the files are evaluated, is not taken off the evaluate time"""
+    mock_get_sink().write_batch.side_effect = lambda *args: time.sleep(0.05) or []
+    metrics_file = tmp_path / "metrics.json"
+    check_filenames("hlsp-name", fake_directory(), "test_file.db", batch_size=10, metrics_file=str(metrics_file))
+    stages = json.loads(metrics_file.read_text())["stages"]
+    assert stages["evaluate"] >= 0
+    assert stages["write"] >= 0.05
+
+
+def test_evaluate_name() -> None:
+    """Test that evaluate_name() returns one record per name, or an error for invalid names"""
+    record = evaluate_name("subdir/hlsp_my-hlsp_jwst_nircam_target1_f200w_v1_spec.fits")
+    assert record["path"] == "subdir"
+    assert record["final_verdict"] == "PASS"
+    assert len(record["fields"]) == record["n_elements"] == 9
+    assert "file_ref" not in record["fields"][0]
+    assert evaluate_name("hlsp_my-hlsp_readme.md", hlsp_name="other-hlsp")["final_verdict"] == "FAIL"
+    assert "error" in evaluate_name("readme.md")
+    assert "error" in evaluate_name("hlsp_my-hlsp_v1_readme")
+
+
+def test_check_filenames_vocabulary(tmp_path) -> None:
+    """Test that the values of a collection vocabulary pass, and that the vocabulary is recorded with the results"""
+    vocabulary_file = tmp_path / "vocabulary.yaml"
+    vocabulary_file.write_text("filters: [F062, f160w]\nproduct_types: [photz, img]\n")
+    file_list = [
+        Path("hlsp_my-hlsp_roman_wfi_m31_f062_v1_photz.fits"),
+        Path("hlsp_my-hlsp_hst_wfc3_m31_f062_v1_img.fits"),
+    ]
+    db_file = tmp_path / "results.db"
+    check_filenames("my-hlsp", file_list, str(db_file), vocabulary_file=str(vocabulary_file))
+    conn = sqlite3.connect(db_file)
+    verdicts = dict(conn.execute("SELECT filename, final_verdict FROM filename"))
+    metrics = json.loads(conn.execute("SELECT metrics FROM runs").fetchone()[0])
+    conn.close()
+    # The mission and instrument of the first file are still unknown
+    assert verdicts == {file_list[0].name: "NEEDS REVIEW", file_list[1].name: "PASS"}
+    # Only values missing from the package configuration are recorded
+    assert metrics["vocabulary"]["values"] == {"filters": ["f062"], "product_types": ["photz"]}
+    assert metrics["vocabulary"]["file"] == str(vocabulary_file)
+    assert metrics["config_hash"] != config_hash()
+
+
+def test_sample_filenames(tmp_path) -> None:
+    """Test that sample_filenames() streams the files of a directory and estimates their verdicts"""
+    for i in range(20):
+        subdir = tmp_path / f"dir{i % 2}"
+        subdir.mkdir(exist_ok=True)
+        # Every file in dir1 fails, for its uppercase target name
+        (subdir / f"hlsp_my-hlsp_hst_wfc3_{'T' if i % 2 else 't'}{i}_f160w_v1_img.fits").touch()
+    file_paths = iter_file_paths(str(tmp_path), exclude_pattern="*.png")
+    assert not isinstance(file_paths, list)
+    estimate = sample_filenames("my-hlsp", file_paths, sample_size=4, seed=1)
+    assert estimate.n_files == 20
+    assert estimate.n_strata == estimate.n_strata_checked == 2
+    assert estimate.proportions["PASS"] == estimate.proportions["FAIL"] == 0.5
+    with pytest.raises(FileNotFoundError):
+        sample_filenames("my-hlsp", iter_file_paths(str(tmp_path), search_pattern="*.png"), sample_size=4)
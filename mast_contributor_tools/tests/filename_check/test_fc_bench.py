@@ -0,0 +1,61 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_bench.py
+"""
+
+from mast_contributor_tools.filename_check import fc_bench
+from mast_contributor_tools.filename_check.fc_bench import (
+    Trial,
+    configurations,
+    format_bench,
+    make_corpus,
+    recommend,
+    run_bench,
+    time_discovery,
+)
+
+
+def test_configurations() -> None:
+    """Test that the SQLite writer is only varied for SQLite results"""
+    assert len(configurations("sqlite")) == 2 * len(fc_bench.BATCH_SIZES)
+    assert {c["sqlite_writer"] for c in configurations("ndjson")} == {"background"}
+
+
+def test_make_corpus(tmp_path) -> None:
+    """Test that the synthetic collection is spread over directories, and every discovery strategy lists it"""
+    make_corpus(str(tmp_path), fc_bench.FILES_PER_DIRECTORY + 10, "my-hlsp")
+    assert len(list(tmp_path.iterdir())) == 2
+    assert len(list((tmp_path / "dir0001").iterdir())) == 10
+    assert set(time_discovery(str(tmp_path), 100)) == {"glob", "walk"}
+
+
+def test_recommend() -> None:
+    """Test that the trial using the least memory is recommended among those almost as fast as the fastest"""
+    trials = [
+        Trial({"batch_size": 250}, 1000.0, 30.0),
+        Trial({"batch_size": 1000}, 1200.0, 40.0),
+        Trial({"batch_size": 5000}, 1180.0, 35.0),
+    ]
+    assert recommend(trials).settings == {"batch_size": 5000}
+    assert recommend(trials[:2]).settings == {"batch_size": 1000}
+
+
+def test_run_bench(tmp_path, monkeypatch) -> None:
+    """Test that each configuration is tried on the synthetic collection, in a process of its own"""
+    monkeypatch.setattr(fc_bench, "BATCH_SIZES", [20])
+    result = run_bench(n_files=50)
+    assert [t.settings for t in result.trials] == [
+        {"batch_size": 20, "sqlite_writer": "background"},
+        {"batch_size": 20, "sqlite_writer": "inline"},
+    ]
+    assert all(t.files_per_sec > 0 for t in result.trials)
+    assert result.recommended["discovery"] in result.discovery_sec
+    assert "Recommended settings: batch_size=20" in format_bench(result)
+    assert result.record()["n_files"] == 50
+
+    # Files listed in a file are not discovered, so the default strategy is kept
+    file_list = tmp_path / "files.txt"
+    file_list.write_text("hlsp_my-hlsp_hst_wfc3_m31_f160w_v1_spec.fits\n")
+    result = run_bench("my-hlsp", from_file=str(file_list), output_format="ndjson")
+    assert result.n_files == 1
+    assert len(result.trials) == 1
+    assert result.recommended == {"batch_size": 20, "sqlite_writer": "background", "discovery": "glob"}
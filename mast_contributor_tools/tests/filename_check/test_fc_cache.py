@@ -0,0 +1,107 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_cache.py
+"""
+
+import sqlite3
+from pathlib import Path
+from unittest import mock
+
+from mast_contributor_tools.filename_check.fc_cache import CONFIG_FILES, MAX_CONFIGS, VerdictCache, config_hash
+from mast_contributor_tools.filename_check.hlsp_filename import FilenameFieldAB, HlspFileName
+
+TEST_FILENAME = "hlsp_fake-hlsp_jwst_nircam_target1_f200w_v1_spec.fits"
+
+
+def evaluate(filename: str, hlsp_name: str, cache: VerdictCache) -> tuple[list[dict], dict]:
+    """Helper to evaluate a filename using the cache"""
+    hfn = HlspFileName(Path(filename), hlsp_name)
+    hfn.partition()
+    hfn.create_fields()
+    elements = hfn.evaluate_fields(cache)
+    return elements, hfn.evaluate_filename()
+
+
+def test_config_hash(tmp_path) -> None:
+    """Test that the config hash changes when a config file changes"""
+    assert config_hash() == config_hash(CONFIG_FILES)
+    config_file = tmp_path / "oif.yaml"
+    config_file.write_text("jwst: {}")
+    first_hash = config_hash([str(config_file)])
+    config_file.write_text("jwst: {}\nhst: {}")
+    assert config_hash([str(config_file)]) != first_hash
+
+
+def test_cache_scores_match(tmp_path) -> None:
+    """Test that cached scores are the same as evaluated scores"""
+    cache = VerdictCache(str(tmp_path / "cache.db"), cfg_hash="abc")
+    cache.load()
+    expected = evaluate(TEST_FILENAME, "fake-hlsp", None)
+    assert evaluate(TEST_FILENAME, "fake-hlsp", cache) == expected
+    assert cache.hits == 0
+    assert evaluate(TEST_FILENAME, "fake-hlsp", cache) == expected
+    assert cache.hits == cache.misses == 9
+    assert cache.hit_rate == 0.5
+
+
+def test_cache_persists(tmp_path) -> None:
+    """Test that the cache is reused by later runs with the same configuration only"""
+    cache_file = str(tmp_path / "cache.db")
+    cache = VerdictCache(cache_file, cfg_hash="abc")
+    cache.load()
+    evaluate(TEST_FILENAME, "fake-hlsp", cache)
+    cache.save()
+
+    # A warm run should not evaluate any fields
+    warm_cache = VerdictCache(cache_file, cfg_hash="abc")
+    warm_cache.load()
+    assert len(warm_cache.entries) == 9
+    with mock.patch("mast_contributor_tools.filename_check.hlsp_filename.FieldRule") as mock_rule:
+        _, file_rec = evaluate(TEST_FILENAME, "fake-hlsp", warm_cache)
+        mock_rule.capitalization.assert_not_called()
+    assert file_rec["final_verdict"] == "PASS"
+
+    # Changing the configuration invalidates the cache, but keeps the entries of the previous one
+    new_cache = VerdictCache(cache_file, cfg_hash="def")
+    new_cache.load()
+    assert len(new_cache.entries) == 0
+    evaluate(TEST_FILENAME, "fake-hlsp", new_cache)
+    new_cache.save()
+    old_cache = VerdictCache(cache_file, cfg_hash="abc")
+    old_cache.load()
+    assert len(old_cache.entries) == 9
+
+
+def test_cache_max_configs(tmp_path) -> None:
+    """Test that only the entries of the configurations saved most recently are kept"""
+    cache_file = str(tmp_path / "cache.db")
+    for i in range(MAX_CONFIGS + 1):
+        cache = VerdictCache(cache_file, cfg_hash=f"hash{i}")
+        evaluate(TEST_FILENAME, "fake-hlsp", cache)
+        cache.save()
+    conn = sqlite3.connect(cache_file)
+    hashes = {row[0] for row in conn.execute("SELECT DISTINCT config_hash FROM verdict_cache")}
+    conn.close()
+    assert hashes == {f"hash{i}" for i in range(1, MAX_CONFIGS + 1)}
+
+
+def test_cache_scores_once(tmp_path) -> None:
+    """Test that the scores of a field missing from the cache are only gathered once"""
+    cache = VerdictCache(str(tmp_path / "cache.db"), cfg_hash="abc")
+    with mock.patch.object(FilenameFieldAB, "get_scores", autospec=True, side_effect=FilenameFieldAB.get_scores) as m:
+        elements, _ = evaluate(TEST_FILENAME, "fake-hlsp", cache)
+    assert m.call_count == len(elements) == 9
+
+
+def test_cache_hlsp_name(tmp_path) -> None:
+    """Test that the hlsp_name field is cached separately for each collection"""
+    cache = VerdictCache(str(tmp_path / "cache.db"), cfg_hash="abc")
+    evaluate(TEST_FILENAME, "fake-hlsp", cache)
+    _, file_rec = evaluate(TEST_FILENAME, "other-hlsp", cache)
+    assert file_rec["final_verdict"] == "FAIL"
+
+
+def test_cache_max_entries(tmp_path) -> None:
+    """Test that the cache does not grow beyond its maximum size"""
+    cache = VerdictCache(str(tmp_path / "cache.db"), cfg_hash="abc", max_entries=3)
+    evaluate(TEST_FILENAME, "fake-hlsp", cache)
+    assert len(cache.entries) == 3
@@ -0,0 +1,163 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_config.py
+"""
+
+import dataclasses
+import os
+from pathlib import Path
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_cache import config_hash
+from mast_contributor_tools.filename_check.fc_config import (
+    DEFAULT_CONFIG_FILE,
+    DEFAULT_OIF_FILE,
+    ConfigRegistry,
+    get_rules,
+    load_rules,
+    load_vocabulary,
+)
+from mast_contributor_tools.filename_check.fc_stream import NameStream
+from mast_contributor_tools.filename_check.hlsp_filename import HlspFileName
+
+TEST_NAME = "hlsp_my-hlsp_newscope_newcam_m31_f200w_v1_img.fits"
+NEW_OIF = """
+newscope:
+  instruments:
+    newcam:
+      filters:
+        - f200w
+"""
+
+
+@pytest.fixture
+def oif_file(tmp_path) -> Path:
+    """An oif.yaml listing a single new mission"""
+    path = tmp_path / "oif.yaml"
+    path.write_text(NEW_OIF)
+    return path
+
+
+def verdicts(rules=None) -> dict:
+    """Returns the verdict of each field of TEST_NAME, checked with a rule set"""
+    hfn = HlspFileName(Path(TEST_NAME), "my-hlsp", rules)
+    hfn.partition()
+    hfn.create_fields()
+    return {f["name"]: f["field_verdict"] for f in hfn.evaluate_fields()}
+
+
+def test_load_rules() -> None:
+    """Test that the default rule set holds the package vocabularies, and cannot be changed"""
+    rules = load_rules("default")
+    assert "fits" in rules.extension_types
+    assert {"hst", "jwst"} <= rules.missions
+    assert "nircam" in rules.instruments and "f200w" in rules.filters
+    assert rules.field_lengths["version_id"] == 9
+    assert rules.config_hash == config_hash()
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        rules.missions = frozenset()
+    with pytest.raises(TypeError):
+        rules.field_lengths["version_id"] = 20
+
+
+def test_load_rules_invalid(tmp_path) -> None:
+    """Test that an oif.yaml without instruments is rejected"""
+    oif_file = tmp_path / "oif.yaml"
+    oif_file.write_text("newscope:\n  filters: [f200w]\n")
+    with pytest.raises(ValueError, match="Invalid configuration for rule set 'bad'"):
+        load_rules("bad", oif_file=str(oif_file))
+
+
+def test_load_rules_vocabulary(tmp_path) -> None:
+    """Test that a collection vocabulary is merged into the vocabularies of a rule set"""
+    vocabulary_file = tmp_path / "vocabulary.yaml"
+    vocabulary_file.write_text("missions: [NewScope]\nfilters: [f200w, f999w]\nextensions: []\n")
+    rules = load_rules("my-hlsp", vocabulary_file=str(vocabulary_file))
+    assert {"newscope", "hst"} <= rules.missions
+    assert {"f999w", "f200w"} <= rules.filters
+    assert dict(rules.vocabulary) == {"missions": ("newscope",), "filters": ("f999w",), "extensions": ()}
+    assert rules.files[2] == str(vocabulary_file)
+    assert rules.config_hash != load_rules("default").config_hash
+    assert load_rules("default").vocabulary == {}
+
+
+@pytest.mark.parametrize(
+    "vocabulary",
+    ["telescopes: [newscope]", "filters: f200w", "- f200w", "filters: [f200w"],
+    ids=["unknown-section", "not-a-list", "not-a-mapping", "invalid-yaml"],
+)
+def test_load_vocabulary_invalid(tmp_path, vocabulary) -> None:
+    """Test that invalid vocabulary files are rejected"""
+    vocabulary_file = tmp_path / "vocabulary.yaml"
+    vocabulary_file.write_text(vocabulary)
+    with pytest.raises(ValueError, match="Invalid vocabulary file"):
+        load_vocabulary(str(vocabulary_file))
+
+
+def test_rule_sets_coexist(oif_file) -> None:
+    """Test that names are checked with the rule set passed to HlspFileName, or its name in a registry"""
+    registry = ConfigRegistry()
+    rules = registry.register("candidate", oif_file=str(oif_file))
+    assert rules.files == (DEFAULT_CONFIG_FILE, str(oif_file))
+    assert rules.config_hash != config_hash()
+    assert verdicts()["mission"] == "NEEDS REVIEW"
+    assert verdicts(rules)["mission"] == "PASS"
+    assert verdicts(rules)["filter"] == "PASS"
+    # The default rule set is unchanged
+    assert verdicts(get_rules())["instrument"] == "NEEDS REVIEW"
+    assert registry.names() == ["candidate"]
+
+
+def test_registry_unknown() -> None:
+    """Test that only the default rule set is registered on first use"""
+    registry = ConfigRegistry()
+    assert registry.get().name == "default"
+    with pytest.raises(KeyError, match="Unknown rule set 'other'"):
+        registry.get("other")
+
+
+def test_registry_reload(oif_file) -> None:
+    """Test that a rule set is swapped for a new one when its file changes, and kept if the new file is invalid"""
+    registry = ConfigRegistry(reload_interval=0)
+    rules = registry.register("candidate", oif_file=str(oif_file))
+    assert registry.get("candidate") is rules
+
+    oif_file.write_text(NEW_OIF.replace("newcam", "othercam"))
+    os.utime(oif_file, ns=(0, os.stat(oif_file).st_mtime_ns + 1_000_000))
+    reloaded = registry.get("candidate")
+    assert reloaded is not rules
+    assert "othercam" in reloaded.instruments and "newcam" in rules.instruments
+    assert reloaded.config_hash != rules.config_hash
+
+    oif_file.write_text("newscope: [")
+    os.utime(oif_file, ns=(0, os.stat(oif_file).st_mtime_ns + 1_000_000))
+    assert registry.get("candidate") is reloaded
+
+
+def test_registry_reload_interval(oif_file) -> None:
+    """Test that files are not checked again before the reload interval has passed"""
+    registry = ConfigRegistry(reload_interval=3600)
+    rules = registry.register("candidate", oif_file=str(oif_file))
+    oif_file.write_text(NEW_OIF.replace("newcam", "othercam"))
+    os.utime(oif_file, ns=(0, os.stat(oif_file).st_mtime_ns + 1_000_000))
+    assert registry.get("candidate") is rules
+    assert "othercam" in registry.reload("candidate").instruments
+
+
+def test_register_directory(oif_file, tmp_path) -> None:
+    """Test that a directory may hold any of the configuration files, the others being the package files"""
+    registry = ConfigRegistry()
+    rules = registry.register_directory("candidate", str(tmp_path))
+    assert rules.files == (DEFAULT_CONFIG_FILE, str(oif_file))
+    (tmp_path / "vocabulary.yaml").write_text("instruments: [othercam]\n")
+    assert "othercam" in registry.register_directory("candidate", str(tmp_path)).instruments
+    with pytest.raises(FileNotFoundError):
+        registry.register_directory("empty", str(tmp_path / "empty"))
+    assert DEFAULT_OIF_FILE not in rules.files
+
+
+def test_name_stream_rules(oif_file) -> None:
+    """Test that a name stream checks names with its own rule set"""
+    rules = load_rules("candidate", oif_file=str(oif_file))
+    assert '"final_verdict":"PASS"' in NameStream(rules=rules).check(TEST_NAME)
+    assert '"final_verdict":"NEEDS REVIEW"' in NameStream().check(TEST_NAME)
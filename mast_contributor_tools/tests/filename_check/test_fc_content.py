@@ -0,0 +1,126 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_content.py
+"""
+
+import bz2
+import gzip
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_app import check_filenames
+from mast_contributor_tools.filename_check.fc_content import (
+    add_content_fields,
+    content_mismatch,
+    content_record,
+    sniff_format,
+)
+
+FITS_HEAD = b"SIMPLE  =                    T" + b" " * 2850
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (FITS_HEAD, "fits"),
+        (b"\x89PNG\r\n\x1a\n\0\0\0\rIHDR", "png"),
+        (b"\xff\xd8\xff\xe0\0\x10JFIF", "jpeg"),
+        (b"GIF89a\x01\0", "gif"),
+        (b"%PDF-1.7\n", "pdf"),
+        (gzip.compress(b"data"), "gzip"),
+        (bz2.compress(b"data"), "bz2"),
+        (b"PK\x03\x04\x14\0", "zip"),
+        (b"\x89HDF\r\n\x1a\n\0", "hdf5"),
+        (b"#ASDF 1.0.0\n", "asdf"),
+        (b"  <!DOCTYPE html>\n<html>", "html"),
+        (b"# A readme\n", "text"),
+        (b"\x00\x01\x02", "binary"),
+        (b"", "empty"),
+    ],
+    ids=lambda v: v if isinstance(v, str) else None,
+)
+def test_sniff_format(head, expected) -> None:
+    """Test that formats are recognized from their signatures"""
+    assert sniff_format(head) == expected
+
+
+@pytest.mark.parametrize(
+    "extension, head, complete, mismatch",
+    [
+        ("fits", FITS_HEAD, False, None),
+        ("fits", b"<html><body>Not Found</body></html>", True, "expected fits"),
+        ("fits", FITS_HEAD[:512], True, "truncated, 512 bytes"),
+        ("png", b"\xff\xd8\xff\xe0", False, "expected png"),
+        ("fits.gz", gzip.compress(FITS_HEAD), True, None),
+        ("fits.gz", gzip.compress(b"<html></html>" * 100), True, "holds html, expected fits"),
+        ("fits.gz", gzip.compress(FITS_HEAD)[:-4], True, "truncated"),
+        ("fits.bz2", bz2.compress(FITS_HEAD)[:-5], True, "truncated"),
+        ("txt", b"<!doctype html>", True, None),
+        ("txt", gzip.compress(b"text"), True, "expected text"),
+        ("dat", b"\x00\x01", True, None),
+    ],
+    ids=[
+        "fits",
+        "fits-html",
+        "fits-truncated",
+        "png-jpeg",
+        "fits.gz",
+        "fits.gz-html",
+        "fits.gz-truncated",
+        "fits.bz2-truncated",
+        "txt-html",
+        "txt-gzip",
+        "dat",
+    ],
+)
+def test_content_mismatch(extension, head, complete, mismatch) -> None:
+    """Test that content that does not match the extension, or is truncated, is reported"""
+    result = content_mismatch(extension, head, complete)
+    if mismatch is None:
+        assert result is None
+    else:
+        assert result.startswith(mismatch)
+
+
+def test_content_record(tmp_path) -> None:
+    """Test that the content field of a file holds its format, and fails if it does not match"""
+    (tmp_path / "good.fits").write_bytes(FITS_HEAD)
+    (tmp_path / "page.fits").write_bytes(b"<html>Not Found</html>")
+    record = content_record(str(tmp_path / "good.fits"), "fits")
+    assert (record["name"], record["value"], record["field_verdict"]) == ("content", "fits", "PASS")
+    record = content_record(str(tmp_path / "page.fits"), "fits")
+    assert record["value"] == "html (expected fits)"
+    assert record["value_score"] == "fail"
+    record = content_record(str(tmp_path / "missing.fits"), "fits")
+    assert record["value"].startswith("unreadable")
+    assert record["field_verdict"] == "FAIL"
+
+
+def test_add_content_fields(tmp_path) -> None:
+    """Test that a content field is added to each file of a batch, failing files that do not match"""
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.fits").write_bytes(FITS_HEAD)
+    (tmp_path / "b.png").write_bytes(b"GIF89a")
+    file_recs = [
+        {"path": "sub", "filename": "a.fits", "final_verdict": "NEEDS REVIEW"},
+        {"path": ".", "filename": "b.png", "final_verdict": "PASS"},
+    ]
+    field_recs = [[{"name": "extension", "value": "fits"}], [{"name": "extension", "value": "png"}]]
+    add_content_fields(file_recs, field_recs, root=str(tmp_path), workers=2)
+    assert [r["final_verdict"] for r in file_recs] == ["NEEDS REVIEW", "FAIL"]
+    assert [fields[-1]["file_ref"] for fields in field_recs] == ["a.fits", "b.png"]
+    assert field_recs[1][-1]["value"] == "gif (expected png)"
+
+
+def test_check_filenames_content(tmp_path) -> None:
+    """Test that the content fields are written with the results"""
+    name = "hlsp_my-hlsp_jwst_nircam_target1_f200w_v1_spec.fits"
+    (tmp_path / name).write_bytes(b"<html>Not Found</html>")
+    db_file = tmp_path / "results.db"
+    check_filenames("my-hlsp", [Path(name)], str(db_file), root=str(tmp_path), check_content=True, metrics_file="")
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT final_verdict FROM filename").fetchone() == ("FAIL",)
+    problems = conn.execute("SELECT name, field_verdict FROM potential_problems").fetchall()
+    assert problems == [("content", "FAIL")]
+    conn.close()
@@ -3,12 +3,14 @@ Tests for mast_contributor_tools/filename_check/fc_db.py
 
 """
 
+import csv
 import os
+import sqlite3
 from unittest import mock
 
 import pytest
 
-from mast_contributor_tools.filename_check.fc_db import Hlsp_SQLiteDb
+from mast_contributor_tools.filename_check.fc_db import Hlsp_SQLiteDb, format_summary
 
 TEST_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_file.db")
 
@@ -171,6 +173,202 @@ def test_add_fields_xfail(field_record) -> None:
     test_db.close_db()
 
 
+@pytest.fixture
+def results_db(tmp_path) -> Hlsp_SQLiteDb:
+    """A small results database with one passing and one failing file"""
+    db = Hlsp_SQLiteDb(str(tmp_path / "results_fake.db"))
+    db.create_db()
+    for name, verdict in [("hlsp_fake_good.fits", "PASS"), ("hlsp_fake_BAD.fits", "FAIL")]:
+        db.add_filename({"path": ".", "filename": name, "final_verdict": verdict, "n_elements": 4})
+        score = verdict.lower()
+        db.add_fields(
+            [
+                {
+                    "file_ref": name,
+                    "name": "product_type",
+                    "value": name.split("_")[2].split(".")[0],
+                    "capitalization_score": score,
+                    "length_score": "pass",
+                    "format_score": "pass",
+                    "value_score": "pass",
+                    "field_verdict": verdict,
+                }
+            ]
+        )
+    yield db
+    db.close_db()
+
+
+def test_add_batch(results_db) -> None:
+    """Test that add_batch() only skips the files that are rejected"""
+    field = {
+        "name": "product_type",
+        "value": "new",
+        "capitalization_score": "pass",
+        "length_score": "pass",
+        "format_score": "pass",
+        "value_score": "pass",
+        "field_verdict": "PASS",
+    }
+    file_records = [
+        {"path": ".", "filename": "hlsp_fake_new.fits", "final_verdict": "PASS", "n_elements": 4},
+        {"path": "subdir", "filename": "hlsp_fake_good.fits", "final_verdict": "PASS", "n_elements": 4},
+    ]
+    field_records = [[{**field, "file_ref": r["filename"]}] for r in file_records]
+    rejected = results_db.add_batch(file_records, field_records)
+    # The duplicate file name is rejected, along with its fields
+    assert [r[0] for r in rejected] == ["hlsp_fake_good.fits"]
+    assert results_db.conn.execute("SELECT COUNT(*) FROM fields WHERE value = 'new'").fetchone()[0] == 1
+    assert results_db.verdict_counts() == {"PASS": 2, "FAIL": 1}
+
+
+def test_background_writer(results_db) -> None:
+    """Test that the writer thread writes every submitted batch and reports rejected files"""
+    results_db.start_writer(max_batches=1)
+    file_records = [
+        {"path": ".", "filename": f"hlsp_fake_new{i}.fits", "final_verdict": "PASS", "n_elements": 4} for i in range(5)
+    ]
+    for record in file_records:
+        results_db.submit_batch([record], [[]])
+    # The duplicate file name may be rejected after submit_batch() returns, so is reported by stop_writer()
+    duplicate = {"path": "subdir", "filename": "hlsp_fake_good.fits", "final_verdict": "PASS", "n_elements": 4}
+    rejected = results_db.submit_batch([duplicate], [[]])
+    rejected += results_db.stop_writer()
+    assert [r[0] for r in rejected] == ["hlsp_fake_good.fits"]
+    assert results_db.writer_status()["lag"] == 0
+    # The connection is usable again in this thread
+    assert results_db.verdict_counts() == {"PASS": 6, "FAIL": 1}
+
+
+def test_background_writer_error(results_db) -> None:
+    """Test that an error in the writer thread is raised in the calling thread"""
+    results_db.start_writer()
+    with mock.patch.object(results_db, "add_batch", side_effect=sqlite3.OperationalError("disk I/O error")):
+        results_db.submit_batch([{}], [[]])
+        with pytest.raises(sqlite3.OperationalError):
+            results_db.stop_writer()
+
+
+def test_background_writer_settings(results_db) -> None:
+    """Test that the writer thread's connection, and the one reopened after it, write with synchronous=NORMAL"""
+    settings = []
+
+    def add_batch(file_records, field_records):
+        settings.append(results_db.conn.execute("PRAGMA synchronous").fetchone()[0])
+        return []
+
+    results_db.start_writer()
+    with mock.patch.object(results_db, "add_batch", side_effect=add_batch):
+        results_db.submit_batch([{}], [[]])
+        results_db.stop_writer()
+    # 1 is NORMAL, where the default is 2, FULL
+    assert settings == [1]
+    assert results_db.conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+
+def test_background_writer_connect_error(results_db) -> None:
+    """Test that a writer thread which cannot connect still takes every batch, and its error is raised"""
+    error = sqlite3.OperationalError("unable to open database file")
+    with mock.patch.object(results_db, "connect", side_effect=[error, results_db.connect()]):
+        results_db.start_writer(max_batches=1)
+        # The queue holds one batch, so this would block if the writer stopped taking them
+        for _ in range(3):
+            results_db.queue.put((0.0, [{}], [[]]))
+        with pytest.raises(sqlite3.OperationalError, match="unable to open"):
+            results_db.stop_writer()
+
+
+@pytest.mark.parametrize(
+    "counts, expected_message",
+    [
+        ({"PASS": 2}, "All files passed!"),
+        ({"PASS": 2, "NEEDS REVIEW": 1}, "please consult with your MAST staff contact"),
+        ({"PASS": 2, "FAIL": 1}, "See results file (results.db)"),
+    ],
+)
+def test_format_summary(counts, expected_message) -> None:
+    """Test that format_summary() counts each verdict"""
+    summary = format_summary(counts, "results.db")
+    assert f"Files Checked: {sum(counts.values())}" in summary
+    assert f"Files Passed: {counts['PASS']}" in summary
+    assert expected_message in summary
+
+
+def test_open_db_missing(tmp_path) -> None:
+    """Test that opening a results database that does not exist raises an error"""
+    with pytest.raises(FileNotFoundError):
+        Hlsp_SQLiteDb(str(tmp_path / "missing.db")).open_db()
+
+
+def test_open_db_uri_characters(tmp_path) -> None:
+    """Test that a results database whose path holds characters special in URIs is opened read-only"""
+    directory = tmp_path / "run #1? 50%"
+    directory.mkdir()
+    db = Hlsp_SQLiteDb(str(directory / "results.db"))
+    db.create_db()
+    db.close_db()
+    db.open_db()
+    assert db.conn.execute("SELECT COUNT(*) FROM filename").fetchone() == (0,)
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        db.conn.execute("DELETE FROM filename")
+    db.close_db()
+
+
+@pytest.mark.parametrize(
+    "relation, columns, verdicts, expected_rows",
+    [
+        ("filename", None, None, 2),
+        ("filename", ["filename"], ["fail"], 1),
+        ("fields", ["file_ref", "value"], None, 2),
+        ("potential_problems", None, None, 1),
+    ],
+)
+def test_export_results_csv(results_db, tmp_path, relation, columns, verdicts, expected_rows) -> None:
+    """Test that export_results() writes the selected rows and columns to CSV"""
+    out_file = str(tmp_path / "out.csv")
+    n_rows = results_db.export_results(out_file, relation=relation, columns=columns, verdicts=verdicts, batch_size=1)
+    assert n_rows == expected_rows
+    with open(out_file, newline="") as f:
+        rows = list(csv.reader(f))
+    assert len(rows) == expected_rows + 1
+    if columns:
+        assert rows[0] == columns
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_export_results_arrow(results_db, tmp_path, fmt) -> None:
+    """Test that export_results() writes Parquet and Arrow IPC files when pyarrow is installed"""
+    pa = pytest.importorskip("pyarrow")
+    ipc = pytest.importorskip("pyarrow.ipc")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    out_file = str(tmp_path / f"out.{fmt}")
+    n_rows = results_db.export_results(out_file, relation="filename", fmt=fmt, batch_size=1)
+    assert n_rows == 2
+    if fmt == "parquet":
+        table = pq.read_table(out_file)
+    else:
+        table = ipc.open_file(out_file).read_all()
+    assert table.column_names == ["path", "filename", "final_verdict", "n_elements"]
+    assert table.schema.field("n_elements").type == pa.int64()
+    assert sorted(table.column("final_verdict").to_pylist()) == ["FAIL", "PASS"]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"relation": "sqlite_master"},
+        {"fmt": "xlsx"},
+        {"columns": ["filename", "nonexistent"]},
+        {"verdicts": ["maybe"]},
+    ],
+)
+def test_export_results_xfail(results_db, tmp_path, kwargs) -> None:
+    """Test that export_results() rejects unknown relations, formats, columns and verdicts"""
+    with pytest.raises(ValueError):
+        results_db.export_results(str(tmp_path / "out.csv"), **kwargs)
+
+
 # Remove the test.db file once the tests are complete
 def test_remove_test_db_file():
     """Delete the test_file.db now that the tests are complete"""
@@ -0,0 +1,129 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_diff.py
+"""
+
+import io
+import json
+import sqlite3
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_db import Hlsp_SQLiteDb
+from mast_contributor_tools.filename_check.fc_diff import ResultsDiff, summarize_changes
+
+
+def make_db(db_file: str, files: dict[str, str]) -> None:
+    """Helper to create a results database, with one 'instrument' field per file given as {filename: verdict}"""
+    db = Hlsp_SQLiteDb(db_file)
+    db.create_db()
+    for name, verdict in files.items():
+        db.add_filename({"path": ".", "filename": name, "final_verdict": verdict, "n_elements": 9})
+        score = {"PASS": "pass", "FAIL": "fail", "NEEDS REVIEW": "needs review"}[verdict]
+        db.add_fields(
+            [
+                {
+                    "file_ref": name,
+                    "name": "instrument",
+                    "value": "nircam",
+                    "capitalization_score": "pass",
+                    "length_score": "pass",
+                    "format_score": "pass",
+                    "value_score": score,
+                    "field_verdict": verdict,
+                }
+            ]
+        )
+    db.build_indexes()
+    db.close_db()
+
+
+@pytest.fixture
+def diff(tmp_path) -> ResultsDiff:
+    """A diff between two runs with one file of each kind of change"""
+    old_db = str(tmp_path / "old.db")
+    new_db = str(tmp_path / "new.db")
+    make_db(old_db, {"same.fits": "PASS", "fixed.fits": "FAIL", "broken.fits": "PASS", "removed.fits": "FAIL"})
+    make_db(new_db, {"same.fits": "PASS", "fixed.fits": "NEEDS REVIEW", "broken.fits": "FAIL", "added.fits": "PASS"})
+    diff = ResultsDiff(old_db, new_db)
+    yield diff
+    diff.close()
+
+
+def test_file_changes(diff) -> None:
+    """Test that each kind of file change is found"""
+    diff.open()
+    changes = {row[2]: row for row in diff.file_changes()}
+    assert changes == {
+        "added.fits": ("new", ".", "added.fits", None, "PASS"),
+        "removed.fits": ("removed", ".", "removed.fits", "FAIL", None),
+        "fixed.fits": ("improved", ".", "fixed.fits", "FAIL", "NEEDS REVIEW"),
+        "broken.fits": ("regressed", ".", "broken.fits", "PASS", "FAIL"),
+    }
+
+
+def test_field_changes(diff) -> None:
+    """Test that field changes are only reported for files in both runs"""
+    diff.open()
+    changes = {row[1]: row[0] for row in diff.field_changes()}
+    assert changes == {"fixed.fits": "improved", "broken.fits": "regressed"}
+
+
+@pytest.mark.parametrize("fmt", ["text", "jsonl"])
+def test_write_stream(diff, fmt) -> None:
+    """Test that changes are streamed one per line"""
+    diff.open()
+    out = io.StringIO()
+    counts = diff.write_stream(out, fmt=fmt)
+    assert counts == {"new": 1, "removed": 1, "improved": 1, "regressed": 1}
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 6
+    if fmt == "jsonl":
+        records = [json.loads(line) for line in lines]
+        assert {r["type"] for r in records} == {"file", "field"}
+    else:
+        assert lines[0].startswith("new")
+
+    # Field changes can be left out
+    out = io.StringIO()
+    diff.write_stream(out, fmt=fmt, fields=False)
+    assert len(out.getvalue().splitlines()) == 4
+
+
+def test_write_db(diff, tmp_path) -> None:
+    """Test that changes are written into a diff database"""
+    diff_db = str(tmp_path / "diff.db")
+    diff.open(diff_db)
+    counts = diff.write_db()
+    assert counts == {"new": 1, "removed": 1, "improved": 1, "regressed": 1}
+    conn = sqlite3.connect(diff_db)
+    assert conn.execute("SELECT COUNT(*) FROM field_changes").fetchone()[0] == 2
+    conn.close()
+    assert "Files Regressed: 1" in summarize_changes(counts)
+
+
+def test_write_db_files_only(diff, tmp_path) -> None:
+    """Test that only file changes are written into a diff database when fields are left out"""
+    diff_db = str(tmp_path / "diff.db")
+    diff.open(diff_db)
+    diff.write_db()
+    assert diff.write_db(fields=False)["new"] == 1
+    tables = {row[0] for row in diff.conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")}
+    assert tables == {"file_changes"}
+
+
+def test_uri_characters(tmp_path) -> None:
+    """Test that results databases whose paths hold characters special in URIs are attached"""
+    directory = tmp_path / "run #1? 50%"
+    directory.mkdir()
+    make_db(str(directory / "old.db"), {"same.fits": "PASS"})
+    make_db(str(directory / "new.db"), {"same.fits": "PASS", "added.fits": "FAIL"})
+    diff = ResultsDiff(str(directory / "old.db"), str(directory / "new.db"))
+    diff.open()
+    assert [row[:3] for row in diff.file_changes()] == [("new", ".", "added.fits")]
+    diff.close()
+
+
+def test_missing_db(tmp_path) -> None:
+    """Test that a missing results database raises an error"""
+    with pytest.raises(FileNotFoundError):
+        ResultsDiff(str(tmp_path / "old.db"), str(tmp_path / "new.db")).open()
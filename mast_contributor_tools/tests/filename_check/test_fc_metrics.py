@@ -0,0 +1,57 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_metrics.py
+"""
+
+import json
+import time
+
+from mast_contributor_tools import __version__
+from mast_contributor_tools.filename_check.fc_cache import config_hash
+from mast_contributor_tools.filename_check.fc_db import RUN_COLUMNS
+from mast_contributor_tools.filename_check.fc_metrics import RunMetrics, peak_rss_mb
+
+
+def test_run_metrics_stages() -> None:
+    """Test that the time spent in each stage is added up"""
+    metrics = RunMetrics("my-hlsp", "sqlite")
+    for _ in range(2):
+        with metrics.stage("evaluate"):
+            time.sleep(0.01)
+    metrics.add_time("write", 0.5)
+    assert [*metrics.stages] == ["evaluate", "write"]
+    assert metrics.stages["evaluate"] >= 0.02
+    assert metrics.stages["write"] == 0.5
+
+
+def test_run_metrics_record(tmp_path) -> None:
+    """Test that the record of a run has what is needed to compare runs"""
+    metrics = RunMetrics("my-hlsp", "ndjson", settings={"batch_size": 10}, workers=2)
+    with metrics.stage("evaluate"):
+        pass
+    record = metrics.finish(100, {"PASS": 90, "FAIL": 10}, cache_hit_rate=0.75)
+    assert record["hlsp_name"] == "my-hlsp"
+    assert record["tool_version"] == __version__
+    assert record["config_hash"] == config_hash()
+    assert record["n_files"] == 100
+    assert record["files_per_sec"] > 0
+    assert record["started_at"] <= record["finished_at"]
+    assert record["workers"] == 2
+    assert record["cache_hit_rate"] == 0.75
+    assert record["counts"] == {"PASS": 90, "FAIL": 10}
+    assert record["settings"] == {"batch_size": 10}
+    assert "evaluate" in record["stages"]
+
+    # The row of the runs table holds the whole record as JSON
+    row = dict(zip(RUN_COLUMNS, metrics.run_row()))
+    assert row["run_id"] == record["run_id"]
+    assert json.loads(row["metrics"]) == record
+
+    metrics_file = tmp_path / "metrics.json"
+    metrics.write_json(str(metrics_file))
+    assert json.loads(metrics_file.read_text()) == record
+
+
+def test_peak_rss_mb() -> None:
+    """Test that the peak memory use is reported in MB where it is available"""
+    peak = peak_rss_mb()
+    assert peak is None or 1 < peak < 100_000
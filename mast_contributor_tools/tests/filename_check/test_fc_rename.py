@@ -0,0 +1,135 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_rename.py
+"""
+
+import csv
+import io
+import subprocess
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_db import Hlsp_SQLiteDb
+from mast_contributor_tools.filename_check.fc_rename import RenamePlan, fix_field, fix_version, summarize_plan
+
+PASSING = "hlsp_my-hlsp_hst_wfc3_m31_f160w_v1.0_spec.fits"
+
+
+def make_db(db_file: str, files: dict[str, str]) -> None:
+    """Helper to create a results database of files given as {filename: verdict}"""
+    db = Hlsp_SQLiteDb(db_file)
+    db.create_db()
+    for name, verdict in files.items():
+        db.add_filename({"path": "data", "filename": name, "final_verdict": verdict, "n_elements": 9})
+    db.close_db()
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("v1.0", "v1.0"), ("V1-0", "v1.0"), ("1", "v1"), ("version2p1", "v2.1"), ("v1.2.3.4", "v1.2.3.4"), ("vx", "vx")],
+)
+def test_fix_version(value, expected) -> None:
+    """Test that versions are rewritten as 'v' and their numbers, unless there are too many numbers"""
+    assert fix_version(value.lower()) == expected
+
+
+@pytest.mark.parametrize(
+    "name, value, expected",
+    [
+        ("hlsp_str", "HLSP", "hlsp"),
+        ("target_name", "-NGC 1+", "ngc1"),
+        ("target_name", "m31+m32", "m31+m32"),
+        ("filter", "F160W/F110W", "f160wf110w"),
+        ("extension", "FITS.GZ", "fits.gz"),
+        ("instrument", "wfc3", "wfc3"),
+    ],
+)
+def test_fix_field(name, value, expected) -> None:
+    """Test that fields are lowercased, and the characters forbidden in each field removed"""
+    assert fix_field(name, value) == expected
+
+
+@pytest.mark.parametrize(
+    "filename, expected",
+    [
+        ("HLSP_my-hlsp_HST_WFC3_M31_F160W_V1-0_SPEC.FITS", (PASSING, "PASS")),
+        ("hlsp_My-Hlsp_readme.txt", ("hlsp_my-hlsp_readme.txt", "PASS")),
+        ("hlsp_other_hst_wfc3_m31_f160w_1.0_spec.fits", (PASSING, "PASS")),
+        (
+            "hlsp_my-hlsp_hst_nircm_m31_f160w_v1_spec.fits",
+            ("hlsp_my-hlsp_hst_nircm_m31_f160w_v1_spec.fits", "NEEDS REVIEW"),
+        ),
+        ("hlsp_my-hlsp_a_b_c_d_e_f_g_spec.fits", ("hlsp_my-hlsp_a_b_c_d_e_f_g_spec.fits", "FAIL")),
+    ],
+)
+def test_propose(filename, expected) -> None:
+    """Test that a compliant name is proposed, with its verdict, and names with too many fields are left alone"""
+    assert RenamePlan("", "my-hlsp").propose(filename) == expected
+
+
+def test_build(tmp_path) -> None:
+    """Test that proposals taking the name of another file, whatever its case, are reported as collisions"""
+    db_file = str(tmp_path / "results.db")
+    files = {
+        PASSING: "PASS",
+        "hlsp_my-hlsp_hst_wfc3_m31_f160w_v1-0_spec.fits": "FAIL",
+        "hlsp_my-hlsp_hst_wfc3_M32_f160w_v1.0_spec.fits": "FAIL",
+        "hlsp_my-hlsp_hst_wfc3_m33_f160w_v1.0_SPEC.fits": "FAIL",
+        "hlsp_my-hlsp_hst_wfc3_m33_f160w_v1.0_spec.FITS": "FAIL",
+        "hlsp_my-hlsp_hst_wfc3_m34_f160w_v1.0_spec.fits-": "FAIL",
+    }
+    make_db(db_file, files)
+    plan = RenamePlan(db_file, "my-hlsp")
+    counts = plan.build()
+    assert counts == {"rename": 2, "collision": 3}
+    rows = {r[1]: r for r in plan.rows}
+    assert rows["hlsp_my-hlsp_hst_wfc3_m31_f160w_v1-0_spec.fits"][4:] == ["collision", PASSING]
+    assert rows["hlsp_my-hlsp_hst_wfc3_M32_f160w_v1.0_spec.fits"][2:5] == [
+        "hlsp_my-hlsp_hst_wfc3_m32_f160w_v1.0_spec.fits",
+        "PASS",
+        "rename",
+    ]
+    # Two failing files with the same proposal both collide
+    assert rows["hlsp_my-hlsp_hst_wfc3_m33_f160w_v1.0_SPEC.fits"][4] == "collision"
+    assert rows["hlsp_my-hlsp_hst_wfc3_m33_f160w_v1.0_spec.FITS"][4] == "collision"
+    assert summarize_plan(counts, "my-hlsp") == (
+        "Rename plan for 5 failing files of my-hlsp: 2 rename, 3 collision, 0 unchanged"
+    )
+
+    out = io.StringIO()
+    plan.write(out)
+    assert len(list(csv.DictReader(io.StringIO(out.getvalue())))) == 5
+
+
+def test_build_missing(tmp_path) -> None:
+    """Test that a missing results database is reported"""
+    with pytest.raises(FileNotFoundError):
+        RenamePlan(str(tmp_path / "missing.db")).build()
+
+
+def test_write_script(tmp_path) -> None:
+    """Test that the script renames the files, including those that only change case, and skips collisions"""
+    db_file = str(tmp_path / "results.db")
+    make_db(
+        db_file,
+        {
+            "hlsp_my-hlsp_hst_wfc3_M31_f160w_v1.0_spec.fits": "FAIL",
+            "hlsp_my-hlsp_hst_wfc3_m32_f160w_V1-0_spec.fits": "FAIL",
+            "hlsp_my-hlsp_hst_wfc3_m32_f160w_v1.0_spec.fits": "PASS",
+        },
+    )
+    data = tmp_path / "data"
+    data.mkdir()
+    for name in ["hlsp_my-hlsp_hst_wfc3_M31_f160w_v1.0_spec.fits", "hlsp_my-hlsp_hst_wfc3_m32_f160w_V1-0_spec.fits"]:
+        (data / name).write_text(name)
+    plan = RenamePlan(db_file, "my-hlsp")
+    plan.build()
+    script = tmp_path / "renames.sh"
+    with open(script, "w") as out:
+        plan.write(out, fmt="sh")
+    assert "# COLLISION with hlsp_my-hlsp_hst_wfc3_m32_f160w_v1.0_spec.fits" in script.read_text()
+
+    subprocess.run(["sh", str(script)], cwd=tmp_path, check=True)
+    assert sorted(p.name for p in data.iterdir()) == [
+        "hlsp_my-hlsp_hst_wfc3_m31_f160w_v1.0_spec.fits",
+        "hlsp_my-hlsp_hst_wfc3_m32_f160w_V1-0_spec.fits",
+    ]
@@ -0,0 +1,161 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_report.py
+"""
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_db import Hlsp_SQLiteDb
+from mast_contributor_tools.filename_check.fc_report import (
+    format_table,
+    query_fields,
+    query_files,
+    split_key,
+    top_failures,
+)
+
+
+def make_field(file_ref: str, name: str, value: str, verdict: str) -> dict:
+    """Helper to create a field record with the given verdict"""
+    score = {"PASS": "pass", "FAIL": "fail", "NEEDS REVIEW": "needs review"}[verdict]
+    return {
+        "file_ref": file_ref,
+        "name": name,
+        "value": value,
+        "capitalization_score": "pass",
+        "length_score": "pass",
+        "format_score": "pass",
+        "value_score": score,
+        "field_verdict": verdict,
+    }
+
+
+@pytest.fixture(params=[True, False], ids=["indexed", "unindexed"])
+def results_db(tmp_path, request) -> Hlsp_SQLiteDb:
+    """A results database with ten files in two directories, with and without indexes"""
+    db = Hlsp_SQLiteDb(str(tmp_path / "results_fake.db"))
+    db.create_db()
+    for i in range(10):
+        instrument = "nircam" if i % 2 else "nircm"
+        verdict = "PASS" if i % 2 else "NEEDS REVIEW"
+        name = f"hlsp_fake_jwst_{instrument}_target{i}_f200w_v1_spec.fits"
+        db.add_filename({"path": f"dir{i % 2}", "filename": name, "final_verdict": verdict, "n_elements": 9})
+        db.add_fields(
+            [make_field(name, "instrument", instrument, verdict), make_field(name, "mission", "jwst", "PASS")]
+        )
+    if request.param:
+        db.build_indexes()
+    yield db
+    db.close_db()
+
+
+def test_build_indexes(results_db) -> None:
+    """Test that has_indexes() reports whether build_indexes() has been run"""
+    indexed = results_db.has_indexes()
+    results_db.build_indexes()
+    assert results_db.has_indexes()
+    # Building the indexes again should be harmless
+    if indexed:
+        results_db.build_indexes()
+
+
+def test_split_key() -> None:
+    """Test page keys are split on the last slash"""
+    assert split_key("dir/subdir/hlsp_file.fits") == ("dir/subdir", "hlsp_file.fits")
+    assert split_key("hlsp_file.fits/instrument") == ("hlsp_file.fits", "instrument")
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected_count",
+    [
+        ({}, 10),
+        ({"verdicts": ["needs review"]}, 5),
+        ({"path_prefix": "dir1"}, 5),
+        ({"path_prefix": "dir"}, 10),
+        ({"glob": "*target1*"}, 1),
+        ({"verdicts": ["PASS"], "path_prefix": "dir0"}, 0),
+    ],
+)
+def test_query_files(results_db, kwargs, expected_count) -> None:
+    """Test that query_files() applies each filter"""
+    rows, next_key = query_files(results_db.conn, **kwargs)
+    assert len(rows) == expected_count
+    assert next_key == ""
+
+
+def test_query_files_pagination(results_db) -> None:
+    """Test that pages returned by query_files() cover every file exactly once, in order"""
+    seen = []
+    after = ""
+    while True:
+        rows, after = query_files(results_db.conn, after=after, limit=3)
+        seen += rows
+        if not after:
+            break
+    assert len(seen) == 10
+    assert seen == sorted(seen, key=lambda r: (r[0], r[1]))
+    assert len({r[1] for r in seen}) == 10
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected_count",
+    [
+        ({"field": "instrument"}, 10),
+        ({"field": "instrument", "value": "nircm"}, 5),
+        ({"value": "jwst"}, 10),
+        ({"verdicts": ["NEEDS REVIEW"]}, 5),
+        ({"field": "mission", "path_prefix": "dir1"}, 5),
+        ({"field": "mission", "glob": "*target3*"}, 1),
+    ],
+)
+def test_query_fields(results_db, kwargs, expected_count) -> None:
+    """Test that query_fields() applies each filter"""
+    rows, _ = query_fields(results_db.conn, **kwargs)
+    assert len(rows) == expected_count
+
+
+def test_query_fields_pagination(results_db) -> None:
+    """Test that pages returned by query_fields() cover every field exactly once"""
+    seen = []
+    after = ""
+    while True:
+        rows, after = query_fields(results_db.conn, after=after, limit=4)
+        seen += rows
+        if not after:
+            break
+    assert len(seen) == 20
+    assert len({(r[0], r[1]) for r in seen}) == 20
+
+
+def test_top_failures(results_db) -> None:
+    """Test that top_failures() counts the most common problems"""
+    assert top_failures(results_db.conn, "value") == [("instrument", "nircm", 5)]
+    assert top_failures(results_db.conn, "field") == [("instrument", 5)]
+    assert top_failures(results_db.conn, "value", verdicts=["PASS"], n=1) == [("mission", "jwst", 10)]
+    assert top_failures(results_db.conn, "value", field="mission") == []
+    with pytest.raises(ValueError):
+        top_failures(results_db.conn, "filename")
+    with pytest.raises(ValueError):
+        query_files(results_db.conn, verdicts=["maybe"])
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected",
+    [
+        ({"path_prefix": "dir0"}, [("instrument", "nircm", 5)]),
+        ({"path_prefix": "dir1"}, []),
+        ({"glob": "*_target2_*"}, [("instrument", "nircm", 1)]),
+        ({"path_prefix": "dir0", "glob": "*_target1_*"}, []),
+    ],
+)
+def test_top_failures_filters(results_db, kwargs, expected) -> None:
+    """Test that top_failures() only counts the fields of the files selected by path and name"""
+    assert top_failures(results_db.conn, "value", **kwargs) == expected
+
+
+def test_format_table() -> None:
+    """Test that format_table() aligns the columns"""
+    table = format_table(["name", "n"], [("instrument", 5), ("mission", 10)])
+    lines = table.splitlines()
+    assert len(lines) == 4
+    assert lines[0].startswith("name        n")
+    assert lines[3].startswith("mission     10")
@@ -0,0 +1,98 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_sample.py
+"""
+
+from pathlib import Path
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_sample import (
+    SAMPLE_VERDICTS,
+    StratifiedSample,
+    estimate_verdicts,
+    stratum,
+    wilson_interval,
+)
+
+
+def fake_collection() -> list[Path]:
+    """A collection of 2100 files: a large directory of files that pass, and small directories that do not"""
+    files = [Path(f"big/hlsp_my-hlsp_hst_wfc3_t{i}_f160w_v1_img.fits") for i in range(2000)]
+    files += [Path(f"small{i % 5}/hlsp_my-hlsp_hst_wfc3_T{i}_f160w_v1_img.fits") for i in range(50)]
+    files += [Path(f"big/hlsp_my-hlsp_hst_wfc3_t{i}_f160w_v1_preview.png") for i in range(49)]
+    files += [Path("big/readme")]
+    return files
+
+
+@pytest.mark.parametrize(
+    "file_path, expected",
+    [
+        (str(Path("dir/hlsp_x_v1_img.fits")), ("dir", "fits")),
+        (str(Path("hlsp_x_v1_img.FITS.gz")), (".", "fits.gz")),
+        (str(Path("dir/sub/readme")), (str(Path("dir/sub")), "")),
+    ],
+)
+def test_stratum(file_path, expected) -> None:
+    """Test that files are stratified by directory and extension"""
+    assert stratum(file_path) == expected
+
+
+def test_stratified_sample() -> None:
+    """Test that the sample has the requested size, with every stratum represented"""
+    sample = StratifiedSample(20, seed=1).extend(fake_collection())
+    assert sample.n_files == 2100
+    assert len(sample.strata) == 8
+    assert sum(count for count, _, _ in sample.strata.values()) == 2100
+    sampled = sample.sample()
+    assert set(sampled) == set(sample.strata)
+    n_sampled = sum(len(paths) for paths in sampled.values())
+    assert 20 <= n_sampled <= 20 + 8
+    # Each sampled path belongs to its stratum
+    assert all(stratum(p) == s for s, paths in sampled.items() for p in paths)
+    # The same seed gives the same sample
+    assert StratifiedSample(20, seed=1).extend(fake_collection()).sample() == sampled
+
+
+def test_stratified_sample_max_extra() -> None:
+    """Test that at most max_extra files are added for missing strata, from the largest strata"""
+    sample = StratifiedSample(1, max_extra=1, seed=1).extend(fake_collection())
+    assert sum(len(paths) for paths in sample.sample().values()) == 2
+    with pytest.raises(ValueError):
+        StratifiedSample(0)
+
+
+def test_wilson_interval() -> None:
+    """Test the Wilson score interval against known values"""
+    low, high = wilson_interval(0.5, 100)
+    assert low == pytest.approx(0.4038, abs=1e-4)
+    assert high == pytest.approx(0.5962, abs=1e-4)
+    # The interval is not empty when nothing (or everything) in the sample failed
+    low, high = wilson_interval(0.0, 50)
+    assert low == 0.0
+    assert high == pytest.approx(0.0713, abs=1e-4)
+    assert wilson_interval(0.3, 0) == (0.0, 1.0)
+
+
+def test_estimate_verdicts() -> None:
+    """Test that the estimates are weighted by stratum, so small directories are not over-represented"""
+    sample = StratifiedSample(50, seed=2).extend(fake_collection())
+    estimate = estimate_verdicts(sample, "my-hlsp")
+    assert estimate.n_files == 2100
+    assert estimate.coverage == 1.0
+    assert sum(estimate.proportions.values()) == pytest.approx(1.0)
+    # 50 of the 2100 files fail, and one is invalid (too few fields)
+    assert estimate.proportions["FAIL"] == pytest.approx(50 / 2100)
+    assert estimate.proportions["INVALID"] == pytest.approx(1 / 2100)
+    for verdict in SAMPLE_VERDICTS:
+        low, high = estimate.intervals[verdict]
+        assert low <= estimate.proportions[verdict] <= high
+    assert "FAIL" in estimate.format()
+
+
+def test_estimate_verdicts_exact() -> None:
+    """Test that the intervals are exact when every file is checked"""
+    files = fake_collection()[:10]
+    estimate = estimate_verdicts(StratifiedSample(10).extend(files), "my-hlsp")
+    assert estimate.n_checked == 10
+    assert estimate.proportions["PASS"] == 1.0
+    assert estimate.intervals["PASS"] == (1.0, 1.0)
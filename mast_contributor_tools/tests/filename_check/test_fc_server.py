@@ -0,0 +1,175 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_server.py
+"""
+
+import http.client
+import json
+import os
+import threading
+import urllib.request
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_config import ConfigRegistry
+from mast_contributor_tools.filename_check.fc_server import (
+    MAX_BATCH,
+    MAX_BODY_BYTES,
+    ValidationClient,
+    ValidationService,
+    benchmark_names,
+    format_benchmark,
+    run_benchmark,
+    start_server,
+)
+
+TEST_NAMES = [
+    "hlsp_fake-hlsp_jwst_nircam_target1_f200w_v1_spec.fits",
+    "hlsp_fake-hlsp_jwst_nircm_target2_f200w_v1_spec.fits",
+    "hlsp_fake-hlsp_jwst_nircam_target3_f200w_v1_SPEC.fits",
+    "not_a_name",
+]
+EXPECTED_VERDICTS = ["PASS", "NEEDS REVIEW", "FAIL", None]
+
+
+@pytest.fixture(params=["http", "unix"])
+def server_address(request, tmp_path) -> tuple[str, int]:
+    """A validation service running in the background, over HTTP or on a Unix socket"""
+    socket_path = str(tmp_path / "mct.sock") if request.param == "unix" else ""
+    server = start_server(socket_path=socket_path, port=0)
+    yield socket_path, (0 if socket_path else server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        [],
+        {"names": TEST_NAMES},
+        {"filenames": [1, 2]},
+        {"filenames": ["hlsp_fake_readme.txt"] * (MAX_BATCH + 1)},
+    ],
+)
+def test_service_handle_xfail(payload) -> None:
+    """Test that the service answers invalid requests with an error"""
+    assert "error" in ValidationService().handle(payload)
+
+
+def test_service_handle() -> None:
+    """Test that the service checks each name, in order, inferring the HLSP name"""
+    service = ValidationService()
+    results = service.handle({"filenames": TEST_NAMES})["results"]
+    assert [r.get("final_verdict") for r in results] == EXPECTED_VERDICTS
+    assert len(results[0]["fields"]) == 9
+    assert "error" in results[3]
+    # The same HLSP name is checked against the one given in the request
+    results = service.handle({"filenames": TEST_NAMES[:1], "hlsp_name": "other-hlsp"})["results"]
+    assert results[0]["final_verdict"] == "FAIL"
+
+
+def test_service_rules(tmp_path) -> None:
+    """Test that requests may name a rule set, and that its scores are dropped when it is reloaded"""
+    oif_file = tmp_path / "oif.yaml"
+    oif_file.write_text("jwst:\n  instruments:\n    nircm:\n      filters: [f200w]\n")
+    registry = ConfigRegistry(reload_interval=0)
+    registry.register("candidate", oif_file=str(oif_file))
+    service = ValidationService(config_registry=registry)
+    results = service.handle({"filenames": TEST_NAMES[:2], "rules": "candidate"})["results"]
+    assert [r["final_verdict"] for r in results] == ["NEEDS REVIEW", "PASS"]
+    assert service.handle({"filenames": TEST_NAMES[:1]})["results"][0]["final_verdict"] == "PASS"
+    assert "Unknown rule set" in service.handle({"filenames": TEST_NAMES, "rules": "other"})["error"]
+
+    cache = service.caches["candidate"]
+    oif_file.write_text("jwst:\n  instruments:\n    nircam:\n      filters: [f200w]\n")
+    os.utime(oif_file, ns=(0, os.stat(oif_file).st_mtime_ns + 1_000_000))
+    results = service.handle({"filenames": TEST_NAMES[:2], "rules": "candidate"})["results"]
+    assert [r["final_verdict"] for r in results] == ["PASS", "NEEDS REVIEW"]
+    assert service.caches["candidate"] is not cache
+
+
+def test_service_handle_line() -> None:
+    """Test that the service answers a line of JSON with a line of JSON"""
+    service = ValidationService()
+    response = service.handle_line(json.dumps({"filenames": TEST_NAMES[:1]}).encode())
+    assert response.endswith(b"\n")
+    assert json.loads(response)["results"][0]["final_verdict"] == "PASS"
+    assert "error" in json.loads(service.handle_line(b"{not json"))
+
+
+def test_client(server_address) -> None:
+    """Test that a client can send several requests over one connection"""
+    client = ValidationClient(*server_address)
+    for _ in range(3):
+        results = client.validate(TEST_NAMES)
+        assert [r.get("final_verdict") for r in results] == EXPECTED_VERDICTS
+    with pytest.raises(ValueError):
+        client.validate(["hlsp_fake_readme.txt"] * (MAX_BATCH + 1))
+    client.close()
+
+
+def test_concurrent_clients(server_address) -> None:
+    """Test that concurrent clients each get the results for their own names"""
+    results = {}
+
+    def check(i: int) -> None:
+        client = ValidationClient(*server_address)
+        names = benchmark_names(50, start=i * 50)
+        results[i] = [r["filename"] for r in client.validate(names)] == names
+        client.close()
+
+    threads = [threading.Thread(target=check, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {i: True for i in range(8)}
+
+
+def test_health() -> None:
+    """Test that the HTTP service reports its health"""
+    server = start_server(port=0)
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/health") as response:
+        assert json.loads(response.read())["status"] == "ok"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize(
+    "headers, status",
+    [
+        ({}, 400),
+        ({"Content-Length": "many"}, 400),
+        ({"Content-Length": "-1"}, 400),
+        ({"Content-Length": str(MAX_BODY_BYTES + 1)}, 413),
+    ],
+)
+def test_http_invalid_length(headers, status) -> None:
+    """Test that the HTTP service rejects requests without a valid length, or too large, without reading them"""
+    server = start_server(port=0)
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conn.putrequest("POST", "/validate")
+    for key, value in headers.items():
+        conn.putheader(key, value)
+    conn.endheaders()
+    response = conn.getresponse()
+    assert response.status == status
+    assert "error" in json.loads(response.read())
+    conn.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_run_benchmark(server_address) -> None:
+    """Test that the benchmark client reports the work done and its latency"""
+    results = run_benchmark(*server_address, n_clients=2, n_requests=3, batch_size=5)
+    assert results["requests"] == 6
+    assert results["names"] == 30
+    assert results["latency_ms"]["p50"] <= results["latency_ms"]["max"]
+    assert "Names checked: 30" in format_benchmark(results)
+
+
+@pytest.mark.parametrize("kwargs", [{"n_clients": 0}, {"n_requests": 0}, {"batch_size": 0}])
+def test_run_benchmark_xfail(kwargs) -> None:
+    """Test that the benchmark client rejects a benchmark with no work to measure"""
+    with pytest.raises(ValueError):
+        run_benchmark(port=0, **kwargs)
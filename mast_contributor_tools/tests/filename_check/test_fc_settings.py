@@ -0,0 +1,58 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_settings.py
+"""
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_settings import (
+    DEFAULT_SETTINGS,
+    default_settings_file,
+    load_settings,
+    validate_settings,
+    write_settings,
+)
+
+
+def test_default_settings_file(tmp_path, monkeypatch) -> None:
+    """Test that the settings file is named by MCT_SETTINGS_FILE, or is in the user's configuration directory"""
+    monkeypatch.delenv("MCT_SETTINGS_FILE", raising=False)
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    assert default_settings_file() == str(tmp_path / "mast_contributor_tools" / "settings.yaml")
+    monkeypatch.setenv("MCT_SETTINGS_FILE", "")
+    assert default_settings_file() == ""
+    assert load_settings() == DEFAULT_SETTINGS
+
+
+def test_write_load_settings(tmp_path) -> None:
+    """Test that written settings are loaded over the defaults, and the benchmark is ignored"""
+    settings_file = str(tmp_path / "config" / "settings.yaml")
+    assert load_settings(settings_file) == DEFAULT_SETTINGS
+    benchmark = {"n_files": 10, "trials": [{"batch_size": 250, "files_per_sec": 2000.0}]}
+    assert write_settings({"batch_size": 250, "discovery": "walk"}, benchmark, settings_file) == settings_file
+    assert load_settings(settings_file) == {"batch_size": 250, "sqlite_writer": "background", "discovery": "walk"}
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [
+        "check_filenames:\n  batch_size: 0\n",
+        "check_filenames:\n  sqlite_writer: threads\n",
+        "check_filenames:\n  jobs: 4\n",
+        "check_filenames: [1000]\n",
+        "check_filenames: {\n",
+    ],
+)
+def test_load_invalid_settings(tmp_path, contents) -> None:
+    """Test that an invalid settings file is ignored"""
+    settings_file = tmp_path / "settings.yaml"
+    settings_file.write_text(contents)
+    assert load_settings(str(settings_file)) == DEFAULT_SETTINGS
+
+
+def test_validate_settings() -> None:
+    """Test that invalid settings are not written"""
+    assert validate_settings({"discovery": "glob"}) == {"discovery": "glob"}
+    with pytest.raises(ValueError, match="discovery"):
+        validate_settings({"discovery": "find"})
+    with pytest.raises(ValueError, match="batch_size"):
+        validate_settings({"batch_size": "1000"})
@@ -0,0 +1,141 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_sinks.py
+
+Each test runs against every result sink.
+"""
+
+import gzip
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_app import check_filenames
+from mast_contributor_tools.filename_check.fc_choices import OUTPUT_FORMATS
+from mast_contributor_tools.filename_check.fc_sinks import SINKS, get_sink
+
+TEST_FILES = [
+    Path("hlsp_fake-hlsp_jwst_nircam_target1_f200w_v1_spec.fits"),
+    Path("hlsp_fake-hlsp_jwst_nircm_target2_f200w_v1_spec.fits"),
+    Path("hlsp_fake-hlsp_jwst_nircam_target3_f200w_v1_SPEC.fits"),
+    Path("subdir/hlsp_fake-hlsp_jwst_nircam_target3_f200w_v1_SPEC.fits"),  # duplicate name
+]
+
+
+def read_verdicts(output_format: str, results_file: str) -> dict[str, str]:
+    """Helper to read the final verdict of each file back from a results file"""
+    if output_format == "sqlite":
+        conn = sqlite3.connect(results_file)
+        verdicts = dict(conn.execute("SELECT filename, final_verdict FROM filename"))
+        assert conn.execute("SELECT COUNT(*) FROM fields").fetchone()[0] == 27
+    elif output_format == "duckdb":
+        import duckdb
+
+        conn = duckdb.connect(results_file)
+        verdicts = dict(conn.execute("SELECT filename, final_verdict FROM filename").fetchall())
+        assert conn.execute("SELECT COUNT(*) FROM fields").fetchone()[0] == 27
+    else:
+        opener = gzip.open if results_file.endswith(".gz") else open
+        with opener(results_file, "rt") as f:
+            records = [json.loads(line) for line in f]
+        assert all(len(r["fields"]) == 9 for r in records)
+        return {r["filename"]: r["final_verdict"] for r in records}
+    conn.close()
+    return verdicts
+
+
+@pytest.fixture(params=[*SINKS])
+def output_format(request) -> str:
+    """Each of the output formats, skipping those whose optional dependencies are missing"""
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+        pytest.importorskip("pyarrow")
+    return request.param
+
+
+def test_output_formats() -> None:
+    """Test that the output formats offered by the CLI are the sinks, with the extensions of their files"""
+    assert {name: sink.extension for name, sink in SINKS.items()} == OUTPUT_FORMATS
+
+
+def test_get_sink_xfail() -> None:
+    """Test that an unknown output format raises an error"""
+    with pytest.raises(ValueError):
+        get_sink("xlsx", "results.xlsx")
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 1000])
+def test_check_filenames_sinks(tmp_path, output_format, batch_size) -> None:
+    """Test that check_filenames() writes the same results to every sink"""
+    results_file = str(tmp_path / f"results{SINKS[output_format].extension}")
+    check_filenames("fake-hlsp", TEST_FILES, results_file, output_format=output_format, batch_size=batch_size)
+    verdicts = read_verdicts(output_format, results_file)
+    if output_format != "ndjson":
+        # The duplicate file name is rejected by the databases
+        assert len(verdicts) == 3
+    assert verdicts[TEST_FILES[0].name] == "PASS"
+    assert verdicts[TEST_FILES[1].name] == "NEEDS REVIEW"
+    assert verdicts[TEST_FILES[2].name] == "FAIL"
+
+
+def test_sink_summarize(tmp_path, output_format) -> None:
+    """Test that every sink summarizes the verdicts it was given"""
+    sink = get_sink(output_format, str(tmp_path / f"results{SINKS[output_format].extension}"))
+    sink.open()
+    file_record = {"path": ".", "filename": "hlsp_fake_readme.txt", "final_verdict": "PASS", "n_elements": 4}
+    assert sink.write_batch([file_record], [[]]) == []
+    assert sink.finish() == []
+    summary = sink.summarize()
+    sink.close()
+    assert "Files Passed: 1" in summary
+    assert "All files passed!" in summary
+
+
+def test_ndjson_sink_compressed(tmp_path) -> None:
+    """Test that the NDJSON sink compresses its output according to the file extension"""
+    results_file = str(tmp_path / "results.ndjson.gz")
+    check_filenames("fake-hlsp", TEST_FILES[:2], results_file, output_format="ndjson")
+    assert len(read_verdicts("ndjson", results_file)) == 2
+
+
+def test_ndjson_sink_stdout(capsys) -> None:
+    """Test that the NDJSON sink can write to standard output"""
+    check_filenames("fake-hlsp", TEST_FILES[:2], "-", output_format="ndjson")
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["filename"] for line in lines] == [f.name for f in TEST_FILES[:2]]
+
+
+@pytest.mark.parametrize("background", [True, False])
+def test_sqlite_sink_background(tmp_path, background) -> None:
+    """Test that the SQLite sink reports rejected files with and without the background writer"""
+    sink = get_sink("sqlite", str(tmp_path / "results.db"), background=background)
+    sink.open()
+    file_record = {"path": ".", "filename": "hlsp_fake_readme.txt", "final_verdict": "PASS", "n_elements": 4}
+    rejected = sink.write_batch([file_record], [[]])
+    rejected += sink.write_batch([{**file_record, "path": "subdir"}], [[]])
+    rejected += sink.finish()
+    sink.close()
+    assert [r[0] for r in rejected] == ["hlsp_fake_readme.txt"]
+
+
+def test_check_filenames_runs(tmp_path, output_format) -> None:
+    """Test that each run is recorded in the runs table of the databases, and in a metrics file"""
+    results_file = str(tmp_path / f"results{SINKS[output_format].extension}")
+    check_filenames("fake-hlsp", TEST_FILES, results_file, output_format=output_format)
+    metrics = json.loads(Path(f"{results_file}.metrics.json").read_text())
+    assert metrics["n_files"] == len(TEST_FILES)
+    assert metrics["output_format"] == output_format
+    if output_format == "sqlite":
+        conn = sqlite3.connect(results_file)
+    elif output_format == "duckdb":
+        import duckdb
+
+        conn = duckdb.connect(results_file)
+    else:
+        return
+    rows = conn.execute("SELECT run_id, n_files, metrics FROM runs").fetchall()
+    conn.close()
+    assert len(rows) == 1
+    assert rows[0][:2] == (metrics["run_id"], len(TEST_FILES))
+    assert json.loads(rows[0][2]) == metrics
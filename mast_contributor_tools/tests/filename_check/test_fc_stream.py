@@ -0,0 +1,76 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_stream.py
+"""
+
+import io
+import json
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_app import evaluate_name
+from mast_contributor_tools.filename_check.fc_stream import NameStream, check_names, check_stream, read_names
+
+TEST_NAMES = [
+    "hlsp_fake-hlsp_jwst_nircam_target1_f200w_v1_spec.fits",
+    "hlsp_fake-hlsp_jwst_nircm_target2_f200w_v1_spec.fits",
+    "subdir/hlsp_fake-hlsp_jwst_nircam_target3_f200w_v1_SPEC.fits",
+    "/abs/path/hlsp_fake-hlsp_hst_acs_m31_f814w-f606w_v2.0_drz.fits.gz",
+    "/hlsp_fake-hlsp_tess_v1_lc.fits",
+    "sub//dir/../hlsp_fake-hlsp_alltargets_v1_cat.fits",
+    "HLSP_Fake-Hlsp_readme.md",
+    "hlsp_fake-hlsp_a_b_c_d_e_f_g_h.fits",  # too many fields
+    "hlsp_fake-hlsp_readme",  # no extension
+    "hlsp_fake",  # too few fields
+    "hlsp_fake-hlsp_é_v1_img.fits",
+]
+
+
+@pytest.mark.parametrize("hlsp_name", ["", "fake-hlsp"])
+def test_name_stream(hlsp_name) -> None:
+    """Test that the records are the same as those of evaluate_name(), whether or not fields are cached"""
+    checker = NameStream(hlsp_name)
+    for file_name in TEST_NAMES * 2:
+        expected = json.dumps(evaluate_name(file_name, hlsp_name), separators=(",", ":"))
+        assert checker.check(file_name) == expected
+
+
+def test_name_stream_max_entries() -> None:
+    """Test that no more field records are kept than allowed"""
+    checker = NameStream(max_entries=3)
+    records = checker.check_batch(TEST_NAMES[:2])
+    assert checker.n_entries == 3
+    assert sum(len(values) for values in checker.fields.values()) == 3
+    # The records are the same when fields are evaluated again
+    assert checker.check_batch(TEST_NAMES[:2]) == records
+
+
+def test_read_names() -> None:
+    """Test that names are read in batches, skipping nothing but surrounding whitespace"""
+    stream = io.BytesIO(b"".join(f"  {name}\r\n".encode() for name in TEST_NAMES) + b"\xff_bad.fits")
+    batches = list(read_names(stream, chunk_bytes=100))
+    assert len(batches) > 1
+    names = [name for batch in batches for name in batch]
+    assert names[:-1] == TEST_NAMES
+    # Undecodable bytes are kept rather than stopping the stream
+    assert names[-1].encode("utf-8", "surrogateescape") == b"\xff_bad.fits"
+
+
+def test_check_stream() -> None:
+    """Test that one record is written per name, skipping blank lines"""
+    stream = io.BytesIO(("\n".join(TEST_NAMES) + "\n\n").encode())
+    output = io.StringIO()
+    assert check_stream(stream, output, hlsp_name="fake-hlsp") == len(TEST_NAMES)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r["filename"] for r in records] == [name.rsplit("/", 1)[-1] for name in TEST_NAMES]
+    assert records[0]["final_verdict"] == "PASS"
+    assert records[1]["final_verdict"] == "NEEDS REVIEW"
+    assert records[2]["final_verdict"] == "FAIL"
+    assert "error" in records[-2]
+
+
+def test_check_names() -> None:
+    """Test that a list of names is written as NDJSON"""
+    output = io.StringIO()
+    assert check_names(TEST_NAMES[:2], output) == 2
+    assert check_names([], output) == 0
+    assert len(output.getvalue().splitlines()) == 2
@@ -0,0 +1,83 @@
+"""
+Tests for mast_contributor_tools/filename_check/fc_suggest.py
+"""
+
+import random
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_config import get_rules
+from mast_contributor_tools.filename_check.fc_suggest import (
+    DeletionIndex,
+    Suggester,
+    edit_distance,
+    get_suggester,
+)
+from mast_contributor_tools.filename_check.hlsp_filename import InstrumentField, ProductField
+
+
+@pytest.mark.parametrize(
+    "a, b, distance",
+    [("nircam", "nircam", 0), ("nircm", "nircam", 1), ("fitz", "fits", 1), ("acs", "wfc3", 3), ("", "spec", 4)],
+)
+def test_edit_distance(a, b, distance) -> None:
+    """Test the Levenshtein distance between two strings, in either order"""
+    assert edit_distance(a, b) == distance
+    assert edit_distance(b, a) == distance
+
+
+def test_deletion_index() -> None:
+    """Test that the index finds the same values as comparing the query with every value"""
+    values = sorted(get_rules().filters)
+    index = DeletionIndex(values)
+    rng = random.Random(1)
+    for _ in range(200):
+        query = list(rng.choice(values))
+        query[rng.randrange(len(query))] = rng.choice("abcdefghijklmnopqrstuvwxyz0123456789")
+        query = "".join(query) + rng.choice(["", "x"])
+        expected = sorted((d, v) for v in values if (d := edit_distance(query, v)) <= 2)
+        assert index.search(query, 2) == expected
+
+
+@pytest.mark.parametrize(
+    "vocabulary, value, multi_valued, expected",
+    [
+        ("instruments", "nircm", True, "nircam"),
+        ("instruments", "NIRCM", True, "nircam"),
+        ("instruments", "acs-wfc4", True, "acs-wfc3"),
+        ("extension_types", "fitz", False, "fits"),
+        ("semantic_types", "spce", True, "spec"),
+    ],
+)
+def test_suggest(vocabulary, value, multi_valued, expected) -> None:
+    """Test that the closest recognized values are suggested, replacing only the unrecognized elements"""
+    suggestions = Suggester(get_rules()).suggest(vocabulary, value, multi_valued)
+    assert expected in suggestions
+    assert len(suggestions) <= 3
+
+
+def test_suggest_none() -> None:
+    """Test that nothing is suggested for values too far from, or too short for, any recognized value"""
+    suggester = Suggester(get_rules())
+    assert suggester.suggest("missions", "zzzzzzzz") == []
+    assert suggester.suggest("filters", "q") == []
+
+
+def test_suggest_memo() -> None:
+    """Test that the suggestions of a value are remembered, up to the maximum number of entries"""
+    suggester = Suggester(get_rules(), max_entries=1)
+    suggestions = suggester.suggest("instruments", "nircm")
+    assert suggester.suggest("instruments", "nircm") is suggestions
+    suggester.suggest("instruments", "miri2")
+    assert list(suggester.memo) == [("instruments", "nircm", True)]
+    assert get_suggester(get_rules()) is get_suggester(get_rules())
+
+
+def test_field_suggestions() -> None:
+    """Test that fields needing review include suggestions in their scores, and other fields do not"""
+    field = InstrumentField("nircm")
+    field.evaluate()
+    assert field.get_scores()["suggestions"][0] == "nircam"
+    field = ProductField("spec")
+    field.evaluate()
+    assert "suggestions" not in field.get_scores()
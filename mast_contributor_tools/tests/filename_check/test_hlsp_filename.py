@@ -37,6 +37,7 @@ from mast_contributor_tools.filename_check.hlsp_filename import (
     ProductField,
     TargetField,
     VersionField,
+    cfg,
 )
 
 
@@ -528,6 +529,13 @@ def test_cfg(test_value: str, cfg_list: list) -> None:
     assert test_value in cfg_list, f"Error: {test_value} not found in {cfg_name}"
 
 
+def test_cfg_sections() -> None:
+    """Test that cfg holds the sections of fc_config.yaml of the default rule set"""
+    assert cfg["FieldLength"]["target_name"] == 30
+    assert cfg["ExtensionTypes"] is EXTENSION_TYPES
+    assert cfg["SemanticTypes"] is SEMANTIC_TYPES
+
+
 # Test that all field classes are called in HlspFileName (no fields are skipped)
 # Listed in backwards order because the last one is passed to function first
 # For standard 9-field filename
@@ -559,11 +567,12 @@ def test_field_9parts_called_in_HlspFileName(*mock_fields) -> None:
             mock_field.assert_called_once(),
             f"Field {mock_field._extract_mock_name()} was not called",
         )
-        # Assert correct value was used as arguments
+        # Assert correct value and the rule set of the name were used as arguments
         if i == 1:
-            mock_field.assert_called_with(parts[i], parts[i])  # two args for HlspName
+            # HlspNameField is also given the HLSP name of the collection
+            mock_field.assert_called_with(parts[i], parts[i], rules=hfn.rules)
         else:
-            mock_field.assert_called_with(parts[i])  # one for everything else
+            mock_field.assert_called_with(parts[i], rules=hfn.rules)
 
 
 # Test that all field classes are called in HlspFileName (no fields are skipped)
@@ -592,3 +601,38 @@ def test_field_5parts_called_in_HlspFileName(*mock_fields) -> None:
             mock_field.assert_called_once(),
             f"Field {mock_field._extract_mock_name()} was not called",
         )
+
+
+@pytest.mark.parametrize(
+    "test_filename, expected_layout",
+    [
+        (
+            "hlsp_fake-hlsp_hst_wfc3_vega_f160w_v1_img.fits",
+            [
+                "hlsp_str",
+                "hlsp_name",
+                "mission",
+                "instrument",
+                "target_name",
+                "filter",
+                "version_id",
+                "product_type",
+                "extension",
+            ],
+        ),
+        (
+            "hlsp_fake-hlsp_alltargets_v1_cat.fits",
+            ["hlsp_str", "hlsp_name", "generic1", "version_id", "product_type", "extension"],
+        ),
+        ("hlsp_fake-hlsp_readme.md", ["hlsp_str", "hlsp_name", "product_type", "extension"]),
+    ],
+)
+def test_field_layout(test_filename: str, expected_layout: list[str]) -> None:
+    """Test that field_layout() names the same fields as create_fields(), at the right positions"""
+    hfn = HlspFileName(Path(test_filename), "fake-hlsp")
+    hfn.partition()
+    hfn.create_fields()
+    layout = HlspFileName.field_layout(hfn.nFields, hfn.fieldvals[-2])
+    assert [name for name, _ in layout] == expected_layout
+    assert [hfn.fieldvals[i] for _, i in layout] == [f.value for f in hfn.fields]
+    assert [f.name for f in hfn.fields] == expected_layout
@@ -0,0 +1,108 @@
+"""
+Fixtures writing small FITS files for the metadata check tests, without any FITS library
+"""
+
+import pytest
+
+from mast_contributor_tools.metadata_check.fits_header import BLOCK_SIZE
+
+# Primary header keywords that pass every metadata check for the collection 'my-hlsp'
+HLSP_KEYWORDS = {
+    "DOI": "10.17909/abcd-1234",
+    "HLSPID": "MY-HLSP",
+    "HLSPLEAD": "Jane Doe",
+    "HLSPNAME": "My High Level Science Product",
+    "HLSPTARG": "M31",
+    "HLSPVER": "v1",
+    "LICENSE": "CC BY 4.0",
+    "LICENURL": "https://creativecommons.org/licenses/by/4.0/",
+    "REFERENC": "2024ApJ...000...00D",
+    "TELESCOP": "HST",
+    "INSTRUME": "WFC3",
+    "FILTER": "F160W",
+    "RADESYS": "ICRS",
+    "RA_TARG": 10.6847,
+    "DEC_TARG": 41.2690,
+    "TIMESYS": "UTC",
+    "MJD-BEG": 58000.5,
+    "MJD-END": 58001.5,
+    "XPOSURE": 1200.0,
+    "OBSERVAT": "HST",
+    "TARGNAME": "M31",
+    "DATE-BEG": "2017-09-04T12:00:00",
+    "DATE-END": "2017-09-05T12:00:00",
+    "EQUINOX": 2000.0,
+}
+
+
+def format_card(keyword: str, value=None, comment: str = "") -> bytes:
+    """Format one 80-character card, with the value in fixed format"""
+    if keyword in ("COMMENT", "HISTORY", "END"):
+        text = f"{keyword:<8}{value or ''}"
+    else:
+        if isinstance(value, bool):
+            field = f"{'T' if value else 'F':>20}"
+        elif isinstance(value, str):
+            field = f"'{value.replace(chr(39), chr(39) * 2):<8}'"
+        else:
+            field = f"{value!r:>20}"
+        text = f"{keyword:<8}= {field}" + (f" / {comment}" if comment else "")
+    return f"{text:<80}"[:80].encode("ascii")
+
+
+def format_header(cards: dict) -> bytes:
+    """Format the cards of a header, ending with END and padded to whole blocks"""
+    header = b"".join(format_card(k, v) for k, v in cards.items()) + format_card("END")
+    return header + b" " * (-len(header) % BLOCK_SIZE)
+
+
+def _image_cards(shape: tuple = (), bitpix: int = 16, extension: bool = False) -> dict:
+    """Returns the mandatory cards of a primary or image extension header"""
+    cards = {"XTENSION": "IMAGE"} if extension else {"SIMPLE": True}
+    cards.update({"BITPIX": bitpix, "NAXIS": len(shape)})
+    # FITS axes are in the reverse order of the shape of an array
+    cards.update({f"NAXIS{i + 1}": n for i, n in enumerate(reversed(shape))})
+    if extension:
+        cards.update({"PCOUNT": 0, "GCOUNT": 1})
+    return cards
+
+
+@pytest.fixture
+def image_cards():
+    """Returns a function giving the mandatory cards of a primary or image extension header"""
+    return _image_cards
+
+
+@pytest.fixture
+def hlsp_cards() -> dict:
+    """Returns the cards of a primary header with no data that passes every check for 'my-hlsp'"""
+    return {**_image_cards(), **HLSP_KEYWORDS}
+
+
+@pytest.fixture
+def make_fits(tmp_path):
+    """Returns a function writing a FITS file in a temporary directory
+
+    Each HDU is given as its header cards, with the data written as zeros and padded to whole
+    blocks. With sparse=True, the data are not written but left as a hole in the file, so that
+    files of several GB take no disk space.
+    """
+
+    def _make_fits(name: str, headers: list[dict], sparse: bool = False):
+        from mast_contributor_tools.metadata_check.fits_header import parse_header
+
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            for cards in headers:
+                header = format_header(cards)
+                f.write(header)
+                size = parse_header(header).padded_data_size()
+                if sparse:
+                    f.seek(size, 1)
+                else:
+                    f.write(bytes(size))
+            f.truncate()
+        return path
+
+    return _make_fits
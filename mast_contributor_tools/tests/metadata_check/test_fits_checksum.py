@@ -0,0 +1,188 @@
+"""
+Tests for mast_contributor_tools/metadata_check/fits_checksum.py
+"""
+
+import gzip
+import json
+import sqlite3
+import struct
+from pathlib import Path
+
+import pytest
+
+from mast_contributor_tools.metadata_check.fits_header import BLOCK_SIZE, read_headers
+from mast_contributor_tools.metadata_check.mc_app import check_metadata, evaluate_file
+
+np = pytest.importorskip("numpy")
+
+from mast_contributor_tools.metadata_check.fits_checksum import (  # noqa: E402
+    buffer_sum,
+    data_sum,
+    encode_checksum,
+    fold,
+    verify_checksums,
+)
+
+
+def python_sum(buffer: bytes) -> int:
+    """Returns the ones' complement sum of a buffer, one word at a time"""
+    total = 0
+    for (word,) in struct.iter_unpack(">I", buffer):
+        total = fold(total + word)
+    return total
+
+
+@pytest.fixture
+def make_checksummed(make_fits):
+    """Returns a function writing a FITS file whose HDUs have valid CHECKSUM and DATASUM cards
+
+    Each HDU is given as its header cards and its data, as bytes.
+    """
+
+    def _make_checksummed(name: str, hdus: list[tuple[dict, bytes]]) -> Path:
+        padded = [data + bytes(-len(data) % BLOCK_SIZE) for _, data in hdus]
+        headers = [
+            {**cards, "CHECKSUM": "0" * 16, "DATASUM": str(python_sum(data))} for (cards, _), data in zip(hdus, padded)
+        ]
+        path = make_fits(name, headers)
+        with open(path, "r+b") as f:
+            for hdu, data in zip(read_headers(path), padded):
+                f.seek(hdu.data_offset)
+                f.write(data)
+                f.seek(hdu.header_offset)
+                header = f.read(hdu.data_offset - hdu.header_offset)
+                checksum = encode_checksum(fold(python_sum(header) + python_sum(data)))
+                f.seek(hdu.header_offset + header.index(b"0" * 16))
+                f.write(checksum.encode())
+        return path
+
+    return _make_checksummed
+
+
+@pytest.fixture
+def checksummed_file(make_checksummed, image_cards):
+    """Returns the path of a FITS file with a primary array and an image extension, with checksums"""
+    primary = np.arange(1000, dtype=">i2").tobytes()
+    image = (np.arange(300, dtype=">f4") * 1.5).tobytes()
+    return make_checksummed(
+        "checksummed.fits",
+        [(image_cards((1000,)), primary), (image_cards((10, 30), bitpix=-32, extension=True), image)],
+    )
+
+
+def test_data_sum(tmp_path) -> None:
+    """Test that files are summed in chunks as they would be one word at a time"""
+    data = np.random.default_rng(1).integers(0, 256, 10 * BLOCK_SIZE + 2, dtype=np.uint8).tobytes()
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    expected = python_sum(data[:-2] + data[-2:] + b"\0\0")
+    assert data_sum(path, 0, len(data), chunk_size=3 * BLOCK_SIZE) == expected
+    assert data_sum(path, 0, len(data)) == expected
+    assert data_sum(path, BLOCK_SIZE, BLOCK_SIZE) == buffer_sum(data[BLOCK_SIZE : 2 * BLOCK_SIZE])
+    assert data_sum(path, 0, 0) == 0
+
+
+def test_fold() -> None:
+    """Test that carries are added back, and that all bits set is kept as negative zero"""
+    assert fold(0xFFFFFFFF + 1) == 1
+    assert fold(0xFFFFFFFF) == 0xFFFFFFFF
+    assert fold(3 * 0xFFFFFFFF) == 0xFFFFFFFF
+
+
+def test_encode_checksum() -> None:
+    """Test that encoded checksums are made of digits and letters only"""
+    for value in [0, 1, 0x12345678, 0xFFFFFFFF, 0x3A3A3A3A]:
+        encoded = encode_checksum(value)
+        assert len(encoded) == 16
+        assert encoded.isalnum()
+
+
+def test_verify_checksums(checksummed_file) -> None:
+    """Test that the CHECKSUM and DATASUM cards of each HDU are verified"""
+    records, n_bytes = verify_checksums(checksummed_file, read_headers(checksummed_file))
+    assert [(r["hdu"], r["keyword"], r["keyword_verdict"]) for r in records] == [
+        (0, "DATASUM", "PASS"),
+        (0, "CHECKSUM", "PASS"),
+        (1, "DATASUM", "PASS"),
+        (1, "CHECKSUM", "PASS"),
+    ]
+    assert n_bytes == checksummed_file.stat().st_size
+
+
+def test_verify_checksums_corrupted(checksummed_file) -> None:
+    """Test that corrupted data fail both sums, and a changed header fails the checksum only"""
+    hdus = read_headers(checksummed_file)
+    with open(checksummed_file, "r+b") as f:
+        f.seek(hdus[1].data_offset + 5)
+        f.write(b"\x7f")
+        # In the blank fill after the END card
+        f.seek(hdus[0].data_offset - 80)
+        f.write(b"X")
+    records, _ = verify_checksums(checksummed_file, read_headers(checksummed_file))
+    verdicts = {(r["hdu"], r["keyword"]): r["value_score"] for r in records}
+    assert verdicts == {
+        (0, "DATASUM"): "pass",
+        (0, "CHECKSUM"): "fail",
+        (1, "DATASUM"): "fail",
+        (1, "CHECKSUM"): "fail",
+    }
+
+
+def test_verify_checksums_compressed(checksummed_file) -> None:
+    """Test that the checksums of a compressed file are verified on its decompressed content"""
+    compressed = checksummed_file.with_name("checksummed.fits.gz")
+    compressed.write_bytes(gzip.compress(checksummed_file.read_bytes()))
+    records, n_bytes = verify_checksums(compressed, read_headers(compressed), chunk_size=BLOCK_SIZE)
+    assert [r["keyword_verdict"] for r in records] == ["PASS"] * 4
+    assert n_bytes == checksummed_file.stat().st_size
+
+
+def test_evaluate_file_checksums_truncated(make_checksummed, hlsp_cards, image_cards) -> None:
+    """Test that a compressed file whose data cannot be decompressed fails, rather than stopping the run"""
+    image = np.random.default_rng(0).random(30000).astype(">f4").tobytes()
+    path = make_checksummed("truncated.fits", [(hlsp_cards, b""), (image_cards((300, 100), -32, True), image)])
+    # The headers can be read, but not the end of the data
+    compressed = gzip.compress(path.read_bytes())
+    path.with_name("truncated.fits.gz").write_bytes(compressed[: len(compressed) // 2])
+    file_rec, keywords = evaluate_file(Path("truncated.fits.gz"), "my-hlsp", str(path.parent), verify=True)
+    assert file_rec["final_verdict"] == "FAIL"
+    assert "decompress" in file_rec["error"]
+    assert keywords == []
+
+
+def test_evaluate_file_checksums(checksummed_file, make_fits, hlsp_cards) -> None:
+    """Test that checksum failures fail the file, and that files without checksums are not summed"""
+    root = str(checksummed_file.parent)
+    file_rec, keywords = evaluate_file(Path(checksummed_file.name), "my-hlsp", root, verify=True)
+    assert file_rec["checksum_bytes"] == checksummed_file.stat().st_size
+    assert file_rec["checksum_ms"] >= 0
+    assert {k["keyword"] for k in keywords} >= {"CHECKSUM", "DATASUM"}
+    assert all(k["file_ref"] == checksummed_file.name for k in keywords)
+
+    make_fits("bad.fits", [{**hlsp_cards, "DATASUM": "12"}])
+    file_rec, keywords = evaluate_file(Path("bad.fits"), "my-hlsp", root, verify=True)
+    assert file_rec["final_verdict"] == "FAIL"
+    assert [k["keyword"] for k in keywords if k["keyword_verdict"] == "FAIL"] == ["DATASUM"]
+
+    make_fits("plain.fits", [hlsp_cards])
+    file_rec, _ = evaluate_file(Path("plain.fits"), "my-hlsp", root, verify=True)
+    assert file_rec["final_verdict"] == "PASS"
+    assert file_rec["checksum_bytes"] == 0
+
+
+def test_check_metadata_checksums(checksummed_file, tmp_path) -> None:
+    """Test that the checksum results and throughput of a run are recorded"""
+    db_file = tmp_path / "metadata.db"
+    file_list = [Path(checksummed_file.name)]
+    check_metadata("my-hlsp", file_list, str(db_file), root=str(tmp_path), verify_checksums=True)
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT checksum_bytes FROM fits_file").fetchone()[0] == checksummed_file.stat().st_size
+    assert conn.execute("SELECT COUNT(*) FROM keywords WHERE keyword = 'CHECKSUM'").fetchone()[0] == 2
+    metrics = json.loads(conn.execute("SELECT metrics FROM runs").fetchone()[0])
+    assert metrics["checksum_gb_per_s"] > 0
+    conn.close()
+
+    with pytest.raises(ValueError, match="header cache alone"):
+        check_metadata(
+            "my-hlsp", file_list, str(db_file), cache_file="cache.db", cache_only=True, verify_checksums=True
+        )
@@ -0,0 +1,205 @@
+"""
+Tests for mast_contributor_tools/metadata_check/fits_header.py
+"""
+
+import bz2
+import gzip
+import io
+import random
+
+import pytest
+
+from mast_contributor_tools.metadata_check.fits_header import (
+    BLOCK_SIZE,
+    READ_BLOCKS,
+    FitsError,
+    FitsHeader,
+    iter_hdus,
+    parse_card,
+    parse_header,
+    read_headers,
+)
+
+
+@pytest.mark.parametrize(
+    "card, expected",
+    [
+        ("SIMPLE  =                    T / conforms to FITS standard", ("SIMPLE", True, "conforms to FITS standard")),
+        ("NAXIS1  =                 2048", ("NAXIS1", 2048, "")),
+        ("EXPTIME =            1.200D+03 / seconds", ("EXPTIME", 1200.0, "seconds")),
+        ("TARGNAME= 'M31 / core'         / the target", ("TARGNAME", "M31 / core", "the target")),
+        ("OBSERVER= 'O''Brien '", ("OBSERVER", "O'Brien", "")),
+        ("BLANK   =                      / undefined", ("BLANK", None, "undefined")),
+        ("HISTORY reduced with pipeline v2", ("HISTORY", "reduced with pipeline v2", "")),
+        ("HIERARCH ESO DET CHIP = 'CCD1'", ("ESO DET CHIP", "CCD1", "")),
+    ],
+)
+def test_parse_card(card, expected) -> None:
+    """Test that card values of each type, and their comments, are parsed"""
+    assert parse_card(f"{card:<80}") == expected
+
+
+def test_parse_header_continue() -> None:
+    """Test that long strings continued with CONTINUE are joined into one value"""
+    cards = ["LICENURL= 'https://creativecommons.org/&'", "CONTINUE  'licenses/by/4.0/'", "END"]
+    header = parse_header("".join(f"{c:<80}" for c in cards).encode())
+    assert header["LICENURL"] == "https://creativecommons.org/licenses/by/4.0/"
+    assert len(header.cards) == 1
+
+
+@pytest.mark.parametrize(
+    "cards, expected",
+    [
+        ({"BITPIX": 8, "NAXIS": 0}, 0),
+        ({"BITPIX": -32, "NAXIS": 2, "NAXIS1": 100, "NAXIS2": 50}, 4 * 100 * 50),
+        # Binary table with a heap
+        ({"BITPIX": 8, "NAXIS": 2, "NAXIS1": 24, "NAXIS2": 10, "PCOUNT": 300, "GCOUNT": 1}, 240 + 300),
+        # Random groups, where NAXIS1 = 0 is not part of the size
+        ({"BITPIX": 16, "NAXIS": 2, "NAXIS1": 0, "NAXIS2": 5, "GROUPS": True, "PCOUNT": 3, "GCOUNT": 4}, 2 * 4 * 8),
+    ],
+)
+def test_data_size(cards, expected) -> None:
+    """Test that the size of the data is computed from BITPIX, NAXISn, PCOUNT and GCOUNT"""
+    header = FitsHeader([(k, v, "") for k, v in cards.items()])
+    assert header.data_size() == expected
+    assert header.padded_data_size() == -(-expected // BLOCK_SIZE) * BLOCK_SIZE
+
+
+@pytest.mark.parametrize(
+    "cards, keyword",
+    [
+        ({"NAXIS": 1, "NAXIS1": "abc"}, "NAXIS1"),
+        ({"NAXIS": 1.5}, "NAXIS"),
+        ({"NAXIS": 1, "NAXIS1": 10, "BITPIX": True}, "BITPIX"),
+        ({"NAXIS": 1, "NAXIS1": 10, "GCOUNT": None}, "GCOUNT"),
+    ],
+)
+def test_data_size_invalid(cards, keyword) -> None:
+    """Test that sizes which are not integers raise FitsError"""
+    header = FitsHeader([(k, v, "") for k, v in cards.items()])
+    with pytest.raises(FitsError, match=f"Invalid {keyword} "):
+        header.data_size()
+
+
+def test_read_headers(make_fits, hlsp_cards, image_cards) -> None:
+    """Test that the headers of every HDU are read, with their offsets"""
+    path = make_fits(
+        "test.fits", [hlsp_cards, image_cards((100, 100), extension=True), image_cards((3,), extension=True)]
+    )
+    hdus = read_headers(path)
+    assert [h.index for h in hdus] == [0, 1, 2]
+    assert hdus[0].header["HLSPID"] == "MY-HLSP"
+    assert hdus[1].header["XTENSION"] == "IMAGE"
+    assert hdus[1].data_size == 20000
+    assert hdus[2].header_offset == hdus[1].data_offset + 7 * BLOCK_SIZE
+    assert len(read_headers(path, max_hdus=1)) == 1
+
+
+class CountingFile(io.FileIO):
+    """A file counting the reads from it, and the bytes read"""
+
+    reads = 0
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.reads += 1
+        self.bytes_read += len(data)
+        return data
+
+
+def test_data_not_read(make_fits, hlsp_cards, image_cards) -> None:
+    """Test that the data of a large file are skipped rather than read"""
+    # 4 GB of data, left as holes in the file
+    headers = [hlsp_cards, image_cards((16384, 16384), bitpix=-64, extension=True), image_cards((10,), extension=True)]
+    path = make_fits("large.fits", headers, sparse=True)
+    with CountingFile(path) as f:
+        hdus = list(iter_hdus(f))
+        assert len(hdus) == 3
+        assert hdus[1].data_size == 8 * 16384**2
+        # One read per header, and one finding the end of the file
+        assert f.reads == 4
+        assert f.bytes_read <= 3 * READ_BLOCKS * BLOCK_SIZE
+
+
+@pytest.mark.parametrize(
+    "content, message",
+    [
+        (b"", "empty"),
+        (b"\x89PNG\r\n\x1a\n" + bytes(BLOCK_SIZE), "starting with SIMPLE"),
+        (f"{'SIMPLE  =                    T':<80}".encode() * 36, "no END card"),
+        (f"{'SIMPLE  =                    T':<80}".encode() * 10, "truncated"),
+    ],
+    ids=["empty", "png", "no END", "truncated"],
+)
+def test_read_headers_invalid(tmp_path, content, message) -> None:
+    """Test that files which are not FITS, or are truncated, raise FitsError"""
+    path = tmp_path / "bad.fits"
+    path.write_bytes(content)
+    with pytest.raises(FitsError, match=message):
+        read_headers(path)
+
+
+def test_read_headers_truncated_data(make_fits, image_cards) -> None:
+    """Test that a file whose data are shorter than their header says raises FitsError"""
+    path = make_fits("short.fits", [image_cards((100, 100))])
+    with open(path, "r+b") as f:
+        f.truncate(BLOCK_SIZE + 1000)
+    with pytest.raises(FitsError, match="Data of HDU 0 is truncated"):
+        read_headers(path)
+    # Trailing bytes that are not an extension header
+    path.write_bytes(path.read_bytes()[:BLOCK_SIZE] + bytes(20000 + 160) + b"garbage" * 500)
+    with pytest.raises(FitsError, match="starting with XTENSION at offset 23040"):
+        read_headers(path)
+
+
+@pytest.fixture
+def compress():
+    """Returns a function compressing a file with gzip or bzip2, returning the path of the compressed file"""
+
+    def _compress(path, method: str = "gz"):
+        module = gzip if method == "gz" else bz2
+        compressed = path.with_name(f"{path.name}.{method}")
+        compressed.write_bytes(module.compress(path.read_bytes()))
+        return compressed
+
+    return _compress
+
+
+@pytest.mark.parametrize("method", ["gz", "bz2"])
+def test_read_headers_compressed(make_fits, hlsp_cards, image_cards, compress, method) -> None:
+    """Test that the headers of compressed files are read as those of the uncompressed file"""
+    path = make_fits("hlsp.fits", [hlsp_cards, image_cards((100, 100), extension=True)])
+    hdus = read_headers(compress(path, method))
+    assert [h[2:] for h in hdus] == [h[2:] for h in read_headers(path)]
+    assert hdus[0].header.values == read_headers(path)[0].header.values
+
+
+def test_read_headers_compressed_keywords(make_fits, hlsp_cards, image_cards, compress) -> None:
+    """Test that compressed files are only read until the keywords looked for are found"""
+    # Random data, which do not compress
+    image = random.Random(0).randbytes(512 * 512 * 2)
+    path = make_fits("hlsp.fits", [hlsp_cards, {**image_cards((512, 512), extension=True), "EXTNAME": "SCI"}])
+    with open(path, "r+b") as f:
+        f.seek(read_headers(path)[1].data_offset)
+        f.write(image)
+    compressed = compress(path)
+    assert len(read_headers(compressed)) == 2
+    # The headers of uncompressed files are all read, since reading them costs little
+    assert len(read_headers(path, keywords=["HLSPID"])) == 2
+
+    # Cut the compressed file within the data of the extension: the rest is not needed
+    compressed.write_bytes(compressed.read_bytes()[:16384])
+    hdus = read_headers(compressed, keywords=["HLSPID", "TELESCOP"])
+    assert len(hdus) == 1
+    with pytest.raises(FitsError, match="Could not decompress"):
+        read_headers(compressed, keywords=["HLSPID", "MISSING"])
+
+
+def test_read_headers_compressed_truncated_data(make_fits, image_cards, compress) -> None:
+    """Test that a compressed file whose data are shorter than their header says raises FitsError"""
+    path = make_fits("short.fits", [image_cards((100, 100))])
+    with open(path, "r+b") as f:
+        f.truncate(BLOCK_SIZE + 1000)
+    with pytest.raises(FitsError, match="truncated"):
+        read_headers(compress(path))
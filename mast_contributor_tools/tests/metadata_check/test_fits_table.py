@@ -0,0 +1,199 @@
+"""
+Tests for mast_contributor_tools/metadata_check/fits_table.py
+"""
+
+import gzip
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from mast_contributor_tools.metadata_check.fits_header import FitsHeader, read_headers
+from mast_contributor_tools.metadata_check.fits_table import (
+    check_tables,
+    column_stats,
+    column_width,
+    parse_tform,
+    table_columns,
+)
+from mast_contributor_tools.metadata_check.mc_app import check_metadata, evaluate_file
+
+
+def bintable_cards(columns: list[tuple], n_rows: int) -> dict:
+    """Returns the cards of a binary table header, given the TTYPE, TFORM, TUNIT and extra cards of each column"""
+    row_size = sum(column_width(*parse_tform(tform)) for _, tform, *_ in columns)
+    cards = {"XTENSION": "BINTABLE", "BITPIX": 8, "NAXIS": 2, "NAXIS1": row_size, "NAXIS2": n_rows}
+    cards.update({"PCOUNT": 0, "GCOUNT": 1, "TFIELDS": len(columns)})
+    for n, (name, tform, unit, *extra) in enumerate(columns, start=1):
+        cards.update({f"TTYPE{n}": name, f"TFORM{n}": tform})
+        if unit is not None:
+            cards[f"TUNIT{n}"] = unit
+        for keyword, value in (extra[0] if extra else {}).items():
+            cards[f"{keyword}{n}"] = value
+    return cards
+
+
+@pytest.mark.parametrize(
+    "tform, expected",
+    [("E", (1, "E")), ("12A", (12, "A")), ("3D", (3, "D")), ("1PE(100)", (1, "P")), ("0J", (0, "J"))],
+)
+def test_parse_tform(tform, expected) -> None:
+    """Test that the repeat count and data type code are parsed from TFORM values"""
+    assert parse_tform(tform) == expected
+
+
+def test_parse_tform_invalid() -> None:
+    """Test that invalid TFORM values raise ValueError"""
+    with pytest.raises(ValueError, match="Invalid TFORM"):
+        parse_tform("F8.3")
+
+
+def test_column_width() -> None:
+    """Test that the widths of bit, string, array and descriptor columns are computed"""
+    assert column_width(9, "X") == 2
+    assert column_width(12, "A") == 12
+    assert column_width(3, "D") == 24
+    assert column_width(1, "Q") == 16
+
+
+def test_table_columns() -> None:
+    """Test that descriptors are checked, and the offset of each column found"""
+    cards = bintable_cards(
+        [
+            ("RA", "D", "deg"),
+            ("FLUX", "2E", None),
+            ("NAME", "8A", None),
+            ("flux", "J", "count"),
+            ("Mag err", "E", "mag"),
+        ],
+        n_rows=10,
+    )
+    header = FitsHeader([(k, v, "") for k, v in cards.items()])
+    columns, records = table_columns(1, header)
+    assert [(c.name, c.offset, c.width) for c in columns] == [
+        ("RA", 0, 8),
+        ("FLUX", 8, 8),
+        ("NAME", 16, 8),
+        ("flux", 24, 4),
+        ("Mag err", 28, 4),
+    ]
+    verdicts = {r["keyword"]: r["keyword_verdict"] for r in records}
+    assert verdicts["TTYPE1"] == "PASS"
+    assert verdicts["TUNIT1"] == "PASS"
+    # A numeric column without a unit, a duplicate name, and a name with a space
+    assert verdicts["TUNIT2"] == "NEEDS REVIEW"
+    assert verdicts["TTYPE4"] == "FAIL"
+    assert verdicts["TTYPE5"] == "NEEDS REVIEW"
+    # String columns need no unit
+    assert "TUNIT3" not in verdicts
+    assert all(r["hdu"] == 1 for r in records)
+
+
+@pytest.mark.parametrize(
+    "changes, keyword, verdict",
+    [
+        ({"TFORM2": "F8.3"}, "TFORM2", "FAIL"),
+        ({"TFORM2": None}, "TFORM2", "FAIL"),
+        ({"NAXIS1": 100}, "NAXIS1", "FAIL"),
+        ({"TTYPE2": None}, "TTYPE2", "NEEDS REVIEW"),
+        ({"TFIELDS": None}, "TFIELDS", "FAIL"),
+    ],
+    ids=["invalid-tform", "missing-tform", "naxis1", "missing-ttype", "missing-tfields"],
+)
+def test_table_columns_invalid(changes, keyword, verdict) -> None:
+    """Test that invalid or missing descriptors are reported, and that no columns are read if their offsets are unknown"""
+    cards = {**bintable_cards([("RA", "D", "deg"), ("DEC", "D", "deg")], n_rows=10), **changes}
+    header = FitsHeader([(k, v, "") for k, v in cards.items() if v is not None])
+    columns, records = table_columns(1, header)
+    assert {r["keyword"]: r["keyword_verdict"] for r in records}[keyword] == verdict
+    assert (len(columns) == 2) == (verdict == "NEEDS REVIEW")
+
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def catalog(make_fits, hlsp_cards) -> Path:
+    """Returns the path of a FITS catalog with float, integer, scaled and string columns"""
+    n_rows = 1000
+    columns = [
+        ("RA", "D", "deg"),
+        ("MAG", "3E", "mag"),
+        ("NOBS", "J", "count", {"TNULL": -1}),
+        ("FLAG", "I", "", {"TSCAL": 2.0, "TZERO": 10.0}),
+        ("NAME", "6A", None),
+    ]
+    dtype = np.dtype([("RA", ">f8"), ("MAG", ">f4", (3,)), ("NOBS", ">i4"), ("FLAG", ">i2"), ("NAME", "S6")])
+    data = np.zeros(n_rows, dtype=dtype)
+    data["RA"] = np.linspace(0.0, 359.0, n_rows)
+    data["MAG"] = np.arange(3 * n_rows, dtype=float).reshape(n_rows, 3) / 100
+    data["MAG"][::10, 1] = np.nan
+    data["NOBS"] = np.arange(n_rows)
+    data["NOBS"][::4] = -1
+    data["FLAG"] = np.arange(n_rows) % 7 - 3
+    data["NAME"] = b"galaxy"
+    path = make_fits("hlsp_my-hlsp_hst_wfc3_m31_f160w_v1_cat.fits", [hlsp_cards, bintable_cards(columns, n_rows)])
+    with open(path, "r+b") as f:
+        f.seek(read_headers(path)[1].data_offset)
+        f.write(data.tobytes())
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [None, 4096, 1])
+def test_check_tables(catalog, chunk_size) -> None:
+    """Test that the statistics of numeric columns are the same whatever the number of rows read at a time"""
+    hdus = read_headers(catalog)
+    if chunk_size:
+        stats = column_stats(catalog, hdus[1], table_columns(1, hdus[1].header)[0], chunk_size)
+    else:
+        records, column_records = check_tables(catalog, hdus)
+        assert all(r["keyword_verdict"] == "PASS" for r in records)
+        stats = {c["column_number"]: c for c in column_records if c["n_nan"] is not None}
+        assert [c["name"] for c in column_records] == ["RA", "MAG", "NOBS", "FLAG", "NAME"]
+        assert column_records[4]["n_nan"] is None
+    assert (stats[1]["min"], stats[1]["max"], stats[1]["n_nan"]) == (0.0, 359.0, 0)
+    assert stats[2]["n_nan"] == 100
+    assert stats[2]["max"] == pytest.approx(29.99)
+    assert (stats[3]["n_null"], stats[3]["min"], stats[3]["max"]) == (250, 1, 999)
+    # Scaled by TSCAL and TZERO
+    assert (stats[4]["min"], stats[4]["max"]) == (4.0, 16.0)
+
+
+def test_check_tables_compressed(catalog) -> None:
+    """Test that the descriptors of compressed catalogs are checked, without reading their data"""
+    compressed = catalog.with_name(catalog.name + ".gz")
+    compressed.write_bytes(gzip.compress(catalog.read_bytes()))
+    records, column_records = check_tables(compressed, read_headers(compressed))
+    assert len(records) == 14
+    assert len(column_records) == 5
+    assert all(c["n_nan"] is None for c in column_records)
+
+
+def test_check_metadata_tables(catalog, tmp_path) -> None:
+    """Test that the columns of each table are written to the table_columns table"""
+    file_rec, keywords = evaluate_file(Path(catalog.name), "my-hlsp", str(tmp_path), tables=True)
+    assert file_rec["final_verdict"] == "PASS"
+    assert {"TTYPE1", "TFORM5"} <= {k["keyword"] for k in keywords}
+    assert all(c["file_ref"] == catalog.name for c in file_rec["columns"])
+
+    db_file = tmp_path / "metadata.db"
+    check_metadata("my-hlsp", [Path(catalog.name)], str(db_file), root=str(tmp_path), check_tables=True)
+    conn = sqlite3.connect(db_file)
+    rows = conn.execute(
+        "SELECT name, n_rows, n_null FROM table_columns WHERE file_ref = ? ORDER BY column_number", [catalog.name]
+    )
+    assert rows.fetchall()[:3] == [("RA", 1000, 0), ("MAG", 1000, 0), ("NOBS", 1000, 250)]
+    conn.close()
+
+
+def test_check_metadata_tables_compressed(catalog, tmp_path) -> None:
+    """Test that every HDU of a compressed catalog is read when its tables are checked"""
+    compressed = catalog.with_name(catalog.name + ".gz")
+    compressed.write_bytes(gzip.compress(catalog.read_bytes()))
+    file_rec, _ = evaluate_file(Path(compressed.name), "my-hlsp", str(tmp_path), tables=True)
+    assert file_rec["n_hdus"] == 2
+    assert len(file_rec["columns"]) == 5
+    # Otherwise reading stops at the primary header, and the number of HDUs is not known
+    file_rec, _ = evaluate_file(Path(compressed.name), "my-hlsp", str(tmp_path))
+    assert file_rec["final_verdict"] == "PASS"
+    assert file_rec["n_hdus"] is None
@@ -0,0 +1,81 @@
+"""
+Tests for mast_contributor_tools/metadata_check/hlsp_metadata.py
+"""
+
+from pathlib import Path
+
+import pytest
+
+from mast_contributor_tools.metadata_check.fits_header import read_headers
+from mast_contributor_tools.metadata_check.hlsp_metadata import (
+    RECOMMENDED_KEYWORDS,
+    REQUIRED_KEYWORDS,
+    HlspMetadata,
+    type_matches,
+)
+
+
+@pytest.mark.parametrize(
+    "value, value_type, expected",
+    [
+        ("HST", "str", True),
+        (10, "str", False),
+        (10, "float", True),
+        (10.5, "float", True),
+        (True, "float", False),
+        (10.5, "int", False),
+        (False, "bool", True),
+        (None, "str", False),
+    ],
+)
+def test_type_matches(value, value_type, expected) -> None:
+    """Test that keyword values are checked against their expected type"""
+    assert type_matches(value, value_type) == expected
+
+
+def evaluate(path: Path, hlsp_name: str = "my-hlsp") -> tuple[dict, dict]:
+    """Returns the file record and the records of each keyword"""
+    hm = HlspMetadata(path, hlsp_name, read_headers(path))
+    keywords = {k["keyword"]: k for k in hm.evaluate_keywords()}
+    return hm.evaluate_file(), keywords
+
+
+def test_all_keywords_pass(make_fits, hlsp_cards) -> None:
+    """Test that a file with every keyword passes"""
+    file_rec, keywords = evaluate(make_fits("good.fits", [hlsp_cards]))
+    assert file_rec["final_verdict"] == "PASS"
+    assert file_rec["n_hdus"] == 1
+    assert set(keywords) == {*REQUIRED_KEYWORDS, *RECOMMENDED_KEYWORDS}
+    assert keywords["RA_TARG"]["value"] == "10.6847"
+    assert all(k["file_ref"] == "good.fits" for k in keywords.values())
+
+
+@pytest.mark.parametrize(
+    "change, keyword, expected",
+    [
+        ({"DOI": None}, "DOI", "FAIL"),
+        ({"TARGNAME": None}, "TARGNAME", "NEEDS REVIEW"),
+        ({"RA_TARG": "10h42m"}, "RA_TARG", "FAIL"),
+        ({"HLSPID": "OTHER"}, "HLSPID", "NEEDS REVIEW"),
+        ({"FILTER": ""}, "FILTER", "NEEDS REVIEW"),
+    ],
+)
+def test_keyword_verdicts(make_fits, hlsp_cards, change, keyword, expected) -> None:
+    """Test that missing, mistyped and unexpected keyword values are found"""
+    cards = {**hlsp_cards, **change}
+    # A value of None removes the keyword
+    cards = {k: v for k, v in cards.items() if v is not None}
+    file_rec, keywords = evaluate(make_fits("test.fits", [cards]))
+    assert keywords[keyword]["keyword_verdict"] == expected
+    assert file_rec["final_verdict"] == expected
+    assert sum(k["keyword_verdict"] != "PASS" for k in keywords.values()) == 1
+
+
+def test_keyword_in_extension(make_fits, hlsp_cards, image_cards) -> None:
+    """Test that keywords missing from the primary header are found in extension headers"""
+    primary = {k: v for k, v in hlsp_cards.items() if k != "FILTER"}
+    extension = {**image_cards((10,), extension=True), "FILTER": "F814W"}
+    file_rec, keywords = evaluate(make_fits("test.fits", [primary, extension]))
+    assert file_rec["final_verdict"] == "PASS"
+    assert keywords["FILTER"]["hdu"] == 1
+    assert keywords["TELESCOP"]["hdu"] == 0
@@ -0,0 +1,101 @@
+"""
+Tests for mast_contributor_tools/metadata_check/mc_app.py
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from mast_contributor_tools.filename_check.fc_config import hash_files
+from mast_contributor_tools.metadata_check.hlsp_metadata import CONFIG_FILE
+from mast_contributor_tools.metadata_check.mc_app import check_metadata, evaluate_file, evaluate_files
+
+
+def test_evaluate_file_invalid(tmp_path) -> None:
+    """Test that files that are missing or are not FITS fail, with the reason"""
+    (tmp_path / "preview.fits").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(3000))
+    file_rec, keywords = evaluate_file(Path("preview.fits"), "my-hlsp", root=str(tmp_path))
+    assert file_rec["final_verdict"] == "FAIL"
+    assert "starting with SIMPLE" in file_rec["error"]
+    assert keywords == []
+    assert file_rec["read_ms"] >= 0
+    file_rec, _ = evaluate_file(Path("missing.fits"), "my-hlsp", root=str(tmp_path))
+    assert "No such file" in file_rec["error"]
+
+
+def test_evaluate_file_malformed_header(tmp_path) -> None:
+    """Test that a header whose sizes are not integers fails the file"""
+    cards = ["SIMPLE  =                    T", "BITPIX  =                    8", "NAXIS   =                    1"]
+    cards += ["NAXIS1  = 'abc'", "END"]
+    (tmp_path / "bad.fits").write_bytes("".join(f"{c:<80}" for c in cards).ljust(2880).encode())
+    file_rec, keywords = evaluate_file(Path("bad.fits"), "my-hlsp", root=str(tmp_path))
+    assert file_rec["final_verdict"] == "FAIL"
+    assert "Invalid NAXIS1" in file_rec["error"]
+    assert keywords == []
+
+
+def test_evaluate_files_unexpected_error() -> None:
+    """Test that an unexpected error in one file fails that file, rather than stopping the run"""
+
+    def evaluate(f, *args):
+        if f.name == "bad.fits":
+            raise TypeError("unsupported operand")
+        return {"filename": f.name, "final_verdict": "PASS"}, []
+
+    with mock.patch("mast_contributor_tools.metadata_check.mc_app.evaluate_file", side_effect=evaluate):
+        results = list(evaluate_files([Path("good.fits"), Path("bad.fits")], "my-hlsp", workers=1))
+    verdicts = {file_rec["filename"]: file_rec for file_rec, _ in results}
+    assert verdicts["good.fits"]["final_verdict"] == "PASS"
+    assert verdicts["bad.fits"]["final_verdict"] == "FAIL"
+    assert verdicts["bad.fits"]["error"] == "TypeError: unsupported operand"
+
+
+def test_check_metadata(make_fits, hlsp_cards, tmp_path) -> None:
+    """Test that the results of each file and keyword are written to the results database"""
+    make_fits("data/good.fits", [hlsp_cards])
+    make_fits("data/review.fits", [{**hlsp_cards, "HLSPID": "OTHER"}])
+    (tmp_path / "data" / "empty.fits").touch()
+    file_list = [Path("good.fits"), Path("review.fits"), Path("empty.fits")]
+    db_file = tmp_path / "metadata.db"
+    check_metadata("my-hlsp", file_list, str(db_file), root=str(tmp_path / "data"), batch_size=2, workers=2)
+
+    conn = sqlite3.connect(db_file)
+    verdicts = dict(conn.execute("SELECT filename, final_verdict FROM fits_file"))
+    assert verdicts == {"good.fits": "PASS", "review.fits": "NEEDS REVIEW", "empty.fits": "FAIL"}
+    problems = conn.execute("SELECT filename, keyword FROM potential_problems").fetchall()
+    assert problems == [("review.fits", "HLSPID")]
+    assert conn.execute("SELECT COUNT(*) FROM value_counts").fetchone()[0] > 0
+    # Each file has its read time, and the run is recorded
+    assert conn.execute("SELECT COUNT(*) FROM fits_file WHERE read_ms >= 0").fetchone()[0] == 3
+    assert conn.execute("SELECT n_files, workers FROM runs").fetchall() == [(3, 2)]
+    # The run is identified by the metadata rules, not those of the filename check
+    assert conn.execute("SELECT config_hash FROM runs").fetchone() == (hash_files([CONFIG_FILE]),)
+    conn.close()
+
+
+def test_evaluate_files_bounded() -> None:
+    """Test that files are read on several threads, with a bounded number in flight"""
+    submitted = 0
+    threads = set()
+
+    def file_list():
+        nonlocal submitted
+        for i in range(50):
+            submitted += 1
+            yield Path(f"file{i}.fits")
+
+    def slow_evaluate(f, *args):
+        threads.add(threading.current_thread().name)
+        time.sleep(0.002)
+        return {"filename": f.name}, []
+
+    with mock.patch("mast_contributor_tools.metadata_check.mc_app.evaluate_file", side_effect=slow_evaluate):
+        returned = 0
+        for file_rec, _ in evaluate_files(file_list(), "my-hlsp", workers=4, max_in_flight=6):
+            returned += 1
+            # Files submitted but not returned, excluding the one about to be submitted
+            assert submitted - returned <= 6
+    assert returned == 50
+    assert len(threads) > 1
@@ -0,0 +1,118 @@
+"""
+Tests for mast_contributor_tools/metadata_check/mc_cache.py
+"""
+
+import gzip
+import os
+import sqlite3
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from mast_contributor_tools.metadata_check.fits_header import read_headers
+from mast_contributor_tools.metadata_check.mc_app import check_metadata, evaluate_file
+from mast_contributor_tools.metadata_check.mc_cache import HeaderCache, cached_file_paths, decode_hdus, encode_hdus
+
+
+@pytest.fixture
+def header_cache(tmp_path):
+    """Returns an open header cache in a temporary directory"""
+    cache = HeaderCache(str(tmp_path / "mct_cache.db"))
+    cache.open()
+    yield cache
+    cache.close()
+
+
+def test_encode_hdus(make_fits, hlsp_cards, image_cards) -> None:
+    """Test that headers are decoded with the same values and types as they were read"""
+    path = make_fits("hlsp.fits", [{**hlsp_cards, "COMMENT": "a comment"}, image_cards((4, 4), extension=True)])
+    hdus = read_headers(path)
+    decoded = decode_hdus(encode_hdus(hdus))
+    assert [h[2:] for h in decoded] == [h[2:] for h in hdus]
+    assert [h.header.cards for h in decoded] == [h.header.cards for h in hdus]
+    assert decoded[0].header.values == hdus[0].header.values
+    assert isinstance(decoded[0].header["RA_TARG"], float)
+    assert decoded[0].header["SIMPLE"] is True
+
+
+def test_header_cache_changed(make_fits, hlsp_cards, header_cache) -> None:
+    """Test that cached headers are only returned while the file has not changed"""
+    path = make_fits("hlsp.fits", [hlsp_cards])
+    st = os.stat(path)
+    assert header_cache.get(str(path), st) is None
+    header_cache.put(str(path), st, read_headers(path))
+    header_cache.save()
+    hdus, error = header_cache.get(str(path), st)
+    assert hdus[0].header["HLSPID"] == "MY-HLSP"
+    assert error is None
+
+    make_fits("hlsp.fits", [{**hlsp_cards, "HLSPID": "OTHER"}, hlsp_cards])
+    assert header_cache.get(str(path), os.stat(path)) is None
+    # Without the status of the file, the cached headers are trusted
+    assert header_cache.get(str(path)) is not None
+    assert header_cache.hit_rate == pytest.approx(2 / 4)
+
+
+def test_evaluate_file_cached(make_fits, hlsp_cards, tmp_path, header_cache) -> None:
+    """Test that unchanged files are not read again, and that files that could not be read are cached too"""
+    make_fits("hlsp.fits", [hlsp_cards])
+    (tmp_path / "preview.fits").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(3000))
+    with mock.patch("mast_contributor_tools.metadata_check.mc_app.read_headers", side_effect=read_headers) as mock_read:
+        for _ in range(2):
+            file_rec, keywords = evaluate_file(Path("hlsp.fits"), "my-hlsp", str(tmp_path), cache=header_cache)
+            assert file_rec["final_verdict"] == "PASS"
+            assert len(keywords) > 0
+            file_rec, _ = evaluate_file(Path("preview.fits"), "my-hlsp", str(tmp_path), cache=header_cache)
+            assert "starting with SIMPLE" in file_rec["error"]
+            header_cache.save()
+        assert mock_read.call_count == 2
+    # Read times are only given for files that were read
+    file_rec, _ = evaluate_file(Path("hlsp.fits"), "my-hlsp", str(tmp_path), cache=header_cache)
+    assert file_rec["read_ms"] is None
+
+
+def test_evaluate_file_cached_compressed(make_fits, hlsp_cards, image_cards, tmp_path, header_cache) -> None:
+    """Test that every HDU of a compressed file is cached, not only those up to the checked keywords"""
+    path = make_fits("hlsp.fits", [hlsp_cards, image_cards((4, 4), extension=True)])
+    (tmp_path / "hlsp.fits.gz").write_bytes(gzip.compress(path.read_bytes()))
+    file_rec, _ = evaluate_file(Path("hlsp.fits.gz"), "my-hlsp", str(tmp_path), cache=header_cache)
+    assert file_rec["n_hdus"] == 2
+    header_cache.save()
+    hdus, _ = header_cache.get(str(tmp_path / "hlsp.fits.gz"))
+    assert len(hdus) == 2
+
+
+def test_cached_file_paths(make_fits, hlsp_cards, tmp_path, header_cache) -> None:
+    """Test that the cached files of a directory are listed without looking at the directory"""
+    for name in ["data/a.fits", "data/sub/b.fits", "data/c_spec.fits", "other/d.fits"]:
+        path = make_fits(name, [hlsp_cards])
+        header_cache.put(str(path), os.stat(path), read_headers(path))
+    header_cache.save()
+    cache_file = header_cache.cache_file
+    paths = cached_file_paths(cache_file, str(tmp_path / "data"), exclude_pattern="*_spec.fits")
+    assert sorted(paths) == [Path("a.fits"), Path("sub/b.fits")]
+    with pytest.raises(FileNotFoundError, match="No files"):
+        cached_file_paths(cache_file, str(tmp_path / "dat"))
+
+
+def test_check_metadata_cache_only(make_fits, hlsp_cards, tmp_path) -> None:
+    """Test that files can be checked again from the cache once they are gone"""
+    make_fits("data/good.fits", [hlsp_cards])
+    make_fits("data/review.fits", [{**hlsp_cards, "HLSPID": "OTHER"}])
+    cache_file = str(tmp_path / "mct_cache.db")
+    root = str(tmp_path / "data")
+    file_list = [Path("good.fits"), Path("review.fits")]
+    check_metadata("my-hlsp", file_list, str(tmp_path / "first.db"), root=root, cache_file=cache_file)
+
+    for path in file_list:
+        os.remove(tmp_path / "data" / path)
+    file_list = cached_file_paths(cache_file, root)
+    db_file = tmp_path / "second.db"
+    check_metadata("my-hlsp", file_list, str(db_file), root=root, cache_file=cache_file, cache_only=True)
+
+    conn = sqlite3.connect(db_file)
+    verdicts = dict(conn.execute("SELECT filename, final_verdict FROM fits_file"))
+    assert verdicts == {"good.fits": "PASS", "review.fits": "NEEDS REVIEW"}
+    assert conn.execute("SELECT cache_hit_rate FROM runs").fetchone()[0] == 1.0
+    conn.close()
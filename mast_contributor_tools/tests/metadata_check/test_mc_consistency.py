@@ -0,0 +1,114 @@
+"""
+Tests for mast_contributor_tools/metadata_check/mc_consistency.py
+"""
+
+from pathlib import Path
+
+import pytest
+
+from mast_contributor_tools.filename_check.fc_app import check_filenames
+from mast_contributor_tools.metadata_check.mc_app import check_metadata
+from mast_contributor_tools.metadata_check.mc_consistency import (
+    CONSISTENCY,
+    ConsistencyCheck,
+    normalize,
+    oif_aliases,
+    summarize_consistency,
+)
+
+
+@pytest.fixture
+def consistency(tmp_path, make_fits, hlsp_cards) -> ConsistencyCheck:
+    """A consistency check of the results of both checks, on files whose names match their headers or not"""
+    files = {
+        "hlsp_my-hlsp_hst_wfc3_m31_f160w_v1_img.fits": {},
+        # A filter that differs from the header
+        "hlsp_my-hlsp_hst_wfc3_m31_f814w_v1_img.fits": {},
+        # Several instruments, one of which is in the header
+        "hlsp_my-hlsp_hst_acs-wfc3_m31_f160w_v1_cat.fits": {},
+        # An alias of the mission, a target name with a space, and an instrument in upper case
+        "hlsp_my-hlsp_cfht_megacam_ngc1234_g.mp9401_v1_img.fits": {
+            "TELESCOP": "CFHT 3.6m",
+            "INSTRUME": "MEGACAM",
+            "TARGNAME": "NGC 1234",
+            "FILTER": "g.MP9401",
+        },
+        # A blank target name is not compared
+        "hlsp_my-hlsp_jwst_nircam_m31_f200w_v1_img.fits": {
+            "TELESCOP": "JWST",
+            "INSTRUME": "NIRSPEC",
+            "TARGNAME": "",
+            "FILTER": "F200W",
+        },
+    }
+    for name, cards in files.items():
+        make_fits(name, [{**hlsp_cards, **cards}])
+    file_list = [Path(name) for name in files]
+    names_db, metadata_db = str(tmp_path / "names.db"), str(tmp_path / "metadata.db")
+    check_filenames("my-hlsp", file_list, names_db, root=str(tmp_path), metrics_file="")
+    check_metadata("my-hlsp", file_list, metadata_db, root=str(tmp_path))
+    check = ConsistencyCheck(names_db, metadata_db)
+    yield check
+    check.close()
+
+
+def test_normalize() -> None:
+    """Test that header values are normalized as in the SQL expression"""
+    assert normalize(" Magellan Clay ") == "magellan-clay"
+    assert normalize("ACS_WFC") == "acs-wfc"
+
+
+def test_oif_aliases() -> None:
+    """Test that missions and instruments are aliases of themselves, along with their listed aliases"""
+    oif = {"cfht": {"aliases": ["CFHT 3.6m"], "instruments": {"megacam": {"filters": ["g"]}}}}
+    assert oif_aliases(oif) == [
+        ("mission", "cfht", "cfht"),
+        ("mission", "cfht-3.6m", "cfht"),
+        ("instrument", "megacam", "megacam"),
+    ]
+
+
+def test_comparisons(consistency) -> None:
+    """Test that each field is compared with its keyword, after normalizing the header values"""
+    consistency.open()
+    rows = {
+        (r[0].split("_")[2], r[0].split("_")[3], r[0].split("_")[5], r[1]): r[5:] for r in consistency.comparisons()
+    }
+    assert rows[("hst", "wfc3", "f814w", "filter")] == ("f160w", "NEEDS REVIEW")
+    assert rows[("hst", "wfc3", "f160w", "filter")] == ("f160w", "PASS")
+    assert rows[("hst", "acs-wfc3", "f160w", "instrument")] == ("wfc3", "PASS")
+    assert rows[("cfht", "megacam", "g.mp9401", "mission")] == ("cfht", "PASS")
+    assert rows[("cfht", "megacam", "g.mp9401", "instrument")] == ("megacam", "PASS")
+    assert rows[("cfht", "megacam", "g.mp9401", "target_name")] == ("ngc-1234", "PASS")
+    assert rows[("cfht", "megacam", "g.mp9401", "filter")] == ("g.mp9401", "PASS")
+    assert rows[("jwst", "nircam", "f200w", "instrument")] == ("nirspec", "NEEDS REVIEW")
+    assert ("jwst", "nircam", "f200w", "target_name") not in rows
+
+
+def test_write_db(consistency, tmp_path) -> None:
+    """Test that the comparisons are written to the consistency database, and the mismatches summarized"""
+    consistency.open(str(tmp_path / "consistency.db"))
+    counts = consistency.write_db()
+    # 5 files with 4 fields each, less the blank target name
+    assert counts["PASS"] + counts["NEEDS REVIEW"] == 19
+    assert counts["NEEDS REVIEW"] == 2
+    mismatches = consistency.mismatches()
+    assert ("filter", "f814w", "F160W", 1) in mismatches
+    summary = summarize_consistency(counts, mismatches)
+    assert "Fields needing review: 2" in summary
+    assert "instrument='nircam', INSTRUME='NIRSPEC': 1 files" in summary
+    assert (tmp_path / "consistency.db").is_file()
+
+
+def test_query_plan(consistency) -> None:
+    """Test that both results databases are searched through their indexes rather than scanned"""
+    consistency.open()
+    plan = " ".join(row[-1] for row in consistency.conn.execute(f"EXPLAIN QUERY PLAN {CONSISTENCY}"))
+    assert "SCAN fl" not in plan and "SCAN kw" not in plan
+    assert "ix_keywords_file_ref" in plan
+
+
+def test_missing_db(tmp_path) -> None:
+    """Test that a missing results database raises FileNotFoundError"""
+    with pytest.raises(FileNotFoundError):
+        ConsistencyCheck(str(tmp_path / "a.db"), str(tmp_path / "b.db")).open()
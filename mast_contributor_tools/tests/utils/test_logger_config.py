@@ -0,0 +1,89 @@
+"""
+Tests for mast_contributor_tools/utils/logger_config.py
+"""
+
+import logging
+import os
+import timeit
+
+import pytest
+
+from mast_contributor_tools.utils import logger_config
+from mast_contributor_tools.utils.logger_config import CustomLoggingFormatter, set_log_file, setup_logger, stop_logging
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    """Write the log file to a temporary directory during a test, then go back to the usual log file"""
+    setup_logger("mast_contributor_tools.tests")
+    previous = logger_config._LogHandlers.log_file
+    log_file = tmp_path / "logs" / "test.log"
+    set_log_file(str(log_file))
+    yield log_file
+    set_log_file(previous)
+
+
+def test_setup_logger_idempotent() -> None:
+    """Test that setting up a logger again does not add more handlers"""
+    logger = setup_logger("mast_contributor_tools.tests.one")
+    handlers = list(logger.handlers)
+    assert len(handlers) == 2
+    assert setup_logger("mast_contributor_tools.tests.one").handlers == handlers
+    # Every logger shares the same handlers
+    assert setup_logger("mast_contributor_tools.tests.two").handlers == handlers
+
+
+def test_log_file(log_file) -> None:
+    """Test that records are written to the configured log file, in its directory"""
+    logger = setup_logger("mast_contributor_tools.tests")
+    logger.info("Checked %d files", 3)
+    logger.debug("Not written at INFO level")
+    stop_logging()
+    text = log_file.read_text()
+    assert "INFO - Checked 3 files" in text
+    assert "Not written" not in text
+
+
+def test_log_file_rotation(log_file, monkeypatch) -> None:
+    """Test that the log file is rotated once it is too large"""
+    monkeypatch.setattr(logger_config, "MAX_LOG_BYTES", 1000)
+    set_log_file(str(log_file))
+    logger = setup_logger("mast_contributor_tools.tests")
+    for i in range(100):
+        logger.info("Message %d", i)
+    stop_logging()
+    assert os.path.exists(f"{log_file}.1")
+    assert len(list(log_file.parent.iterdir())) == 1 + logger_config.LOG_BACKUP_COUNT
+
+
+def test_no_log_file(log_file) -> None:
+    """Test that an empty log file name turns off the log file"""
+    set_log_file("")
+    setup_logger("mast_contributor_tools.tests").info("Not written")
+    assert not log_file.exists()
+
+
+@pytest.mark.parametrize(
+    "msg, args, level, color",
+    [
+        ("Checking", (), logging.INFO, CustomLoggingFormatter.grey),
+        ("Final Verdict: '%s'", ("FAIL",), logging.CRITICAL, CustomLoggingFormatter.bold_red),
+        ("Final Verdict: 'PASS'", (), logging.CRITICAL, CustomLoggingFormatter.green),
+        ("Files Failed: %d", (0,), logging.CRITICAL, CustomLoggingFormatter.green),
+        ("Files Failed: %d", (2,), logging.CRITICAL, CustomLoggingFormatter.bold_red),
+    ],
+)
+def test_custom_formatter(msg, args, level, color) -> None:
+    """Test that records are color-coded by level and by their (lazily formatted) message"""
+    record = logging.LogRecord("mct", level, __file__, 1, msg, args, None)
+    formatted = CustomLoggingFormatter().format(record)
+    assert formatted.startswith(color)
+    assert record.getMessage() in formatted
+
+
+def test_disabled_log_overhead() -> None:
+    """Test that debug messages cost little more than a function call at INFO level"""
+    logger = setup_logger("mast_contributor_tools.tests")
+    n = 10000
+    per_call = min(timeit.repeat(lambda: logger.debug("Examining %s", "name"), number=n, repeat=5)) / n
+    assert per_call < 5e-6
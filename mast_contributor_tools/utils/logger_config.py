@@ -1,6 +1,20 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import re
+from typing import Union
+
+# Environment variable with the path of the log file; an empty value turns off the log file
+LOG_FILE_ENV = "MCT_LOG_FILE"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# The log file is rotated once it reaches this size, keeping this many old log files
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+# Number of failed files in the summary of check_filenames
+N_FAILED_REGEX = re.compile(r"Files Failed: (\d+)")
 
 
 class CustomLoggingFormatter(logging.Formatter):
@@ -11,82 +25,159 @@ class CustomLoggingFormatter(logging.Formatter):
         'ERROR' messages are in red
         'CRITICAL' messages are in green
 
+    The formatter of each color is created once, rather than for every record.
+
     Modified from : https://stackoverflow.com/questions/384076/how-can-i-color-python-logging-output
     """
 
+    grey = "\x1b[38;20m"
+    yellow = "\x1b[33;20m"
+    red = "\x1b[31;20m"
+    bold_red = "\x1b[31;1m"
+    green = "\x1b[1;32m"
+    reset = "\x1b[0m"
+
+    # Set color by log message level
+    LEVEL_COLORS = {
+        logging.DEBUG: grey,
+        logging.INFO: grey,
+        logging.WARNING: yellow,
+        logging.ERROR: red,
+        logging.CRITICAL: green,
+    }
+
+    def __init__(self) -> None:
+        super().__init__(LOG_FORMAT)
+        colors = {self.grey, self.yellow, self.red, self.bold_red, self.green}
+        self.formatters = {color: logging.Formatter(color + LOG_FORMAT + self.reset) for color in colors}
+
     def color_code(self, record) -> str:
         """
-        Returns the color-coded format for a log record
+        Returns the color code for a log record
         """
-        grey = "\x1b[38;20m"
-        yellow = "\x1b[33;20m"
-        red = "\x1b[31;20m"
-        bold_red = "\x1b[31;1m"
-        green = "\x1b[1;32m"
-        reset = "\x1b[0m"
-        msg_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-
-        # Set color by log message level
-        FORMATS = {
-            logging.DEBUG: grey + msg_format + reset,
-            logging.INFO: grey + msg_format + reset,
-            logging.WARNING: yellow + msg_format + reset,
-            logging.ERROR: red + msg_format + reset,
-            logging.CRITICAL: green + msg_format + reset,
-        }
-
-        log_fmt = FORMATS.get(record.levelno)
+        color = self.LEVEL_COLORS.get(record.levelno, self.grey)
+        message = record.getMessage()
 
         # Additional logic if specific strings are present in log message
         # Individual field and file verdicts
-        if ": 'FAIL'" in record.msg:
-            log_fmt = bold_red + msg_format + reset
-        elif ": 'NEEDS REVIEW'" in record.msg:
-            log_fmt = yellow + msg_format + reset
-        elif ": 'PASS'" in record.msg:
-            log_fmt = green + msg_format + reset
+        if ": 'FAIL'" in message:
+            color = self.bold_red
+        elif ": 'NEEDS REVIEW'" in message:
+            color = self.yellow
+        elif ": 'PASS'" in message:
+            color = self.green
 
         # Total score for file list
-        if "All files passed!" in record.msg:
-            log_fmt = green + msg_format + reset
-        elif "Files Failed" in record.msg:
-            n_failed = int(re.findall(r"Files Failed: (\d+)", record.msg)[0])
-            print(n_failed)
-            if n_failed > 0:  # make text red if any files failed
-                log_fmt = bold_red + msg_format + reset
-
-        if not log_fmt:
-            log_fmt = grey + msg_format + reset
-        return log_fmt
+        if "All files passed!" in message:
+            color = self.green
+        elif "Files Failed" in message:
+            match = N_FAILED_REGEX.search(message)
+            if match and int(match.group(1)) > 0:  # make text red if any files failed
+                color = self.bold_red
+        return color
 
     def format(self, record) -> str:
-        log_fmt = self.color_code(record)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        return self.formatters[self.color_code(record)].format(record)
+
+
+class _FileQueueHandler(logging.handlers.QueueHandler):
+    """Puts records on the queue of the log file listener, if there is a log file"""
+
+    def emit(self, record) -> None:
+        if _LogHandlers.listener is not None:
+            super().emit(record)
+
+
+class _LogHandlers:
+    """The handlers shared by every logger of this package, created by the first call to setup_logger()
+
+    Records for the log file are put on a queue by a QueueHandler, and written to a rotating log
+    file by a QueueListener thread, so that writing the log file does not slow down the caller.
+    """
+
+    console: Union[logging.Handler, None] = None
+    file_queue: Union[_FileQueueHandler, None] = None
+    listener: Union[logging.handlers.QueueListener, None] = None
+    # Path of the log file, or None to use default_log_file()
+    log_file: Union[str, None] = None
+
+
+def default_log_file() -> str:
+    """Returns the path of the log file: from the MCT_LOG_FILE environment variable if it is set,
+    otherwise mct.log in the user's state directory (for example ~/.local/state/mast_contributor_tools)
+    """
+    if LOG_FILE_ENV in os.environ:
+        return os.environ[LOG_FILE_ENV]
+    state_dir = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(state_dir, "mast_contributor_tools", "mct.log")
+
+
+def set_log_file(log_file: str) -> None:
+    """Write the log file to a new location, or stop writing it if log_file is empty.
+
+    The file is rotated once it reaches MAX_LOG_BYTES, keeping LOG_BACKUP_COUNT old files.
+    """
+    stop_logging()
+    _LogHandlers.log_file = ""
+    if _LogHandlers.file_queue is None:
+        # Used once the first logger is set up
+        _LogHandlers.log_file = log_file
+        return
+    if not log_file:
+        return
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+    except OSError as e:
+        logging.getLogger(__name__).warning(f"Not writing a log file: cannot create {log_file}: {e}")
+        return
+    # The log file is only opened once the first message is written
+    f_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+    )
+    f_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(queue.SimpleQueue(), f_handler)
+    listener.start()
+    _LogHandlers.file_queue.queue = listener.queue
+    _LogHandlers.listener, _LogHandlers.log_file = listener, log_file
+
+
+def stop_logging() -> None:
+    """Write the records still queued to the log file, and close it"""
+    listener = _LogHandlers.listener
+    if listener is not None:
+        # Records logged from now on are dropped, rather than queued with no listener
+        _LogHandlers.listener = None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
 
 
 def setup_logger(name: str, level: int = logging.INFO) -> logging.Logger:
-    """Create a custom logger."""
+    """Create a custom logger.
+
+    Every logger shares the same two handlers, which are only added once however many times this
+    is called: a color-coded terminal output, and a queue to the log file (see set_log_file).
+    """
 
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
-    # Create handlers
-    c_handler = logging.StreamHandler()
-    f_handler = logging.FileHandler(os.path.join(os.path.dirname(__file__), "../mct.log"))
-    c_handler.setLevel(level)
-    f_handler.setLevel(level)
-
-    # Create formatters and add it to handlers
-    c_format = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    f_format = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    c_handler.setFormatter(c_format)
-    f_handler.setFormatter(f_format)
-    # Color code the text for the terminal output
-    c_handler.setFormatter(CustomLoggingFormatter())
+    if _LogHandlers.console is None:
+        # Create handlers
+        c_handler = logging.StreamHandler()
+        # Color code the text for the terminal output
+        c_handler.setFormatter(CustomLoggingFormatter())
+        c_handler.setLevel(level)
+        q_handler = _FileQueueHandler(queue.SimpleQueue())
+        q_handler.setLevel(level)
+        _LogHandlers.console, _LogHandlers.file_queue = c_handler, q_handler
+        log_file = _LogHandlers.log_file
+        set_log_file(default_log_file() if log_file is None else log_file)
+        atexit.register(stop_logging)
 
     # Add handlers to the logger
-    logger.addHandler(c_handler)
-    logger.addHandler(f_handler)
+    for handler in (_LogHandlers.console, _LogHandlers.file_queue):
+        if handler not in logger.handlers:
+            logger.addHandler(handler)
 
     return logger